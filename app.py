@@ -1,26 +1,42 @@
 # file: app.py
+import re, time
+_script_t0 = time.perf_counter()
+import uuid
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 from tape_gpt.viz.indicators import render_main_signal_indicator
 from tape_gpt.config import get_settings, require_openai_api_key
 from tape_gpt.data.loaders import parse_profit_excel
-from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
-from tape_gpt.viz.charts import candle_volume_figure, buy_sell_imbalance_figures, top_aggressors_figure
+from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances, StreamingPreprocessor
 from tape_gpt.analysis.orderflow import top_aggressors
 from tape_gpt.chat.chat_ui import render_chat_ui
+from tape_gpt.chat.scheduler import LLMScheduler
+from tape_gpt.chat.resilience import guard_for
+from tape_gpt.chat.local_backend import get_local_llm
 from tape_gpt.analysis.rule_based import analyze_tape, render_response
-from tape_gpt.data.simulator import RealTimeSimulator
-from streamlit_autorefresh import st_autorefresh
-from tape_gpt.viz.order_book import order_book_figure
-from tape_gpt.viz.time_sales import time_and_sales_figure
+from tape_gpt.analysis.features import signal_timeline
+from tape_gpt.analysis.agents import AgentIndex
+from tape_gpt.analysis.microstructure import TapeSpeed
+from tape_gpt.analysis.liquidity import book_liquidity, detect_liquidity_events, summarize_liquidity_events
+from tape_gpt.analysis.alerts import AlertEngine, WebhookSink
+from tape_gpt.data.hub import MarketDataHub
+from tape_gpt.data.multi import MultiSymbolHub, make_multi_hub, parse_watchlist
+from tape_gpt.data.tick_store import TickStore
+from tape_gpt.data.snapshots import SnapshotStore, content_hash
+from tape_gpt.data.checkpoint import CheckpointStore, load_session, save_session
+from tape_gpt.startup import lazy_import, record, timed, report as startup_report
+
+# imports de topo só pesam na primeira execução do processo (depois vêm do cache de módulos);
+# openai, numba, streamlit_autorefresh, openpyxl e os gráficos (plotly) ficam para o primeiro uso
+record("imports do app.py", (time.perf_counter() - _script_t0) * 1000, kind="import")
 
 st.set_page_config(page_title="TapeGPT — Chatbot Tape Reading & TA", layout="wide")
 
 # Config
 settings = get_settings()
 # Se a chave não estiver definida em env/secrets, pede via UI
-openai_api_key = settings.OPENAI_API_KEY or require_openai_api_key()
+openai_api_key = settings.OPENAI_API_KEY or (require_openai_api_key() if settings.LLM_BACKEND == "openai" else "")
 
 # Cabeçalho
 st.title("Pilotrader — Análise automatizada de Tape Reading")
@@ -35,15 +51,15 @@ st.sidebar.header("Dados de mercado")
 # --- Controle de abas (evita flicker no Chat enquanto Painel faz auto-refresh) ---
 tab_label = st.sidebar.radio(
     "Navegação",
-    options=["📊 Painel", "🤖 Chatbot"],
+    options=["📊 Painel", "📋 Watchlist", "🤖 Chatbot"],
     index=0,
     help="Selecione a seção"
 )
-tab = "Painel" if tab_label.startswith("📊") else "Chatbot"
+tab = {"📊": "Painel", "📋": "Watchlist"}.get(tab_label[:1], "Chatbot")
 
 data_source = st.sidebar.selectbox(
     "Fonte de dados",
-    ["Upload Excel (Profit Times in Trade)", "Conexão WebSocket (placeholder)", "Simular tempo real"]
+    ["Upload Excel (Profit Times in Trade)", "Conexão WebSocket (placeholder)", "Simular tempo real", "Histórico (tick store)"]
 )
 
 agg_unit = st.sidebar.selectbox("Agregação para plot (resolução)", ["5s","1s","15s","1min"])
@@ -51,45 +67,182 @@ lookback = st.sidebar.selectbox("Janela Top Agressores", ["10min","30min","60min
 
 uploaded_df = None
 offers_df = None
+source_id = None   # identidade barata da fonte estática (arquivo enviado ou consulta ao histórico)
+agent_index = None
+alert_engine = None
 
 #### Fonte 1: Simulador de tempo real
-if "sim" not in st.session_state:
-    st.session_state.sim = RealTimeSimulator(start_price=100000.0, tick_ms=5000, vol=2.0, max_rows=100)
-    try:
-        st.session_state.sim.seed_from_profit_xlsx("testes/exemplo_times_in_trade.xlsx")  # ponto de partida
-    except Exception as e:
-        st.warning(f"Falha ao semear simulador com XLSX: {e}")
+# Um feed por símbolo da WATCHLIST, por processo (st.cache_resource), compartilhado por todas as abas/sessões.
+# INGEST_MODE=process move a geração para outro processo (rings em memória compartilhada).
+# Com CHECKPOINT_DIR cada feed retoma do último checkpoint após reiniciar o servidor.
+# Os pipelines por símbolo (barras, imbalances, agressores, livro) rodam num pool de workers em
+# background (processos quando há mais de um núcleo); a aba Watchlist só lê os últimos resultados.
+# Cada feed guarda WINDOW_S segundos de tape à taxa padrão (não um número fixo de negócios).
+@st.cache_resource
+def get_multi_hub(symbols: tuple, ingest_mode: str = "thread", store_dir: str = "", checkpoint_dir: str = "",
+                  checkpoint_interval_s: float = 10.0, workers: int = 0, executor: str = "auto") -> MultiSymbolHub:
+    multi = make_multi_hub(symbols, ingest_mode, store_dir, checkpoint_dir, checkpoint_interval_s,
+                           max_workers=workers or None, executor=executor)
+    multi.start()
+    return multi
+
+def multi_hub() -> MultiSymbolHub:
+    return get_multi_hub(tuple(parse_watchlist(settings.WATCHLIST) or ["WIN"]), settings.INGEST_MODE,
+                         settings.TICK_STORE_DIR, settings.CHECKPOINT_DIR, settings.CHECKPOINT_INTERVAL_S,
+                         settings.PIPELINE_WORKERS, settings.PIPELINE_EXECUTOR)
+
+def market_hub(symbol: str = "") -> MarketDataHub:
+    """Feed do símbolo (padrão: o primeiro da watchlist, que recebe a semente XLSX)."""
+    multi = multi_hub()
+    return multi.hub(symbol or multi.symbols()[0])
+
+# Motores de alertas: um por símbolo, avaliado a cada lote do feed dele (thread do simulador ou seguidor
+# do IngestProcess), independente do refresh do navegador. Um por processo e símbolo, como os feeds.
+@st.cache_resource
+def get_alert_engine(symbol: str, ingest_mode: str = "thread", store_dir: str = "", webhook_url: str = "") -> AlertEngine:
+    engine = AlertEngine(bar="5s", symbol=symbol)
+    if webhook_url:
+        engine.add_sink(WebhookSink(webhook_url))
+    engine.attach(market_hub(symbol).sim)
+    return engine
+
+def alert_engines() -> dict:
+    """{símbolo: motor} de toda a watchlist (cada alerta traz o campo "symbol")."""
+    return {s: get_alert_engine(s, settings.INGEST_MODE, settings.TICK_STORE_DIR, settings.ALERT_WEBHOOK_URL)
+            for s in multi_hub().symbols()}
+
+if "session_id" not in st.session_state:
+    # id estável na URL (?sid=...): ao reconectar após reinício/expiração, a sessão retoma do checkpoint
+    # o feed e a análise (janela, índice por agente, ritmo). Qualquer um pode abrir a página com um sid
+    # escolhido (ex.: link enviado por outra pessoa), então o sid nunca dá acesso ao chat: o histórico
+    # fica só na memória da sessão, não vai para o checkpoint. Só ids no formato gerado aqui são aceitos
+    sid = str(st.query_params.get("sid") or "")
+    st.session_state.session_id = sid if re.fullmatch(r"[0-9a-f]{32}", sid) else uuid.uuid4().hex
+    st.query_params["sid"] = st.session_state.session_id
+checkpoints = CheckpointStore(settings.CHECKPOINT_DIR) if settings.CHECKPOINT_DIR else None
+if checkpoints is not None:
+    st.sidebar.caption("O endereço desta página (?sid=…) retoma o feed e a análise após reinícios; "
+                       "o chat não é salvo nem restaurado pelo link.")
+
+hub = sim = None
+market = "índice"   # descrição do instrumento no prompt do chat
 
-# Controles do simulador
+# Controles do simulador (feed e semente só são montados quando o simulador é escolhido)
 if data_source == "Simular tempo real":
+    symbols = multi_hub().symbols()
+    symbol = st.sidebar.selectbox("Símbolo", symbols, key="__sim_symbol")
+    market = multi_hub().market(symbol)
+    with timed("feed + semente do simulador"):
+        hub = market_hub(symbol)
+        if symbol == symbols[0]:
+            try:
+                hub.ensure_seeded("testes/exemplo_times_in_trade.xlsx")  # ponto de partida (uma vez por processo)
+            except Exception as e:
+                st.warning(f"Falha ao semear simulador com XLSX: {e}")
+    sim = hub.sim
+    # estado analítico e checkpoint são por (sessão, símbolo): trocar de símbolo retoma o daquele feed
+    checkpoint_key = f"{st.session_state.session_id}:{symbol}"
+    if st.session_state.get("sim_symbol") != symbol:
+        st.session_state.pop("sim_stream", None)
+        st.session_state.sim_symbol = symbol
+    if "sim_stream" not in st.session_state:
+        with timed("retomada do checkpoint da sessão"):
+            resumed = load_session(checkpoints, checkpoint_key) if checkpoints is not None else None
+        if resumed is not None:
+            # janela, índice por agente e cursor salvos: lê do feed só o que chegou depois do checkpoint
+            st.session_state.sim_stream = resumed["stream"]
+            st.session_state.sim_agents = resumed["agents"]
+            # checkpoint anterior ao ritmo do tape: recomeça do zero (aquece em ~warmup negócios)
+            st.session_state.sim_speed = resumed["speed"] or TapeSpeed()
+            hub.drop_session(st.session_state.session_id)   # o cursor válido é o do checkpoint
+            hub.register_session(st.session_state.session_id, cursor=resumed["cursor"])
+        else:
+            st.session_state.sim_stream = StreamingPreprocessor(max_rows=sim.max_rows)
+            st.session_state.sim_agents = AgentIndex()
+            st.session_state.sim_speed = TapeSpeed()
+            hub.drop_session(st.session_state.session_id)   # janela nova: volta a ler com backfill
+        st.session_state.checkpoint_at = time.time()
+    hub.register_session(st.session_state.session_id, backfill=sim.max_rows)
     colA, colB, colC = st.sidebar.columns(3)
     with colA:
-        running = st.toggle("Rodar", value=st.session_state.sim.is_running(), key="__sim_run_toggle")
+        # o toggle segue o estado real do feed (ligado/desligado pela watchlist ou por outra sessão);
+        # só vira comando quando o usuário o altera nesta sessão
+        if st.session_state.get("__sim_run_toggle") == st.session_state.get("sim_run_applied"):
+            st.session_state["__sim_run_toggle"] = sim.is_running()
+        running = st.toggle("Rodar", key="__sim_run_toggle")
+        st.session_state.sim_run_applied = running
     with colB:
         tick_ms = st.number_input("Tick (ms)", min_value=1000, max_value=10000, value=5000, step=500)  # 5s default
     with colC:
         vol = st.number_input("Vol (σ)", min_value=0.1, max_value=20.0, value=2.0, step=0.1)
+    sim_mode = st.sidebar.selectbox(
+        "Relógio do simulador", ["tick", "poisson", "hawkes", "book"],
+        help="tick: 1 negócio por tick. poisson/hawkes: chegadas em lotes com taxa alvo (hawkes = rajadas). "
+             "book: ordens limite/mercado/cancelamento casadas em um livro (taxa = eventos/s)."
+    )
+    rate = st.sidebar.number_input("Taxa alvo (negócios/s)", min_value=1, max_value=50000, value=1000, step=500,
+                                   disabled=(sim_mode == "tick"))
+    st.sidebar.caption(f"Feed compartilhado entre sessões ({hub.session_count()} conectada(s)).")
+
+    engines = alert_engines()
+    alert_engine = engines[symbol]
+    with st.sidebar.expander(f"Alertas ({symbol})", expanded=False):
+        rules_text = st.text_area(
+            "Regras (uma por linha)", value="\n".join(alert_engine.rules()), height=140, key=f"__alert_rules_{symbol}",
+            help="Ex.: imbalance < -0.4 for 3 bars | big_prints >= 3 in 2min | agent AG012 buy >= 300 in 1min | "
+                 "cvd_divergence [bullish|bearish]. Barras de 5s; valem para o feed deste símbolo (todas as sessões)."
+        )
+        if st.button("Aplicar regras", key="__alert_apply"):
+            errors = alert_engine.set_rules(rules_text.splitlines())
+            for err in errors:
+                st.error(err)
+            if not errors:
+                st.success(f"{len(alert_engine.rules())} regra(s) ativa(s).")
+        st.caption(f"Avaliação: {alert_engine.last_eval_us:.0f} µs por lote"
+                   + (" · webhook ativo" if settings.ALERT_WEBHOOK_URL else ""))
 
-    if running and not st.session_state.sim.is_running():
-        st.session_state.sim.tick = tick_ms/1000.0
-        st.session_state.sim.vol = float(vol)
-        st.session_state.sim.start()
-    elif (not running) and st.session_state.sim.is_running():
-        st.session_state.sim.stop()
+    # alertas novos de todos os símbolos desde os cursores desta sessão (os logs são compartilhados;
+    # cada sessão tem um cursor por símbolo)
+    cursors = st.session_state.setdefault("alert_cursors", {})
+    new_alerts = []
+    for sym, engine in engines.items():
+        if sym not in cursors:
+            cursors[sym] = engine.log.seq()
+        batch, cursors[sym] = engine.log.read_since(cursors[sym])
+        new_alerts.extend(batch)
+    for a in new_alerts[-3:]:
+        st.toast(f"🔔 {a['symbol']}: {a['rule']} (valor {a['value']:.2f})")
+
+    sim.mode = sim_mode
+    sim.rate = float(rate)
+    if running and not sim.is_running():
+        sim.tick = tick_ms/1000.0
+        sim.vol = float(vol)
+        sim.start()
+    elif (not running) and sim.is_running():
+        sim.stop()
     else:
-        st.session_state.sim.tick = tick_ms/1000.0
-        st.session_state.sim.vol = float(vol)
+        sim.tick = tick_ms/1000.0
+        sim.vol = float(vol)
 
-    # Coleta dados correntes do simulador e usa o mesmo mapeamento do código atual
-    sim_trades, sim_offers = st.session_state.sim.get_dataframes()
+    # Negócios: só as linhas novas desde o cursor desta sessão são normalizadas (janela incremental).
+    # Ofertas: snapshot compartilhado, montado uma vez por versão do feed.
+    sim_version = hub.sim.version()   # antes da leitura: a janela contém ao menos esta versão
+    new_trades = hub.read_new(st.session_state.session_id)
+    st.session_state.sim_stream.update(new_trades)
+    st.session_state.sim_agents.update(new_trades)   # índice por agente cresce só com o lote novo
+    st.session_state.sim_speed.update(new_trades)    # ritmo do tape: estado O(1), só o lote novo
+    if checkpoints is not None and time.time() - st.session_state.checkpoint_at >= settings.CHECKPOINT_INTERVAL_S:
+        ms = save_session(checkpoints, checkpoint_key, st.session_state.sim_stream,
+                          st.session_state.sim_agents, hub.session_cursor(st.session_state.session_id),
+                          speed=st.session_state.sim_speed)
+        record("checkpoint da sessão", ms)
+        st.session_state.checkpoint_at = time.time()
+    agent_index = st.session_state.sim_agents
+    sim_trades = st.session_state.sim_stream.frame()
     if not sim_trades.empty:
-        # NÃO force renomear se já existem as colunas internas
-        uploaded_df = sim_trades.copy()
-        if "price" not in uploaded_df.columns and "Valor" in uploaded_df.columns:
-            uploaded_df = uploaded_df.rename(columns={"Valor": "price"})
-        if "volume" not in uploaded_df.columns and "Quantidade" in uploaded_df.columns:
-            uploaded_df = uploaded_df.rename(columns={"Quantidade": "volume"})
-        offers_df = sim_offers.copy()
+        uploaded_df = sim_trades
+        offers_df = hub.snapshot()[1]
 
 #### Fonte 2: Upload XLSX Profit
 elif data_source == "Upload Excel (Profit Times in Trade)":
@@ -99,54 +252,115 @@ elif data_source == "Upload Excel (Profit Times in Trade)":
             df_trades, df_offers = parse_profit_excel(excel_file)
             uploaded_df = df_trades
             offers_df = df_offers
+            source_id = ("upload", getattr(excel_file, "file_id", None) or excel_file.name, excel_file.size)
             st.sidebar.success(f"XLSX carregado: {uploaded_df.shape[0]} negócios")
         except Exception as e:
             st.sidebar.error(f"Falha ao ler XLSX do Profit: {e}")
+    if uploaded_df is not None:
+        store_symbol = st.sidebar.text_input("Símbolo (tick store)", value="WIN", key="__store_symbol_upload")
+        if st.sidebar.button("Salvar no tick store"):
+            try:
+                n = TickStore(settings.TICK_STORE_DIR).append(store_symbol, uploaded_df)
+                st.sidebar.success(f"{n} negócios gravados em {store_symbol}.")
+            except Exception as e:
+                st.sidebar.error(f"Falha ao gravar no tick store: {e}")
+
+#### Fonte 4: Histórico persistido (tick store)
+elif data_source == "Histórico (tick store)":
+    store = TickStore(settings.TICK_STORE_DIR)
+    symbols = store.symbols()
+    if not symbols:
+        st.sidebar.info("Tick store vazio. Salve um upload ou rode o simulador para gravar histórico.")
+    else:
+        store_symbol = st.sidebar.selectbox("Símbolo", symbols)
+        days = store.days(store_symbol)
+        day = st.sidebar.selectbox("Dia", days, index=len(days) - 1)
+        t_start, t_end = st.sidebar.slider(
+            "Janela (UTC)", value=(datetime.strptime("00:00", "%H:%M").time(), datetime.strptime("23:59", "%H:%M").time())
+        )
+        try:
+            # lê apenas as partições/row groups que intersectam a janela pedida
+            uploaded_df = store.read(store_symbol, start=f"{day} {t_start:%H:%M}", end=f"{day} {t_end:%H:%M}:59.999999")
+            # o tick store cresce com o simulador: tamanho e último negócio entram na identidade da consulta
+            last_ts = uploaded_df["timestamp"].iloc[-1] if len(uploaded_df) else None
+            source_id = ("hist", store_symbol, day, t_start, t_end, len(uploaded_df), last_ts)
+            st.sidebar.success(f"{len(uploaded_df)} negócios carregados de {store_symbol} ({day}).")
+        except Exception as e:
+            st.sidebar.error(f"Falha ao ler o tick store: {e}")
 
 #### Fonte 3: WebSocket (placeholder)
 else:
     st.sidebar.info("WebSocket: inserir código do provedor e credenciais aqui. Atualmente é um placeholder.")
 
+# Identidade do conteúdo atual (chave do SnapshotStore, compartilhado entre sessões): mesma chave = mesmos
+# dados. No simulador, (feed, versão); em upload/histórico, hash do conteúdo (dois arquivos com as mesmas
+# linhas e pontas diferem no miolo). O hash percorre todas as linhas: é calculado uma vez por source_id
+data_key = None
+if uploaded_df is not None and len(uploaded_df) > 0:
+    if data_source == "Simular tempo real":
+        data_key = (data_source, symbol, sim_version)
+    else:
+        if source_id is None or st.session_state.get("content_hash_src") != source_id:
+            st.session_state.content_hash_val = content_hash(uploaded_df, offers_df)
+            st.session_state.content_hash_src = source_id
+        data_key = (data_source, st.session_state.content_hash_val)
+
+# Índice por agente para fontes estáticas (upload/histórico): montado uma vez por conjunto de dados
+if agent_index is None and data_key is not None:
+    if st.session_state.get("agent_index_key") != data_key:
+        st.session_state.agent_index = AgentIndex()
+        st.session_state.agent_index.update(uploaded_df)
+        st.session_state.agent_index_key = data_key
+    agent_index = st.session_state.agent_index
+
 # ---------------- Snapshot (congelar contexto do chat) ----------------
-# Ao enviar uma pergunta, congelaremos um snapshot do DF nesse instante.
-if "chat_frozen" not in st.session_state:
-    st.session_state.chat_frozen = False
-if "chat_snapshot_df" not in st.session_state:
-    st.session_state.chat_snapshot_df = None
-if "chat_snapshot_offers" not in st.session_state:
-    st.session_state.chat_snapshot_offers = None
-
-def freeze_chat_snapshot(df_trades: pd.DataFrame, df_offers: pd.DataFrame | None):
-    st.session_state.chat_frozen = True
-    st.session_state.chat_snapshot_df = df_trades.copy() if df_trades is not None else None
-    st.session_state.chat_snapshot_offers = df_offers.copy() if df_offers is not None else None
-    st.session_state.chat_frozen_at = datetime.utcnow().isoformat()
-
-def reset_chat_snapshot():
-    st.session_state.chat_frozen = False
-    st.session_state.chat_snapshot_df = None
-    st.session_state.chat_snapshot_offers = None
-    st.session_state.chat_frozen_at = None
-    st.session_state.chat_history = []
-    st.session_state.chat_summary = ""
+# Ao enviar uma pergunta, o chat congela uma referência (fonte, versão) a esta versão dos dados;
+# as versões ficam num store por processo, compartilhadas entre sessões (sem cópia por sessão).
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    return SnapshotStore()
+
+# Agendador do modelo: um por (chave, modelos, endpoint) no processo, para o p95 usado no hedge
+# refletir as latências de todas as sessões. O guard (prazo, retry, limite, circuito) é por chave/endpoint.
+@st.cache_resource
+def get_llm_scheduler(api_key: str, model: str, cheap_model: str, base_url: str,
+                      timeout_s: float, max_concurrency: int) -> LLMScheduler:
+    guard = guard_for(api_key, base_url, deadline_s=timeout_s, max_concurrency=max_concurrency)
+    return LLMScheduler(api_key, model, cheap_model=cheap_model, base_url=base_url, guard=guard)
+
+def get_chat_backend():
+    """LLM_BACKEND=local/llama_cpp: modelo local com lotes entre sessões; senão a API com hedge e guard."""
+    if settings.LLM_BACKEND != "openai":
+        return get_local_llm(settings.LLM_BACKEND, settings.LOCAL_LLM_URL, settings.LOCAL_LLM_MODEL,
+                             settings.LOCAL_MODEL_PATH, template=settings.LOCAL_CHAT_TEMPLATE,
+                             timeout_s=settings.LLM_TIMEOUT_S)
+    return get_llm_scheduler(openai_api_key or "", settings.OPENAI_MODEL, settings.CHEAPER_MODEL,
+                             settings.OPENAI_BASE_URL, settings.LLM_TIMEOUT_S, settings.LLM_MAX_CONCURRENCY)
 
 # ---------------- Painel de análise/gráficos (tempo real) ----------------
 imbs = None
 if tab == "Painel":
     if uploaded_df is not None and len(uploaded_df) > 0:
+        charts = lazy_import("tape_gpt.viz.charts")   # plotly só carrega quando há gráfico a desenhar
         df = preprocess_ts(uploaded_df)
         freq = agg_unit
 
         # 1) Imbalances (agora com aggr_diff/total_volume)
         imbs = compute_imbalances(df, window=freq)
 
-        # 2) Análise heurística com pressão dos agressores
-        insights = analyze_tape(df, imbs, freq=freq)
+        # 2) Análise heurística com pressão dos agressores (no simulador, o ritmo do tape vem do
+        #    TapeSpeed da sessão, atualizado só com os lotes novos)
+        micro = st.session_state.sim_speed.stats() if data_source == "Simular tempo real" else None
+        # Liquidez do livro por barra: só no simulador (série que o feed mantém a cada lote de ofertas).
+        # A aba ofertas do XLSX do Profit é uma foto do livro, sem timestamp: não dá série no tempo
+        book_frame = multi_hub().book_series(symbol).frame(freq) if data_source == "Simular tempo real" else None
+        book = book_liquidity(book_frame) if book_frame is not None and len(book_frame) else None
+        insights = analyze_tape(df, imbs, freq=freq, micro=micro, book=book)
 
         # 2a) Top agressores (por agente) — usar DF “bruto” pois contém buyer/seller_agent 
         try:
             top_buy_df, top_sell_df = top_aggressors(df, lookback=lookback, top_n=5)  # troque uploaded_df -> df  
-            fig_top = top_aggressors_figure(top_buy_df, top_sell_df)  # espera cols agent/volume  
+            fig_top = charts.top_aggressors_figure(top_buy_df, top_sell_df)  # espera cols agent/volume  
             insights["top_buy_aggressors"] = list(zip(top_buy_df["agent"].tolist(), top_buy_df["volume"].tolist()))
             insights["top_sell_aggressors"] = list(zip(top_sell_df["agent"].tolist(), top_sell_df["volume"].tolist()))
         except Exception as e:
@@ -157,11 +371,16 @@ if tab == "Painel":
         render_main_signal_indicator(insights.get("main_signal", {}))
 
         # 4) Gráficos
-        st.subheader("Gráfico de candles (agregação) e volume")
-        fig_candle = candle_volume_figure(df, freq=freq)
-        st.plotly_chart(fig_candle, use_container_width=True)
+        if book and book.get("bars"):
+            # candles e liquidez do livro no mesmo eixo de tempo (volume segue no gráfico Buy/Sell abaixo)
+            st.subheader("Candles e liquidez do livro (spread, profundidade, imbalance)")
+            st.plotly_chart(charts.candle_liquidity_figure(df, book_frame, freq=freq), use_container_width=True)
+        else:
+            st.subheader("Gráfico de candles (agregação) e volume")
+            fig_candle = charts.candle_volume_figure(df, freq=freq)
+            st.plotly_chart(fig_candle, use_container_width=True)
 
-        fig_bs, fig_imb = buy_sell_imbalance_figures(imbs)
+        fig_bs, fig_imb = charts.buy_sell_imbalance_figures(imbs)
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Volume Buy/Sell")
@@ -170,38 +389,168 @@ if tab == "Painel":
             st.subheader("Imbalance")
             st.plotly_chart(fig_imb, use_container_width=True)
 
+        # Evolução do sinal na sessão inteira (mesmas regras do indicador, por barra)
+        with st.expander("Linha do tempo do sinal", expanded=False):
+            timeline = signal_timeline(df, imbs, freq=freq)
+            if len(timeline) > 0:
+                st.plotly_chart(charts.signal_timeline_figure(timeline), use_container_width=True)
+                st.caption(f"Mudanças de regime na sessão: {int((timeline['signal'] != timeline['signal'].shift()).sum() - 1)}")
+            else:
+                st.info("Sem barras suficientes para a linha do tempo.")
+
         if fig_top is not None:
             st.subheader("Top Agressores (Tape Reading)")
             st.plotly_chart(fig_top, use_container_width=True)
 
+        if agent_index is not None and agent_index.names():
+            with st.expander("Agentes (índice por corretora)", expanded=False):
+                sessions = agent_index.sessions()
+                sess_label = st.selectbox("Sessão", ["Acumulado"] + sessions[::-1], index=1 if sessions else 0)
+                sess = None if sess_label == "Acumulado" else sess_label
+                agents_df = agent_index.frame(sess)
+                st.dataframe(agents_df.head(20), use_container_width=True, hide_index=True)
+                if len(agents_df) > 0:
+                    who = st.selectbox("Agente", agents_df["agent"].tolist())
+                    st.write(agent_index.describe(who, sess))
+
+        # Eventos de liquidez: negócios x topo do livro no tempo (precisa de ofertas com timestamp)
+        if offers_df is not None and "timestamp" in offers_df.columns and offers_df["timestamp"].notna().any():
+            events = detect_liquidity_events(df, offers_df)
+            insights["liquidity_events"] = summarize_liquidity_events(events)
+            with st.expander(f"Eventos de liquidez (icebergs, varridas) — {len(events)}", expanded=False):
+                if len(events) > 0:
+                    st.dataframe(events.drop(columns=["kind"]).tail(50).iloc[::-1], use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nenhum evento detectado na janela.")
+
+        if alert_engine is not None:
+            recent, _ = alert_engine.log.read_since(0)
+            with st.expander(f"Alertas recentes ({alert_engine.symbol}) — {len(recent)}", expanded=False):
+                if recent:
+                    st.dataframe(pd.DataFrame(recent[-20:][::-1]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nenhum alerta disparado ainda.")
+
         st.subheader("Análise automática (heurística) dos dados")
         st.markdown(render_response(insights))
 
         # 5) Time & Sales + Book
         st.subheader("Times & Trades")  
         if uploaded_df is not None and len(uploaded_df) > 0:
-            st.plotly_chart(time_and_sales_figure(uploaded_df, limit=200), use_container_width=True)
+            st.plotly_chart(lazy_import("tape_gpt.viz.time_sales").time_and_sales_figure(uploaded_df, limit=200), use_container_width=True)
         else:
             st.info("Sem dados de negócios disponíveis.")
 
+        # No modo "book" o livro vem do mesmo motor que gerou os negócios (visões L2 e tape consistentes)
+        book_df = hub.book_snapshot(depth=10) if data_source == "Simular tempo real" else None
+        if book_df is not None and len(book_df) > 0:
+            st.subheader("Livro de ofertas (motor de casamento)")
+            st.plotly_chart(lazy_import("tape_gpt.viz.order_book").order_book_figure(book_df, depth=10), use_container_width=True)
+
         # Auto-refresh apenas quando a aba Painel está ativa
-        if data_source == "Simular tempo real" and st.session_state.sim.is_running():
+        if data_source == "Simular tempo real" and sim.is_running():
             # Atualiza mais rápido que o tick para dar tempo de redesenhar.
-            refresh_ms = max(200, int(st.session_state.sim.tick * 1000 * 0.7))  # ~70% do tick
-            st_autorefresh(interval=refresh_ms, key="rt_autorefresh")  # evita queue de updates 【】
+            # nos modos por chegada o feed é contínuo: redesenha a cada 1s
+            refresh_ms = max(200, int(sim.tick * 1000 * 0.7)) if sim.mode == "tick" else 1000  # ~70% do tick
+            lazy_import("streamlit_autorefresh").st_autorefresh(interval=refresh_ms, key="rt_autorefresh")  # evita queue de updates 【】
 
     else:
         st.info("Carregue um XLSX ou ative a simulação para começar.")
 
+# ---------------- Watchlist (todos os símbolos) ----------------
+# Resultados prontos dos pipelines por símbolo (pool em background): o script não recalcula nada.
+if tab == "Watchlist":
+    multi = multi_hub()
+    symbols = multi.symbols()
+    try:
+        multi.hub(symbols[0]).ensure_seeded("testes/exemplo_times_in_trade.xlsx")
+    except Exception as e:
+        st.warning(f"Falha ao semear simulador com XLSX: {e}")
+    st.subheader("Watchlist — sinal principal por símbolo")
+    col_run, col_stop = st.columns(2)
+    with col_run:
+        if st.button("▶️ Rodar todos os feeds", key="__watch_start"):
+            for s in symbols:
+                if not multi.hub(s).sim.is_running():
+                    multi.hub(s).sim.start()
+    with col_stop:
+        if st.button("⏹️ Parar todos os feeds", key="__watch_stop"):
+            for s in symbols:
+                multi.hub(s).sim.stop()
+    watch = multi.watchlist()
+    st.dataframe(
+        watch, use_container_width=True, hide_index=True,
+        column_config={
+            "var. %": st.column_config.NumberColumn(format="%.2f%%"),
+            "imbalance": st.column_config.NumberColumn(format="%.2f"),
+            "agressão": st.column_config.NumberColumn(format="%+.2f"),
+            "passo (ms)": st.column_config.NumberColumn(format="%.1f"),
+        },
+    )
+    st.caption(f"{len(symbols)} símbolo(s) · {multi.max_workers} worker(s) · "
+               f"último ciclo do pool: {multi.last_cycle_ms:.0f} ms")
+    detail = st.selectbox("Detalhe do símbolo", symbols, key="__watch_detail")
+    result = multi.result(detail)
+    if result is not None:
+        render_main_signal_indicator(result["insights"].get("main_signal", {}))
+        st.markdown(render_response(result["insights"]))
+    else:
+        st.info("Sem negócios ainda para este símbolo (ative os feeds).")
+
+    # Correlação e lead-lag entre os símbolos: o agendador do pool mantém o cálculo em dia
+    with st.expander("Correlação entre ativos e lead-lag", expanded=False):
+        c1, c2, c3 = st.columns(3)
+        cross_freq = c1.selectbox("Resolução", ["1s", "250ms", "5s"], key="__cross_freq")
+        cross_window = c2.number_input("Janela móvel (barras)", min_value=10, max_value=3600, value=60, key="__cross_window")
+        cross_lag = c3.number_input("Lag máximo (barras)", min_value=1, max_value=600, value=30, key="__cross_lag")
+        st.session_state.cross_params = (cross_freq, int(cross_window), int(cross_lag))
+        cross = multi.cross_asset(*st.session_state.cross_params)
+        st.markdown(cross["summary"])
+        if cross["pairs"]:
+            charts = lazy_import("tape_gpt.viz.charts")
+            pairs_df = pd.DataFrame(cross["pairs"])[["pair", "ret_corr", "ret_corr_rolling", "ofi_corr",
+                                                     "lag_s", "lag_corr", "leader", "ofi_lag_s", "ofi_lag_corr"]]
+            st.dataframe(pairs_df, use_container_width=True, hide_index=True)
+            st.subheader("Correlação móvel dos retornos")
+            st.plotly_chart(charts.rolling_correlation_figure(cross["rolling"]), use_container_width=True)
+            st.subheader("Correlação cruzada por lag")
+            st.plotly_chart(charts.cross_correlation_figure(cross["xcorr"], cross["step_s"]), use_container_width=True)
+    if any(multi.hub(s).sim.is_running() for s in symbols):
+        lazy_import("streamlit_autorefresh").st_autorefresh(interval=1000, key="watch_autorefresh")
+
 # ---------------- Chatbot (congela o contexto no envio) ----------------
 if tab == "Chatbot":
-    render_chat_ui(
-        uploaded_df=uploaded_df,
-        offers_df=offers_df,
-        settings=settings,
-        openai_api_key=openai_api_key,
-        max_history=8,
-    )
+    cross_text = chat_book = None
+    if data_source == "Simular tempo real":
+        # quem lidera entre os símbolos da watchlist (mesmos parâmetros da aba Watchlist; em cache)
+        cross = multi_hub().cross_asset(*st.session_state.get("cross_params", ("1s", 60, 30)))
+        cross_text = cross["summary"] if cross["pairs"] else None
+        chat_book = book_liquidity(multi_hub().book_series(symbol).frame("1min"))
+    with timed("aba Chatbot"):
+        render_chat_ui(
+            uploaded_df=uploaded_df,
+            offers_df=offers_df,
+            settings=settings,
+            openai_api_key=openai_api_key,
+            max_history=8,
+            agent_index=agent_index,
+            snapshot_store=get_snapshot_store(),
+            data_key=data_key,
+            scheduler=get_chat_backend(),
+            market=market,
+            cross_asset=cross_text,
+            book=chat_book,
+        )
+
+# Diagnóstico de carregamento (por processo): imports adiados e fases de inicialização
+_run_ms = (time.perf_counter() - _script_t0) * 1000
+if "startup_first_run_ms" not in st.session_state:
+    st.session_state.startup_first_run_ms = _run_ms
+    record("primeira execução da sessão", _run_ms)
+record("execução do script", _run_ms)
+with st.sidebar.expander("Diagnóstico de carregamento", expanded=False):
+    st.caption(f"Esta execução: {_run_ms:.0f} ms · primeira da sessão: {st.session_state.startup_first_run_ms:.0f} ms")
+    st.dataframe(startup_report(), use_container_width=True, hide_index=True)
 
 # Footer
 st.markdown("---")
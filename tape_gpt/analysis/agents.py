@@ -0,0 +1,210 @@
+# file: tape_gpt/analysis/agents.py
+import re
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis.orderflow import side_sign
+
+# Colunas do acumulador por agente (volumes em contratos)
+_FIELDS = ["aggr_buy", "aggr_sell", "passive_buy", "passive_sell", "unknown", "trades", "big_volume", "big_trades"]
+_F = {f: i for i, f in enumerate(_FIELDS)}
+_VOL_HIST_CAP = 1 << 16   # histograma de tamanhos de print (acima disso vai para o último bucket)
+
+class AgentIndex:
+    """
+    Índice incremental por agente (corretora), por sessão (dia UTC) e acumulado.
+    update() recebe só os negócios novos e soma tudo com bincount (sem varrer o tape de novo);
+    agent()/frame() leem linhas já agregadas — consulta O(1) por agente.
+    Print grande = volume >= quantil `big_quantile` dos tamanhos vistos até aqui (incluindo o lote atual).
+    """
+    def __init__(self, big_quantile: float = 0.95, capacity: int = 64):
+        self.big_quantile = float(big_quantile)
+        self._row: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._capacity = int(capacity)
+        self._cum = np.zeros((self._capacity, len(_FIELDS)), np.float64)
+        self._sessions: Dict[str, np.ndarray] = {}
+        self._last: Optional[str] = None
+        self._vol_hist = np.zeros(_VOL_HIST_CAP + 1, np.int64)
+        self.rows = 0
+
+    # ---------- escrita ----------
+
+    def _rows_for(self, agents: pd.Series) -> np.ndarray:
+        """Linha de cada agente (cadastra nomes novos); -1 para nulo."""
+        if isinstance(agents.dtype, pd.CategoricalDtype):
+            codes, cats = agents.cat.codes.to_numpy(), agents.cat.categories
+        else:
+            codes, cats = pd.factorize(agents)
+        lut = np.array([self._ensure(str(c)) for c in cats] + [-1], dtype=np.int64)
+        return lut[codes]   # código -1 (nulo) pega o último slot
+
+    def _ensure(self, name: str) -> int:
+        row = self._row.get(name)
+        if row is None:
+            row = len(self._names)
+            self._row[name] = row
+            self._names.append(name)
+            if row >= self._capacity:
+                self._grow()
+        return row
+
+    def _grow(self):
+        self._capacity *= 2
+        pad = lambda a: np.vstack([a, np.zeros((self._capacity - len(a), len(_FIELDS)))])
+        self._cum = pad(self._cum)
+        self._sessions = {k: pad(v) for k, v in self._sessions.items()}
+
+    def big_threshold(self) -> float:
+        """Tamanho mínimo de um print grande pelo histograma acumulado (inf se ainda não há dados)."""
+        total = self._vol_hist.sum()
+        if total == 0:
+            return float("inf")
+        return float(np.searchsorted(np.cumsum(self._vol_hist), self.big_quantile * total))
+
+    def update(self, df_new: pd.DataFrame) -> int:
+        """Incorpora negócios novos (colunas timestamp, volume, side, buyer_agent, seller_agent)."""
+        if df_new is None or len(df_new) == 0 or "buyer_agent" not in df_new.columns or "seller_agent" not in df_new.columns:
+            return 0
+        vol = pd.to_numeric(df_new["volume"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        sign = side_sign(df_new["side"])
+        buyer = self._rows_for(df_new["buyer_agent"])
+        seller = self._rows_for(df_new["seller_agent"])
+
+        self._vol_hist += np.bincount(np.clip(vol, 0, _VOL_HIST_CAP).astype(np.int64), minlength=_VOL_HIST_CAP + 1)
+        big = vol >= self.big_threshold()
+
+        # contribuições por lado: (linhas, coluna do acumulador, peso)
+        parts = []
+        for rows, is_buyer in ((buyer, True), (seller, False)):
+            ok = rows >= 0
+            aggr = (sign > 0) if is_buyer else (sign < 0)
+            passive = (sign < 0) if is_buyer else (sign > 0)
+            parts += [
+                (rows, "aggr_buy" if is_buyer else "aggr_sell", np.where(ok & aggr, vol, 0)),
+                (rows, "passive_buy" if is_buyer else "passive_sell", np.where(ok & passive, vol, 0)),
+                (rows, "unknown", np.where(ok & (sign == 0), vol, 0)),
+                (rows, "trades", ok.astype(np.float64)),
+                (rows, "big_volume", np.where(ok & big, vol, 0)),
+                (rows, "big_trades", (ok & big).astype(np.float64)),
+            ]
+
+        # sessão = dia UTC (normalmente um só por lote)
+        days = pd.to_datetime(df_new["timestamp"], utc=True).dt.floor("D")
+        keys, inv = np.unique(days.astype("datetime64[ns, UTC]").astype("int64").to_numpy(), return_inverse=True)
+        labels = [pd.Timestamp(k, tz="UTC").strftime("%Y-%m-%d") for k in keys]
+        n = self._capacity
+        for s, label in enumerate(labels):
+            in_s = inv == s
+            acc = self._sessions.get(label)
+            if acc is None:
+                acc = self._sessions[label] = np.zeros((n, len(_FIELDS)), np.float64)
+                self._last = max(self._last or label, label)
+            for rows, field, w in parts:
+                m = in_s & (rows >= 0)
+                add = np.bincount(rows[m], weights=w[m], minlength=n)
+                acc[:, _F[field]] += add
+                self._cum[:, _F[field]] += add
+        self.rows += len(df_new)
+        return len(df_new)
+
+    # ---------- checkpoint ----------
+
+    def state(self):
+        """(arrays, meta) para o checkpoint (tape_gpt.data.checkpoint); inverso de from_state."""
+        n = len(self._names)
+        labels = sorted(self._sessions)
+        sessions = np.stack([self._sessions[k][:n] for k in labels]) if labels else np.zeros((0, n, len(_FIELDS)))
+        arrays = {"cum": self._cum[:n], "sessions": sessions, "vol_hist": self._vol_hist}
+        meta = {"names": self._names, "session_labels": labels, "last": self._last,
+                "rows": self.rows, "big_quantile": self.big_quantile}
+        return arrays, meta
+
+    @classmethod
+    def from_state(cls, arrays, meta) -> "AgentIndex":
+        names = list(meta["names"])
+        idx = cls(big_quantile=meta["big_quantile"], capacity=max(64, 1 << max(0, len(names) - 1).bit_length()))
+        idx._names = names
+        idx._row = {name: i for i, name in enumerate(names)}
+        idx._cum[:len(names)] = arrays["cum"]
+        for label, table in zip(meta["session_labels"], arrays["sessions"]):
+            acc = idx._sessions[label] = np.zeros((idx._capacity, len(_FIELDS)), np.float64)
+            acc[:len(names)] = table
+        idx._vol_hist = np.array(arrays["vol_hist"], dtype=np.int64)
+        idx._last = meta["last"]
+        idx.rows = int(meta["rows"])
+        return idx
+
+    # ---------- leitura ----------
+
+    def sessions(self) -> List[str]:
+        return sorted(self._sessions)
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def _table(self, session: Optional[str]) -> Optional[np.ndarray]:
+        if session is None:
+            return self._cum
+        if session == "last":
+            session = self._last
+        return self._sessions.get(session)
+
+    @staticmethod
+    def _stats(r: np.ndarray) -> dict:
+        bought = r[_F["aggr_buy"]] + r[_F["passive_buy"]]
+        sold = r[_F["aggr_sell"]] + r[_F["passive_sell"]]
+        total = bought + sold + r[_F["unknown"]]
+        trades = r[_F["trades"]]
+        return {
+            "aggressor_volume": float(r[_F["aggr_buy"]] + r[_F["aggr_sell"]]),
+            "aggressor_buy": float(r[_F["aggr_buy"]]),
+            "aggressor_sell": float(r[_F["aggr_sell"]]),
+            "passive_volume": float(r[_F["passive_buy"]] + r[_F["passive_sell"]]),
+            "total_volume": float(total),
+            "trades": int(trades),
+            "avg_print": float(total / trades) if trades else 0.0,
+            "net_position": float(bought - sold),   # proxy: comprado - vendido
+            "big_prints": int(r[_F["big_trades"]]),
+            "big_share": float(r[_F["big_volume"]] / total) if total else 0.0,
+        }
+
+    def agent(self, name: str, session: Optional[str] = None) -> Optional[dict]:
+        """Estatísticas de um agente (session=None: acumulado; "last": sessão mais recente; ou "AAAA-MM-DD")."""
+        row = self._row.get(name)
+        table = self._table(session)
+        if row is None or table is None:
+            return None
+        out = self._stats(table[row])
+        out["agent"] = name
+        return out
+
+    def frame(self, session: Optional[str] = None) -> pd.DataFrame:
+        """Todos os agentes com participação, ordenados por volume total."""
+        table = self._table(session)
+        if table is None or not self._names:
+            return pd.DataFrame(columns=["agent"])
+        t = table[:len(self._names)]
+        df = pd.DataFrame([self._stats(r) for r in t])
+        df.insert(0, "agent", self._names)
+        return df[df["trades"] > 0].sort_values("total_volume", ascending=False).reset_index(drop=True)
+
+    def describe(self, name: str, session: Optional[str] = "last") -> Optional[str]:
+        """Frase curta (para o chat) com o comportamento do agente."""
+        s = self.agent(name, session)
+        if s is None or s["trades"] == 0:
+            return None
+        lado = "comprado" if s["net_position"] > 0 else ("vendido" if s["net_position"] < 0 else "zerado")
+        return (
+            f"{name}: {s['trades']} negócios, volume {s['total_volume']:.0f} "
+            f"(agressão compra {s['aggressor_buy']:.0f} / venda {s['aggressor_sell']:.0f}, passivo {s['passive_volume']:.0f}), "
+            f"print médio {s['avg_print']:.0f}, saldo {lado} {abs(s['net_position']):.0f}, "
+            f"{100 * s['big_share']:.0f}% do volume em prints grandes"
+        )
+
+    def mentioned(self, text: str) -> List[str]:
+        """Agentes conhecidos citados em `text` (ex.: "o que o AG012 está fazendo?")."""
+        if not text or not self._names:
+            return []
+        tokens = set(re.findall(r"[\w\-\.]+", text.upper()))
+        return [n for n in self._names if n.upper() in tokens]
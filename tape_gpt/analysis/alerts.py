@@ -0,0 +1,429 @@
+# file: tape_gpt/analysis/alerts.py
+"""
+Motor de alertas avaliado a cada lote do feed (não depende do refresh do navegador).
+As regras são texto, compiladas uma vez em predicados NumPy sobre o estado por barra:
+    imbalance < -0.4 for 3 bars        (também: delta, vbuy, vsell, volume, price, cvd)
+    big_prints >= 3 in 2min
+    agent AG012 buy >= 300 in 1min     (lado: buy | sell | any)
+    cvd_divergence [bullish|bearish] [in 12 bars]
+Entrega: AlertLog (fila no app, lida por cursor em cada sessão) e WebhookSink (POST JSON local).
+"""
+import json, operator, queue, re, threading, time
+import urllib.request
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis import kernels
+from tape_gpt.analysis.orderflow import side_sign, _ts_ns
+
+DEFAULT_RULES = [
+    "imbalance < -0.4 for 3 bars",
+    "imbalance > 0.4 for 3 bars",
+    "big_prints >= 3 in 2min",
+    "cvd_divergence",
+]
+
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq}
+_BAR_METRICS = ("imbalance", "delta", "vbuy", "vsell", "volume", "price", "cvd")
+
+class FeatureState:
+    """
+    Estado incremental por barra (janela de max_bars): volume comprador/vendedor, fechamento, CVD no
+    fechamento, nº de prints grandes e volume agressor por agente/lado. update() é vetorizado por lote.
+    """
+    def __init__(self, bar: str = "5s", max_bars: int = 240, big_window: int = 500):
+        self.bar_ns = int(pd.to_timedelta(bar).value)
+        self.max_bars = int(max_bars)
+        self.bar_ts = np.empty(0, np.int64)
+        self.vbuy = np.empty(0)
+        self.vsell = np.empty(0)
+        self.close = np.empty(0)
+        self.cvd = np.empty(0)
+        self.big = np.empty(0)
+        self.agent_vol = np.empty((0, 0, 2))      # [barra, agente, 0=compra/1=venda]
+        self._agents: Dict[str, int] = {}
+        self._cvd = 0.0
+        # anel com os tamanhos recentes (limiar P95 de print grande)
+        self._vols = np.empty(int(big_window))
+        self._nvols = 0
+
+    def bars_for(self, duration_ns: int) -> int:
+        return max(1, -(-int(duration_ns) // self.bar_ns))
+
+    def agent_code(self, name: str) -> Optional[int]:
+        return self._agents.get(name)
+
+    def _agent_rows(self, agents: pd.Series) -> np.ndarray:
+        """Código interno de cada agente (cadastra nomes novos); -1 para nulo."""
+        if isinstance(agents.dtype, pd.CategoricalDtype):
+            codes, cats = agents.cat.codes.to_numpy(), agents.cat.categories
+        else:
+            codes, cats = pd.factorize(agents)
+        lut = np.array([self._agents.setdefault(str(c), len(self._agents)) for c in cats] + [-1], dtype=np.int64)
+        return lut[codes]
+
+    def _big_threshold(self) -> float:
+        n = min(self._nvols, len(self._vols))
+        if n < 20:
+            return np.inf
+        k = int(0.95 * (n - 1))                     # P95 (posição inferior), via partition
+        return float(np.partition(self._vols[:n], k)[k])
+
+    def _push_vols(self, vol: np.ndarray):
+        cap = len(self._vols)
+        vol = vol[-cap:]
+        pos = (self._nvols + np.arange(len(vol))) % cap
+        self._vols[pos] = vol
+        self._nvols += len(vol)
+
+    def update(self, trades: pd.DataFrame) -> int:
+        if trades is None or len(trades) == 0:
+            return 0
+        t = trades if trades["timestamp"].is_monotonic_increasing else trades.sort_values("timestamp", kind="stable")
+        ts = _ts_ns(t["timestamp"])
+        vol = t["volume"]
+        if not pd.api.types.is_numeric_dtype(vol.dtype) or vol.hasnans:
+            vol = pd.to_numeric(vol, errors="coerce").fillna(0)
+        vol = vol.to_numpy(dtype="float64")
+        price = t["price"].to_numpy(dtype="float64")
+        sign = side_sign(t["side"])
+
+        # barras cobertas pelo lote (alinhadas à época), inclusive barras vazias entre lotes
+        # (negócios atrasados, anteriores à última barra, entram nela)
+        last_bar = self.bar_ts[-1] // self.bar_ns if len(self.bar_ts) else None
+        b = ts // self.bar_ns if last_bar is None else np.maximum(ts // self.bar_ns, last_bar)
+        start = b[0] if last_bar is None else last_bar
+        start = max(start, b[-1] - self.max_bars + 1)
+        keep = b >= start
+        if not keep.all():
+            b, vol, price, sign = b[keep], vol[keep], price[keep], sign[keep]
+        nb = int(b[-1] - start + 1)
+        idx = (b - start).astype(np.int64)
+
+        vb = np.bincount(idx, weights=np.where(sign > 0, vol, 0), minlength=nb)
+        vs = np.bincount(idx, weights=np.where(sign < 0, vol, 0), minlength=nb)
+        cvd_trade = self._cvd + kernels.cvd(vol, sign)
+        last = np.full(nb, -1)
+        last[idx] = np.arange(len(idx))             # último negócio de cada barra
+        has = last >= 0
+        close = np.where(has, price[np.maximum(last, 0)], np.nan)
+        cvd = np.where(has, cvd_trade[np.maximum(last, 0)], np.nan)
+
+        # prints grandes: acima do P95 dos tamanhos anteriores ao lote (estritamente, para que um
+        # fluxo de tamanho constante não vire "grande" inteiro)
+        big = np.bincount(idx, weights=vol > self._big_threshold(), minlength=nb)
+        self._push_vols(vol)
+
+        # volume agressor por agente (comprador agride na compra, vendedor na venda)
+        if "buyer_agent" in t.columns and "seller_agent" in t.columns:
+            buyer = self._agent_rows(t["buyer_agent"])
+            seller = self._agent_rows(t["seller_agent"])
+            if not keep.all():
+                buyer, seller = buyer[keep], seller[keep]
+            rows = np.where(sign > 0, buyer, seller)
+            ok = (sign != 0) & (rows >= 0)
+        else:
+            rows, ok = None, np.zeros(len(idx), bool)
+        na = len(self._agents)
+        if ok.any():
+            # índice achatado [barra, agente, lado] -> uma única soma com bincount
+            flat = (idx[ok] * na + rows[ok]) * 2 + (sign[ok] < 0)
+            agent_vol = np.bincount(flat, weights=vol[ok], minlength=nb * na * 2).reshape(nb, na, 2)
+        else:
+            agent_vol = np.zeros((nb, na, 2))
+
+        self._cvd = float(cvd_trade[-1])
+        self._merge(start, vb, vs, close, cvd, big, agent_vol)
+        return len(t)
+
+    @staticmethod
+    def _ffill(x: np.ndarray, prev: float) -> np.ndarray:
+        """Preenche NaN com o último valor válido (prev antes do primeiro)."""
+        x = np.concatenate([[prev], x])
+        pos = np.where(np.isnan(x), 0, np.arange(len(x)))
+        return x[np.maximum.accumulate(pos)][1:]
+
+    def _merge(self, start, vb, vs, close, cvd, big, agent_vol):
+        n_agents = agent_vol.shape[1]
+        if self.agent_vol.shape[1] < n_agents:
+            pad = np.zeros((len(self.bar_ts), n_agents - self.agent_vol.shape[1], 2))
+            self.agent_vol = np.concatenate([self.agent_vol, pad], axis=1)
+        nb = len(vb)
+        new_ts = (start + np.arange(nb)) * self.bar_ns
+        if len(self.bar_ts) and self.bar_ts[-1] == new_ts[0]:
+            # primeira barra do lote continua a última barra do estado
+            self.vbuy[-1] += vb[0]
+            self.vsell[-1] += vs[0]
+            self.big[-1] += big[0]
+            self.agent_vol[-1] += agent_vol[0]
+            if not np.isnan(close[0]):
+                self.close[-1], self.cvd[-1] = close[0], cvd[0]
+            if nb == 1:
+                return
+            new_ts, vb, vs, close, cvd, big, agent_vol = (new_ts[1:], vb[1:], vs[1:], close[1:], cvd[1:], big[1:], agent_vol[1:])
+        # barras vazias herdam fechamento/CVD anteriores
+        close = self._ffill(close, self.close[-1] if len(self.close) else np.nan)
+        cvd = self._ffill(cvd, self.cvd[-1] if len(self.cvd) else 0.0)
+        m = self.max_bars
+        cat = lambda old, new: np.concatenate([old, new])[-m:]
+        self.bar_ts = cat(self.bar_ts, new_ts)
+        self.vbuy = cat(self.vbuy, vb)
+        self.vsell = cat(self.vsell, vs)
+        self.close = cat(self.close, close)
+        self.cvd = cat(self.cvd, cvd)
+        self.big = cat(self.big, big)
+        self.agent_vol = cat(self.agent_vol, agent_vol)
+
+    def series(self, metric: str, k: int) -> np.ndarray:
+        """Últimas k barras de uma métrica (imbalance, delta, vbuy, vsell, volume, price, cvd)."""
+        vb, vs = self.vbuy[-k:], self.vsell[-k:]
+        if metric == "imbalance":
+            return (vb - vs) / (vb + vs + 1e-9)
+        if metric == "delta":
+            return vb - vs
+        if metric == "volume":
+            return vb + vs
+        if metric == "price":
+            return self.close[-k:]
+        return {"vbuy": vb, "vsell": vs, "cvd": self.cvd[-k:]}[metric]
+
+# ---------------- compilação de regras ----------------
+
+_RE_BAR = re.compile(r"^(?P<m>\w+)\s*(?P<op><=|>=|==|<|>)\s*(?P<v>-?[\d.]+)(?:\s+for\s+(?P<k>\d+)\s+bars?)?$")
+_RE_BIG = re.compile(r"^big_prints\s*(?P<op><=|>=|==|<|>)\s*(?P<v>[\d.]+)\s+in\s+(?P<d>\w+)$")
+_RE_AGENT = re.compile(r"^agent\s+(?P<a>\S+)\s+(?P<s>buy|sell|any)\s*(?P<op><=|>=|==|<|>)\s*(?P<v>[\d.]+)\s+in\s+(?P<d>\w+)$")
+_RE_DIV = re.compile(r"^cvd_divergence(?:\s+(?P<dir>bullish|bearish))?(?:\s+in\s+(?P<k>\d+)\s+bars?)?$")
+
+def _duration_ns(text: str) -> int:
+    try:
+        ns = int(pd.to_timedelta(text).value)
+    except ValueError:
+        raise ValueError(f"Duração inválida: {text!r}") from None
+    if ns <= 0:
+        raise ValueError(f"Duração inválida: {text!r}")
+    return ns
+
+def _bars(text: Optional[str], default: int) -> int:
+    k = int(text) if text else default
+    if k < 1:
+        raise ValueError(f"Número de barras inválido: {k} (mínimo 1)")
+    return k
+
+Predicate = Callable[[FeatureState], Tuple[bool, float]]
+
+def compile_rule(text: str) -> Predicate:
+    """Texto da regra -> predicado (state) -> (disparou, valor). ValueError se a sintaxe não for reconhecida."""
+    src = " ".join(text.strip().split())
+    low = src.lower()
+
+    m = _RE_BAR.match(low)
+    if m and m["m"] in _BAR_METRICS:
+        metric, op, v, k = m["m"], _OPS[m["op"]], float(m["v"]), _bars(m["k"], 1)
+        def pred(s: FeatureState):
+            if len(s.bar_ts) < k:
+                return False, float("nan")
+            x = s.series(metric, k)
+            return bool(op(x, v).all()), float(x[-1])
+        return pred
+
+    m = _RE_BIG.match(low)
+    if m:
+        op, v, dur = _OPS[m["op"]], float(m["v"]), _duration_ns(m["d"])
+        def pred(s: FeatureState):
+            n = float(s.big[-s.bars_for(dur):].sum())
+            return bool(op(n, v)), n
+        return pred
+
+    m = _RE_AGENT.match(low)
+    if m:
+        agent = src.split()[1]                     # nome com a caixa original
+        cols = {"buy": [0], "sell": [1], "any": [0, 1]}[m["s"]]
+        op, v, dur = _OPS[m["op"]], float(m["v"]), _duration_ns(m["d"])
+        def pred(s: FeatureState):
+            code = s.agent_code(agent)
+            if code is None or code >= s.agent_vol.shape[1]:
+                return False, 0.0
+            x = float(s.agent_vol[-s.bars_for(dur):, code][:, cols].sum())
+            return bool(op(x, v)), x
+        return pred
+
+    m = _RE_DIV.match(low)
+    if m:
+        direction, k = m["dir"], _bars(m["k"], 12)
+        def pred(s: FeatureState):
+            if len(s.bar_ts) < k + 1:
+                return False, 0.0
+            px, cv = s.close[-(k + 1):], s.cvd[-(k + 1):]
+            # preço renova máxima e o CVD não (baixista) / preço renova mínima e o CVD não (altista)
+            bear = px[-1] > np.nanmax(px[:-1]) and cv[-1] < np.nanmax(cv[:-1])
+            bull = px[-1] < np.nanmin(px[:-1]) and cv[-1] > np.nanmin(cv[:-1])
+            hit = {"bearish": bear, "bullish": bull}.get(direction, bear or bull)
+            return bool(hit), (-1.0 if bear else (1.0 if bull else 0.0))
+        return pred
+
+    raise ValueError(f"Regra não reconhecida: {text!r}")
+
+# ---------------- entrega ----------------
+
+class AlertLog:
+    """Fila de alertas no app (limitada); cada sessão lê pelo próprio cursor, sem consumir a dos outros."""
+    def __init__(self, maxlen: int = 500):
+        self._items = deque(maxlen=int(maxlen))
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, alert: dict):
+        with self._lock:
+            self._seq += 1
+            self._items.append((self._seq, alert))
+
+    def seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def read_since(self, cursor: int) -> Tuple[List[dict], int]:
+        with self._lock:
+            return [a for s, a in self._items if s > cursor], self._seq
+
+class WebhookSink:
+    """POST JSON de cada alerta para `url` (ex.: receptor local), numa thread própria — não trava o feed."""
+    def __init__(self, url: str, timeout: float = 2.0, maxsize: int = 1000):
+        self.url = url
+        self.timeout = float(timeout)
+        self.errors = 0
+        self._q: "queue.Queue[dict]" = queue.Queue(maxsize=maxsize)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __call__(self, alert: dict):
+        try:
+            self._q.put_nowait(alert)
+        except queue.Full:
+            self.errors += 1
+
+    def _run(self):
+        while True:
+            alert = self._q.get()
+            try:
+                req = urllib.request.Request(self.url, data=json.dumps(alert).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"}, method="POST")
+                urllib.request.urlopen(req, timeout=self.timeout).close()
+            except Exception:
+                self.errors += 1
+
+# ---------------- motor ----------------
+
+class AlertEngine:
+    """
+    Sink do feed (assinatura (negocios_df, ofertas_df)): atualiza o FeatureState com o lote e avalia as
+    regras compiladas. Cada regra dispara quando fica verdadeira e no máximo uma vez a cada cooldown_s
+    (regras que oscilam entre lotes não geram rajadas de alertas). Um motor por feed: `symbol` vai em
+    cada alerta (campo "symbol"), para o log e o webhook dizerem de qual instrumento é.
+    """
+    def __init__(self, rules=DEFAULT_RULES, bar: str = "5s", cooldown_s: float = 30.0, max_bars: int = 240,
+                 symbol: str = ""):
+        self.symbol = symbol
+        self.state = FeatureState(bar=bar, max_bars=max_bars)
+        self.cooldown_s = float(cooldown_s)
+        self.log = AlertLog()
+        self._sinks: List[Callable[[dict], None]] = [self.log]
+        self._lock = threading.Lock()
+        self._rules: List[Tuple[str, Predicate]] = []
+        self._active: Dict[str, bool] = {}
+        self._last_fire: Dict[str, float] = {}
+        self.last_eval_us = 0.0
+        self._follower: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.follow_errors = 0          # falhas da thread seguidora (o lote é pulado, a thread continua)
+        self.last_follow_error: Optional[str] = None
+        self.sink_errors = 0            # falhas de sinks (um sink com erro não impede os outros)
+        self.last_sink_error: Optional[str] = None
+        self.set_rules(rules)
+
+    def set_rules(self, texts) -> List[str]:
+        """Compila e troca o conjunto de regras (tudo ou nada). Devolve os erros; vazio se ok."""
+        compiled, errors = [], []
+        for t in texts:
+            if not t or not t.strip() or t.strip().startswith("#"):
+                continue
+            try:
+                compiled.append((t.strip(), compile_rule(t)))
+            except ValueError as e:
+                errors.append(str(e))
+        if not errors:
+            with self._lock:
+                self._rules = compiled
+                self._active = {t: self._active.get(t, False) for t, _ in compiled}
+        return errors
+
+    def rules(self) -> List[str]:
+        with self._lock:
+            return [t for t, _ in self._rules]
+
+    def add_sink(self, fn: Callable[[dict], None]):
+        self._sinks.append(fn)
+
+    def __call__(self, trades: pd.DataFrame, offers: Optional[pd.DataFrame] = None):
+        self.on_batch(trades)
+
+    def on_batch(self, trades: pd.DataFrame) -> List[dict]:
+        if trades is None or len(trades) == 0:
+            return []
+        fired = []
+        with self._lock:
+            self.state.update(trades)
+            t0 = time.perf_counter()
+            now = time.time()
+            for text, pred in self._rules:
+                hit, value = pred(self.state)
+                self._active[text] = hit
+                if hit and now - self._last_fire.get(text, -np.inf) >= self.cooldown_s:
+                    self._last_fire[text] = now
+                    fired.append({
+                        "symbol": self.symbol,
+                        "ts": pd.Timestamp(int(self.state.bar_ts[-1]), tz="UTC").isoformat() if len(self.state.bar_ts) else None,
+                        "rule": text,
+                        "value": value,
+                        "price": float(self.state.close[-1]) if len(self.state.close) else None,
+                    })
+            self.last_eval_us = (time.perf_counter() - t0) * 1e6
+        for alert in fired:
+            for sink in self._sinks:
+                try:
+                    sink(alert)
+                except Exception as e:
+                    self.sink_errors += 1
+                    self.last_sink_error = repr(e)
+        return fired
+
+    def attach(self, feed, interval_s: float = 0.2):
+        """
+        Liga o motor ao feed: via add_sink quando o feed chama sinks a cada lote (simulador em thread);
+        senão acompanha read_since numa thread própria (ex.: IngestProcess em outro processo).
+        """
+        if callable(getattr(feed, "add_sink", None)):
+            feed.add_sink(self)
+            return
+        if self._follower is not None:
+            return
+        self._stop.clear()
+        def _follow():
+            cursor = feed.version()
+            while not self._stop.is_set():
+                try:
+                    df_new, cursor = feed.read_since(cursor)
+                    self.on_batch(df_new)
+                except Exception as e:
+                    # lote ruim ou feed reiniciando: conta e segue com o cursor atual
+                    self.follow_errors += 1
+                    self.last_follow_error = repr(e)
+                self._stop.wait(interval_s)
+        self._follower = threading.Thread(target=_follow, name="alert-engine", daemon=True)
+        self._follower.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Para a thread seguidora (se houver); attach() pode ligá-la de novo."""
+        self._stop.set()
+        if self._follower is not None:
+            self._follower.join(timeout=timeout)
+            self._follower = None
@@ -0,0 +1,191 @@
+# file: tape_gpt/analysis/batch.py
+"""
+Pipeline em lote (preprocess -> imbalances -> OHLC -> top agressores -> análise/linha do tempo)
+com backend plugável:
+  - "pandas": as mesmas funções usadas no painel;
+  - "polars": as reduções pesadas (resample/groupby sobre todos os negócios) rodam numa única
+    query lazy do polars, multi-thread e com coleta em streaming; os resultados agregados (pequenos)
+    são finalizados em pandas com as mesmas regras, então a saída é idêntica à do caminho pandas.
+Uso offline, ex.: run_pipeline(scan_store(store, "WIN", ini, fim), backend="polars").
+"""
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+from tape_gpt.data.schema import TRADE_COLUMNS, SIDE_DTYPE
+from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
+from tape_gpt.analysis.orderflow import top_aggressors
+from tape_gpt.analysis.rule_based import analyze_tape
+from tape_gpt.analysis.features import signal_timeline
+
+BACKENDS = ("pandas", "polars")
+
+def _require_polars():
+    try:
+        import polars as pl
+        return pl
+    except ImportError as e:
+        raise RuntimeError("O backend 'polars' requer o pacote polars (pip install polars).") from e
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def scan_store(store, symbol: str, start=None, end=None):
+    """LazyFrame polars sobre as partes do TickStore (filtro de tempo empurrado para o leitor Parquet)."""
+    pl = _require_polars()
+    files = store.files(symbol, start, end)
+    if not files:
+        return pl.from_pandas(pd.DataFrame(columns=TRADE_COLUMNS)).lazy()
+    lf = pl.scan_parquet(files)
+    if start is not None:
+        lf = lf.filter(pl.col("timestamp") >= _utc(start))
+    if end is not None:
+        lf = lf.filter(pl.col("timestamp") <= _utc(end))
+    return lf
+
+def ohlc_volume(df: pd.DataFrame, freq: str = "1min") -> pd.DataFrame:
+    """OHLC + volume por barra (mesma agregação do gráfico de candles)."""
+    temp = df.set_index("timestamp")
+    return temp["price"].resample(freq).ohlc().join(temp["volume"].resample(freq).sum())
+
+# ---------------- backend pandas ----------------
+
+def _run_pandas(source, freq: str, lookback: Optional[str], top_n: int) -> dict:
+    if not isinstance(source, pd.DataFrame):
+        source = source.collect().to_pandas()
+    df = preprocess_ts(source)
+    imbs = compute_imbalances(df, window=freq)
+    top_buy, top_sell = top_aggressors(df, lookback=lookback, top_n=top_n)
+    return {"df": df, "imbs": imbs, "ohlc": ohlc_volume(df, freq), "top_buy": top_buy, "top_sell": top_sell}
+
+# ---------------- backend polars ----------------
+
+def _side_series(bins: pd.DataFrame, side: str, freq: str, dtype) -> pd.Series:
+    """Volume por barra de um lado, no intervalo contínuo [primeira, última] barra do lado (como o resample)."""
+    part = bins.loc[bins["side"] == side].set_index("bin")["volume"].sort_index()
+    if len(part) == 0:
+        return pd.Series([], index=pd.DatetimeIndex([], tz="UTC", name="timestamp", freq=freq), dtype=dtype)
+    idx = pd.date_range(part.index[0], part.index[-1], freq=freq, name="timestamp")
+    return part.reindex(idx, fill_value=0).astype(dtype)
+
+def _imbalances_from_bins(bins: pd.DataFrame, freq: str, dtype) -> pd.DataFrame:
+    vbuy = _side_series(bins, "buy", freq, dtype)
+    vsell = _side_series(bins, "sell", freq, dtype)
+    out = pd.DataFrame({
+        "vbuy": vbuy,
+        "vsell": vsell,
+        "imbalance": (vbuy - vsell) / (vbuy + vsell + 1e-9),
+        "aggr_diff": (vsell - vbuy),
+        "total_volume": (vbuy + vsell),
+    })
+    out.index.name = "timestamp"
+    return out
+
+def _ohlc_from_bins(bars: pd.DataFrame, freq: str, dtype) -> pd.DataFrame:
+    bars = bars.set_index("bin").sort_index()
+    if len(bars) == 0:
+        return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+    idx = pd.date_range(bars.index[0], bars.index[-1], freq=freq, name="timestamp")
+    out = bars.reindex(idx)
+    out["volume"] = out["volume"].fillna(0).astype(dtype)
+    return out[["open", "high", "low", "close", "volume"]]
+
+def _top_from_groups(grp: pd.DataFrame, top_n: int):
+    # mesma ordenação/desempate do top_aggressors (grupos em ordem de chave, sort estável, nlargest)
+    grp = grp.sort_values(["side", "volume"], ascending=[True, False])
+    top_buy = grp[grp["side"] == "buy"].nlargest(top_n, "volume")[["aggressor_agent", "volume", "trades"]]
+    top_sell = grp[grp["side"] == "sell"].nlargest(top_n, "volume")[["aggressor_agent", "volume", "trades"]]
+    return (top_buy.rename(columns={"aggressor_agent": "agent"}),
+            top_sell.rename(columns={"aggressor_agent": "agent"}))
+
+def _run_polars(source, freq: str, lookback: Optional[str], top_n: int, streaming: bool) -> dict:
+    pl = _require_polars()
+    df = None
+    if isinstance(source, pd.DataFrame):
+        # já em memória no pandas: normaliza uma vez e só as agregações vão para o polars
+        df = preprocess_ts(source)
+        source = pl.from_pandas(df[TRADE_COLUMNS])
+    lf = source.lazy() if isinstance(source, pl.DataFrame) else source
+
+    every = f"{pd.to_timedelta(freq).value}ns"
+    # preprocess: descarta nulos e ordena por tempo (estável), mantendo os dtypes compactos do schema
+    base = (
+        lf.select(TRADE_COLUMNS)
+        .drop_nulls(["timestamp", "price", "volume"])
+        .sort("timestamp", maintain_order=True)
+    )
+    vol = pl.col("volume").cast(pl.Int64)
+    side = pl.col("side").cast(pl.String)
+    binned = base.with_columns(bin=pl.col("timestamp").dt.truncate(every))
+
+    q_bins = (binned.with_columns(side=side).filter(pl.col("side").is_in(["buy", "sell"]))
+              .group_by(["bin", "side"]).agg(vol.sum()))
+    q_bars = binned.group_by("bin").agg(
+        open=pl.col("price").first(), high=pl.col("price").max(), low=pl.col("price").min(),
+        close=pl.col("price").last(), volume=vol.sum(),
+    )
+    aggr = (base
+            .with_columns(side=side)
+            .with_columns(aggressor_agent=pl.when(pl.col("side") == "buy").then(pl.col("buyer_agent").cast(pl.String))
+                          .when(pl.col("side") == "sell").then(pl.col("seller_agent").cast(pl.String)))
+            .filter(pl.col("aggressor_agent").is_not_null()))
+    if lookback:
+        end = pl.col("timestamp").max()
+        aggr = aggr.filter(pl.col("timestamp").is_between(end - pd.to_timedelta(lookback), end))
+    q_top = aggr.group_by(["side", "aggressor_agent"]).agg(
+        volume=vol.sum(), trades=pl.len().cast(pl.Int64))
+
+    queries = [q_bins, q_bars, q_top] + ([base] if df is None else [])
+    results = pl.collect_all(queries, engine="streaming" if streaming else "auto")
+    bins, bars, groups = results[:3]
+    if df is None:
+        df = preprocess_ts(results[3].to_pandas())   # já limpo/ordenado: só valida o schema compacto
+    # somas no mesmo dtype do volume (o pandas preserva int32 em resample/groupby)
+    vol_dtype = df["volume"].dtype
+    groups = groups.to_pandas().astype({"volume": vol_dtype})
+    groups["side"] = groups["side"].astype(SIDE_DTYPE)
+    groups = groups.sort_values(["side", "aggressor_agent"], kind="stable").reset_index(drop=True)
+    top_buy, top_sell = _top_from_groups(groups, top_n)
+    return {
+        "df": df,
+        "imbs": _imbalances_from_bins(bins.to_pandas(), freq, vol_dtype),
+        "ohlc": _ohlc_from_bins(bars.to_pandas(), freq, vol_dtype),
+        "top_buy": top_buy,
+        "top_sell": top_sell,
+    }
+
+# ---------------- API ----------------
+
+def run_pipeline(source, freq: str = "1min", lookback: Optional[str] = "30min", top_n: int = 5,
+                 backend: str = "pandas", streaming: bool = True) -> dict:
+    """
+    Executa o pipeline completo sobre `source` (DataFrame pandas/polars ou LazyFrame polars).
+    Retorna dict com df, imbs, ohlc, top_buy, top_sell, insights (analyze_tape) e timeline (signal_timeline).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend!r} (use {BACKENDS})")
+    if backend == "polars":
+        out = _run_polars(source, freq, lookback, top_n, streaming)
+    else:
+        out = _run_pandas(source, freq, lookback, top_n)
+    out["insights"] = analyze_tape(out["df"], out["imbs"], freq=freq)
+    out["timeline"] = signal_timeline(out["df"], out["imbs"], freq=freq)
+    return out
+
+def benchmark(source, freq: str = "1min", lookback: Optional[str] = "30min", repeat: int = 3) -> dict:
+    """Melhor tempo (s) de cada backend disponível para o pipeline completo sobre `source`."""
+    timings = {}
+    for backend in BACKENDS:
+        try:
+            if backend == "polars":
+                _require_polars()
+        except RuntimeError:
+            continue
+        best = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run_pipeline(source, freq=freq, lookback=lookback, backend=backend)
+            best = min(best, time.perf_counter() - t0)
+        timings[backend] = best
+    return timings
@@ -0,0 +1,158 @@
+# file: tape_gpt/analysis/cross_asset.py
+"""
+Correlação entre ativos e lead-lag (quem lidera) a partir dos tapes de vários símbolos:
+  - barras em grade comum (1s, ou sub-segundo como "250ms" para resolução próxima do tick):
+    retorno log do último preço e imbalance de fluxo agressor (vbuy - vsell) / (vbuy + vsell);
+  - correlação móvel por par via somas acumuladas (O(n) por par, qualquer janela);
+  - correlação cruzada por FFT (O(n log n), todos os lags de uma vez) para estimar o lag;
+  - analyze_cross_asset(): insights no formato do analyze_tape ("summary" + campos).
+Lag positivo em (a, b) = a lidera b: o movimento de a em t aparece em b em t + lag.
+"""
+from itertools import combinations
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis.orderflow import side_sign
+
+def bar_series(df: pd.DataFrame, freq: str = "1s") -> pd.DataFrame:
+    """Último preço e imbalance de fluxo agressor por barra (barras sem negócio: preço NaN, imbalance 0)."""
+    ts = pd.DatetimeIndex(df["timestamp"])
+    vol = df["volume"].to_numpy(dtype="float64")
+    signed = pd.Series(vol * side_sign(df["side"]), index=ts).resample(freq).sum()
+    total = pd.Series(vol, index=ts).resample(freq).sum()
+    last = pd.Series(df["price"].to_numpy(dtype="float64"), index=ts).resample(freq).last()
+    ofi = (signed / total.where(total > 0)).fillna(0.0)
+    return pd.DataFrame({"price": last, "ofi": ofi})
+
+def align_symbols(frames: Dict[str, pd.DataFrame], freq: str = "1s") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (retornos, imbalances) numa grade comum, uma coluna por símbolo, restrita ao intervalo em que
+    todos os tapes têm dados. Preço sem negócio na barra repete o anterior (retorno 0).
+    """
+    bars = {s: bar_series(df, freq) for s, df in frames.items() if df is not None and len(df) > 0}
+    if len(bars) < 2:
+        return pd.DataFrame(), pd.DataFrame()
+    start = max(b.index[0] for b in bars.values())
+    end = min(b.index[-1] for b in bars.values())
+    if start >= end:
+        return pd.DataFrame(), pd.DataFrame()
+    grid = pd.date_range(start, end, freq=freq)
+    prices = pd.DataFrame({s: b["price"].reindex(grid) for s, b in bars.items()}).ffill()
+    ofi = pd.DataFrame({s: b["ofi"].reindex(grid).fillna(0.0) for s, b in bars.items()})
+    rets = np.log(prices).diff().fillna(0.0)
+    return rets, ofi
+
+def rolling_corr(x: np.ndarray, y: np.ndarray, window: int) -> np.ndarray:
+    """Correlação de Pearson na janela móvel (somas acumuladas: O(n) para qualquer janela); NaN no início."""
+    n, w = len(x), int(window)
+    out = np.full(n, np.nan)
+    if n < w or w < 2:
+        return out
+    # padroniza antes de acumular (a correlação não muda e as somas ficam bem condicionadas)
+    x = (x - x.mean()) / (x.std() or 1.0)
+    y = (y - y.mean()) / (y.std() or 1.0)
+    def wsum(a):
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[w:] - c[:-w]
+    sx, sy, sxx, syy, sxy = wsum(x), wsum(y), wsum(x * x), wsum(y * y), wsum(x * y)
+    cov = w * sxy - sx * sy
+    var = (w * sxx - sx * sx) * (w * syy - sy * sy)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[w - 1:] = np.where(var > 1e-12, cov / np.sqrt(np.maximum(var, 1e-300)), np.nan)
+    return out
+
+def cross_correlation(x: np.ndarray, y: np.ndarray, max_lag: int) -> pd.Series:
+    """
+    corr(x[t], y[t + k]) para k em [-max_lag, max_lag], todos os lags num único produto por FFT.
+    Estimador enviesado (divide por n), o usual para localizar o pico.
+    """
+    n = len(x)
+    max_lag = int(min(max_lag, n - 1)) if n else 0
+    lags = np.arange(-max_lag, max_lag + 1)
+    sx, sy = x.std(), y.std()
+    if n < 2 or sx == 0 or sy == 0:
+        return pd.Series(np.zeros(len(lags)), index=pd.Index(lags, name="lag"))
+    x, y = x - x.mean(), y - y.mean()
+    nfft = 1 << (2 * n - 1).bit_length()
+    cc = np.fft.irfft(np.conj(np.fft.rfft(x, nfft)) * np.fft.rfft(y, nfft), nfft)   # cc[k] = Σ x[t]·y[t+k]
+    return pd.Series(cc[lags % nfft] / (n * sx * sy), index=pd.Index(lags, name="lag"))
+
+def lead_lag(x: np.ndarray, y: np.ndarray, max_lag: int) -> dict:
+    """
+    Pico da correlação cruzada: {"lag", "corr", "corr0", "significant"}. Como o pico é o máximo de
+    2·max_lag+1 correlações, a banda de ruído é a do máximo de gaussianas: (√(2·ln m) + 1)/√n.
+    """
+    curve = cross_correlation(x, y, max_lag)
+    k = int(curve.abs().idxmax()) if len(curve) else 0
+    band = (np.sqrt(2 * np.log(max(len(curve), 2))) + 1.0) / np.sqrt(max(len(x), 1))
+    return {"lag": k, "corr": float(curve.get(k, 0.0)), "corr0": float(curve.get(0, 0.0)),
+            "significant": bool(abs(curve.get(k, 0.0)) > band), "curve": curve}
+
+def _step_seconds(freq: str) -> float:
+    return pd.to_timedelta(pd.tseries.frequencies.to_offset(freq)).total_seconds()
+
+def analyze_cross_asset(frames: Dict[str, pd.DataFrame], freq: str = "1s", window: int = 60,
+                        max_lag: int = 30) -> dict:
+    """
+    Insights entre ativos no formato do analyze_tape: "summary" em texto e, por par,
+    correlação (retornos e imbalance), correlação móvel atual e lead-lag. Inclui as séries
+    para gráficos: "rolling" (correlação móvel dos retornos por par) e "xcorr" (curva por lag).
+    """
+    out = {"summary": "Dados insuficientes (é preciso tape de ao menos dois símbolos no mesmo período).",
+           "freq": freq, "step_s": _step_seconds(freq), "n_bins": 0, "pairs": [], "leader": None,
+           "rolling": pd.DataFrame(), "xcorr": pd.DataFrame()}
+    rets, ofi = align_symbols(frames, freq)
+    n = len(rets)
+    if n < max(8, 2 * int(max_lag) + 1):
+        out["n_bins"] = n
+        return out
+    step_s = out["step_s"]
+    pairs, rolling, xcorr = [], {}, {}
+    leads: Dict[str, int] = {s: 0 for s in rets.columns}
+    for a, b in combinations(rets.columns, 2):
+        ra, rb = rets[a].to_numpy(), rets[b].to_numpy()
+        oa, ob = ofi[a].to_numpy(), ofi[b].to_numpy()
+        label = f"{a}×{b}"
+        roll = rolling_corr(ra, rb, window)
+        rolling[label] = roll
+        ll = lead_lag(ra, rb, max_lag)
+        ll_ofi = lead_lag(oa, ob, max_lag)
+        xcorr[label] = ll.pop("curve")
+        ll_ofi.pop("curve")
+        leader = None
+        if ll["significant"] and ll["lag"] != 0:
+            leader = a if ll["lag"] > 0 else b
+            leads[leader] += 1
+        pairs.append({
+            "pair": label, "a": a, "b": b,
+            "ret_corr": float(np.corrcoef(ra, rb)[0, 1]) if ra.std() and rb.std() else 0.0,
+            "ofi_corr": float(np.corrcoef(oa, ob)[0, 1]) if oa.std() and ob.std() else 0.0,
+            "ret_corr_rolling": float(roll[-1]) if np.isfinite(roll[-1]) else None,
+            "lag_bins": ll["lag"], "lag_s": ll["lag"] * step_s, "lag_corr": ll["corr"],
+            "lag_significant": ll["significant"], "leader": leader,
+            "ofi_lag_s": ll_ofi["lag"] * step_s, "ofi_lag_corr": ll_ofi["corr"],
+        })
+    top = max(leads, key=leads.get)
+    out.update({
+        "n_bins": n,
+        "pairs": pairs,
+        "leader": top if leads[top] > 0 else None,
+        "rolling": pd.DataFrame(rolling, index=rets.index),
+        "xcorr": pd.DataFrame(xcorr),
+    })
+    out["summary"] = render_cross_asset(out)
+    return out
+
+def render_cross_asset(insights: dict) -> str:
+    """Texto curto (painel e prompt do chat) a partir de analyze_cross_asset."""
+    pairs = insights.get("pairs") or []
+    if not pairs:
+        return insights.get("summary", "")
+    lines = [f"Correlação entre ativos ({insights['n_bins']} barras de {insights['freq']}):"]
+    for p in pairs:
+        lead = (f"{p['leader']} lidera por {abs(p['lag_s']):g}s (corr {p['lag_corr']:+.2f})"
+                if p["leader"] else "sem liderança clara")
+        lines.append(f"- {p['pair']}: retornos {p['ret_corr']:+.2f}, fluxo {p['ofi_corr']:+.2f}; {lead}.")
+    if insights.get("leader"):
+        lines.append(f"Ativo que mais lidera: {insights['leader']}.")
+    return "\n".join(lines)
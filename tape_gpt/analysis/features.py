@@ -0,0 +1,145 @@
+# file: tape_gpt/analysis/features.py
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis.rule_based import MAIN_SIGNALS, AGGRESSOR_STRENGTH_THR
+from tape_gpt.analysis.microstructure import tape_speed, RUN_LEN_THR, SPEED_Z_THR
+
+def _window_sum(cs: np.ndarray, end: np.ndarray, size: np.ndarray) -> np.ndarray:
+    """Soma de x[end-size+1 .. end] a partir do cumsum com zero à esquerda (cs[k] = sum(x[:k]))."""
+    return cs[end + 1] - cs[end + 1 - size]
+
+def _rolling_std_of_returns(ret: np.ndarray, end: np.ndarray, n_prices: np.ndarray) -> np.ndarray:
+    """
+    Desvio padrão amostral (ddof=1) dos retornos de uma janela de `n_prices` preços terminando em `end`
+    — mesma conta de price.tail(n).pct_change().std(), para todos os `end` de uma vez.
+    """
+    r = np.nan_to_num(ret, nan=0.0, posinf=0.0, neginf=0.0)
+    cs1 = np.concatenate([[0.0], np.cumsum(r)])
+    cs2 = np.concatenate([[0.0], np.cumsum(r * r)])
+    m = n_prices - 1                                  # nº de retornos dentro da janela
+    s1 = _window_sum(cs1, end, np.maximum(m, 0))
+    s2 = _window_sum(cs2, end, np.maximum(m, 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (s2 - s1 * s1 / m) / (m - 1)
+    return np.where(m >= 2, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+def signal_timeline(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> pd.DataFrame:
+    """
+    Reproduz, para o fechamento de cada barra da sessão, as métricas do analyze_tape sobre o prefixo
+    até aquela barra (tendência nos últimos ≤200 negócios, volatilidade e volatilidade relativa,
+    imbalance/pressão dos agressores, reversão nos últimos 30, ritmo do tape) e o main_signal
+    resultante — tudo vetorizado com somas acumuladas, sem chamar analyze_tape barra a barra.
+    Espera df já normalizado (preprocess_ts) e imbs de compute_imbalances(df, freq) da sessão.
+    """
+    cols = ["close", "price_change_pct", "trend", "volatility", "volatility_rel", "imb_last",
+            "aggressor_strength", "reversal_detected", "speed_z", "signal", "label", "color"]
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=cols)
+
+    ts = df["timestamp"]
+    price = df["price"].to_numpy(dtype="float64")
+    n = len(price)
+
+    # último negócio de cada barra (mesmos rótulos do resample)
+    bins = ts.dt.floor(freq)
+    key = bins.astype("int64").to_numpy()           # comparação em int64 (evita array de Timestamps)
+    ends = np.flatnonzero(np.r_[key[1:] != key[:-1], True])
+    count = ends + 1                                  # negócios disponíveis até o fechamento da barra
+
+    # Tendência: variação nos últimos min(200, len(tail)) negócios
+    k = np.minimum(200, count)
+    p0 = price[ends - k + 1]
+    p1 = price[ends]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change = np.where(p0 != 0, 100.0 * (p1 - p0) / p0, 0.0)
+    change = np.nan_to_num(change)
+    trend = np.where(change > 0.1, "alta", np.where(change < -0.1, "baixa", "lateral"))
+
+    # Volatilidade (últimos ≤500) e relativa (vs. últimos ≤1000)
+    ret = np.r_[np.nan, price[1:] / price[:-1] - 1.0]
+    vol_tail = _rolling_std_of_returns(ret, ends, np.minimum(500, count)) * np.sqrt(60.0)
+    volat = np.where(k > 5, np.nan_to_num(vol_tail), 0.0)
+    hist = _rolling_std_of_returns(ret, ends, np.minimum(1000, count)) * np.sqrt(60.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volat_rel = np.where(hist > 0, vol_tail / hist, 1.0)
+    volat_rel = np.where(np.isnan(volat_rel), 1.0, volat_rel)
+
+    # Reversão: últimos 30 negócios contra a tendência
+    back = price[np.maximum(ends - 29, 0)]
+    reversal = (count > 30) & (((p1 > back) & (trend == "baixa")) | ((p1 < back) & (trend == "alta")))
+
+    # Imbalance/pressão por barra. No prefixo, compute_imbalances só tem vbuy da 1ª à última barra com
+    # compra (idem vsell), e analyze_tape usa a última barra com os dois lados: min(última barra com
+    # compra, última com venda) até o fechamento — não a barra corrente da sessão, em que o lado sem
+    # negócios viraria 0. Os valores dessa barra no prefixo e na sessão são os mesmos.
+    labels = pd.DatetimeIndex(bins.iloc[ends])
+    side = df["side"].to_numpy(dtype=object) if "side" in df.columns else np.full(n, None, dtype=object)
+    pos = np.arange(n)
+    last_buy = np.maximum.accumulate(np.where(side == "buy", pos, -1))[ends]
+    last_sell = np.maximum.accumulate(np.where(side == "sell", pos, -1))[ends]
+    has_both = (last_buy >= 0) & (last_sell >= 0)
+    j_key = np.minimum(key[np.maximum(last_buy, 0)], key[np.maximum(last_sell, 0)])
+    if has_both.any():
+        first_both = max(key[np.argmax(side == "buy")], key[np.argmax(side == "sell")])
+        has_both &= j_key >= first_both
+    if imbs is not None and len(imbs) > 0 and has_both.any():
+        iv = imbs.dropna(subset=["vbuy", "vsell", "imbalance"])
+        iv = iv.reindex(pd.DatetimeIndex(j_key.astype("datetime64[ns]")).tz_localize(labels.tz))
+        imb_last = np.where(has_both, iv["imbalance"].fillna(0.0).to_numpy(), 0.0)
+        if "aggr_diff" in iv.columns and "total_volume" in iv.columns:
+            diff = iv["aggr_diff"].to_numpy()
+            total = iv["total_volume"].fillna(iv["vbuy"] + iv["vsell"]).to_numpy()
+        else:
+            diff = (iv["vsell"] - iv["vbuy"]).to_numpy()
+            total = (iv["vbuy"] + iv["vsell"]).to_numpy()
+        strength = np.where(has_both, np.nan_to_num(diff / (total + 1e-9)), 0.0)
+    else:
+        imb_last = np.zeros(len(ends))
+        strength = np.zeros(len(ends))
+
+    # Ritmo do tape no último negócio da barra (kernel causal: igual ao analyze_tape no prefixo)
+    speed = tape_speed(df)
+    speed_z = speed["speed_z"].to_numpy()[ends]
+    run_side = speed["run_side"].to_numpy()[ends]
+    accel = (speed_z >= SPEED_Z_THR) & (speed["run_len"].to_numpy()[ends] >= RUN_LEN_THR) & (run_side != 0) & ~reversal
+
+    # Mesma árvore de decisão de rule_based.main_signal_key, em forma vetorial
+    strong = (np.abs(strength) >= AGGRESSOR_STRENGTH_THR) & ~reversal
+    key = np.select(
+        [
+            accel & (run_side > 0),
+            accel,
+            strong & (strength > 0),
+            strong,
+            (trend == "alta") & (imb_last > 0.1) & ~reversal,
+            (trend == "baixa") & (imb_last < -0.1) & ~reversal,
+            reversal,
+            trend == "lateral",
+        ],
+        ["accel_buy", "accel_sell", "aggr_sell", "aggr_buy", "up", "down", "reversal", "lateral"],
+        default="undefined",
+    )
+    key = np.where(count < 10, "undefined", key)   # poucos dados: mesmo corte do analyze_tape
+
+    out = pd.DataFrame({
+        "close": p1,
+        "price_change_pct": change,
+        "trend": trend,
+        "volatility": volat,
+        "volatility_rel": volat_rel,
+        "imb_last": imb_last,
+        "aggressor_strength": strength,
+        "reversal_detected": reversal,
+        "speed_z": speed_z,
+        "signal": key,
+    }, index=labels)
+    out["label"] = out["signal"].map({k_: v["label"] for k_, v in MAIN_SIGNALS.items()})
+    out["color"] = out["signal"].map({k_: v["color"] for k_, v in MAIN_SIGNALS.items()})
+    # poucos dados: analyze_tape devolve os valores padrão
+    few = count < 10
+    if few.any():
+        out.loc[few, ["price_change_pct", "volatility", "volatility_rel", "imb_last", "aggressor_strength", "speed_z"]] = 0.0
+        out.loc[few, "trend"] = "indefinida"
+        out.loc[few, "reversal_detected"] = False
+    out.index.name = "timestamp"
+    return out
@@ -0,0 +1,341 @@
+# file: tape_gpt/analysis/kernels.py
+"""
+Kernels por negócio (laços sequenciais sobre o tape) sobre arrays NumPy.
+Se o numba estiver instalado, usa versões @njit; senão cai nas versões NumPy puras.
+A escolha é feita uma vez, no primeiro uso de um kernel (backend() -> "numba" | "numpy"):
+importar o numba custa ~0,25 s e não deve pesar no carregamento do app.
+Convenções: ts em int64 (ns UTC), sign = +1 agressor comprador, -1 vendedor, 0 desconhecido.
+Kernels com estado (tape_speed) recebem o estado em arrays e o atualizam in place: rodar em lotes
+sucessivos dá o mesmo resultado que rodar no tape inteiro (O(1) por negócio no modo streaming).
+"""
+import argparse, time
+import numpy as np
+
+# ---------------- Versões NumPy (fallback) ----------------
+
+def _first_cluster_np(ts: np.ndarray, window_ns: int, k: int) -> int:
+    if len(ts) < k:
+        return -1
+    hits = np.flatnonzero(ts[k - 1:] - ts[:len(ts) - k + 1] <= window_ns)
+    return int(hits[0]) if len(hits) else -1
+
+def _cvd_np(volume: np.ndarray, sign: np.ndarray) -> np.ndarray:
+    return np.cumsum(volume * sign, dtype=np.float64)
+
+def _rolling_side_volume_np(ts: np.ndarray, volume: np.ndarray, sign: np.ndarray, window_ns: int):
+    vb = np.where(sign > 0, volume, 0).astype(np.float64)
+    vs = np.where(sign < 0, volume, 0).astype(np.float64)
+    cb = np.concatenate(([0.0], np.cumsum(vb)))
+    cs = np.concatenate(([0.0], np.cumsum(vs)))
+    # janela (t - w, t], igual ao rolling("w") do pandas
+    start = np.searchsorted(ts, ts - window_ns, side="right")
+    end = np.arange(1, len(ts) + 1)
+    return cb[end] - cb[start], cs[end] - cs[start]
+
+def _footprint_add_np(level: np.ndarray, volume: np.ndarray, sign: np.ndarray,
+                      buy_acc: np.ndarray, sell_acc: np.ndarray, total_acc: np.ndarray) -> None:
+    n = len(total_acc)
+    buy_acc += np.bincount(level, weights=np.where(sign > 0, volume, 0), minlength=n)[:n]
+    sell_acc += np.bincount(level, weights=np.where(sign < 0, volume, 0), minlength=n)[:n]
+    total_acc += np.bincount(level, weights=volume, minlength=n)[:n]
+
+# estado do tape_speed: [intensidade rápida, lenta, média EW, variância EW, n, lado da sequência,
+# tamanho da sequência, tempo decorrido desde o primeiro negócio (s)]
+SPEED_STATE = 8
+_MAX_DECAY = 250.0   # exp(-250) ~ 0: limita o passo do decaimento (e o bloco do cálculo vetorizado)
+
+def _linrec_np(loga: np.ndarray, u: np.ndarray, y0: float) -> np.ndarray:
+    """y_i = exp(loga_i)·y_{i-1} + u_i, com y_{-1} = y0; vetorizado por blocos sem overflow."""
+    n = len(u)
+    out = np.empty(n, np.float64)
+    L = np.cumsum(-np.maximum(loga, -_MAX_DECAY))
+    blk = (L // _MAX_DECAY).astype(np.int64)
+    bounds = np.flatnonzero(np.r_[True, blk[1:] != blk[:-1], True])
+    y = y0
+    for s, e in zip(bounds[:-1], bounds[1:]):
+        w = np.exp(L[s:e] - (L[s - 1] if s else 0.0))     # 1 / Π a_k no bloco (≤ e^500)
+        out[s:e] = (y + np.cumsum(u[s:e] * w)) / w
+        y = out[e - 1]
+    return out
+
+def _tape_speed_np(ts, sign, tau_f, tau_s, alpha, warmup, clock, state):
+    n = len(ts)
+    idx = np.arange(n)
+    prev_ts = np.r_[clock[0] if state[4] > 0 else ts[0], ts[:-1]]
+    dt = (ts - prev_ts) / 1e9
+    raw_f = _linrec_np(-dt / tau_f, np.full(n, 1.0 / tau_f), state[0])
+    raw_s = _linrec_np(-dt / tau_s, np.full(n, 1.0 / tau_s), state[1])
+    # correção de início (como no EW com adjust): o kernel ainda não cobriu tau desde o 1º negócio
+    elapsed = state[7] + np.cumsum(dt)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lam_f = np.where(elapsed > 0, raw_f / -np.expm1(-elapsed / tau_f), raw_f)
+        lam_s = np.where(elapsed > 0, raw_s / -np.expm1(-elapsed / tau_s), raw_s)
+    # z do log da intensidade contra média/variância EW (por negócio) anteriores ao negócio
+    x = np.log(lam_f)
+    m0 = state[2] if state[4] > 0 else x[0]
+    m = _linrec_np(np.full(n, np.log1p(-alpha)), alpha * x, m0)
+    m_prev = np.r_[m0, m[:-1]]
+    d = x - m_prev
+    v = _linrec_np(np.full(n, np.log1p(-alpha)), alpha * (1 - alpha) * d * d, state[3])
+    v_prev = np.r_[state[3], v[:-1]]
+    count = state[4] + idx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where((count >= warmup) & (v_prev > 0), d / np.sqrt(v_prev), 0.0)
+    # sequências de agressão: negócio sem lado não quebra nem alonga a sequência
+    nz = sign != 0
+    last = np.maximum.accumulate(np.where(nz, idx, -1))
+    side = np.where(last >= 0, sign[np.maximum(last, 0)], state[5]).astype(np.int8)
+    side_prev = np.r_[np.int8(state[5]), side[:-1]]
+    start = nz & (side != side_prev)
+    c = np.cumsum(nz)
+    sp = np.maximum.accumulate(np.where(start, idx, -1))
+    run = np.where(sp >= 0, c - (c[np.maximum(sp, 0)] - 1), state[6] + c).astype(np.int64)
+    clock[0] = ts[-1]
+    state[:] = (raw_f[-1], raw_s[-1], m[-1], v[-1], state[4] + n, side[-1], run[-1], elapsed[-1])
+    return lam_f, lam_s, z, side, run
+
+# ---------------- Versões numba (laço único, sem temporários) ----------------
+
+def _first_cluster_loop(ts, window_ns, k):
+    for i in range(len(ts) - k + 1):
+        if ts[i + k - 1] - ts[i] <= window_ns:
+            return i
+    return -1
+
+def _cvd_loop(volume, sign):
+    out = np.empty(len(volume), np.float64)
+    acc = 0.0
+    for i in range(len(volume)):
+        acc += volume[i] * sign[i]
+        out[i] = acc
+    return out
+
+def _rolling_side_volume_loop(ts, volume, sign, window_ns):
+    n = len(ts)
+    vb = np.empty(n, np.float64)
+    vs = np.empty(n, np.float64)
+    sb = 0.0
+    ss = 0.0
+    j = 0
+    for i in range(n):
+        if sign[i] > 0:
+            sb += volume[i]
+        elif sign[i] < 0:
+            ss += volume[i]
+        while ts[j] <= ts[i] - window_ns:
+            if sign[j] > 0:
+                sb -= volume[j]
+            elif sign[j] < 0:
+                ss -= volume[j]
+            j += 1
+        vb[i] = sb
+        vs[i] = ss
+    return vb, vs
+
+def _footprint_add_loop(level, volume, sign, buy_acc, sell_acc, total_acc):
+    for i in range(len(level)):
+        total_acc[level[i]] += volume[i]
+        if sign[i] > 0:
+            buy_acc[level[i]] += volume[i]
+        elif sign[i] < 0:
+            sell_acc[level[i]] += volume[i]
+
+def _tape_speed_loop(ts, sign, tau_f, tau_s, alpha, warmup, clock, state):
+    n = len(ts)
+    lam_f = np.empty(n, np.float64)
+    lam_s = np.empty(n, np.float64)
+    z = np.empty(n, np.float64)
+    side = np.empty(n, np.int8)
+    run = np.empty(n, np.int64)
+    lf, ls, m, v, cnt, sd, rl, el = state[0], state[1], state[2], state[3], state[4], state[5], state[6], state[7]
+    t_prev = clock[0]
+    for i in range(n):
+        dt = (ts[i] - t_prev) / 1e9 if cnt > 0 else 0.0
+        t_prev = ts[i]
+        lf = np.exp(max(-dt / tau_f, -_MAX_DECAY)) * lf + 1.0 / tau_f
+        ls = np.exp(max(-dt / tau_s, -_MAX_DECAY)) * ls + 1.0 / tau_s
+        el += dt
+        cf = -np.expm1(-el / tau_f) if el > 0 else 1.0
+        cs = -np.expm1(-el / tau_s) if el > 0 else 1.0
+        x = np.log(lf / cf)
+        if cnt == 0:
+            m = x
+        d = x - m
+        z[i] = d / np.sqrt(v) if cnt >= warmup and v > 0 else 0.0
+        m = m + alpha * d
+        v = (1.0 - alpha) * v + alpha * (1.0 - alpha) * d * d
+        if sign[i] != 0:
+            if sign[i] == sd:
+                rl += 1
+            else:
+                sd = float(sign[i])
+                rl = 1
+        lam_f[i] = lf / cf
+        lam_s[i] = ls / cs
+        side[i] = np.int8(sd)
+        run[i] = np.int64(rl)
+        cnt += 1
+    clock[0] = t_prev
+    state[0], state[1], state[2], state[3], state[4], state[5], state[6], state[7] = lf, ls, m, v, cnt, sd, rl, el
+    return lam_f, lam_s, z, side, run
+
+_IMPL = {}
+
+def _kernels() -> dict:
+    if not _IMPL:
+        try:
+            from numba import njit
+        except ImportError:  # numba é opcional
+            _IMPL.update(backend="numpy", first_cluster=_first_cluster_np, cvd=_cvd_np,
+                         rolling_side_volume=_rolling_side_volume_np, footprint_add=_footprint_add_np,
+                         tape_speed=_tape_speed_np)
+        else:
+            _IMPL.update(backend="numba", first_cluster=njit(cache=True)(_first_cluster_loop),
+                         cvd=njit(cache=True)(_cvd_loop),
+                         rolling_side_volume=njit(cache=True)(_rolling_side_volume_loop),
+                         footprint_add=njit(cache=True)(_footprint_add_loop),
+                         tape_speed=njit(cache=True)(_tape_speed_loop))
+    return _IMPL
+
+def backend() -> str:
+    """Backend em uso: "numba" ou "numpy"."""
+    return _kernels()["backend"]
+
+def __getattr__(name):
+    # compatibilidade: kernels.BACKEND continua disponível (resolve o backend no acesso)
+    if name == "BACKEND":
+        return backend()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ---------------- API pública ----------------
+
+def first_cluster(ts: np.ndarray, window_ns: int, k: int = 3) -> int:
+    """Índice i do primeiro grupo de k eventos com ts[i+k-1] - ts[i] <= window_ns (ou -1). ts ordenado."""
+    return int(_kernels()["first_cluster"](np.ascontiguousarray(ts, dtype=np.int64), np.int64(window_ns), int(k)))
+
+def cvd(volume: np.ndarray, sign: np.ndarray) -> np.ndarray:
+    """Cumulative volume delta: soma acumulada de volume * sinal do agressor."""
+    return _kernels()["cvd"](np.ascontiguousarray(volume, dtype=np.float64), np.ascontiguousarray(sign, dtype=np.int8))
+
+def rolling_side_volume(ts: np.ndarray, volume: np.ndarray, sign: np.ndarray, window_ns: int):
+    """Volume comprador e vendedor na janela (t - w, t] de cada negócio. ts ordenado."""
+    return _kernels()["rolling_side_volume"](
+        np.ascontiguousarray(ts, dtype=np.int64),
+        np.ascontiguousarray(volume, dtype=np.float64),
+        np.ascontiguousarray(sign, dtype=np.int8),
+        np.int64(window_ns),
+    )
+
+def footprint_add(level: np.ndarray, volume: np.ndarray, sign: np.ndarray,
+                  buy_acc: np.ndarray, sell_acc: np.ndarray, total_acc: np.ndarray) -> None:
+    """Acumula (in place) volume comprador, vendedor e total por nível; level indexa os acumuladores."""
+    _kernels()["footprint_add"](
+        np.ascontiguousarray(level, dtype=np.int64),
+        np.ascontiguousarray(volume, dtype=np.float64),
+        np.ascontiguousarray(sign, dtype=np.int8),
+        buy_acc, sell_acc, total_acc,
+    )
+
+def tape_speed(ts: np.ndarray, sign: np.ndarray, tau_fast_s: float, tau_slow_s: float, alpha: float,
+               warmup: int, clock: np.ndarray, state: np.ndarray):
+    """
+    Por negócio: intensidade (negócios/s, kernel exponencial) rápida e lenta, z do log da intensidade
+    rápida contra sua média/variância EW (peso alpha por negócio), lado e tamanho da sequência de
+    agressão. clock (int64[1], ts do último negócio) e state (float64[SPEED_STATE]) são atualizados.
+    """
+    if len(ts) == 0:
+        e = np.empty(0, np.float64)
+        return e, e, e, np.empty(0, np.int8), np.empty(0, np.int64)
+    return _kernels()["tape_speed"](
+        np.ascontiguousarray(ts, dtype=np.int64), np.ascontiguousarray(sign, dtype=np.int8),
+        float(tau_fast_s), float(tau_slow_s), float(alpha), int(warmup), clock, state,
+    )
+
+# ---------------- Benchmark (python -m tape_gpt.analysis.kernels) ----------------
+
+def _synthetic_tape(n: int, seed: int = 0):
+    """ts (ns, ~20 negócios/s), volume e sinal sintéticos para o benchmark."""
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000 * 10**9 + np.cumsum(rng.exponential(5e7, n)).astype(np.int64)
+    volume = rng.integers(1, 200, n).astype(np.float64)
+    sign = rng.choice(np.array([1, -1, 0], np.int8), n, p=[0.48, 0.48, 0.04])
+    return ts, volume, sign
+
+def _pandas_refs(ts, volume, sign, window_ns):
+    """Mesmos cálculos no pandas (caminho anterior aos kernels), para comparação."""
+    import pandas as pd
+    idx = pd.DatetimeIndex(ts.view("datetime64[ns]"))
+    s_vol, s_sign = pd.Series(volume, index=idx), pd.Series(sign, index=idx)
+    w = pd.Timedelta(int(window_ns), "ns")
+    s_ts = pd.Series(ts)
+    level = pd.Series(ts % 400)   # 400 níveis de preço sintéticos
+    return {
+        "cvd": lambda: (s_vol * s_sign).cumsum(),
+        "rolling_side_volume": lambda: (s_vol.where(s_sign > 0, 0.0).rolling(w).sum(),
+                                        s_vol.where(s_sign < 0, 0.0).rolling(w).sum()),
+        # pior caso (varre o tape inteiro): nenhum trio de negócios no mesmo nanossegundo
+        "first_cluster": lambda: ((s_ts.shift(-2) - s_ts) <= 0).idxmax(),
+        "footprint_add": lambda: pd.DataFrame({"level": level, "v": volume, "s": sign})
+                                   .assign(vb=lambda d: d.v.where(d.s > 0, 0.0), vs=lambda d: d.v.where(d.s < 0, 0.0))
+                                   .groupby("level")[["vb", "vs", "v"]].sum(),
+    }
+
+def benchmark(n: int = 1_000_000, repeat: int = 3) -> "pd.DataFrame":
+    """
+    Vazão (milhões de negócios/s) de cada kernel: pandas (quando há equivalente), NumPy (fallback)
+    e o backend ativo (numba quando instalado). A primeira chamada (compilação) fica fora da medição.
+    """
+    import pandas as pd
+    ts, volume, sign = _synthetic_tape(n)
+    window_ns = 120 * 10**9
+    refs = _pandas_refs(ts, volume, sign, window_ns)
+
+    def _speed_np():
+        _tape_speed_np(ts, sign, 1.0, 30.0, 0.01, 50, np.zeros(1, np.int64), np.zeros(SPEED_STATE))
+
+    def _speed():
+        tape_speed(ts, sign, 1.0, 30.0, 0.01, 50, np.zeros(1, np.int64), np.zeros(SPEED_STATE))
+
+    level = ts % 400
+    acc = lambda: (np.zeros(400), np.zeros(400), np.zeros(400))
+
+    cases = {
+        "cvd": (refs["cvd"], lambda: _cvd_np(volume, sign), lambda: cvd(volume, sign)),
+        "rolling_side_volume": (refs["rolling_side_volume"],
+                                lambda: _rolling_side_volume_np(ts, volume, sign, window_ns),
+                                lambda: rolling_side_volume(ts, volume, sign, window_ns)),
+        "first_cluster": (refs["first_cluster"], lambda: _first_cluster_np(ts, 0, 3),
+                          lambda: first_cluster(ts, 0, 3)),
+        "footprint_add": (refs["footprint_add"], lambda: _footprint_add_np(level, volume, sign, *acc()),
+                          lambda: footprint_add(level, volume, sign, *acc())),
+        "tape_speed": (None, _speed_np, _speed),
+    }
+
+    def _mtps(fn):
+        if fn is None:
+            return float("nan")
+        fn()   # aquecimento (compilação do numba, caches do pandas)
+        best = min(_timed(fn) for _ in range(repeat))
+        return n / best / 1e6
+
+    out = []
+    for name, (ref, np_fn, active) in cases.items():
+        out.append({"kernel": name, "pandas": _mtps(ref), "numpy": _mtps(np_fn),
+                    backend(): _mtps(active)})
+    return pd.DataFrame(out).set_index("kernel")
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão dos kernels por negócio (milhões de negócios/s).")
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"backend: {backend()}  negócios: {args.trades}")
+    print(benchmark(args.trades, args.repeat).round(1).to_string())
+
+if __name__ == "__main__":
+    main()
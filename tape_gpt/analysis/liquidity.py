@@ -0,0 +1,398 @@
+# file: tape_gpt/analysis/liquidity.py
+import threading, time
+from typing import Callable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis.orderflow import side_sign, _ts_ns
+
+EVENT_LABELS = {
+    "hidden": "Negócio maior que o exibido",
+    "iceberg": "Iceberg / absorção (nível reposto)",
+    "sweep": "Varrida de níveis",
+}
+EVENT_COLUMNS = ["timestamp", "kind", "label", "side", "price", "price_end", "volume", "displayed", "levels", "trades"]
+
+def align_quotes(trades: pd.DataFrame, quotes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Junta a cada negócio o topo do livro imediatamente antes (cotação com ts < negócio) e logo depois
+    (primeira cotação com ts >= negócio) via merge_asof — sem busca por negócio em Python.
+    Espera quotes com timestamp, bid, qty_bid, ask, qty_ask (formato de ofertas).
+    """
+    q = quotes[["timestamp", "bid", "qty_bid", "ask", "qty_ask"]].dropna(subset=["timestamp"])
+    if not q["timestamp"].is_monotonic_increasing:
+        q = q.sort_values("timestamp", kind="stable")
+    t = trades[["timestamp", "price", "volume", "side"]]
+    if not t["timestamp"].is_monotonic_increasing:
+        t = t.sort_values("timestamp", kind="stable")
+    before = pd.merge_asof(t, q, on="timestamp", direction="backward", allow_exact_matches=False)
+    # "depois": mantém a última cotação de cada ts (estado do livro após o evento)
+    q_after = q.drop_duplicates("timestamp", keep="last")
+    after = pd.merge_asof(t[["timestamp"]], q_after, on="timestamp", direction="forward", allow_exact_matches=True)
+    for c in ("bid", "qty_bid", "ask", "qty_ask"):
+        before[f"{c}_after"] = after[c].to_numpy()
+    return before.rename(columns={"bid": "bid_before", "qty_bid": "qty_bid_before",
+                                  "ask": "ask_before", "qty_ask": "qty_ask_before"})
+
+def detect_liquidity_events(
+    trades: pd.DataFrame,
+    quotes: pd.DataFrame,
+    sweep_ms: float = 50.0,
+    min_levels: int = 2,
+    run_gap_s: float = 2.0,
+    refill_ratio: float = 0.5,
+) -> pd.DataFrame:
+    """
+    Eventos de liquidez a partir de negócios + topo do livro no tempo:
+      - hidden: agressão no melhor nível com volume > quantidade exibida;
+      - iceberg: sequência de agressões no mesmo nível que executa mais que o exibido e o nível
+        continua lá (reposto com >= refill_ratio do exibido) — absorção;
+      - sweep: rajada de agressões do mesmo lado (intervalo <= sweep_ms) atravessando >= min_levels preços.
+    """
+    if trades is None or quotes is None or len(trades) == 0 or len(quotes) == 0 or "timestamp" not in quotes.columns:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    a = align_quotes(trades, quotes)
+    sign = side_sign(a["side"])
+    price = a["price"].to_numpy(dtype="float64")
+    vol = a["volume"].to_numpy(dtype="float64")
+    ts = a["timestamp"]
+    tsn = ts.astype("datetime64[ns, UTC]").astype("int64").to_numpy()
+
+    # nível exibido do lado agredido (ask para compra, bid para venda)
+    lvl_before = np.where(sign > 0, a["ask_before"], np.where(sign < 0, a["bid_before"], np.nan))
+    shown = np.where(sign > 0, a["qty_ask_before"], np.where(sign < 0, a["qty_bid_before"], np.nan))
+    lvl_after = np.where(sign > 0, a["ask_after"], np.where(sign < 0, a["bid_after"], np.nan))
+    shown_after = np.where(sign > 0, a["qty_ask_after"], np.where(sign < 0, a["qty_bid_after"], np.nan))
+    at_level = (sign != 0) & np.isclose(price, lvl_before)
+
+    events = []
+    side_name = np.where(sign > 0, "buy", "sell")
+
+    # 1) negócio maior que o exibido (se o nível foi reposto em seguida, vira iceberg abaixo)
+    hid = at_level & (vol > shown)
+
+    # 2) iceberg/absorção: sequências no mesmo nível (mesmo lado/preço, sem pausa > run_gap_s)
+    gap = np.r_[np.inf, np.diff(tsn)] > run_gap_s * 1e9
+    new_run = gap | np.r_[True, (sign[1:] != sign[:-1]) | (price[1:] != price[:-1])]
+    i0 = np.flatnonzero(new_run)
+    i1 = np.r_[i0[1:], len(a)] - 1
+    executed = np.add.reduceat(vol, i0)
+    # o nível continua no livro depois da última agressão da sequência, com quantidade reposta
+    still = np.isclose(lvl_after[i1], price[i0]) & (shown_after[i1] >= refill_ratio * shown[i0])
+    ice = at_level[i0] & (executed > shown[i0]) & still
+    hid &= ~ice[np.cumsum(new_run) - 1]
+    if hid.any():
+        events.append(pd.DataFrame({
+            "timestamp": ts[hid].to_numpy(), "kind": "hidden", "side": side_name[hid],
+            "price": price[hid], "price_end": price[hid], "volume": vol[hid], "displayed": shown[hid],
+            "levels": 1, "trades": 1,
+        }))
+    if ice.any():
+        events.append(pd.DataFrame({
+            "timestamp": ts.iloc[i0[ice]].to_numpy(), "kind": "iceberg", "side": side_name[i0[ice]],
+            "price": price[i0[ice]], "price_end": price[i1[ice]], "volume": executed[ice],
+            "displayed": shown[i0[ice]], "levels": 1, "trades": (i1 - i0 + 1)[ice],
+        }))
+
+    # 3) varridas: rajadas do mesmo lado em <= sweep_ms atravessando vários preços
+    burst_new = (np.r_[np.inf, np.diff(tsn)] > sweep_ms * 1e6) | np.r_[True, sign[1:] != sign[:-1]]
+    burst = np.cumsum(burst_new) - 1
+    levels = pd.Series(price).groupby(burst, sort=False).nunique().to_numpy()
+    j0 = np.flatnonzero(burst_new)
+    j1 = np.r_[j0[1:], len(a)] - 1
+    sw = (levels >= min_levels) & (sign[j0] != 0)
+    if sw.any():
+        events.append(pd.DataFrame({
+            "timestamp": ts.iloc[j0[sw]].to_numpy(), "kind": "sweep", "side": side_name[j0[sw]],
+            "price": price[j0[sw]], "price_end": price[j1[sw]], "volume": np.add.reduceat(vol, j0)[sw],
+            "displayed": shown[j0[sw]], "levels": levels[sw], "trades": (j1 - j0 + 1)[sw],
+        }))
+
+    if not events:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    out = pd.concat(events, ignore_index=True)
+    out["label"] = out["kind"].map(EVENT_LABELS)
+    return out.sort_values("timestamp", kind="stable").reset_index(drop=True)[EVENT_COLUMNS]
+
+def summarize_liquidity_events(events: pd.DataFrame, last_n: int = 5) -> Optional[str]:
+    """Resumo curto (contagem por tipo + últimos eventos) para o painel e o chat."""
+    if events is None or len(events) == 0:
+        return None
+    counts = events["label"].value_counts()
+    head = "; ".join(f"{k}: {v}" for k, v in counts.items())
+    lines = [
+        f"{r.timestamp:%H:%M:%S} {r.label} ({'compra' if r.side == 'buy' else 'venda'}) "
+        f"{r.price:.2f}{'' if r.price_end == r.price else f'→{r.price_end:.2f}'} vol={r.volume:.0f} exibido={r.displayed:.0f}"
+        for r in events.tail(last_n).itertuples()
+    ]
+    return head + "\n" + "\n".join(lines)
+
+# ---------------- séries do livro por barra ----------------
+
+# Uma barra por registro, num anel indexado pelo nº da barra (slot = barra % capacidade): atualizar a
+# barra corrente ou abrir barras novas custa O(lote), sem realocar a janela. Guarda somas e contagens,
+# então reagrupar em barras maiores (frame(freq)) é exato.
+BOOK_BAR_DTYPE = np.dtype([
+    ("bar", "i8"),            # ts // bar_ns; slot com outro nº = barra sem atualização
+    ("updates", "i4"),        # atualizações de topo na barra (taxa de cotação)
+    ("quotes", "i4"),         # atualizações com bid e ask válidos (base das médias)
+    ("spread_sum", "f8"),
+    ("bid_qty_sum", "f8"),
+    ("ask_qty_sum", "f8"),
+    ("depth_bid", "f4"),      # qtd nos N melhores níveis (última amostra da barra; NaN sem amostra)
+    ("depth_ask", "f4"),
+])
+BOOK_COLUMNS = ["spread", "bid_qty", "ask_qty", "depth_top", "imbalance", "depth_bid_n", "depth_ask_n",
+                "depth_n", "imbalance_n", "updates", "update_rate"]
+
+class BookSeries:
+    """
+    Spread, profundidade no topo e em N níveis, imbalance do livro e taxa de atualização de cotações
+    por barra, mantidos incrementalmente a partir do fluxo de ofertas. É um sink do feed (assinatura
+    (negocios_df, ofertas_df), como o AlertEngine): consome todo lote, não só a janela de max_rows.
+    A profundidade em N níveis vem do livro do feed quando ele mantém um (simulador no modo "book").
+    """
+    def __init__(self, bar: str = "1s", max_bars: int = 4 * 3600, levels: int = 10):
+        self.bar = bar
+        self.bar_ns = int(pd.to_timedelta(bar).value)
+        self.capacity = int(max_bars)
+        self.levels = int(levels)
+        self._ring = np.zeros(self.capacity, dtype=BOOK_BAR_DTYPE)
+        self._ring["bar"] = -1
+        self._last = -1                 # nº da barra mais recente
+        self._first = -1                # nº da primeira barra vista
+        self._lock = threading.Lock()
+        self._depth_fn: Optional[Callable[[int], Optional[Tuple[int, int]]]] = None
+        self._follower: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.follow_errors = 0          # falhas da thread seguidora (o lote é pulado, a thread continua)
+        self.last_follow_error: Optional[str] = None
+        self.last_update_us = 0.0
+
+    def __len__(self) -> int:
+        return 0 if self._last < 0 else min(self._last - self._first + 1, self.capacity)
+
+    def _open_bars(self, lo: int, hi: int):
+        """Abre (zera) os slots das barras novas até hi; lo = primeira barra do lote."""
+        if hi <= self._last:
+            return
+        start = max(hi - self.capacity + 1, self._last + 1 if self._last >= 0 else lo)
+        if self._last < 0:
+            self._first = start
+        new = np.arange(start, hi + 1)
+        slots = new % self.capacity
+        self._ring[slots] = 0
+        self._ring["bar"][slots] = new
+        self._ring["depth_bid"][slots] = np.nan
+        self._ring["depth_ask"][slots] = np.nan
+        self._last = hi
+
+    def update(self, offers: pd.DataFrame) -> int:
+        """Acumula um lote de ofertas (timestamp, bid, ask, qty_bid, qty_ask). Devolve quantas entraram."""
+        if offers is None or len(offers) == 0 or "timestamp" not in offers.columns:
+            return 0
+        t0 = time.perf_counter()
+        n = self.add(_ts_ns(offers["timestamp"]), offers["bid"].to_numpy(dtype="float64"),
+                     offers["ask"].to_numpy(dtype="float64"), offers["qty_bid"].to_numpy(dtype="float64"),
+                     offers["qty_ask"].to_numpy(dtype="float64"))
+        self.last_update_us = (time.perf_counter() - t0) * 1e6
+        return n
+
+    def add(self, ts: np.ndarray, bid: np.ndarray, ask: np.ndarray, qb: np.ndarray, qa: np.ndarray) -> int:
+        """Mesmo que update() sobre arrays (ts em ns; preços e quantidades do topo)."""
+        with self._lock:
+            b = ts // self.bar_ns
+            if self._last >= 0:
+                b = np.maximum(b, self._last)          # cotação atrasada entra na barra corrente
+            lo, hi = int(b.min()), int(b.max())
+            self._open_bars(lo, hi)
+            lo = max(lo, hi - self.capacity + 1)       # lote mais longo que a janela: só o que cabe
+            keep = b >= lo
+            ok = keep & (bid > 0) & (ask > 0) & (ask >= bid)   # lado vazio (livro sem ofertas) não entra nas médias
+            idx, nb = np.where(keep, b - lo, 0), hi - lo + 1
+            w = lambda x: np.bincount(idx, weights=np.where(ok, x, 0.0), minlength=nb)
+            ring, slots = self._ring, np.arange(lo, hi + 1) % self.capacity
+            ring["updates"][slots] += np.bincount(idx, weights=keep, minlength=nb).astype("i4")
+            ring["quotes"][slots] += np.bincount(idx, weights=ok, minlength=nb).astype("i4")
+            ring["spread_sum"][slots] += w(ask - bid)
+            ring["bid_qty_sum"][slots] += w(qb)
+            ring["ask_qty_sum"][slots] += w(qa)
+        return int(keep.sum())
+
+    def sample_depth(self, bid_qty: float, ask_qty: float, ts_ns: Optional[int] = None):
+        """Registra a profundidade em N níveis (soma das quantidades por lado) na barra de ts_ns."""
+        ts_ns = time.time_ns() if ts_ns is None else int(ts_ns)
+        with self._lock:
+            b = max(ts_ns // self.bar_ns, self._last)
+            self._open_bars(b, b)
+            slot = b % self.capacity
+            self._ring["depth_bid"][slot] = bid_qty
+            self._ring["depth_ask"][slot] = ask_qty
+
+    # --- ligação com o feed ---
+    def __call__(self, trades: pd.DataFrame, offers: Optional[pd.DataFrame] = None):
+        self.update(offers)
+        if self._depth_fn is not None:
+            depth = self._depth_fn(self.levels)
+            if depth is not None:
+                ts = offers["timestamp"].iloc[-1].value if offers is not None and len(offers) else None
+                self.sample_depth(*depth, ts_ns=ts)
+
+    def attach(self, feed, interval_s: float = 0.2):
+        """
+        Liga a série ao feed: via add_sink quando o feed chama sinks a cada lote (simulador em thread);
+        senão acompanha read_offers_since numa thread própria (ex.: IngestProcess em outro processo).
+        """
+        self._depth_fn = getattr(feed, "book_depth", None)
+        if callable(getattr(feed, "add_sink", None)):
+            feed.add_sink(self)
+            return
+        if self._follower is not None or not callable(getattr(feed, "read_offers_since", None)):
+            return
+        self._stop.clear()
+        def _follow():
+            cursor = 0                     # começa pelo que ainda está no ring
+            while not self._stop.is_set():
+                try:
+                    df_new, cursor = feed.read_offers_since(cursor)
+                    self.update(df_new)
+                except Exception as e:
+                    # lote ruim ou feed reiniciando: conta e segue com o cursor atual
+                    self.follow_errors += 1
+                    self.last_follow_error = repr(e)
+                self._stop.wait(interval_s)
+        self._follower = threading.Thread(target=_follow, name="book-series", daemon=True)
+        self._follower.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Para a thread seguidora (se houver); attach() pode ligá-la de novo."""
+        self._stop.set()
+        if self._follower is not None:
+            self._follower.join(timeout=timeout)
+            self._follower = None
+
+    # --- leitura ---
+    def frame(self, freq: Optional[str] = None, last: Optional[int] = None) -> pd.DataFrame:
+        """
+        Série por barra (colunas BOOK_COLUMNS), índice UTC. freq reagrupa em barras maiores (múltiplos
+        de `bar`); barras sem cotação repetem spread/quantidades anteriores (o livro não mudou).
+        """
+        with self._lock:
+            n = len(self)
+            if last is not None:
+                n = min(n, int(last))
+            ids = np.arange(self._last - n + 1, self._last + 1)
+            rows = self._ring[ids % self.capacity].copy()
+        stale = rows["bar"] != ids
+        rows[stale] = 0
+        rows["depth_bid"][stale] = rows["depth_ask"][stale] = np.nan
+        step_ns = self.bar_ns
+        if freq is not None and n and pd.to_timedelta(freq).value > self.bar_ns:
+            # barras de `freq` alinhadas à época: somas por grupo, profundidade = última amostra do grupo
+            step_ns = int(pd.to_timedelta(freq).value)
+            g = ids * self.bar_ns // step_ns
+            starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+            grouped = np.zeros(len(starts), dtype=BOOK_BAR_DTYPE)
+            for c in ("updates", "quotes", "spread_sum", "bid_qty_sum", "ask_qty_sum"):
+                grouped[c] = np.add.reduceat(rows[c], starts)
+            for c in ("depth_bid", "depth_ask"):
+                pos = np.where(np.isnan(rows[c]), -1, np.arange(n))
+                last_ok = np.maximum.reduceat(pos, starts)
+                grouped[c] = np.where(last_ok >= 0, rows[c][np.maximum(last_ok, 0)], np.nan)
+            rows, ids = grouped, g[starts]
+        idx = pd.DatetimeIndex((ids * step_ns).astype("datetime64[ns]")).tz_localize("UTC")
+        return _book_frame(rows, idx, step_ns / 1e9)
+
+    def stats(self, freq: str = "5s", recent: int = 12) -> dict:
+        return book_liquidity(self.frame(freq), recent=recent)
+
+def _ffill(x: np.ndarray) -> np.ndarray:
+    """NaN -> último valor válido anterior (NaN no início continua NaN)."""
+    return x[np.maximum.accumulate(np.where(np.isnan(x), 0, np.arange(len(x))))]
+
+def _book_frame(rows: np.ndarray, index: pd.DatetimeIndex, step_s: float) -> pd.DataFrame:
+    """Somas por barra -> médias (spread, quantidades no topo), imbalances e taxa de atualização."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q = np.where(rows["quotes"] > 0, rows["quotes"], np.nan)
+        spread = _ffill(rows["spread_sum"] / q)
+        bid_qty = _ffill(rows["bid_qty_sum"] / q)
+        ask_qty = _ffill(rows["ask_qty_sum"] / q)
+        depth_top = bid_qty + ask_qty
+        depth_bid_n = _ffill(rows["depth_bid"].astype("float64"))
+        depth_ask_n = _ffill(rows["depth_ask"].astype("float64"))
+        depth_n = depth_bid_n + depth_ask_n
+        out = pd.DataFrame({
+            "spread": spread,
+            "bid_qty": bid_qty,
+            "ask_qty": ask_qty,
+            "depth_top": depth_top,
+            "imbalance": np.where(depth_top > 0, (bid_qty - ask_qty) / depth_top, np.nan),
+            "depth_bid_n": depth_bid_n,
+            "depth_ask_n": depth_ask_n,
+            "depth_n": depth_n,
+            "imbalance_n": np.where(depth_n > 0, (depth_bid_n - depth_ask_n) / depth_n, np.nan),
+            "updates": rows["updates"].astype("float64"),
+            "update_rate": rows["updates"] / step_s,
+        }, index=index)
+    return out
+
+def book_series(offers: pd.DataFrame, freq: str = "5s") -> pd.DataFrame:
+    """
+    Versão em lote do BookSeries para um fluxo de ofertas no formato do feed (timestamp, bid, ask,
+    qty_bid, qty_ask; ex.: ofertas enviadas à API): uma passada vetorizada. As ofertas do
+    parse_profit_excel (buy_price/sell_price, sem timestamp) são uma foto do livro e dão frame vazio.
+    """
+    if (offers is None or len(offers) == 0 or not {"timestamp", "bid", "ask", "qty_bid", "qty_ask"} <= set(offers.columns)
+            or offers["timestamp"].isna().all()):
+        return pd.DataFrame(columns=BOOK_COLUMNS, dtype="float64")
+    q = offers.dropna(subset=["timestamp"])
+    if not q["timestamp"].is_monotonic_increasing:
+        q = q.sort_values("timestamp", kind="stable")
+    ts = _ts_ns(q["timestamp"])
+    bar_ns = int(pd.to_timedelta(freq).value)
+    series = BookSeries(bar=freq, max_bars=int(ts[-1] // bar_ns - ts[0] // bar_ns) + 1)
+    series.update(q)
+    return series.frame()
+
+def book_liquidity(frame: pd.DataFrame, recent: int = 12) -> dict:
+    """
+    Resumo da liquidez do livro (campos de insight, como no analyze_tape): valores atuais, médias das
+    últimas `recent` barras contra a janela inteira, e um comentário para o painel e o prompt.
+    """
+    f = frame.dropna(subset=["spread"]) if len(frame) else frame
+    if len(f) == 0:
+        return {"bars": 0, "comment": ""}
+    tail = f.tail(int(recent))
+    spread_mean, spread_recent = float(f["spread"].mean()), float(tail["spread"].mean())
+    depth_mean, depth_recent = float(f["depth_top"].mean()), float(tail["depth_top"].mean())
+    out = {
+        "bars": len(f),
+        "spread": float(f["spread"].iloc[-1]),
+        "spread_recent": spread_recent,
+        "spread_mean": spread_mean,
+        "depth_top": depth_recent,
+        "depth_top_mean": depth_mean,
+        "depth_n": float(tail["depth_n"].iloc[-1]) if tail["depth_n"].notna().any() else None,
+        "imbalance": float(tail["imbalance"].mean()),
+        "imbalance_n": float(tail["imbalance_n"].iloc[-1]) if tail["imbalance_n"].notna().any() else None,
+        "update_rate": float(tail["update_rate"].mean()),
+        "update_rate_mean": float(f["update_rate"].mean()),
+        # livro afinando / spread abrindo: janela recente contra a sessão
+        "thinning": depth_recent < 0.7 * depth_mean,
+        "widening": spread_recent > 1.5 * spread_mean,
+    }
+    out["comment"] = book_comment(out)
+    return out
+
+def book_comment(stats: dict) -> str:
+    """Frase curta sobre a liquidez do livro."""
+    if not stats.get("bars"):
+        return ""
+    txt = (f"Livro: spread {stats['spread_recent']:.2f} (média {stats['spread_mean']:.2f}); "
+           f"topo com {stats['depth_top']:.0f} (média {stats['depth_top_mean']:.0f})")
+    if stats.get("depth_n") is not None:
+        txt += f"; {stats['depth_n']:.0f} nos níveis do book (imbalance {stats['imbalance_n']:+.2f})"
+    txt += f"; imbalance do topo {stats['imbalance']:+.2f}; {stats['update_rate']:.0f} atualizações/s"
+    flags = [w for w, on in (("livro afinando", stats["thinning"]), ("spread abrindo", stats["widening"])) if on]
+    if flags:
+        txt += " — " + ", ".join(flags)
+    return txt + "."
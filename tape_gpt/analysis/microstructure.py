@@ -0,0 +1,205 @@
+# file: tape_gpt/analysis/microstructure.py
+"""
+Tempo entre negócios (o "ritmo do tape"), negócio a negócio:
+  - intensidade (negócios/s) por kernel exponencial, rápida (tau_fast_s) e base (tau_slow_s);
+  - distribuição dos intervalos entre negócios (histograma log, faixas fixas);
+  - sequências de agressão (prints seguidos do mesmo lado): atual, média, p90, máximas;
+  - z da velocidade: log da intensidade rápida contra sua média/variância EW (aceleração > 0).
+TapeSpeed é a versão streaming (estado O(1) por negócio, atualizada por lote do feed) e
+tape_speed()/microstructure_stats() a versão vetorizada para sessões históricas; as duas usam o
+mesmo kernel (analysis.kernels.tape_speed) e dão o mesmo resultado.
+"""
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis import kernels
+from tape_gpt.analysis.orderflow import side_sign, _ts_ns
+
+# faixas do histograma de intervalos (ms); a última é aberta
+IA_EDGES_MS = np.array([0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, np.inf])
+MAX_RUN = 64              # sequências maiores caem na última faixa do histograma
+SPEED_Z_THR = 2.0         # |z| a partir do qual o tape está acelerando/desacelerando
+RUN_LEN_THR = 5           # sequência de agressão "longa" para o main_signal
+
+def _hist_quantile(counts: np.ndarray, edges: np.ndarray, q: float, vmin: float = None, vmax: float = None,
+                   log: bool = False) -> float:
+    """
+    Quantil aproximado de um histograma. A faixa do quantil é recortada aos valores observados
+    (vmin/vmax, quando conhecidos) e a interpolação dentro dela é linear ou, com log=True (faixas em
+    escala log, como IA_EDGES_MS), geométrica — linear numa faixa [1000, 2000) poria tudo perto de 1500.
+    """
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    cum = np.cumsum(counts)
+    i = int(np.searchsorted(cum, q * total))
+    lo, hi = float(edges[i]), float(edges[i + 1])
+    if vmin is not None:
+        lo = min(max(lo, vmin), hi)
+    if vmax is not None:
+        hi = max(min(hi, vmax), lo)
+    if not np.isfinite(hi) or hi == lo:
+        return lo
+    before = cum[i - 1] if i else 0
+    frac = (q * total - before) / max(counts[i], 1)
+    if log and lo > 0:
+        return float(np.exp(np.log(lo) + frac * (np.log(hi) - np.log(lo))))
+    return float(lo + (hi - lo) * frac)
+
+class TapeSpeed:
+    """
+    Estatísticas de ritmo do tape mantidas incrementalmente: update(negócios_novos) custa O(lote),
+    o estado é fixo (alguns escalares e dois histogramas) e stats() é O(1).
+    """
+    def __init__(self, tau_fast_s: float = 5.0, tau_slow_s: float = 300.0, span: int = 500, warmup: int = 50):
+        self.tau_fast_s = float(tau_fast_s)
+        self.tau_slow_s = float(tau_slow_s)
+        self.span = int(span)
+        self.alpha = 2.0 / (self.span + 1)
+        self.warmup = int(warmup)
+        self._clock = np.zeros(1, np.int64)
+        self._state = np.zeros(kernels.SPEED_STATE, np.float64)
+        self._z = 0.0
+        self._lam = (0.0, 0.0)     # intensidades (corrigidas no início) no último negócio
+        self.ia_counts = np.zeros(len(IA_EDGES_MS) - 1, np.int64)
+        self.ia_sum_ms = 0.0
+        self.ia_min_ms = np.inf    # menor/maior intervalo visto (recortam a faixa dos quantis)
+        self.ia_max_ms = 0.0
+        self.run_counts = np.zeros((2, MAX_RUN + 1), np.int64)   # [compra, venda] x tamanho
+
+    @property
+    def trades(self) -> int:
+        return int(self._state[4])
+
+    def _run(self, ts: np.ndarray, sign: np.ndarray):
+        """Kernel sobre um lote (ts ordenado) + histogramas; devolve as séries por negócio."""
+        first = self.trades == 0
+        prev_ts, prev_run = int(self._clock[0]), int(self._state[6])
+        out = kernels.tape_speed(ts, sign, self.tau_fast_s, self.tau_slow_s, self.alpha, self.warmup,
+                                 self._clock, self._state)
+        if len(ts) == 0:
+            return out
+        lam_f, lam_s, z, side, run = out
+        self._z = float(z[-1])
+        self._lam = (float(lam_f[-1]), float(lam_s[-1]))
+        ia_ms = np.diff(ts if first else np.r_[prev_ts, ts]) / 1e6
+        self.ia_counts += np.histogram(ia_ms, IA_EDGES_MS)[0]
+        self.ia_sum_ms += float(ia_ms.sum())
+        if len(ia_ms):
+            self.ia_min_ms = min(self.ia_min_ms, float(ia_ms.min()))
+            self.ia_max_ms = max(self.ia_max_ms, float(ia_ms.max()))
+        # sequência encerrada = a anterior de cada negócio que abre uma nova
+        run_prev = np.r_[prev_run, run[:-1]]
+        ended = (run == 1) & (sign != 0) & (run_prev > 0)
+        ended_len = np.minimum(run_prev[ended], MAX_RUN)
+        ended_side = -side[ended]
+        self.run_counts[0] += np.bincount(ended_len[ended_side > 0], minlength=MAX_RUN + 1)
+        self.run_counts[1] += np.bincount(ended_len[ended_side < 0], minlength=MAX_RUN + 1)
+        return out
+
+    def update(self, df_new: pd.DataFrame) -> int:
+        """Consome os negócios novos (timestamp/side, em ordem). Devolve quantos entraram."""
+        if df_new is None or len(df_new) == 0:
+            return 0
+        ts = _ts_ns(df_new["timestamp"])
+        sign = side_sign(df_new["side"]) if "side" in df_new.columns else np.zeros(len(ts), np.int8)
+        if self.trades and ts[0] < self._clock[0]:
+            keep = ts >= self._clock[0]       # lote sobreposto ao já consumido: ignora o atraso
+            ts, sign = ts[keep], sign[keep]
+        self._run(ts, sign)
+        return len(ts)
+
+    def stats(self) -> dict:
+        """Resumo atual (campos de insight, como no analyze_tape)."""
+        n = self.trades
+        lam_f, lam_s = self._lam
+        side, run = int(self._state[5]), int(self._state[6])
+        runs = self.run_counts.sum(axis=0)
+        lengths = np.arange(MAX_RUN + 1)
+        n_runs = int(runs.sum())
+        z = self._z if n >= self.warmup else 0.0
+        out = {
+            "trades": n,
+            "intensity": lam_f,
+            "intensity_base": lam_s,
+            "speed_ratio": lam_f / lam_s if lam_s > 0 else 1.0,
+            "speed_z": z,
+            "accelerating": z >= SPEED_Z_THR,
+            "decelerating": z <= -SPEED_Z_THR,
+            "interarrival_ms": {
+                "mean": self.ia_sum_ms / max(n - 1, 1),
+                "p50": self._ia_quantile(0.5),
+                "p90": self._ia_quantile(0.9),
+            },
+            "interarrival_hist": self.ia_counts.tolist(),
+            "run_side": "buy" if side > 0 else ("sell" if side < 0 else ""),
+            "run_len": run,
+            "run_mean": float((runs * lengths).sum() / n_runs) if n_runs else 0.0,
+            "run_p90": _hist_quantile(runs.astype(float), np.r_[lengths, MAX_RUN + 1].astype(float), 0.9),
+            "max_run_buy": int(np.flatnonzero(self.run_counts[0]).max(initial=0)),
+            "max_run_sell": int(np.flatnonzero(self.run_counts[1]).max(initial=0)),
+        }
+        out["max_run_buy"] = max(out["max_run_buy"], run if side > 0 else 0)
+        out["max_run_sell"] = max(out["max_run_sell"], run if side < 0 else 0)
+        out["comment"] = speed_comment(out)
+        return out
+
+    def _ia_quantile(self, q: float) -> float:
+        seen = self.ia_max_ms >= self.ia_min_ms
+        return _hist_quantile(self.ia_counts, IA_EDGES_MS, q, vmin=self.ia_min_ms if seen else None,
+                              vmax=self.ia_max_ms if seen else None, log=True)
+
+    # --- checkpoint (arrays + meta JSON, como AgentIndex/StreamingPreprocessor) ---
+    def state(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        arrays = {"clock": self._clock.copy(), "state": self._state.copy(),
+                  "ia_counts": self.ia_counts.copy(), "run_counts": self.run_counts.copy()}
+        meta = {"tau_fast_s": self.tau_fast_s, "tau_slow_s": self.tau_slow_s, "span": self.span,
+                "warmup": self.warmup, "z": self._z, "lam": list(self._lam), "ia_sum_ms": self.ia_sum_ms,
+                "ia_range_ms": [self.ia_min_ms, self.ia_max_ms] if self.ia_max_ms >= self.ia_min_ms else None}
+        return arrays, meta
+
+    @classmethod
+    def from_state(cls, arrays: Dict[str, np.ndarray], meta: dict) -> "TapeSpeed":
+        ts = cls(meta["tau_fast_s"], meta["tau_slow_s"], meta["span"], meta["warmup"])
+        ts._clock[:] = arrays["clock"]
+        ts._state[:] = arrays["state"]
+        ts.ia_counts[:] = arrays["ia_counts"]
+        ts.run_counts[:] = arrays["run_counts"]
+        ts._z, ts.ia_sum_ms = float(meta["z"]), float(meta["ia_sum_ms"])
+        ts._lam = tuple(float(x) for x in meta["lam"])
+        if meta.get("ia_range_ms"):   # checkpoints antigos não têm a faixa: quantis só pelo histograma
+            ts.ia_min_ms, ts.ia_max_ms = (float(x) for x in meta["ia_range_ms"])
+        return ts
+
+def speed_comment(stats: dict) -> str:
+    """Frase curta sobre o ritmo do tape (painel e prompt)."""
+    if stats.get("trades", 0) < 2:
+        return ""
+    ia = stats["interarrival_ms"]
+    txt = (f"Ritmo: {stats['intensity']:.1f} negócios/s ({stats['speed_ratio']:.1f}x a base; "
+           f"z={stats['speed_z']:+.1f}); intervalo mediano {ia['p50']:.0f} ms")
+    if stats["accelerating"]:
+        txt += " — tape ACELERANDO"
+    elif stats["decelerating"]:
+        txt += " — tape desacelerando"
+    if stats["run_side"]:
+        lado = "compradora" if stats["run_side"] == "buy" else "vendedora"
+        txt += f". Sequência {lado} atual: {stats['run_len']} prints (p90 {stats['run_p90']:.0f})"
+    return txt + "."
+
+def tape_speed(df: pd.DataFrame, tau_fast_s: float = 5.0, tau_slow_s: float = 300.0, span: int = 500,
+               warmup: int = 50) -> pd.DataFrame:
+    """Versão em lote: séries por negócio (intensity, intensity_base, speed_z, run_side, run_len)."""
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=["intensity", "intensity_base", "speed_z", "run_side", "run_len"])
+    ts = TapeSpeed(tau_fast_s, tau_slow_s, span, warmup)
+    lam_f, lam_s, z, side, run = ts._run(_ts_ns(df["timestamp"]), side_sign(df["side"]))
+    return pd.DataFrame({"intensity": lam_f, "intensity_base": lam_s, "speed_z": z, "run_side": side,
+                         "run_len": run}, index=pd.DatetimeIndex(df["timestamp"]))
+
+def microstructure_stats(df: pd.DataFrame, **params) -> dict:
+    """Versão em lote do TapeSpeed.stats() para uma sessão/janela inteira (df ordenado)."""
+    ts = TapeSpeed(**params)
+    if df is not None and len(df) > 0:
+        ts._run(_ts_ns(df["timestamp"]), side_sign(df["side"]))
+    return ts.stats()
@@ -2,51 +2,64 @@
 import pandas as pd
 import numpy as np
 from typing import Tuple
+from tape_gpt.data.schema import SIDE_DTYPE, price_to_ticks, ticks_to_price
+from tape_gpt.analysis import kernels
 
 def extract_aggressor_trades(df_raw: pd.DataFrame) -> pd.DataFrame:
     """
     Extrai (timestamp, side, volume, aggressor_agent) por negócio.
     side deve indicar o agressor (já vem do XLSX Profit: agressor -> buy/sell).
     buyer_agent/seller_agent também vêm do loader. 
+    Monta apenas as 4 colunas de saída (sem copiar o frame de entrada inteiro).
     """
-    df = df_raw.copy()
     # Normalizações defensivas
     for c in ("timestamp","side","volume"):
-        if c not in df.columns:
+        if c not in df_raw.columns:
             raise ValueError(f"Coluna '{c}' ausente para extrair agressores.")
     # Se 'volume' for DataFrame (nomes duplicados), reduza para a primeira coluna numérica
-    if isinstance(df["volume"], pd.DataFrame):
-        df["volume"] = pd.to_numeric(df["volume"].iloc[:, 0], errors="coerce")
-    else:
-        df["volume"] = pd.to_numeric(df["volume"], errors="coerce")
+    volume = df_raw["volume"]
+    if isinstance(volume, pd.DataFrame):
+        volume = volume.iloc[:, 0]
+    if not pd.api.types.is_numeric_dtype(volume):
+        volume = pd.to_numeric(volume, errors="coerce")
+
+    side = df_raw["side"]
+    if side.dtype != SIDE_DTYPE:
+        side = side.astype(str).str.lower()
 
-    df["side"] = df["side"].astype(str).str.lower()
-    if "buyer_agent" not in df.columns and "seller_agent" not in df.columns:
+    if "buyer_agent" not in df_raw.columns and "seller_agent" not in df_raw.columns:
         # não há agentes: não há como ranquear "quem"
-        df["aggressor_agent"] = np.nan
-        return df[["timestamp","side","volume","aggressor_agent"]]
-
-    buyer = df["buyer_agent"] if "buyer_agent" in df.columns else None
-    seller = df["seller_agent"] if "seller_agent" in df.columns else None
-    df["aggressor_agent"] = np.where(
-        df["side"].eq("buy"),
-        buyer if buyer is not None else np.nan,
-        np.where(df["side"].eq("sell"), seller if seller is not None else np.nan, np.nan)
-    )
-    return df[["timestamp","side","volume","aggressor_agent"]]
+        aggressor = np.nan
+    else:
+        buyer = df_raw["buyer_agent"] if "buyer_agent" in df_raw.columns else None
+        seller = df_raw["seller_agent"] if "seller_agent" in df_raw.columns else None
+        aggressor = np.where(
+            side.eq("buy"),
+            buyer.astype(object) if buyer is not None else np.nan,
+            np.where(side.eq("sell"), seller.astype(object) if seller is not None else np.nan, np.nan)
+        )
+    return pd.DataFrame({
+        "timestamp": df_raw["timestamp"],
+        "side": side,
+        "volume": volume,
+        "aggressor_agent": aggressor,
+    }, index=df_raw.index)
 
 def top_aggressors(df_raw: pd.DataFrame, lookback: str = "30min", top_n: int = 5) -> Tuple[pd.DataFrame, pd.DataFrame]:
     dfa = extract_aggressor_trades(df_raw).dropna(subset=["aggressor_agent"])
-    # Normaliza timestamps para evitar naive/aware mix
-    dfa["timestamp"] = pd.to_datetime(dfa["timestamp"], errors="coerce", utc=True)
-    dfa = dfa.dropna(subset=["timestamp"]).sort_values("timestamp")
+    # Normaliza timestamps para evitar naive/aware mix (já vem em UTC do preprocess_ts)
+    if not isinstance(dfa["timestamp"].dtype, pd.DatetimeTZDtype):
+        dfa["timestamp"] = pd.to_datetime(dfa["timestamp"], errors="coerce", utc=True)
+        dfa = dfa.dropna(subset=["timestamp"])
+    if not dfa["timestamp"].is_monotonic_increasing:
+        dfa = dfa.sort_values("timestamp")
 
     if lookback:
         end = dfa["timestamp"].max()
         start = end - pd.to_timedelta(lookback)
         dfa = dfa[dfa["timestamp"].between(start, end)]
 
-    grp = dfa.groupby(["side","aggressor_agent"]).agg(
+    grp = dfa.groupby(["side","aggressor_agent"], observed=True).agg(
         volume=("volume","sum"),
         trades=("volume","size")
     ).reset_index().sort_values(["side","volume"], ascending=[True, False])
@@ -54,4 +67,83 @@ def top_aggressors(df_raw: pd.DataFrame, lookback: str = "30min", top_n: int = 5
     top_buy  = grp[grp["side"]=="buy"].nlargest(top_n, "volume")[["aggressor_agent","volume","trades"]]
     top_sell = grp[grp["side"]=="sell"].nlargest(top_n, "volume")[["aggressor_agent","volume","trades"]]
     return (top_buy.rename(columns={"aggressor_agent":"agent"}),
-            top_sell.rename(columns={"aggressor_agent":"agent"}))
\ No newline at end of file
+            top_sell.rename(columns={"aggressor_agent":"agent"}))
+
+_SIDE_LUT = np.array([1, -1, 0, 0], dtype=np.int8)
+
+def side_sign(side: pd.Series) -> np.ndarray:
+    """+1 para agressor comprador, -1 vendedor, 0 desconhecido (int8)."""
+    if side.dtype == SIDE_DTYPE:
+        # categórico canônico: tabela pelos códigos (buy, sell, unknown, nulo=-1)
+        return _SIDE_LUT[side.cat.codes.to_numpy()]
+    side = side.astype(str).str.lower()
+    return np.where(side.eq("buy"), 1, np.where(side.eq("sell"), -1, 0)).astype(np.int8)
+
+def _ts_ns(ts: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(ts.dtype):
+        # já é datetime (com ou sem fuso): .values está em UTC, só ajusta a unidade
+        return ts.values.astype("datetime64[ns]", copy=False).view("int64")
+    return pd.to_datetime(ts, utc=True).astype("datetime64[ns, UTC]").astype("int64").to_numpy()
+
+def cumulative_volume_delta(df: pd.DataFrame) -> pd.Series:
+    """CVD por negócio (volume agressor comprador - vendedor, acumulado), indexado por timestamp."""
+    out = kernels.cvd(df["volume"].to_numpy(dtype="float64"), side_sign(df["side"]))
+    return pd.Series(out, index=pd.DatetimeIndex(df["timestamp"]), name="cvd")
+
+def rolling_aggressor_volume(df: pd.DataFrame, window: str = "2min") -> pd.DataFrame:
+    """Volume comprador/vendedor agressor na janela móvel de tempo que termina em cada negócio (df ordenado)."""
+    vbuy, vsell = kernels.rolling_side_volume(
+        _ts_ns(df["timestamp"]), df["volume"].to_numpy(dtype="float64"),
+        side_sign(df["side"]), pd.to_timedelta(window).value,
+    )
+    return pd.DataFrame({"vbuy": vbuy, "vsell": vsell}, index=pd.DatetimeIndex(df["timestamp"]))
+
+class Footprint:
+    """
+    Footprint incremental (volume agressor comprador/vendedor e total por nível de preço).
+    update() recebe só os negócios novos; os acumuladores crescem conforme aparecem preços fora da faixa.
+    """
+    def __init__(self):
+        self._base = None                      # tick do índice 0 dos acumuladores
+        self._buy = np.zeros(0, np.float64)
+        self._sell = np.zeros(0, np.float64)
+        self._total = np.zeros(0, np.float64)
+
+    def update(self, df_new: pd.DataFrame) -> None:
+        if df_new is None or len(df_new) == 0:
+            return
+        self.add(df_new["price"].to_numpy(dtype="float64"), df_new["volume"].to_numpy(dtype="float64"),
+                 side_sign(df_new["side"]))
+
+    def add(self, price: np.ndarray, volume: np.ndarray, sign: np.ndarray) -> None:
+        """Mesmo que update() sobre arrays (preço, volume, sinal do agressor)."""
+        if len(price) == 0:
+            return
+        ticks = price_to_ticks(price).astype(np.int64)
+        lo, hi = int(ticks.min()), int(ticks.max())
+        if self._base is None:
+            self._base = lo
+        if lo < self._base or hi - self._base >= len(self._total):
+            new_base = min(lo, self._base)
+            size = max(hi, self._base + len(self._total) - 1) - new_base + 1
+            shift = self._base - new_base
+            grown = []
+            for acc in (self._buy, self._sell, self._total):
+                out = np.zeros(size, np.float64)
+                out[shift:shift + len(acc)] = acc
+                grown.append(out)
+            self._base, (self._buy, self._sell, self._total) = new_base, grown
+        kernels.footprint_add(ticks - self._base, volume, sign, self._buy, self._sell, self._total)
+
+    def frame(self) -> pd.DataFrame:
+        """Níveis com volume (price, vbuy, vsell, volume, delta), do maior para o menor preço."""
+        nz = np.flatnonzero(self._total > 0)[::-1]
+        if self._base is None or len(nz) == 0:
+            return pd.DataFrame(columns=["price", "vbuy", "vsell", "volume", "delta"])
+        return pd.DataFrame({
+            "price": ticks_to_price(nz + self._base),
+            "vbuy": self._buy[nz],
+            "vsell": self._sell[nz],
+            "volume": self._total[nz],
+            "delta": self._buy[nz] - self._sell[nz],
+        })
@@ -1,6 +1,9 @@
 # file: tape_gpt/analysis/rule_based.py
+from typing import Optional
 import numpy as np
 import pandas as pd
+from tape_gpt.analysis import kernels
+from tape_gpt.analysis.microstructure import microstructure_stats, RUN_LEN_THR, SPEED_Z_THR
 
 def _pct(a, b):
     try:
@@ -10,7 +13,93 @@ def _pct(a, b):
     except Exception:
         return 0.0
 
-def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> dict:
+# Sinais principais possíveis (label/cor/ícone/ajuda), indexados por chave estável
+MAIN_SIGNALS = {
+    "aggr_sell": {
+        "label": "Domínio Vendedor (Agressores)",
+        "color": "red",
+        "icon": "⬇️",
+        "help": "Agressões vendedoras dominando o fluxo. Evite compras; venda apenas em repiques com stop."
+    },
+    "accel_sell": {
+        "label": "Venda Acelerando (Tape Rápido)",
+        "color": "red",
+        "icon": "⏬",
+        "help": "O tape acelerou com sequência de agressões vendedoras. Não compre contra o fluxo; espere o ritmo normalizar."
+    },
+    "accel_buy": {
+        "label": "Compra Acelerando (Tape Rápido)",
+        "color": "green",
+        "icon": "⏫",
+        "help": "O tape acelerou com sequência de agressões compradoras. Não venda contra o fluxo; evite perseguir o preço."
+    },
+    "aggr_buy": {
+        "label": "Domínio Comprador (Agressores)",
+        "color": "green",
+        "icon": "⬆️",
+        "help": "Agressões compradoras dominando o fluxo. Evite vender; compre somente em correções com stop."
+    },
+    "up": {
+        "label": "Possível Alta",
+        "color": "green",
+        "icon": "⬆️",
+        "help": "O tape reading indica tendência de alta. Evite comprar no topo, prefira esperar correções."
+    },
+    "down": {
+        "label": "Possível Queda",
+        "color": "red",
+        "icon": "⬇️",
+        "help": "O tape reading indica tendência de baixa. Evite operar comprado, prefira esperar repiques."
+    },
+    "reversal": {
+        "label": "Atenção: Possível Reversão",
+        "color": "orange",
+        "icon": "⚠️",
+        "help": "Há sinais de reversão. Evite operar até o mercado mostrar direção clara."
+    },
+    "lateral": {
+        "label": "Estagnação / Lateralização",
+        "color": "gray",
+        "icon": "⏸️",
+        "help": "Mercado sem direção clara. O melhor é não operar ou usar posições pequenas."
+    },
+    "undefined": {
+        "label": "Cenário Indefinido",
+        "color": "gray",
+        "icon": "❔",
+        "help": "Não há sinais claros no tape reading. Prefira não operar."
+    },
+}
+AGGRESSOR_STRENGTH_THR = 0.35
+
+def main_signal_key(trend: str, imb_last: float, aggressor_strength: float, reversal_detected: bool,
+                    speed_z: float = 0.0, run_side: int = 0, run_len: int = 0) -> str:
+    # Regra: tape acelerando (z da velocidade alto) com sequência longa de agressões de um lado vem
+    # primeiro — ritmo é o principal aviso de aceleração na leitura de fita.
+    # Depois, se |aggressor_strength| for grande (ex.: > 0.35), prioriza a leitura de fluxo.
+    # Caso contrário, mantém lógica anterior baseada em tendência + imbalance. 
+    if speed_z >= SPEED_Z_THR and run_len >= RUN_LEN_THR and run_side != 0 and not reversal_detected:
+        return "accel_buy" if run_side > 0 else "accel_sell"
+    if abs(aggressor_strength) >= AGGRESSOR_STRENGTH_THR and not reversal_detected:
+        return "aggr_sell" if aggressor_strength > 0 else "aggr_buy"
+    if trend == "alta" and imb_last > 0.1 and not reversal_detected:
+        return "up"
+    if trend == "baixa" and imb_last < -0.1 and not reversal_detected:
+        return "down"
+    if reversal_detected:
+        return "reversal"
+    if trend == "lateral":
+        return "lateral"
+    return "undefined"
+
+def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min", micro: Optional[dict] = None,
+                 book: Optional[dict] = None) -> dict:
+    """
+    micro: estatísticas de ritmo já mantidas em streaming (TapeSpeed.stats()); sem elas, são
+    calculadas em lote sobre df (microstructure_stats).
+    book: liquidez do livro (liquidity.book_liquidity: spread, profundidade, atualizações); quando
+    vem, o comentário de liquidez sai do livro em vez do volume médio por negócio.
+    """
     out = {
         # (campos existentes) 
         "summary": "Dados insuficientes.",
@@ -33,6 +122,9 @@ def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> di
         "main_signal": {"label": "Indefinido", "color": "gray", "icon": "❔", "help": ""},
         "aggressor_diff_last": 0.0,   # vsell - vbuy (última janela)
         "aggressor_strength": 0.0,    # (vsell - vbuy) / total_volume
+        "microstructure": {},         # ritmo do tape (intensidade, intervalos, sequências, z)
+        "speed_z": 0.0,
+        "book": book or {},           # liquidez do livro (spread, profundidade, imbalance, atualizações)
     }
     if df is None or len(df) < 10:
         out["summary"] = "Poucos dados para análise. Evite operar até ter mais informações."
@@ -44,8 +136,9 @@ def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> di
         }
         return out
 
-    df = df.copy()
-    df = df.sort_values("timestamp")
+    # preprocess_ts já entrega ordenado; só reordena (copiando) se vier fora de ordem
+    if not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp")
     tail_trades = df.tail(min(500, len(df)))
 
     # Tendência simples por variação de preço nos últimos N negócios
@@ -108,22 +201,21 @@ def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> di
             "side": str(r.get("side", "unknown"))
         })
 
-    # Cluster de prints grandes (>=3 em 2min)
+    # Cluster de prints grandes (>=3 em 2min) — varredura no kernel (numba quando disponível)
     big_prints_cluster = []
     if len(big) >= 3:
-        big_sorted = big.sort_values("timestamp")
+        big_sorted = big if big["timestamp"].is_monotonic_increasing else big.sort_values("timestamp")
         times = pd.to_datetime(big_sorted["timestamp"])
-        for i in range(len(times) - 2):
-            if (times.iloc[i+2] - times.iloc[i]).total_seconds() <= 120:
-                cluster = big_sorted.iloc[i:i+3]
-                big_prints_cluster.append({
-                    "start": str(times.iloc[i]),
-                    "end": str(times.iloc[i+2]),
-                    "side": cluster["side"].mode()[0] if "side" in cluster else "unknown",
-                    "vol_sum": float(cluster["volume"].sum()),
-                    "prices": [float(x) for x in cluster["price"]]
-                })
-                break  # só reporta o primeiro cluster recente
+        i = kernels.first_cluster(pd.to_datetime(times, utc=True).astype("datetime64[ns, UTC]").astype("int64").to_numpy(), 120 * 10**9, 3)
+        if i >= 0:
+            cluster = big_sorted.iloc[i:i+3]
+            big_prints_cluster.append({
+                "start": str(times.iloc[i]),
+                "end": str(times.iloc[i+2]),
+                "side": cluster["side"].mode()[0] if "side" in cluster else "unknown",
+                "vol_sum": float(cluster["volume"].sum()),
+                "prices": [float(x) for x in cluster["price"]]
+            })  # só reporta o primeiro cluster recente
 
     # Níveis de S/R por OHLC na agregação escolhida
     try:
@@ -160,77 +252,33 @@ def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> di
     else:
         volume_concentration = "Sem dados de volume."
 
-    # Comentário sobre liquidez (volume médio por trade)
+    # Comentário sobre liquidez: do livro quando há série de ofertas; senão, volume médio por trade
     avg_vol = float(tail_trades["volume"].mean())
-    if avg_vol > 1000:
+    if book and book.get("comment"):
+        liquidity_comment = book["comment"]
+    elif avg_vol > 1000:
         liquidity_comment = f"Liquidez alta (volume médio por trade: {avg_vol:.0f})"
     elif avg_vol < 100:
         liquidity_comment = f"Liquidez baixa (volume médio por trade: {avg_vol:.0f})"
     else:
         liquidity_comment = f"Liquidez moderada (volume médio por trade: {avg_vol:.0f})"
 
-    # Sinal principal — incorporar pressão dos agressores
-    # Regra: se |aggressor_strength| for grande (ex.: > 0.35), prioriza a leitura de fluxo.
-    # Caso contrário, mantém lógica anterior baseada em tendência + imbalance. 
-    thr = 0.35
-    if abs(aggressor_strength) >= thr and not reversal_detected:
-        if aggressor_strength > 0:
-            main_signal = {
-                "label": "Domínio Vendedor (Agressores)",
-                "color": "red",
-                "icon": "⬇️",
-                "help": "Agressões vendedoras dominando o fluxo. Evite compras; venda apenas em repiques com stop."
-            }
-        else:
-            main_signal = {
-                "label": "Domínio Comprador (Agressores)",
-                "color": "green",
-                "icon": "⬆️",
-                "help": "Agressões compradoras dominando o fluxo. Evite vender; compre somente em correções com stop."
-            }
-    else:
-        if trend == "alta" and imb_last > 0.1 and not reversal_detected:
-            main_signal = {
-                "label": "Possível Alta",
-                "color": "green",
-                "icon": "⬆️",
-                "help": "O tape reading indica tendência de alta. Evite comprar no topo, prefira esperar correções."
-            }
-        elif trend == "baixa" and imb_last < -0.1 and not reversal_detected:
-            main_signal = {
-                "label": "Possível Queda",
-                "color": "red",
-                "icon": "⬇️",
-                "help": "O tape reading indica tendência de baixa. Evite operar comprado, prefira esperar repiques."
-            }
-        elif reversal_detected:
-            main_signal = {
-                "label": "Atenção: Possível Reversão",
-                "color": "orange",
-                "icon": "⚠️",
-                "help": "Há sinais de reversão. Evite operar até o mercado mostrar direção clara."
-            }
-        elif trend == "lateral":
-            main_signal = {
-                "label": "Estagnação / Lateralização",
-                "color": "gray",
-                "icon": "⏸️",
-                "help": "Mercado sem direção clara. O melhor é não operar ou usar posições pequenas."
-            }
-        else:
-            main_signal = {
-                "label": "Cenário Indefinido",
-                "color": "gray",
-                "icon": "❔",
-                "help": "Não há sinais claros no tape reading. Prefira não operar."
-            }
+    # Ritmo do tape (O(1) por negócio no streaming; em lote quando não veio pronto)
+    if micro is None:
+        micro = microstructure_stats(df)
+    run_side = 1 if micro.get("run_side") == "buy" else (-1 if micro.get("run_side") == "sell" else 0)
+
+    # Sinal principal — incorporar ritmo do tape e pressão dos agressores
+    main_signal = dict(MAIN_SIGNALS[main_signal_key(trend, imb_last, aggressor_strength, reversal_detected,
+                                                    micro.get("speed_z", 0.0), run_side, micro.get("run_len", 0))])
 
     out.update({
         "summary": (
             f"Tendência: {trend.upper()} "
             f"— Δ {change_pct:.2f}%. Imbalance={imb_last:.2f}. "
             f"Pressão dos agressores (vsell - vbuy)={aggr_diff_last:.0f} "
-            f"({aggressor_strength:+.2f} do volume da janela)."
+            f"({aggressor_strength:+.2f} do volume da janela). "
+            f"Ritmo={micro.get('intensity', 0.0):.1f} negócios/s (z={micro.get('speed_z', 0.0):+.1f})."
         ),
         "trend": trend,
         "price_change_pct": change_pct,
@@ -250,6 +298,8 @@ def analyze_tape(df: pd.DataFrame, imbs: pd.DataFrame, freq: str = "1min") -> di
         "main_signal": main_signal,
         "aggressor_diff_last": aggr_diff_last,
         "aggressor_strength": aggressor_strength,
+        "microstructure": micro,
+        "speed_z": float(micro.get("speed_z", 0.0)),
     })
     return out
 
@@ -278,6 +328,9 @@ def render_response(insights: dict, user_text: str = "") -> str:
     if insights.get("reversal_detected"):
         sinais.append("- Atenção: possível reversão de tendência nos últimos negócios.")
 
+    if (insights.get("microstructure") or {}).get("comment"):
+        sinais.append(f"- {insights['microstructure']['comment']}")
+
     if insights.get("volume_concentration"):
         sinais.append(f"- {insights['volume_concentration']}")
 
@@ -315,6 +368,16 @@ def render_response(insights: dict, user_text: str = "") -> str:
             "Há sinais de reversão. Não opere contra a tendência sem confirmação clara. "
             "Espere o mercado mostrar direção definida antes de entrar. Prefira não operar em momentos de dúvida."
         )
+    elif (insights.get("microstructure") or {}).get("accelerating"):
+        ideas.append(
+            "O ritmo dos negócios acelerou bem acima do normal. Movimentos rápidos costumam ter "
+            "repiques bruscos e slippage: não entre no meio da aceleração; espere o ritmo voltar ao normal."
+        )
+    elif (insights.get("book") or {}).get("thinning") or (insights.get("book") or {}).get("widening"):
+        ideas.append(
+            "O livro está mais fino que o normal (menos ofertas no topo ou spread mais aberto). "
+            "Ordens a mercado pagam mais caro nessas horas: prefira ordens limitadas e posições menores."
+        )
     elif insights.get("big_prints_cluster"):
         ideas.append(
             "Sequência de prints grandes pode indicar movimento forte. "
@@ -1,30 +1,57 @@
 # file: tape_gpt/chat/chat_ui.py
+import uuid
 import streamlit as st
-from datetime import datetime
 from typing import Optional, List, Dict
 
 # Reuso dos módulos existentes
 from tape_gpt.chat.prompts import assemble_messages
-from tape_gpt.chat.client import call_openai
+from tape_gpt.chat.client import call_openai, call_openai_tools
+from tape_gpt.chat.tools import TapeTools
 from tape_gpt.chat.summarizer import summarize_chat
 from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
-from tape_gpt.analysis.rule_based import analyze_tape
+from tape_gpt.analysis.rule_based import analyze_tape, render_response
+from tape_gpt.chat.resilience import CircuitOpenError
+from tape_gpt.analysis.liquidity import detect_liquidity_events, summarize_liquidity_events
+from tape_gpt.data.snapshots import SnapshotStore
 
-# Helpers de snapshot (migram de app.py para cá)
-def _freeze_chat_snapshot(df_trades, offers_df=None):
+# Helpers de snapshot: o session_state guarda só a referência (fonte, versão) ao SnapshotStore
+def _session_store() -> SnapshotStore:
+    # sem store compartilhado (ex.: uso fora do app): um privado por sessão
+    if "chat_snapshot_store" not in st.session_state:
+        st.session_state.chat_snapshot_store = SnapshotStore()
+    return st.session_state.chat_snapshot_store
+
+def _freeze_chat_snapshot(store: SnapshotStore, data_key, df_trades, offers_df=None):
+    prev = st.session_state.get("chat_snapshot")
+    if data_key is None:
+        data_key = ("sem-chave", uuid.uuid4().hex)   # conteúdo sem identidade: versão própria
+    ref = store.freeze(data_key[0], data_key[1:], df_trades, offers_df)
+    store.release(prev)   # depois do freeze: congelar de novo a mesma versão não a descarta
+    st.session_state.chat_snapshot = ref
     st.session_state.chat_frozen = True
-    st.session_state.chat_snapshot_df = df_trades.copy() if df_trades is not None else None
-    st.session_state.chat_snapshot_offers = offers_df.copy() if offers_df is not None else None
-    st.session_state.chat_frozen_at = datetime.utcnow().isoformat()
+    st.session_state.chat_frozen_at = ref.frozen_at
 
-def _reset_chat_snapshot():
+def _unfreeze_chat_snapshot(store: SnapshotStore):
+    store.release(st.session_state.get("chat_snapshot"))
+    st.session_state.chat_snapshot = None
     st.session_state.chat_frozen = False
-    st.session_state.chat_snapshot_df = None
-    st.session_state.chat_snapshot_offers = None
     st.session_state.chat_frozen_at = None
+
+def _reset_chat_snapshot(store: SnapshotStore):
+    _unfreeze_chat_snapshot(store)
     st.session_state.chat_history = []
     st.session_state.chat_summary = ""
 
+def _tools_for(df_chat, agent_index) -> TapeTools:
+    # índices das ferramentas montados uma vez por versão congelada (reaproveitados entre perguntas)
+    ref = st.session_state.get("chat_snapshot")
+    key = (ref.source, ref.version) if ref is not None else None
+    cached = st.session_state.get("chat_tools")
+    if cached is None or key is None or cached[0] != key:
+        cached = (key, TapeTools(df_chat, agent_index=agent_index))
+        st.session_state.chat_tools = cached
+    return cached[1]
+
 def _ensure_state():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []  # lista de {"user": "...", "assistant": "..."}
@@ -32,8 +59,7 @@ def _ensure_state():
         st.session_state.chat_summary = ""
     if "chat_frozen" not in st.session_state:
         st.session_state.chat_frozen = False
-        st.session_state.chat_snapshot_df = None
-        st.session_state.chat_snapshot_offers = None
+        st.session_state.chat_snapshot = None
         st.session_state.chat_frozen_at = None
 
 def render_chat_ui(
@@ -42,9 +68,26 @@ def render_chat_ui(
     offers_df,
     settings,
     openai_api_key: str,
-    max_history: int = 8
+    max_history: int = 8,
+    agent_index=None,
+    snapshot_store: Optional[SnapshotStore] = None,
+    data_key=None,
+    scheduler=None,
+    market: str = "índice",
+    cross_asset: Optional[str] = None,
+    book: Optional[dict] = None,
 ):
+    """
+    data_key identifica o conteúdo de uploaded_df/offers_df (ex.: (fonte, versão do feed)); sessões que
+    congelam a mesma chave compartilham a mesma versão no snapshot_store em vez de copiar os DataFrames.
+    scheduler (LLMScheduler, opcional): respostas com hedge e resumos no CHEAPER_MODEL; ou LocalLLM
+    (backend local, mesma interface, sem ferramentas).
+    market descreve o instrumento no prompt do sistema (ex.: "dólar (mini-dólar futuro WDO)");
+    cross_asset é o resumo de correlação/lead-lag entre os símbolos da watchlist, quando houver;
+    book, a liquidez do livro (liquidity.book_liquidity) do feed em tempo real.
+    """
     _ensure_state()
+    store = snapshot_store if snapshot_store is not None else _session_store()
 
     st.header("TapeGPT — Chatbot")
     if st.session_state.chat_frozen and st.session_state.chat_frozen_at:
@@ -52,14 +95,11 @@ def render_chat_ui(
         col_a, col_b = st.columns(2)
         with col_a:
             if st.button("Reiniciar conversa (nova foto)"):
-                _reset_chat_snapshot()
+                _reset_chat_snapshot(store)
                 st.rerun()
         with col_b:
             if st.button("Descongelar (usar dados atuais)"):
-                st.session_state.chat_frozen = False
-                st.session_state.chat_snapshot_df = None
-                st.session_state.chat_snapshot_offers = None
-                st.session_state.chat_frozen_at = None
+                _unfreeze_chat_snapshot(store)
                 st.rerun()
 
     # Render do histórico no estilo chat (auto-scrolling nativo)
@@ -67,6 +107,13 @@ def render_chat_ui(
         st.chat_message("user").write(turn["user"])
         st.chat_message("assistant").write(turn["assistant"])
 
+    tools_ok = getattr(scheduler, "supports_tools", True)   # backend local: só texto
+    use_tools = st.toggle(
+        "Consultar o tape sob demanda (ferramentas)", value=tools_ok, key="__chat_tools", disabled=not tools_ok,
+        help="O modelo consulta perfil de volume, agentes, barras e prints grandes da sessão inteira "
+             "em vez de receber as últimas 200 linhas no prompt."
+    ) and tools_ok
+
     # Entrada do usuário no rodapé
     user_input = st.chat_input("Pergunte ao TapeGPT")
     if not user_input:
@@ -74,21 +121,32 @@ def render_chat_ui(
 
     # 1) Congelar snapshot no envio (como já é feito hoje)
     if uploaded_df is not None:
-        _freeze_chat_snapshot(uploaded_df, offers_df)
+        _freeze_chat_snapshot(store, data_key, uploaded_df, offers_df)
 
     # 2) Contexto do chat baseado no snapshot (se existir)
-    df_chat = st.session_state.chat_snapshot_df if st.session_state.chat_snapshot_df is not None else uploaded_df
+    snap_trades, offers_chat = store.get(st.session_state.chat_snapshot)
+    df_chat = snap_trades if snap_trades is not None else uploaded_df
     insights_chat = None
     df_text = None
     if df_chat is not None and len(df_chat) > 0:
         df_proc = preprocess_ts(df_chat)
         imbs_chat = compute_imbalances(df_proc, window="1min")
-        insights_chat = analyze_tape(df_proc, imbs_chat, freq="1min")
-        try:
-            last = df_chat.tail(200).to_csv(index=False)
-            df_text = "Últimos trades (CSV heads):\n" + last[:10000]
-        except Exception:
-            pass
+        insights_chat = analyze_tape(df_proc, imbs_chat, freq="1min", book=book)
+        if offers_chat is not None and "timestamp" in offers_chat.columns:
+            insights_chat["liquidity_events"] = summarize_liquidity_events(detect_liquidity_events(df_proc, offers_chat))
+        if cross_asset:
+            insights_chat["cross_asset"] = cross_asset
+        if not use_tools:
+            try:
+                last = df_chat.tail(200).to_csv(index=False)
+                df_text = "Últimos trades (CSV heads):\n" + last[:10000]
+            except Exception:
+                pass
+
+    # 2a) Agentes citados na pergunta (ex.: "o que o AG012 está fazendo?") — consulta direta no índice
+    agent_notes = None
+    if agent_index is not None:
+        agent_notes = [d for d in (agent_index.describe(n) for n in agent_index.mentioned(user_input)) if d]
 
     # 3) Montagem de mensagens + chamada do modelo (reuso do pipeline atual)
     history_msgs: List[Dict] = []
@@ -102,37 +160,73 @@ def render_chat_ui(
         rule_based=insights_chat,
         history=history_msgs,
         chat_summary=st.session_state.chat_summary or None,
+        agent_notes=agent_notes,
+        tools_enabled=use_tools and df_chat is not None,
+        market=market,
     )
 
+    tool_trace = []
+    model_ok = True
     with st.spinner("Consultando modelo..."):
         try:
-            assistant_text = call_openai(
-                api_key=openai_api_key,
-                model=settings.OPENAI_MODEL,
-                messages=messages,
-            )
+            if use_tools and df_chat is not None and len(df_chat) > 0:
+                assistant_text, tool_trace = call_openai_tools(
+                    api_key=openai_api_key,
+                    model=settings.OPENAI_MODEL,
+                    messages=messages,
+                    tools=_tools_for(df_chat, agent_index),
+                    base_url=settings.OPENAI_BASE_URL,
+                    scheduler=scheduler,
+                )
+            elif scheduler is not None:
+                assistant_text = scheduler.complete(messages, kind="answer")
+            else:
+                assistant_text = call_openai(
+                    api_key=openai_api_key,
+                    model=settings.OPENAI_MODEL,
+                    messages=messages,
+                    base_url=settings.OPENAI_BASE_URL,
+                )
         except Exception as e:
-            st.error(f"Erro ao chamar a API: {e}")
-            assistant_text = "Falha ao consultar o modelo."
+            model_ok = False
+            if isinstance(e, CircuitOpenError):
+                st.warning(str(e))
+            else:
+                st.error(f"Erro ao chamar a API: {e}")
+            if insights_chat is not None:
+                # degradação: resposta rule-based sobre o mesmo snapshot
+                assistant_text = ("_Modelo indisponível — resposta automática (regras):_\n\n"
+                                  + render_response(insights_chat, user_input))
+            else:
+                assistant_text = "Falha ao consultar o modelo."
 
     # 4) Atualiza histórico e resumo
     st.session_state.chat_history.append({"user": user_input, "assistant": assistant_text})
-    try:
-        # Concatena turns no formato esperado pelo summarizer
-        hist_for_sum = []
-        for t in st.session_state.chat_history[-(max_history*2):]:
-            hist_for_sum.append({"role": "user", "content": t["user"]})
-            hist_for_sum.append({"role": "assistant", "content": t["assistant"]})
-        st.session_state.chat_summary = summarize_chat(
-            api_key=openai_api_key,
-            model=settings.OPENAI_MODEL,
-            history=hist_for_sum,
-            prior_summary=st.session_state.chat_summary or None,
-            insights=insights_chat
-        )
-    except Exception:
-        pass
+    if model_ok:   # com o modelo fora, não insiste no resumo
+        try:
+            # Concatena turns no formato esperado pelo summarizer
+            hist_for_sum = []
+            for t in st.session_state.chat_history[-(max_history*2):]:
+                hist_for_sum.append({"role": "user", "content": t["user"]})
+                hist_for_sum.append({"role": "assistant", "content": t["assistant"]})
+            st.session_state.chat_summary = summarize_chat(
+                api_key=openai_api_key,
+                model=settings.OPENAI_MODEL,
+                history=hist_for_sum,
+                prior_summary=st.session_state.chat_summary or None,
+                insights=insights_chat,
+                base_url=settings.OPENAI_BASE_URL,
+                scheduler=scheduler,
+            )
+        except Exception:
+            pass
 
     # 5) Escreve a última troca (aparece imediatamente no topo visual do chat)
     st.chat_message("user").write(user_input)
-    st.chat_message("assistant").write(assistant_text)
\ No newline at end of file
+    with st.chat_message("assistant"):
+        st.write(assistant_text)
+        if tool_trace:
+            with st.expander(f"Consultas ao tape ({len(tool_trace)})", expanded=False):
+                for call in tool_trace:
+                    st.markdown(f"`{call['name']}({call['arguments']})`")
+                    st.json(call["result"], expanded=False)
\ No newline at end of file
@@ -1,6 +1,22 @@
 # file: tape_gpt/chat/client.py
-from typing import List, Dict, Optional, Any
-from openai import OpenAI
+import json
+from typing import List, Dict, Optional, Any, Tuple
+from tape_gpt.chat.tools import TOOL_SPECS
+
+def _require_openai():
+    # importado só na primeira chamada ao modelo (~0,7 s): não pesa no carregamento do app
+    try:
+        import openai
+        return openai
+    except ImportError as e:
+        raise RuntimeError("O chat requer o pacote openai (pip install openai).") from e
+
+def _make_client(api_key: str, base_url: Optional[str] = None, timeout_s: Optional[float] = None):
+    # base_url aponta para um servidor compatível (ex.: mock local: http://127.0.0.1:8001/v1)
+    if timeout_s is None:
+        return _require_openai().OpenAI(api_key=api_key, base_url=base_url or None)
+    # com prazo explícito quem faz retry é o LLMGuard (resilience.py), não o SDK
+    return _require_openai().OpenAI(api_key=api_key, base_url=base_url or None, timeout=timeout_s, max_retries=0)
 
 def _as_dict(obj: Any) -> dict:
     if isinstance(obj, dict):
@@ -95,12 +111,19 @@ def call_openai(
     model: str,
     messages: List[Dict],
     max_output_tokens: int = 1024,
-    temperature: Optional[float] = None
+    temperature: Optional[float] = None,
+    base_url: Optional[str] = None,
+    guard=None,
+    timeout_s: Optional[float] = None,
 ) -> str:
+    """guard (resilience.LLMGuard): prazo, retry, limite de concorrência e circuit breaker em volta da chamada."""
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY não definido.")
+    if guard is not None:
+        return guard.run(lambda t: call_openai(api_key, model, messages, max_output_tokens, temperature,
+                                               base_url, timeout_s=t))
 
-    client = OpenAI(api_key=api_key)
+    client = _make_client(api_key, base_url, timeout_s)
     prompt = _render_messages_as_text(messages)
 
     # Requests para Responses API
@@ -177,4 +200,95 @@ def call_openai(
     try:
         return _responses_call()
     except Exception:
-        return _chat_completions_call()
\ No newline at end of file
+        return _chat_completions_call()
+
+async def acall_openai(
+    client,
+    model: str,
+    messages: List[Dict],
+    max_output_tokens: int = 1024,
+    temperature: Optional[float] = None,
+) -> str:
+    """
+    Versão assíncrona (AsyncOpenAI) do call_openai, com o mesmo roteamento por modelo:
+    Responses para gpt-4.1/gpt-5, Chat Completions para os legacy (3.5/4/4o), Responses nos demais.
+    Sem fallback sequencial: quem agenda (scheduler) trata falhas/lentidão com hedge.
+    """
+    if isinstance(model, str) and model.startswith(("gpt-3.5", "gpt-4", "gpt-4o")) and not model.startswith("gpt-4.1"):
+        token_key = "max_tokens"
+        req = {"model": model, "messages": messages, token_key: max_output_tokens}
+        if temperature is not None:
+            req["temperature"] = float(temperature)
+        resp = await client.chat.completions.create(**req)
+        txt = _extract_text(resp)
+        if not txt:
+            raise RuntimeError("Chat Completions retornou saída vazia (sem choices/message.content).")
+        return txt
+    req = {"model": model, "input": _render_messages_as_text(messages), "max_output_tokens": max_output_tokens}
+    if isinstance(model, str) and model.startswith("gpt-5"):
+        req["reasoning"] = {"effort": "low"}
+    if temperature is not None:
+        req["temperature"] = float(temperature)
+    resp = await client.responses.create(**req)
+    txt = _extract_text(resp)
+    if not txt:
+        raise RuntimeError("Responses API retornou saída vazia (sem output_text nem blocos textuais).")
+    return txt
+
+def call_openai_tools(
+    api_key: str,
+    model: str,
+    messages: List[Dict],
+    tools,
+    max_rounds: int = 4,
+    max_output_tokens: int = 1024,
+    temperature: Optional[float] = None,
+    base_url: Optional[str] = None,
+    scheduler=None,
+    guard=None,
+) -> Tuple[str, List[Dict]]:
+    """
+    Chat Completions com function calling: o modelo pede ferramentas (tools.TOOL_SPECS), executamos
+    em `tools` (TapeTools) e devolvemos os resultados até ele responder em texto (no máx. max_rounds).
+    Retorna (texto, chamadas feitas [{"name", "arguments", "result"}]).
+    Com `scheduler` (LLMScheduler), cada rodada passa pelo hedge dele; sem ele, `guard` (LLMGuard) protege cada rodada.
+    """
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY não definido.")
+
+    client = _make_client(api_key, base_url) if scheduler is None else None
+    msgs = list(messages)
+    trace: List[Dict] = []
+    token_key = "max_completion_tokens" if str(model).startswith("gpt-5") else "max_tokens"
+    for round_ in range(max_rounds + 1):
+        req = {"model": model, "messages": msgs, token_key: max_output_tokens}
+        if round_ < max_rounds:
+            req["tools"] = TOOL_SPECS
+            req["tool_choice"] = "auto"
+        if temperature is not None:
+            req["temperature"] = float(temperature)
+        if client is None:
+            resp = scheduler.chat_completion(req)
+        elif guard is not None:
+            resp = guard.run(lambda t: client.with_options(timeout=t, max_retries=0).chat.completions.create(**req))
+        else:
+            resp = client.chat.completions.create(**req)
+        msg = resp.choices[0].message
+        calls = getattr(msg, "tool_calls", None) or []
+        if not calls:
+            txt = (msg.content or "").strip()
+            if not txt:
+                raise RuntimeError("Chat Completions retornou saída vazia (sem choices/message.content).")
+            return txt, trace
+        msgs.append({
+            "role": "assistant",
+            "content": msg.content or "",
+            "tool_calls": [{"id": c.id, "type": "function",
+                            "function": {"name": c.function.name, "arguments": c.function.arguments}} for c in calls],
+        })
+        for c in calls:
+            result = tools.call(c.function.name, c.function.arguments)
+            trace.append({"name": c.function.name, "arguments": c.function.arguments, "result": result})
+            msgs.append({"role": "tool", "tool_call_id": c.id,
+                         "content": json.dumps(result, ensure_ascii=False, default=str)[:8000]})
+    raise RuntimeError("O modelo não respondeu após o limite de chamadas de ferramentas.")
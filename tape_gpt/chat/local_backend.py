@@ -0,0 +1,370 @@
+# file: tape_gpt/chat/local_backend.py
+"""
+Backend local do chat (sem sair da máquina, funciona offline):
+  - "local": servidor compatível com a OpenAI (llama.cpp server, vLLM...) em LOCAL_LLM_URL;
+  - "llama_cpp": modelo pequeno em processo, na CPU (pacote opcional llama-cpp-python, LOCAL_MODEL_PATH).
+Pedidos concorrentes das sessões que chegam dentro de batch_window_s (até max_batch) viram uma única
+geração em lote: no servidor, um /v1/completions com a lista de prompts, renderizados no template de chat
+do modelo (LOCAL_CHAT_TEMPLATE: chatml, llama3, mistral). Com "server" o app usa /v1/chat/completions
+(o servidor aplica o template do próprio modelo e faz o lote) e só repassa os pedidos concorrentes.
+LocalLLM expõe a mesma interface do LLMScheduler (complete/model_for) e call_local a do call_openai.
+benchmark() compara backends com os prompts montados por assemble_messages:
+
+    python -m tape_gpt.chat.local_backend --mock          # servidor simulado com 1 slot
+    python -m tape_gpt.chat.local_backend --url http://127.0.0.1:8080/v1 --sessions 8
+"""
+import argparse, hashlib, queue, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.chat.client import _make_client
+from tape_gpt.chat.resilience import LLMTimeoutError
+
+BACKENDS = ("openai", "local", "llama_cpp")
+
+def _require_llama_cpp():
+    try:
+        import llama_cpp
+        return llama_cpp
+    except ImportError as e:
+        raise RuntimeError("O backend 'llama_cpp' requer o pacote llama-cpp-python (pip install llama-cpp-python).") from e
+
+def render_chatml(messages: List[Dict]) -> str:
+    """Mensagens no template ChatML (Qwen, Hermes, ...), terminando na vez do assistente."""
+    parts = [f"<|im_start|>{m.get('role', 'user')}\n{m.get('content') or ''}<|im_end|>\n" for m in messages]
+    return "".join(parts) + "<|im_start|>assistant\n"
+
+def render_llama3(messages: List[Dict]) -> str:
+    """Template do Llama 3 (header_id/eot_id), terminando no cabeçalho do assistente."""
+    parts = [f"<|start_header_id|>{m.get('role', 'user')}<|end_header_id|>\n\n{(m.get('content') or '').strip()}<|eot_id|>"
+             for m in messages]
+    return "<|begin_of_text|>" + "".join(parts) + "<|start_header_id|>assistant<|end_header_id|>\n\n"
+
+def render_mistral(messages: List[Dict]) -> str:
+    """Template [INST] do Mistral: sem papel de sistema (vai no 1º turno do usuário); respostas fecham com </s>."""
+    system = "\n\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    out = "<s>"
+    for m in messages:
+        role, content = m.get("role", "user"), m.get("content") or ""
+        if role == "system":
+            continue
+        if role == "assistant":
+            out += f" {content}</s>"
+        else:
+            if system:
+                content, system = f"{system}\n\n{content}", ""
+            out += f"[INST] {content} [/INST]"
+    return out
+
+# template -> (render, stop). "server" não renderiza: o servidor aplica o template do modelo.
+CHAT_TEMPLATES = {
+    "chatml": (render_chatml, ["<|im_end|>", "<|im_start|>"]),
+    "llama3": (render_llama3, ["<|eot_id|>", "<|start_header_id|>"]),
+    "mistral": (render_mistral, ["</s>", "[INST]"]),
+}
+TEMPLATES = tuple(CHAT_TEMPLATES) + ("server",)
+
+def _template(name: str) -> Tuple[Callable[[List[Dict]], str], List[str]]:
+    try:
+        return CHAT_TEMPLATES[name]
+    except KeyError:
+        raise ValueError(f"Template de chat desconhecido: {name!r} (use {TEMPLATES})") from None
+
+# ---------------- motores (geração de um lote de prompts) ----------------
+
+class HTTPCompletionsEngine:
+    """Servidor compatível com a OpenAI: um POST /v1/completions por lote (prompt = lista)."""
+    def __init__(self, base_url: str, model: str, api_key: str = "local", timeout_s: float = 120.0,
+                 template: str = "chatml"):
+        self.model = model
+        self.render, self._stop = _template(template)
+        self._client = _make_client(api_key or "local", base_url, timeout_s)
+
+    def generate(self, prompts: List[str], max_tokens: int, temperature: Optional[float]) -> List[str]:
+        req = {"model": self.model, "prompt": prompts, "max_tokens": max_tokens, "stop": self._stop}
+        if temperature is not None:
+            req["temperature"] = float(temperature)
+        resp = self._client.completions.create(**req)
+        out = [""] * len(prompts)
+        for ch in resp.choices:
+            out[ch.index] = (ch.text or "").strip()
+        return out
+
+class HTTPChatEngine:
+    """
+    Servidor compatível com a OpenAI via /v1/chat/completions: o servidor aplica o template do modelo.
+    O lote vira pedidos concorrentes (um por conversa) e o agrupamento fica com o servidor.
+    """
+    def __init__(self, base_url: str, model: str, api_key: str = "local", timeout_s: float = 120.0,
+                 max_workers: int = 8):
+        self.model = model
+        self._client = _make_client(api_key or "local", base_url, timeout_s)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="local-chat")
+
+    @staticmethod
+    def render(messages: List[Dict]) -> List[Dict]:
+        return messages
+
+    def _one(self, messages: List[Dict], max_tokens: int, temperature: Optional[float]) -> str:
+        req = {"model": self.model, "messages": messages, "max_tokens": max_tokens}
+        if temperature is not None:
+            req["temperature"] = float(temperature)
+        resp = self._client.chat.completions.create(**req)
+        return (resp.choices[0].message.content or "").strip() if resp.choices else ""
+
+    def generate(self, prompts: List[List[Dict]], max_tokens: int, temperature: Optional[float]) -> List[str]:
+        futs = [self._pool.submit(self._one, m, max_tokens, temperature) for m in prompts]
+        return [f.result() for f in futs]
+
+class LlamaCppEngine:
+    """Modelo GGUF em processo (CPU). O llama.cpp gera um prompt por vez: o lote só amortiza a fila."""
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: Optional[int] = None,
+                 template: str = "chatml"):
+        if not model_path:
+            raise ValueError("Informe LOCAL_MODEL_PATH (arquivo .gguf) para o backend 'llama_cpp'.")
+        self.model = model_path
+        # "server": usa o template gravado no próprio .gguf (create_chat_completion)
+        self._chat = template == "server"
+        self.render, self._stop = (HTTPChatEngine.render, None) if self._chat else _template(template)
+        self._llm = _require_llama_cpp().Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+
+    def generate(self, prompts: List, max_tokens: int, temperature: Optional[float]) -> List[str]:
+        kw = {"max_tokens": max_tokens}
+        if temperature is not None:
+            kw["temperature"] = float(temperature)
+        if self._chat:
+            return [(self._llm.create_chat_completion(messages=m, **kw)["choices"][0]["message"]["content"] or "").strip()
+                    for m in prompts]
+        return [self._llm(p, stop=self._stop, **kw)["choices"][0]["text"].strip() for p in prompts]
+
+def make_engine(backend: str, base_url: str = "", model: str = "local", model_path: str = "",
+                api_key: str = "local", template: str = "chatml"):
+    """Motor do backend local no template pedido ("server" = /v1/chat/completions, template do modelo)."""
+    if template not in TEMPLATES:
+        raise ValueError(f"Template de chat desconhecido: {template!r} (use {TEMPLATES})")
+    if backend == "llama_cpp":
+        return LlamaCppEngine(model_path, template=template)
+    if template == "server":
+        return HTTPChatEngine(base_url, model, api_key)
+    return HTTPCompletionsEngine(base_url, model, api_key, template=template)
+
+# ---------------- lotes ----------------
+
+class _Pending:
+    __slots__ = ("prompt", "max_tokens", "temperature", "future")
+
+    def __init__(self, prompt, max_tokens: int, temperature: Optional[float]):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.future: Future = Future()
+
+class LocalLLM:
+    """
+    Fila única por processo: a thread de lote junta os pedidos que chegam até batch_window_s depois
+    do primeiro (no máx. max_batch) e gera todos numa chamada ao motor; cada sessão espera o seu Future.
+    Pedidos com temperatura diferente vão em lotes separados; max_tokens do lote é o maior pedido.
+    Pedido que estourou o prazo em complete() é cancelado e sai do lote antes de ir ao motor.
+    """
+    supports_tools = False   # o caminho em lote é texto puro (sem function calling)
+
+    def __init__(self, engine, max_batch: int = 8, batch_window_s: float = 0.02, timeout_s: float = 120.0):
+        self.engine = engine
+        self.model = getattr(engine, "model", "local")
+        self.max_batch = max(1, int(max_batch))
+        self.batch_window_s = float(batch_window_s)
+        self.timeout_s = float(timeout_s)
+        self._q: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "max_batch_seen": 0, "failures": 0}
+        threading.Thread(target=self._loop, name="local-llm-batcher", daemon=True).start()
+
+    def model_for(self, kind: str) -> str:
+        return self.model
+
+    def submit(self, messages: List[Dict], max_output_tokens: int = 1024, temperature: Optional[float] = None) -> Future:
+        render = getattr(self.engine, "render", render_chatml)
+        p = _Pending(render(messages), int(max_output_tokens), temperature)
+        self._q.put(p)
+        return p.future
+
+    def complete(self, messages: List[Dict], kind: str = "answer", max_output_tokens: int = 1024,
+                 temperature: Optional[float] = None, hedge: Optional[bool] = None) -> str:
+        fut = self.submit(messages, max_output_tokens, temperature)
+        try:
+            txt = fut.result(timeout=self.timeout_s)
+        except TimeoutError as e:
+            fut.cancel()   # ainda na fila: o lote descarta; já gerando: o resultado é ignorado
+            raise LLMTimeoutError(f"Modelo local não respondeu em {self.timeout_s:.0f}s.") from e
+        if not txt:
+            raise RuntimeError("Modelo local retornou saída vazia.")
+        return txt
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._q.get()]
+        deadline = time.monotonic() + self.batch_window_s
+        while len(batch) < self.max_batch:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            # cancelados (prazo vencido em complete) não vão ao motor; os demais ficam "running"
+            batch = [p for p in self._collect() if p.future.set_running_or_notify_cancel()]
+            groups: Dict[Optional[float], List[_Pending]] = {}
+            for p in batch:
+                groups.setdefault(p.temperature, []).append(p)
+            for temperature, items in groups.items():
+                with self._lock:
+                    self.stats["requests"] += len(items)
+                    self.stats["batches"] += 1
+                    self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(items))
+                try:
+                    texts = self.engine.generate([p.prompt for p in items], max(p.max_tokens for p in items), temperature)
+                except Exception as e:
+                    with self._lock:
+                        self.stats["failures"] += 1
+                    for p in items:
+                        p.future.set_exception(e)
+                    continue
+                for p, txt in zip(items, texts):
+                    p.future.set_result(txt)
+
+_locals: Dict[Tuple, LocalLLM] = {}
+_locals_lock = threading.Lock()
+
+def get_local_llm(backend: str = "local", base_url: str = "", model: str = "local", model_path: str = "",
+                  api_key: str = "local", template: str = "chatml", **kwargs) -> LocalLLM:
+    """LocalLLM do processo para o backend: todas as sessões caem na mesma fila (e nos mesmos lotes)."""
+    if backend not in BACKENDS[1:]:
+        raise ValueError(f"Backend local desconhecido: {backend!r} (use {BACKENDS[1:]})")
+    key = (backend, base_url, model, model_path, template, hashlib.sha256((api_key or "").encode()).hexdigest()[:16])
+    with _locals_lock:
+        llm = _locals.get(key)
+        if llm is None:
+            engine = make_engine(backend, base_url, model, model_path, api_key, template)
+            llm = _locals[key] = LocalLLM(engine, **kwargs)
+        return llm
+
+def call_local(
+    api_key: str,
+    model: str,
+    messages: List[Dict],
+    max_output_tokens: int = 1024,
+    temperature: Optional[float] = None,
+    base_url: Optional[str] = None,
+    backend: str = "local",
+    model_path: str = "",
+    template: str = "chatml",
+) -> str:
+    """Mesma assinatura do call_openai, atendida pelo backend local (com lotes entre sessões)."""
+    llm = get_local_llm(backend, base_url or "", model, model_path, api_key or "local", template)
+    return llm.complete(messages, max_output_tokens=max_output_tokens, temperature=temperature)
+
+# ---------------- benchmark ----------------
+
+QUESTIONS = [
+    "Como está o fluxo agora?",
+    "Quem está comprando mais forte?",
+    "Há sinais de exaustão vendedora?",
+    "Onde estão os níveis importantes?",
+    "Vale esperar um pullback antes de comprar?",
+    "O imbalance recente confirma a tendência?",
+    "Teve print grande no topo?",
+    "Resuma o tape em uma frase.",
+]
+
+def sample_prompts(df: pd.DataFrame, n: int = 8) -> List[List[Dict]]:
+    """Prompts reais do chat (assemble_messages com o insight rule-based do tape) para n perguntas."""
+    from tape_gpt.chat.prompts import assemble_messages
+    from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
+    from tape_gpt.analysis.rule_based import analyze_tape
+    df = preprocess_ts(df)
+    insights = analyze_tape(df, compute_imbalances(df, window="1min"), freq="1min")
+    return [assemble_messages(user_text=QUESTIONS[i % len(QUESTIONS)], rule_based=insights) for i in range(n)]
+
+def benchmark(backends: Dict[str, Callable[[List[Dict]], str]], prompts: List[List[Dict]],
+              sessions: int = 8, rounds: int = 3) -> pd.DataFrame:
+    """
+    Para cada backend (nome -> fn(mensagens) -> texto), `sessions` sessões concorrentes enviam os
+    mesmos prompts por `rounds` rodadas. Retorna latência p50/p95 (ms) e vazão (pedidos/s).
+    """
+    rows = []
+    for name, fn in backends.items():
+        lat: List[float] = []
+
+        def one(msgs):
+            t0 = time.perf_counter()
+            fn(msgs)
+            return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as ex:
+            for _ in range(rounds):
+                lat += list(ex.map(one, [prompts[i % len(prompts)] for i in range(sessions)]))
+        wall = time.perf_counter() - t0
+        a = np.array(lat) * 1000
+        rows.append({"backend": name, "pedidos": len(lat), "p50_ms": np.percentile(a, 50),
+                     "p95_ms": np.percentile(a, 95), "pedidos_s": len(lat) / wall})
+    return pd.DataFrame(rows).round(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos backends do chat com prompts do assemble_messages.")
+    parser.add_argument("--url", default="", help="servidor local compatível (…/v1)")
+    parser.add_argument("--model", default="local")
+    parser.add_argument("--model-path", default="", help="modelo .gguf para o backend em processo")
+    parser.add_argument("--template", default="chatml", choices=TEMPLATES,
+                        help="template de chat do modelo local (server = /v1/chat/completions)")
+    parser.add_argument("--openai-model", default="", help="inclui a API da OpenAI (requer OPENAI_API_KEY)")
+    parser.add_argument("--mock", action="store_true", help="usa o servidor simulado (1 slot, custo por lote)")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--data", default="testes/exemplo_tape.csv")
+    args = parser.parse_args(argv)
+
+    from tape_gpt.data.loaders import load_csv_ts
+    prompts = sample_prompts(load_csv_ts(args.data), n=args.sessions)
+    srv = None
+    url = args.url
+    if args.mock:
+        from tape_gpt.chat.mock_llm import MockLLMServer
+        # um slot de geração; o lote custa o tempo fixo do forward mais um pequeno acréscimo por prompt
+        def cost(req):
+            p = req.get("prompt")
+            return 0.15 + 0.01 * (len(p) if isinstance(p, list) else 1)
+        srv = MockLLMServer(latency=cost, slots=1).start()
+        url = srv.url
+
+    backends: Dict[str, Callable[[List[Dict]], str]] = {}
+    if url:
+        single = LocalLLM(make_engine("local", url, args.model, template=args.template), max_batch=1)
+        batched = LocalLLM(make_engine("local", url, args.model, template=args.template), max_batch=args.sessions)
+        backends["local (sem lote)"] = lambda m: single.complete(m, max_output_tokens=args.max_tokens)
+        backends["local (lote)"] = lambda m: batched.complete(m, max_output_tokens=args.max_tokens)
+    if args.model_path:
+        inproc = LocalLLM(make_engine("llama_cpp", model_path=args.model_path, template=args.template),
+                          max_batch=args.sessions)
+        backends["llama_cpp"] = lambda m: inproc.complete(m, max_output_tokens=args.max_tokens)
+    if args.openai_model:
+        import os
+        from tape_gpt.chat.client import call_openai
+        key = os.getenv("OPENAI_API_KEY", "")
+        backends["openai"] = lambda m: call_openai(key, args.openai_model, m, max_output_tokens=args.max_tokens)
+    if not backends:
+        parser.error("nenhum backend: use --mock, --url, --model-path ou --openai-model")
+    try:
+        print(benchmark(backends, prompts, sessions=args.sessions, rounds=args.rounds).to_string(index=False))
+    finally:
+        if srv is not None:
+            srv.stop()
+
+if __name__ == "__main__":
+    main()
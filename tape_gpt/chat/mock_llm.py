@@ -0,0 +1,239 @@
+# file: tape_gpt/chat/mock_llm.py
+"""
+Servidor local compatível com a API da OpenAI (/v1/chat/completions, /v1/responses e /v1/completions,
+esta com lote de prompts como vLLM/llama.cpp), determinístico,
+para rodar o chat e o function calling sem rede nem custo:
+
+    python -m tape_gpt.chat.mock_llm --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock streamlit run app.py
+
+Com ferramentas na requisição, escolhe a ferramenta pelas palavras da pergunta (agente citado, perfil,
+barras, prints grandes); com resultados de ferramentas no histórico, responde resumindo-os.
+As requisições recebidas ficam em `requests` (inspeção em testes).
+Injeção de falhas (fault(req) ou --fail-rate/--hang-rate): status HTTP de erro ou conexão pendurada.
+"""
+import argparse, json, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+Fault = Union[None, int, str]   # None = responde normalmente; int = status de erro; "hang" = não responde
+
+def _last(messages: List[Dict], role: str) -> Optional[Dict]:
+    return next((m for m in reversed(messages) if m.get("role") == role), None)
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(str(c.get("text", "")) for c in content if isinstance(c, dict))
+    return str(content or "")
+
+def plan_tool_calls(question: str, tool_names: List[str]) -> List[Dict]:
+    """Heurística do mock: quais ferramentas chamar (nome, argumentos) para a pergunta."""
+    q = question.lower()
+    calls = []
+    agents = re.findall(r"\b(AG\d{2,}|[A-Z]{2,}[A-Za-z]*)\b", question)
+    if "get_agent_stats" in tool_names and agents and any(w in q for w in ("agente", "corretora", "fazendo", "comprou", "vendeu")):
+        calls.append(("get_agent_stats", {"agent": agents[0]}))
+    if "get_volume_profile" in tool_names and any(w in q for w in ("perfil", "profile", "poc", "nível", "nivel", "preço com mais volume")):
+        calls.append(("get_volume_profile", {"range": "all", "bins": 10}))
+    if "get_bars" in tool_names and any(w in q for w in ("barra", "candle", "tendência", "tendencia")):
+        calls.append(("get_bars", {"freq": "1min", "n": 10}))
+    if "get_big_prints" in tool_names and any(w in q for w in ("grande", "big", "lote", "print")):
+        calls.append(("get_big_prints", {"since": "all", "limit": 5}))
+    return [{"name": n, "arguments": a} for n, a in calls]
+
+def fault_sequence(faults: Iterable[Fault]) -> Callable[[dict], Fault]:
+    """Falhas na ordem dada (ex.: [503, 503, None]); depois delas, respostas normais."""
+    it = iter(list(faults))
+    lock = threading.Lock()
+    def _next(req: dict) -> Fault:
+        with lock:
+            return next(it, None)
+    return _next
+
+def random_faults(fail_rate: float = 0.0, hang_rate: float = 0.0, seed: Optional[int] = None) -> Callable[[dict], Fault]:
+    rng = random.Random(seed)
+    def _pick(req: dict) -> Fault:
+        u = rng.random()
+        if u < hang_rate:
+            return "hang"
+        if u < hang_rate + fail_rate:
+            return rng.choice((429, 500, 503))
+        return None
+    return _pick
+
+def _answer_from_tools(messages: List[Dict]) -> str:
+    parts = []
+    for m in messages:
+        if m.get("role") != "tool":
+            continue
+        try:
+            data = json.loads(m.get("content") or "{}")
+        except ValueError:
+            data = {}
+        if "poc" in data:
+            parts.append(f"POC em {data['poc']:.2f} ({data['trades']} negócios)")
+        elif "net_position" in data:
+            parts.append(f"{data['agent']}: {data['trades']} negócios, saldo {data['net_position']:.0f}")
+        elif "bars" in data:
+            parts.append(f"{len(data['bars'])} barras de {data['freq']}")
+        elif "prints" in data:
+            parts.append(f"{data['count']} prints grandes (>= {data['threshold']:.0f})")
+        elif "error" in data:
+            parts.append(f"erro: {data['error']}")
+    return "Consultei o tape: " + "; ".join(parts) if parts else "Resposta do mock."
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload: dict, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.owner.cancelled += 1   # cliente desistiu (ex.: hedge vencedor cancelou esta)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        owner: "MockLLMServer" = self.server.owner
+        owner.requests.append({"path": self.path, "body": req})
+        if owner._slots is None:
+            self._handle(owner, req)
+        else:
+            with owner._slots:   # servidor local com `slots` gerações simultâneas (ex.: llama.cpp --parallel 1)
+                self._handle(owner, req)
+
+    def _handle(self, owner: "MockLLMServer", req: dict):
+        delay = owner.latency(req) if owner.latency else owner.delay_s
+        if delay:
+            time.sleep(delay)
+        fault = owner.fault(req) if owner.fault else None
+        if fault == "hang":
+            time.sleep(owner.hang_s)   # segura a conexão sem responder (o cliente deve estourar o prazo)
+            return
+        if isinstance(fault, int):
+            headers = {"Retry-After": "0"} if fault == 429 else None
+            self._send({"error": {"message": f"falha injetada ({fault})", "type": "mock_fault", "code": fault}},
+                       status=fault, headers=headers)
+            return
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(owner.chat_completion(req))
+        elif self.path.rstrip("/").endswith("/responses"):
+            self._send(owner.response(req))
+        elif self.path.rstrip("/").endswith("/completions"):
+            self._send(owner.completion(req))
+        else:
+            self._send({"error": {"message": f"rota desconhecida: {self.path}"}}, status=404)
+
+class MockLLMServer:
+    """
+    Servidor mock em thread; `url` é o base_url para o cliente OpenAI (…/v1).
+    Latência: delay_s fixo ou latency(req) -> segundos por requisição (ex.: cauda lenta aleatória).
+    Falhas: fault(req) -> None | status | "hang" (ver fault_sequence e random_faults); hang dura hang_s.
+    slots > 0 limita as requisições atendidas ao mesmo tempo (as demais esperam), como um servidor local.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_s: float = 0.0,
+                 latency: Optional[Callable[[dict], float]] = None,
+                 fault: Optional[Callable[[dict], Fault]] = None, hang_s: float = 30.0, slots: int = 0):
+        self.delay_s = float(delay_s)
+        self.latency = latency
+        self.fault = fault
+        self.hang_s = float(hang_s)
+        self._slots = threading.BoundedSemaphore(slots) if slots > 0 else None
+        self.cancelled = 0
+        self.requests: List[Dict] = []
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.owner = self
+        self._seq = 0
+        self._th: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._th = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._th.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _id(self, prefix: str) -> str:
+        self._seq += 1
+        return f"{prefix}_{self._seq}"
+
+    def chat_completion(self, req: dict) -> dict:
+        messages = req.get("messages") or []
+        tool_names = [t["function"]["name"] for t in req.get("tools") or []]
+        last = messages[-1] if messages else {}
+        message = {"role": "assistant", "content": None}
+        calls = plan_tool_calls(_text(last.get("content")), tool_names) if last.get("role") == "user" and tool_names else []
+        if calls:
+            message["tool_calls"] = [{"id": self._id("call"), "type": "function",
+                                      "function": {"name": c["name"], "arguments": json.dumps(c["arguments"])}}
+                                     for c in calls]
+            finish = "tool_calls"
+        else:
+            if any(m.get("role") == "tool" for m in messages):
+                message["content"] = _answer_from_tools(messages)
+            else:
+                message["content"] = "Resposta do mock: " + _text((_last(messages, "user") or {}).get("content"))[:200]
+            finish = "stop"
+        return {
+            "id": self._id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": req.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def response(self, req: dict) -> dict:
+        text = "Resposta do mock: " + _text(req.get("input"))[-200:]
+        return {
+            "id": self._id("resp"), "object": "response", "created_at": int(time.time()),
+            "model": req.get("model", "mock"), "status": "completed",
+            "output": [{"type": "message", "id": self._id("msg"), "role": "assistant", "status": "completed",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+        }
+
+    def completion(self, req: dict) -> dict:
+        prompts = req.get("prompt")
+        prompts = prompts if isinstance(prompts, list) else [prompts or ""]
+        choices = []
+        for i, p in enumerate(prompts):
+            # última fala do usuário no prompt renderizado (template ChatML)
+            user = str(p).rsplit("<|im_start|>user\n", 1)[-1].split("<|im_end|>", 1)[0]
+            choices.append({"index": i, "text": "Resposta do mock: " + user[:200], "finish_reason": "stop", "logprobs": None})
+        return {
+            "id": self._id("cmpl"), "object": "text_completion", "created": int(time.time()),
+            "model": req.get("model", "mock"), "choices": choices,
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor mock compatível com a API da OpenAI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="latência artificial por requisição (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fração de respostas 429/500/503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fração de requisições sem resposta")
+    parser.add_argument("--slots", type=int, default=0, help="requisições simultâneas atendidas (0 = sem limite)")
+    args = parser.parse_args(argv)
+    fault = random_faults(args.fail_rate, args.hang_rate) if args.fail_rate or args.hang_rate else None
+    srv = MockLLMServer(args.host, args.port, delay_s=args.delay, fault=fault, slots=args.slots)
+    print(f"Mock LLM em {srv.url}")
+    srv._httpd.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ from typing import List, Dict, Optional
 def build_system_prompt(market: str = "índice", rule_based_summary: Optional[str] = None, main_signal: Optional[dict] = None) -> str:
     base = (
         "Você é um especialista em tape reading (leitura do fluxo de ordens) e análise técnica intraday, "
-        "focado em mercados de índice (futuros e/ou CFDs). "
+        f"focado em mercados de {market}{' (futuros e/ou CFDs)' if market == 'índice' else ''}. "
         "Seu objetivo é ajudar o usuário a entender o cenário de mercado de forma simples, didática e acessível, "
         "evitando termos técnicos sempre que possível. Se precisar usar termos técnicos, explique o significado de forma clara e curta. "
         "Sempre priorize a proteção do usuário contra perdas e oriente para decisões conservadoras. "
@@ -27,16 +27,20 @@ def assemble_messages(
     system_prompt: Optional[str] = None,
     rule_based: Optional[dict] = None,
     history: Optional[List[Dict]] = None,
-    chat_summary: Optional[str] = None
+    chat_summary: Optional[str] = None,
+    agent_notes: Optional[List[str]] = None,
+    tools_enabled: bool = False,
+    market: str = "índice",
 ) -> List[Dict]:
     # Monta o prompt do sistema com dados do rule_based se disponíveis
     if rule_based:
         system = build_system_prompt(
+            market=market,
             rule_based_summary=rule_based.get("summary"),
             main_signal=rule_based.get("main_signal")
         )
     else:
-        system = system_prompt or build_system_prompt()
+        system = system_prompt or build_system_prompt(market=market)
 
     messages = [{"role": "system", "content": system}]
 
@@ -58,6 +62,14 @@ def assemble_messages(
         if rule_based.get("big_prints"):
             bp = rule_based["big_prints"][-1]
             messages.append({"role": "system", "content": f"Negócio grande recente: {bp['side']} volume={bp['volume']:.0f} @ {bp['price']:.2f} ({bp['ts']})"})
+        if rule_based.get("liquidity_events"):
+            messages.append({"role": "system", "content": f"Eventos de liquidez no livro (icebergs/varridas):\n{rule_based['liquidity_events']}"})
+        if (rule_based.get("book") or {}).get("comment"):
+            messages.append({"role": "system", "content": f"Liquidez do livro (spread, profundidade, atualizações): {rule_based['book']['comment']}"})
+        if (rule_based.get("microstructure") or {}).get("comment"):
+            messages.append({"role": "system", "content": f"Ritmo do tape (tempo entre negócios): {rule_based['microstructure']['comment']}"})
+        if rule_based.get("cross_asset"):
+            messages.append({"role": "system", "content": f"Outros ativos acompanhados (quem lidera):\n{rule_based['cross_asset']}"})
         tb = rule_based.get("top_buy_aggressors") or []
         ts = rule_based.get("top_sell_aggressors") or []
         if tb:
@@ -67,6 +79,17 @@ def assemble_messages(
             tops_txt = ", ".join([f"{a}({v:.0f})" for a, v in ts[:5]])
             messages.append({"role": "system", "content": f"Top agressores de VENDA: {tops_txt}"})
 
+    # Agentes citados pelo usuário (estatísticas da sessão vindas do AgentIndex)
+    if agent_notes:
+        messages.append({"role": "system", "content": "Comportamento dos agentes citados (sessão atual):\n" + "\n".join(agent_notes)})
+
+    if tools_enabled:
+        messages.append({"role": "system", "content": (
+            "Você tem ferramentas para consultar o tape da sessão inteira: get_volume_profile, get_agent_stats, "
+            "get_bars e get_big_prints. Consulte-as quando a pergunta pedir números, níveis, agentes ou barras "
+            "em vez de supor; cite os valores retornados."
+        )})
+
     if df_sample_text:
         messages.append({"role": "user", "content": "Aqui estão exemplos de leituras do tape:\n" + df_sample_text})
 
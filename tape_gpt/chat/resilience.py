@@ -0,0 +1,246 @@
+# file: tape_gpt/chat/resilience.py
+"""
+Camada de resiliência das chamadas ao modelo (LLMGuard):
+  - prazo por chamada (deadline): tentativas, esperas e fila somadas nunca passam de deadline_s;
+  - retry com backoff exponencial e jitter (full jitter) só para erros retentáveis
+    (408/409/429/5xx, conexão, timeout), respeitando Retry-After;
+  - limite de chamadas simultâneas por chave de API (compartilhado entre sessões/threads/loops);
+  - circuit breaker (fechado -> aberto após N falhas seguidas -> meio-aberto com uma sonda).
+Com o circuito aberto a chamada falha na hora (CircuitOpenError) e o chat responde com o texto
+rule-based (render_response). Um guard por (chave, endpoint) no processo: guard_for().
+"""
+import asyncio, hashlib, random, threading, time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+RETRIABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+class LLMTimeoutError(RuntimeError):
+    pass
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+def is_retriable(exc: BaseException) -> bool:
+    """Erros transitórios: status retentável, falha de conexão/timeout do SDK ou prazo da tentativa."""
+    if isinstance(exc, (LLMTimeoutError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return int(status) in RETRIABLE_STATUS
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(exc, openai.APIConnectionError)   # inclui APITimeoutError
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """closed -> open após failure_threshold falhas seguidas; após reset_after_s deixa passar uma sonda."""
+    def __init__(self, failure_threshold: int = 5, reset_after_s: float = 30.0):
+        self.failure_threshold = int(failure_threshold)
+        self.reset_after_s = float(reset_after_s)
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_after_s:
+                return "half_open"
+            return self._state
+
+    def check(self):
+        """Levanta CircuitOpenError se a chamada não deve sair agora."""
+        with self._lock:
+            if self._state == "closed":
+                return
+            if self._state == "open":
+                wait = self.reset_after_s - (time.monotonic() - self._opened_at)
+                if wait > 0:
+                    raise CircuitOpenError(f"Modelo indisponível (circuito aberto, nova tentativa em {wait:.0f}s).")
+                self._state = "half_open"
+            if self._probing:
+                raise CircuitOpenError("Modelo indisponível (circuito meio-aberto, sonda em andamento).")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._state, self._failures, self._probing = "closed", 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._state, self._opened_at = "open", time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        # tentativa cancelada (ex.: hedge perdedor): não conta como sucesso nem falha
+        with self._lock:
+            self._probing = False
+
+class ConcurrencyLimiter:
+    """Máximo de chamadas simultâneas; semáforo de thread, usável de código síncrono e de qualquer loop."""
+    def __init__(self, limit: int = 4):
+        self.limit = int(limit)
+        self._sem = threading.BoundedSemaphore(self.limit)
+
+    def _timeout(self) -> LLMTimeoutError:
+        return LLMTimeoutError(f"Prazo esgotado aguardando vaga ({self.limit} chamadas simultâneas por chave).")
+
+    @contextmanager
+    def slot(self, timeout_s: float):
+        if not self._sem.acquire(timeout=max(0.0, timeout_s)):
+            raise self._timeout()
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+    @asynccontextmanager
+    async def aslot(self, timeout_s: float):
+        # sondagem em vez de acquire bloqueante: não trava o loop e é segura sob cancelamento
+        deadline = time.monotonic() + timeout_s
+        while not self._sem.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise self._timeout()
+            await asyncio.sleep(0.01)
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+class LLMGuard:
+    """
+    Executa uma chamada ao modelo com prazo, retry, limite de concorrência e circuit breaker.
+    A chamada recebe o tempo restante (s) para configurar o timeout do cliente: fn(timeout_s).
+    """
+    def __init__(
+        self,
+        deadline_s: float = 30.0,
+        max_retries: int = 3,
+        base_delay_s: float = 0.5,
+        max_delay_s: float = 8.0,
+        max_concurrency: int = 4,
+        failure_threshold: int = 5,
+        reset_after_s: float = 30.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.deadline_s = float(deadline_s)
+        self.max_retries = int(max_retries)
+        self.base_delay_s = float(base_delay_s)
+        self.max_delay_s = float(max_delay_s)
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_after_s)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def backoff(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """Espera antes da tentativa attempt+1: Retry-After do servidor ou full jitter sobre base*2^attempt."""
+        hinted = _retry_after(exc) if exc is not None else None
+        if hinted is not None:
+            return min(self.max_delay_s, max(0.0, hinted))
+        return self._rng.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** attempt))
+
+    def _begin(self, deadline: float) -> float:
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.breaker.release_probe()
+            raise LLMTimeoutError(f"Prazo de {self.deadline_s:.0f}s esgotado.")
+        self._count("attempts")
+        return remaining
+
+    def _after_failure(self, exc: BaseException, attempt: int, deadline: float) -> float:
+        """Registra a falha e devolve a espera até a próxima tentativa; relança se não vale tentar de novo."""
+        if not is_retriable(exc):
+            # erro do pedido (400, chave inválida...): o provedor respondeu, não conta para o circuito
+            self.breaker.record_success()
+            raise exc
+        self.breaker.record_failure()
+        delay = self.backoff(attempt, exc)
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            self._count("failures")
+            raise exc
+        self._count("retries")
+        return delay
+
+    def run(self, fn: Callable[[float], T]) -> T:
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_s
+        attempt = 0
+        while True:
+            remaining = self._begin(deadline)
+            try:
+                with self.limiter.slot(remaining):
+                    try:
+                        result, failure = fn(max(0.01, deadline - time.monotonic())), None
+                    except Exception as e:
+                        result, failure = None, e
+            except BaseException:
+                # sem vaga dentro do prazo ou interrupção: não diz nada sobre o provedor
+                self.breaker.release_probe()
+                raise
+            if failure is None:
+                self.breaker.record_success()
+                return result
+            time.sleep(self._after_failure(failure, attempt, deadline))   # espera fora da vaga
+            attempt += 1
+
+    async def arun(self, fn: Callable[[float], Awaitable[T]]) -> T:
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_s
+        attempt = 0
+        while True:
+            remaining = self._begin(deadline)
+            try:
+                async with self.limiter.aslot(remaining):
+                    left = max(0.01, deadline - time.monotonic())
+                    try:
+                        result, failure = await asyncio.wait_for(fn(left), left), None
+                    except asyncio.TimeoutError:
+                        result, failure = None, LLMTimeoutError(f"Prazo de {self.deadline_s:.0f}s esgotado.")
+                    except Exception as e:
+                        result, failure = None, e
+            except BaseException:
+                # sem vaga, ou tentativa cancelada (hedge perdedor): não conta para o circuito
+                self.breaker.release_probe()
+                raise
+            if failure is None:
+                self.breaker.record_success()
+                return result
+            await asyncio.sleep(self._after_failure(failure, attempt, deadline))
+            attempt += 1
+
+_guards: Dict[Tuple[str, str], LLMGuard] = {}
+_guards_lock = threading.Lock()
+
+def guard_for(api_key: str, base_url: Optional[str] = None, **kwargs) -> LLMGuard:
+    """Guard do processo para (chave, endpoint): o limite e o circuito valem para todas as sessões."""
+    key = (hashlib.sha256((api_key or "").encode()).hexdigest()[:16], base_url or "")
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = _guards[key] = LLMGuard(**kwargs)
+        return guard
@@ -0,0 +1,163 @@
+# file: tape_gpt/chat/scheduler.py
+"""
+Agendador das chamadas ao modelo:
+  - roteamento por tipo de tarefa: tarefas baratas (resumo, classificação) vão para o CHEAPER_MODEL;
+  - hedge nas respostas sensíveis à latência: se a chamada não voltar até o p95 das latências recentes,
+    dispara uma segunda (mesmo modelo ou o próximo de hedge_models), fica com a primeira resposta boa
+    e cancela as outras (tarefas asyncio; o httpx fecha a conexão da que perdeu).
+Cada tentativa passa pelo LLMGuard (resilience.py): prazo, retry com backoff, limite por chave e circuit breaker.
+Testável contra o servidor local (tape_gpt.chat.mock_llm) via base_url.
+"""
+import asyncio, threading, time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+import numpy as np
+from tape_gpt.chat.client import _require_openai, acall_openai
+from tape_gpt.chat.resilience import LLMGuard, guard_for
+
+CHEAP_TASKS = ("summary", "classify")
+
+class LLMScheduler:
+    supports_tools = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        cheap_model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        hedge_models: Sequence[str] = (),
+        hedge_quantile: float = 0.95,
+        initial_hedge_s: float = 4.0,
+        min_hedge_s: float = 0.25,
+        max_hedges: int = 1,
+        window: int = 100,
+        timeout_s: float = 60.0,
+        guard: Optional[LLMGuard] = None,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.cheap_model = cheap_model or model
+        self.base_url = base_url or None
+        self.hedge_models = list(hedge_models)
+        self.hedge_quantile = float(hedge_quantile)
+        self.initial_hedge_s = float(initial_hedge_s)
+        self.min_hedge_s = float(min_hedge_s)
+        self.max_hedges = int(max_hedges)
+        self.timeout_s = float(timeout_s)
+        self.guard = guard if guard is not None else guard_for(api_key, base_url)
+        self._lat: Dict[str, Deque[float]] = {}
+        self._window = int(window)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failures": 0, "cancelled": 0}
+
+    # ---------- roteamento / latência ----------
+
+    def model_for(self, kind: str) -> str:
+        return self.cheap_model if kind in CHEAP_TASKS else self.model
+
+    def hedge_delay(self, kind: str = "answer") -> float:
+        """Quanto esperar antes do hedge: quantil das latências recentes do tipo (ou o valor inicial)."""
+        with self._lock:
+            lat = list(self._lat.get(kind, ()))
+        if len(lat) < 10:
+            return self.initial_hedge_s
+        return max(self.min_hedge_s, float(np.quantile(lat, self.hedge_quantile)))
+
+    def _observe(self, kind: str, seconds: float):
+        with self._lock:
+            self._lat.setdefault(kind, deque(maxlen=self._window)).append(seconds)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _client(self):
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY não definido.")
+        # sem retry interno do SDK: atraso e falhas são tratados aqui (hedge) e no guard
+        return _require_openai().AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             timeout=self.timeout_s, max_retries=0)
+
+    # ---------- execução ----------
+
+    async def _hedged(self, kind: str, attempt: Callable[[str], Awaitable], hedge: bool):
+        """Roda attempt(modelo); com hedge, dispara réplicas após hedge_delay e fica com a primeira boa."""
+        model = self.model_for(kind)
+        models = [model] + [self.hedge_models[i % len(self.hedge_models)] if self.hedge_models else model
+                            for i in range(self.max_hedges if hedge else 0)]
+        delay = self.hedge_delay(kind)
+        t0 = time.perf_counter()
+        pending = {asyncio.ensure_future(attempt(models[0])): 0}
+        launched, errors = 1, []
+        try:
+            while pending:
+                can_hedge = launched < len(models)
+                done, _ = await asyncio.wait(pending, timeout=delay if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # ninguém respondeu até o p95: réplica
+                    pending[asyncio.ensure_future(attempt(models[launched]))] = launched
+                    launched += 1
+                    self._count("hedged")
+                    continue
+                for task in done:
+                    idx = pending.pop(task)
+                    if task.exception() is None:
+                        self._observe(kind, time.perf_counter() - t0)
+                        if idx > 0:
+                            self._count("hedge_wins")
+                        return task.result()
+                    errors.append(task.exception())
+                if not pending and launched < len(models):
+                    # a primeira falhou antes do p95: a réplica sai já
+                    pending[asyncio.ensure_future(attempt(models[launched]))] = launched
+                    launched += 1
+                    self._count("hedged")
+            self._count("failures")
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+                self._count("cancelled")
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _run(self, coro):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # chamado de dentro de um loop (ex.: serviço async): roda em thread própria
+        out = {}
+        th = threading.Thread(target=lambda: out.update(r=asyncio.run(coro)))
+        th.start()
+        th.join()
+        return out["r"]
+
+    def complete(self, messages: List[Dict], kind: str = "answer", max_output_tokens: int = 1024,
+                 temperature: Optional[float] = None, hedge: Optional[bool] = None) -> str:
+        """Texto do modelo para a tarefa `kind`; hedge por padrão só nas tarefas que não são baratas."""
+        hedge = (kind not in CHEAP_TASKS) if hedge is None else hedge
+        self._count("calls")
+
+        async def _go():
+            async with self._client() as client:
+                async def attempt(model):
+                    return await self.guard.arun(
+                        lambda t: acall_openai(client, model, messages, max_output_tokens, temperature))
+                return await self._hedged(kind, attempt, hedge)
+        return self._run(_go())
+
+    def chat_completion(self, req: dict, kind: str = "answer", hedge: Optional[bool] = None):
+        """client.chat.completions.create(**req) com hedge (usado pelo laço de ferramentas)."""
+        hedge = (kind not in CHEAP_TASKS) if hedge is None else hedge
+        self._count("calls")
+
+        async def _go():
+            async with self._client() as client:
+                async def attempt(model):
+                    return await self.guard.arun(
+                        lambda t: client.chat.completions.create(**{**req, "model": model}, timeout=t))
+                return await self._hedged(kind, attempt, hedge)
+        return self._run(_go())
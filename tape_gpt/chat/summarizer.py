@@ -9,12 +9,15 @@ def summarize_chat(
     prior_summary: Optional[str] = None,
     insights: Optional[dict] = None,
     max_turns: int = 12,
+    base_url: Optional[str] = None,
+    scheduler=None,
 ) -> str:
     """
     Gera/atualiza um resumo curto da conversa (memória de longo prazo).
     - history: lista [{"role":"user"/"assistant","content":"..."}]
     - prior_summary: resumo anterior (se houver)
     - insights: opcional, injeta um mini-resumo do cenário do AnalyzerAgent
+    - scheduler: opcional (LLMScheduler); o resumo vai como tarefa barata (CHEAPER_MODEL, sem hedge)
     Retorna um texto de 2-4 frases.
     """
     # recorta últimos turnos para baratear o custo
@@ -44,13 +47,20 @@ def summarize_chat(
     msgs.extend(h)
     msgs.append({"role": "user", "content": "Atualize o resumo da conversa seguindo as instruções acima."})
 
+    if scheduler is not None:
+        model = scheduler.model_for("summary")
+
     # Define temperatura condicional: None para gpt-5 (usa default=1), 0.2 para demais
     temp = None if isinstance(model, str) and model.startswith("gpt-5") else 0.2
 
+    if scheduler is not None:
+        return scheduler.complete(msgs, kind="summary", max_output_tokens=240, temperature=temp)
+
     return call_openai(
         api_key=api_key,
         model=model,
         messages=msgs,
         max_output_tokens=240,
-        temperature=temp
+        temperature=temp,
+        base_url=base_url,
     )
\ No newline at end of file
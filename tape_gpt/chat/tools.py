@@ -0,0 +1,196 @@
+# file: tape_gpt/chat/tools.py
+"""
+Ferramentas (function calling) para o modelo consultar o tape sob demanda em vez de receber um CSV
+truncado no prompt. TapeTools pré-calcula os índices uma vez por snapshot (sessão inteira):
+timestamps em ns, sinal do agressor, limiar de print grande e barras por frequência (cache).
+"""
+import json
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
+from tape_gpt.analysis.orderflow import (Footprint, side_sign, _ts_ns, cumulative_volume_delta,
+                                         rolling_aggressor_volume)
+from tape_gpt.analysis.agents import AgentIndex
+
+TOOL_SPECS: List[Dict] = [
+    {"type": "function", "function": {
+        "name": "get_volume_profile",
+        "description": "Perfil de volume por preço (comprador/vendedor agressor), com o POC (preço de maior volume).",
+        "parameters": {"type": "object", "properties": {
+            "range": {"type": "string", "description": "'all', uma duração recente (ex.: '30min') ou 'início/fim' em ISO (UTC)."},
+            "bins": {"type": "integer", "description": "Máximo de faixas de preço (padrão 20)."},
+        }, "required": ["range"]},
+    }},
+    {"type": "function", "function": {
+        "name": "get_agent_stats",
+        "description": "Estatísticas de um agente/corretora: volume agressor e passivo, saldo, print médio e prints grandes.",
+        "parameters": {"type": "object", "properties": {
+            "agent": {"type": "string", "description": "Nome do agente, ex.: 'XP' ou 'AG012'."},
+        }, "required": ["agent"]},
+    }},
+    {"type": "function", "function": {
+        "name": "get_bars",
+        "description": "Últimas n barras OHLC com volume comprador/vendedor, imbalance e CVD no fechamento.",
+        "parameters": {"type": "object", "properties": {
+            "freq": {"type": "string", "description": "Tamanho da barra, ex.: '1min', '5min', '15s' (mín. 1s)."},
+            "n": {"type": "integer", "description": "Quantidade de barras (máx. 200)."},
+        }, "required": ["freq", "n"]},
+    }},
+    {"type": "function", "function": {
+        "name": "get_big_prints",
+        "description": "Negócios grandes (volume >= P95 da sessão) a partir de um instante, com o volume agressor comprador/vendedor dos 2 min até cada um.",
+        "parameters": {"type": "object", "properties": {
+            "since": {"type": "string", "description": "Duração recente (ex.: '15min') ou instante ISO (UTC)."},
+            "limit": {"type": "integer", "description": "Máximo de negócios (padrão 20)."},
+        }, "required": ["since"]},
+    }},
+]
+
+TOOL_NAMES = [t["function"]["name"] for t in TOOL_SPECS]
+_MAX_BARS = 200
+_MIN_BAR = pd.Timedelta("1s")   # barras menores reamostrariam a sessão em milhões de faixas
+
+def _iso(ns: int) -> str:
+    return pd.Timestamp(int(ns), tz="UTC").isoformat()
+
+class TapeTools:
+    """Executa as ferramentas sobre o snapshot do chat; call() devolve sempre um dict serializável."""
+    def __init__(self, df: pd.DataFrame, agent_index: Optional[AgentIndex] = None, big_quantile: float = 0.95):
+        self.df = preprocess_ts(df)
+        self.ts = _ts_ns(self.df["timestamp"]) if len(self.df) else np.empty(0, np.int64)
+        self.price = self.df["price"].to_numpy(dtype="float64")
+        self.volume = self.df["volume"].to_numpy(dtype="float64")
+        self.sign = side_sign(self.df["side"]) if len(self.df) else np.empty(0, np.int8)
+        self.big_thr = float(np.percentile(self.volume, big_quantile * 100)) if len(self.volume) else np.inf
+        self._agents = agent_index
+        self._bars: Dict[str, pd.DataFrame] = {}
+        self._flow: Optional[pd.DataFrame] = None
+        self._footprint: Optional[Footprint] = None
+
+    # ---------- índices ----------
+
+    def _window(self, spec: str) -> slice:
+        """Fatia [i0, i1) dos negócios para 'all', duração recente ou 'início/fim' ISO."""
+        n = len(self.ts)
+        spec = (spec or "all").strip()
+        if n == 0 or spec.lower() == "all":
+            return slice(0, n)
+        if "/" in spec:
+            a, b = (pd.Timestamp(x.strip()) for x in spec.split("/", 1))
+            a = a.tz_localize("UTC") if a.tzinfo is None else a
+            b = b.tz_localize("UTC") if b.tzinfo is None else b
+            return slice(int(np.searchsorted(self.ts, a.value, "left")), int(np.searchsorted(self.ts, b.value, "right")))
+        try:
+            start = self.ts[-1] - pd.to_timedelta(spec).value
+        except ValueError:
+            ts = pd.Timestamp(spec)
+            start = (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value
+        return slice(int(np.searchsorted(self.ts, start, "left")), n)
+
+    def _bars_for(self, freq: str) -> pd.DataFrame:
+        bars = self._bars.get(freq)
+        if bars is None:
+            temp = self.df.set_index("timestamp")
+            ohlc = temp["price"].resample(freq).ohlc()
+            imbs = compute_imbalances(self.df, window=freq)
+            cvd = cumulative_volume_delta(self.df).resample(freq).last().rename("cvd")
+            bars = ohlc.join(imbs[["vbuy", "vsell", "imbalance"]]).join(cvd).dropna(subset=["close"])
+            self._bars[freq] = bars
+        return bars
+
+    def _flow_2min(self) -> pd.DataFrame:
+        """Volume agressor comprador/vendedor na janela de 2 min até cada negócio (kernel, uma vez por snapshot)."""
+        if self._flow is None:
+            self._flow = rolling_aggressor_volume(self.df, "2min")
+        return self._flow
+
+    def _footprint_for(self, w: slice) -> Footprint:
+        """Footprint da fatia; o da sessão inteira é montado uma vez por snapshot."""
+        if w.start == 0 and w.stop == len(self.ts):
+            if self._footprint is None:
+                self._footprint = Footprint()
+                self._footprint.add(self.price, self.volume, self.sign)
+            return self._footprint
+        fp = Footprint()
+        fp.add(self.price[w], self.volume[w], self.sign[w])
+        return fp
+
+    def _agent_index(self) -> AgentIndex:
+        if self._agents is None:
+            self._agents = AgentIndex()
+            self._agents.update(self.df)
+        return self._agents
+
+    # ---------- ferramentas ----------
+
+    def get_volume_profile(self, range: str = "all", bins: int = 20) -> dict:
+        w = self._window(range)
+        fp = self._footprint_for(w).frame().iloc[::-1]     # níveis em ordem crescente de preço
+        if len(fp) == 0:
+            return {"range": range, "trades": 0, "levels": []}
+        levels, buy, sell, total = (fp[c].to_numpy() for c in ("price", "vbuy", "vsell", "volume"))
+        bins = max(1, min(int(bins), 100))
+        if len(levels) > bins:
+            # agrupa os níveis em faixas de mesma largura; o preço da faixa é o limite inferior
+            edges = np.linspace(levels[0], levels[-1], bins + 1)
+            inv = np.clip(np.searchsorted(edges, levels, "right") - 1, 0, bins - 1)
+            buy, sell, total = (np.bincount(inv, weights=x, minlength=bins) for x in (buy, sell, total))
+            levels = edges[:-1]
+        poc = int(np.argmax(total))
+        return {
+            "range": range,
+            "trades": int(w.stop - w.start),
+            "poc": float(levels[poc]),
+            "levels": [{"price": round(float(p), 4), "volume": float(t), "buy": float(b), "sell": float(s)}
+                       for p, t, b, s in zip(levels, total, buy, sell) if t > 0],
+        }
+
+    def get_agent_stats(self, agent: str) -> dict:
+        idx = self._agent_index()
+        stats = idx.agent(agent)
+        if stats is None:
+            # tolera caixa diferente ("xp" -> "XP")
+            match = next((n for n in idx.names() if n.upper() == str(agent).upper()), None)
+            stats = idx.agent(match) if match else None
+        if stats is None:
+            return {"agent": agent, "error": "agente não encontrado", "known_agents": idx.names()[:30]}
+        return stats
+
+    def get_bars(self, freq: str = "1min", n: int = 20) -> dict:
+        td = pd.to_timedelta(freq)   # valida
+        if td <= pd.Timedelta(0):
+            raise ValueError(f"freq deve ser positiva: {freq!r}")
+        if td < _MIN_BAR:
+            freq = "1s"
+        n = max(1, min(int(n), _MAX_BARS))
+        bars = self._bars_for(freq).tail(n).reset_index()
+        bars["timestamp"] = bars["timestamp"].map(lambda t: t.isoformat())
+        return {"freq": freq, "bars": bars.round(4).to_dict(orient="records")}
+
+    def get_big_prints(self, since: str = "30min", limit: int = 20) -> dict:
+        w = self._window(since)
+        idx = np.flatnonzero(self.volume[w] >= self.big_thr) + (w.start or 0)
+        idx = idx[-max(1, min(int(limit), 100)):]
+        side = np.where(self.sign[idx] > 0, "buy", np.where(self.sign[idx] < 0, "sell", "unknown"))
+        flow = self._flow_2min()[["vbuy", "vsell"]].to_numpy()[idx] if len(idx) else np.empty((0, 2))
+        return {
+            "since": since,
+            "threshold": self.big_thr,
+            "count": int(np.count_nonzero(self.volume[w] >= self.big_thr)),
+            "prints": [{"ts": _iso(t), "price": float(p), "volume": float(v), "side": str(s),
+                        "vbuy_2min": float(b), "vsell_2min": float(q)}
+                       for t, p, v, s, (b, q) in zip(self.ts[idx], self.price[idx], self.volume[idx], side, flow)],
+        }
+
+    def call(self, name: str, arguments) -> dict:
+        """Executa a ferramenta `name` com argumentos JSON (str ou dict); erros voltam como {"error": ...}."""
+        if name not in TOOL_NAMES:
+            return {"error": f"ferramenta desconhecida: {name}"}
+        try:
+            args = json.loads(arguments or "{}") if isinstance(arguments, str) else dict(arguments or {})
+            return getattr(self, name)(**args)
+        except (TypeError, ValueError) as e:
+            return {"error": f"argumentos inválidos para {name}: {e}"}
+        except Exception as e:   # falha interna também volta ao modelo em vez de derrubar o chat
+            return {"error": f"falha em {name}: {type(e).__name__}: {e}"}
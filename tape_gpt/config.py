@@ -5,6 +5,16 @@ from dataclasses import dataclass
 DEFAULT_OPENAI_MODEL = "gpt-4.1-mini"  # modelo padrão para Responses API
 CHEAPER_OPENAI_MODEL = "gpt-4.1-nano"
 MAX_HISTORY = 8
+DEFAULT_TICK_STORE_DIR = "data/ticks"
+DEFAULT_INGEST_MODE = "thread"  # "thread" (simulador no processo do app) ou "process" (memória compartilhada)
+DEFAULT_LLM_TIMEOUT_S = 30.0     # prazo total de uma chamada ao modelo (tentativas + esperas)
+DEFAULT_LLM_MAX_CONCURRENCY = 4  # chamadas simultâneas por chave de API no processo
+DEFAULT_LLM_BACKEND = "openai"   # "openai", "local" (servidor compatível) ou "llama_cpp" (em processo)
+DEFAULT_LOCAL_LLM_URL = "http://127.0.0.1:8080/v1"
+DEFAULT_LOCAL_CHAT_TEMPLATE = "chatml"  # "chatml", "llama3", "mistral" ou "server" (/v1/chat/completions)
+DEFAULT_CHECKPOINT_DIR = "data/checkpoints"  # vazio desliga os checkpoints de feed/sessão
+DEFAULT_CHECKPOINT_INTERVAL_S = 10.0
+DEFAULT_WATCHLIST = "WIN,WDO,PETR4,VALE3"  # símbolos do feed simulado (o primeiro é o principal)
 
 def _get_env(name: str, default: str = "") -> str:
     return os.getenv(name, default)
@@ -26,13 +36,55 @@ class Settings:
     OPENAI_MODEL: str
     CHEAPER_MODEL: str
     MAX_HISTORY: int = MAX_HISTORY  # mensagens de contexto padrão
+    INGEST_MODE: str = DEFAULT_INGEST_MODE
+    TICK_STORE_DIR: str = DEFAULT_TICK_STORE_DIR
+    OPENAI_BASE_URL: str = ""    # opcional: servidor compatível (ex.: mock local em http://127.0.0.1:8001/v1)
+    ALERT_WEBHOOK_URL: str = ""  # opcional: POST JSON de cada alerta (ex.: receptor local)
+    LLM_TIMEOUT_S: float = DEFAULT_LLM_TIMEOUT_S
+    LLM_MAX_CONCURRENCY: int = DEFAULT_LLM_MAX_CONCURRENCY
+    LLM_BACKEND: str = DEFAULT_LLM_BACKEND
+    LOCAL_LLM_URL: str = DEFAULT_LOCAL_LLM_URL
+    LOCAL_LLM_MODEL: str = "local"
+    LOCAL_MODEL_PATH: str = ""   # .gguf para o backend llama_cpp
+    LOCAL_CHAT_TEMPLATE: str = DEFAULT_LOCAL_CHAT_TEMPLATE
+    CHECKPOINT_DIR: str = DEFAULT_CHECKPOINT_DIR
+    CHECKPOINT_INTERVAL_S: float = DEFAULT_CHECKPOINT_INTERVAL_S
+    WATCHLIST: str = DEFAULT_WATCHLIST
+    PIPELINE_WORKERS: int = 0    # workers dos pipelines por símbolo (0 = min(símbolos, núcleos))
+    PIPELINE_EXECUTOR: str = "auto"  # "auto" (processos se houver mais de um núcleo), "thread" ou "process"
 
 def get_settings() -> Settings:
     # prioridade: secrets -> env -> vazio
     api_key = _get_from_streamlit_secrets("OPENAI_API_KEY") or _get_env("OPENAI_API_KEY", "")
     model = _get_from_streamlit_secrets("OPENAI_MODEL") or _get_env("OPENAI_MODEL", DEFAULT_OPENAI_MODEL)
     cheaper_model = _get_from_streamlit_secrets("CHEAPER_MODEL") or _get_env("CHEAPER_MODEL", CHEAPER_OPENAI_MODEL)
-    return Settings(OPENAI_API_KEY=api_key, OPENAI_MODEL=model, CHEAPER_MODEL=cheaper_model, MAX_HISTORY=MAX_HISTORY)
+    ingest_mode = _get_from_streamlit_secrets("INGEST_MODE") or _get_env("INGEST_MODE", DEFAULT_INGEST_MODE)
+    tick_store_dir = _get_from_streamlit_secrets("TICK_STORE_DIR") or _get_env("TICK_STORE_DIR", DEFAULT_TICK_STORE_DIR)
+    base_url = _get_from_streamlit_secrets("OPENAI_BASE_URL") or _get_env("OPENAI_BASE_URL", "")
+    alert_webhook_url = _get_from_streamlit_secrets("ALERT_WEBHOOK_URL") or _get_env("ALERT_WEBHOOK_URL", "")
+    llm_timeout_s = _get_from_streamlit_secrets("LLM_TIMEOUT_S") or _get_env("LLM_TIMEOUT_S", "")
+    llm_max_concurrency = _get_from_streamlit_secrets("LLM_MAX_CONCURRENCY") or _get_env("LLM_MAX_CONCURRENCY", "")
+    llm_backend = _get_from_streamlit_secrets("LLM_BACKEND") or _get_env("LLM_BACKEND", DEFAULT_LLM_BACKEND)
+    local_url = _get_from_streamlit_secrets("LOCAL_LLM_URL") or _get_env("LOCAL_LLM_URL", DEFAULT_LOCAL_LLM_URL)
+    local_model = _get_from_streamlit_secrets("LOCAL_LLM_MODEL") or _get_env("LOCAL_LLM_MODEL", "local")
+    local_model_path = _get_from_streamlit_secrets("LOCAL_MODEL_PATH") or _get_env("LOCAL_MODEL_PATH", "")
+    local_template = (_get_from_streamlit_secrets("LOCAL_CHAT_TEMPLATE")
+                      or _get_env("LOCAL_CHAT_TEMPLATE", DEFAULT_LOCAL_CHAT_TEMPLATE))
+    checkpoint_dir = _get_from_streamlit_secrets("CHECKPOINT_DIR") or _get_env("CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)
+    checkpoint_interval_s = _get_from_streamlit_secrets("CHECKPOINT_INTERVAL_S") or _get_env("CHECKPOINT_INTERVAL_S", "")
+    watchlist = _get_from_streamlit_secrets("WATCHLIST") or _get_env("WATCHLIST", DEFAULT_WATCHLIST)
+    pipeline_workers = _get_from_streamlit_secrets("PIPELINE_WORKERS") or _get_env("PIPELINE_WORKERS", "")
+    pipeline_executor = _get_from_streamlit_secrets("PIPELINE_EXECUTOR") or _get_env("PIPELINE_EXECUTOR", "auto")
+    return Settings(OPENAI_API_KEY=api_key, OPENAI_MODEL=model, CHEAPER_MODEL=cheaper_model, MAX_HISTORY=MAX_HISTORY,
+                    INGEST_MODE=ingest_mode, TICK_STORE_DIR=tick_store_dir, OPENAI_BASE_URL=base_url,
+                    ALERT_WEBHOOK_URL=alert_webhook_url,
+                    LLM_TIMEOUT_S=float(llm_timeout_s or DEFAULT_LLM_TIMEOUT_S),
+                    LLM_MAX_CONCURRENCY=int(llm_max_concurrency or DEFAULT_LLM_MAX_CONCURRENCY),
+                    LLM_BACKEND=llm_backend, LOCAL_LLM_URL=local_url, LOCAL_LLM_MODEL=local_model,
+                    LOCAL_MODEL_PATH=local_model_path, LOCAL_CHAT_TEMPLATE=local_template, CHECKPOINT_DIR=checkpoint_dir,
+                    CHECKPOINT_INTERVAL_S=float(checkpoint_interval_s or DEFAULT_CHECKPOINT_INTERVAL_S),
+                    WATCHLIST=watchlist, PIPELINE_WORKERS=int(pipeline_workers or 0),
+                    PIPELINE_EXECUTOR=pipeline_executor)
 
 def require_openai_api_key() -> str:
     """
@@ -0,0 +1,169 @@
+# file: tape_gpt/data/checkpoint.py
+"""
+Checkpoints locais do estado incremental, para retomar em milissegundos após reinício do servidor
+ou expiração da sessão (em vez de reprocessar o tape):
+  - feed (simulador): janelas de negócios/ofertas, versões (seq) e preço — salvo por um sink a cada
+    interval_s, restaurado no make_market_hub;
+  - sessão: janela normalizada (StreamingPreprocessor), índice por agente (AgentIndex), ritmo do tape
+    (TapeSpeed) e cursor no hub — salvo pelo app a cada interval_s; checkpoints de sessões abandonadas
+    (sem gravação há SESSION_TTL_S) são apagados ao salvar. O id da sessão vem da URL (qualquer um pode
+    escolhê-lo), então o checkpoint só guarda estado de mercado: o chat nunca é gravado nem restaurado.
+Formato: um .npz por checkpoint (arrays NumPy sem pickle) com os metadados em JSON no próprio arquivo;
+gravação atômica (arquivo temporário + os.replace), então um crash nunca deixa checkpoint pela metade.
+"""
+import hashlib, json, os, re, threading, time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+from tape_gpt.analysis.agents import AgentIndex
+from tape_gpt.analysis.microstructure import TapeSpeed
+from tape_gpt.data.preprocess import StreamingPreprocessor
+
+_META = "__meta__"
+_NAME_RE = re.compile(r"^[A-Za-z0-9_\-]{1,80}$")
+
+class CheckpointStore:
+    def __init__(self, root: str = "data/checkpoints"):
+        self.root = Path(root)
+
+    def _path(self, name: str) -> Path:
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Nome de checkpoint inválido: {name!r}")
+        return self.root / f"{name}.npz"
+
+    def save(self, name: str, arrays: Dict[str, np.ndarray], meta: dict) -> float:
+        """Grava (arrays, meta) de forma atômica; devolve o tempo gasto em ms."""
+        t0 = time.perf_counter()
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(name)
+        tmp = path.with_name(f".{path.stem}.{threading.get_ident()}.tmp.npz")
+        payload = dict(arrays)
+        payload[_META] = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        np.savez(tmp, **payload)
+        os.replace(tmp, path)
+        return (time.perf_counter() - t0) * 1000
+
+    def load(self, name: str) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+        """(arrays, meta) ou None se não existe / está ilegível."""
+        path = self._path(name)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                arrays = {k: z[k] for k in z.files if k != _META}
+                meta = json.loads(z[_META].tobytes().decode("utf-8"))
+        except (OSError, ValueError, KeyError):
+            return None
+        return arrays, meta
+
+    def remove(self, name: str):
+        try:
+            self._path(name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def prune(self, prefix: str = "session-", max_age_s: float = 86400.0) -> int:
+        """Apaga checkpoints `prefix*` sem gravação há mais de max_age_s (sessões abandonadas)."""
+        if not self.root.exists():
+            return 0
+        cutoff, n = time.time() - max_age_s, 0
+        for p in self.root.glob(f"{prefix}*.npz"):
+            if p.stat().st_mtime < cutoff:
+                p.unlink(missing_ok=True)
+                n += 1
+        return n
+
+# ---------------- feed ----------------
+
+SIM_CHECKPOINT = "feed-sim"
+
+class SimCheckpointSink:
+    """Sink do simulador (negocios_df, ofertas_df): grava o estado do feed no máximo a cada interval_s."""
+    def __init__(self, sim, store: CheckpointStore, interval_s: float = 10.0, name: str = SIM_CHECKPOINT):
+        self.sim = sim
+        self.store = store
+        self.interval_s = float(interval_s)
+        self.name = name
+        self._last = 0.0
+        self.last_ms = 0.0
+
+    def __call__(self, trades_df, offers_df):
+        now = time.monotonic()
+        if now - self._last < self.interval_s:
+            return
+        self._last = now
+        arrays, meta = self.sim.state()
+        self.last_ms = self.store.save(self.name, arrays, meta)
+
+def restore_simulator(sim, store: CheckpointStore, name: str = SIM_CHECKPOINT) -> bool:
+    """Restaura o feed do último checkpoint; False se não há (ou o feed não suporta checkpoint)."""
+    if not hasattr(sim, "restore_state"):
+        return False
+    loaded = store.load(name)
+    if loaded is None:
+        return False
+    sim.restore_state(*loaded)
+    return True
+
+# ---------------- sessão ----------------
+
+SESSION_TTL_S = 86400.0    # checkpoint de sessão sem gravação há mais que isso é apagado
+PRUNE_EVERY_S = 600.0      # varredura do diretório no máximo uma vez a cada PRUNE_EVERY_S (por diretório)
+_last_prune: Dict[str, float] = {}
+_prune_lock = threading.Lock()
+
+def prune_sessions(store: CheckpointStore, max_age_s: float = SESSION_TTL_S, every_s: float = PRUNE_EVERY_S) -> int:
+    """store.prune() das sessões, limitado a uma varredura por every_s no processo; devolve quantos apagou."""
+    key, now = str(store.root.resolve()), time.monotonic()
+    with _prune_lock:
+        if now - _last_prune.get(key, -every_s) < every_s:
+            return 0
+        _last_prune[key] = now
+    return store.prune("session-", max_age_s)
+
+def session_name(session_key: str) -> str:
+    """
+    Nome do checkpoint para a chave "sid:símbolo". Os separadores viram "-" (sid e símbolo não se
+    fundem); se a limpeza ou o corte mudarem a chave, um hash dela entra no nome para não colidir.
+    """
+    key = str(session_key)
+    safe = re.sub(r"[^A-Za-z0-9_\-]", "-", key)
+    if safe != key.replace(":", "-", 1) or len(safe) > 64:
+        safe = f"{safe[:52]}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+    return f"session-{safe}"
+
+def save_session(store: CheckpointStore, session_id: str, stream: StreamingPreprocessor, agents: AgentIndex,
+                 cursor: int, speed: Optional[TapeSpeed] = None) -> float:
+    """Grava o estado analítico da sessão (sem o chat). Devolve ms."""
+    s_arrays, s_meta = stream.state()
+    a_arrays, a_meta = agents.state()
+    arrays = {f"stream.{k}": v for k, v in s_arrays.items()}
+    arrays.update({f"agents.{k}": v for k, v in a_arrays.items()})
+    meta = {"stream": s_meta, "agents": a_meta, "cursor": int(cursor), "saved_at": time.time()}
+    if speed is not None:
+        sp_arrays, meta["speed"] = speed.state()
+        arrays.update({f"speed.{k}": v for k, v in sp_arrays.items()})
+    ms = store.save(session_name(session_id), arrays, meta)
+    prune_sessions(store)
+    return ms
+
+def load_session(store: CheckpointStore, session_id: str) -> Optional[dict]:
+    """
+    {"stream", "agents", "speed", "cursor", "saved_at"} restaurados, ou None ("speed" None em checkpoints
+    antigos). Um "chat" gravado por versões anteriores é ignorado.
+    """
+    loaded = store.load(session_name(session_id))
+    if loaded is None:
+        return None
+    arrays, meta = loaded
+    pick = lambda prefix: {k[len(prefix):]: v for k, v in arrays.items() if k.startswith(prefix)}
+    try:
+        return {
+            "stream": StreamingPreprocessor.from_state(pick("stream."), meta["stream"]),
+            "agents": AgentIndex.from_state(pick("agents."), meta["agents"]),
+            "speed": TapeSpeed.from_state(pick("speed."), meta["speed"]) if "speed" in meta else None,
+            "cursor": int(meta["cursor"]),
+            "saved_at": meta.get("saved_at"),
+        }
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,127 @@
+# tape_gpt/data/hub.py
+
+import threading, time
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from tape_gpt.data.simulator import RealTimeSimulator
+from tape_gpt.data.tick_store import TickStore, BufferedAppender
+from tape_gpt.data.checkpoint import CheckpointStore, SimCheckpointSink, restore_simulator
+
+class MarketDataHub:
+    """
+    Feed de mercado único por processo, compartilhado entre todas as sessões.
+    - Um só simulador (uma thread, uma semente XLSX, um random walk).
+    - snapshot(): DataFrames montados uma vez por versão e reaproveitados por todas as sessões.
+    - read_new(session_id): somente os negócios novos desde o cursor daquela sessão.
+    Os DataFrames devolvidos são compartilhados: trate-os como somente leitura.
+    `sim` pode ser o RealTimeSimulator (thread local) ou um IngestProcess (outro processo via
+    memória compartilhada): ambos expõem version/read_since/get_dataframes/start/stop.
+    """
+    def __init__(self, sim=None, session_ttl_s: float = 3600.0):
+        self.sim = sim or RealTimeSimulator(start_price=100000.0, tick_ms=5000, vol=2.0, max_rows=100)
+        self.session_ttl_s = float(session_ttl_s)
+        self._lock = threading.Lock()
+        self._seeded_from: Optional[str] = None
+        self._cursors: Dict[str, Tuple[int, float]] = {}   # session_id -> (cursor, último acesso)
+        self._cache_version = -1
+        self._cache: Tuple[pd.DataFrame, pd.DataFrame] = (pd.DataFrame(), pd.DataFrame())
+
+    def ensure_seeded(self, path: str):
+        """Semeia o simulador com o XLSX apenas na primeira chamada do processo."""
+        with self._lock:
+            if self._seeded_from is not None:
+                return
+            self._seeded_from = path
+        self.sim.seed_from_profit_xlsx(path)
+
+    def mark_seeded(self, source: str):
+        """Feed já tem dados (ex.: restaurado de checkpoint): ensure_seeded não semeia de novo."""
+        with self._lock:
+            self._seeded_from = source
+
+    def snapshot(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """(negocios, ofertas) da janela corrente; reconstruídos só quando há dados novos."""
+        version = self.sim.version()
+        with self._lock:
+            if version == self._cache_version:
+                return self._cache
+        df_tr, df_of = self.sim.get_dataframes()
+        with self._lock:
+            self._cache_version = version
+            self._cache = (df_tr, df_of)
+        return df_tr, df_of
+
+    def book_snapshot(self, depth: int = 10) -> Optional[pd.DataFrame]:
+        """Livro corrente quando o feed mantém um (simulador no modo "book"); senão None."""
+        fn = getattr(self.sim, "book_snapshot", None)
+        return fn(depth) if callable(fn) else None
+
+    # --- cursores por sessão ---
+    def register_session(self, session_id: str, backfill: int = 0, cursor: Optional[int] = None) -> int:
+        """
+        Cria o cursor da sessão; `backfill` faz a primeira leitura incluir os últimos N negócios.
+        `cursor` retoma uma sessão de checkpoint (limitado à versão atual do feed).
+        """
+        with self._lock:
+            if session_id not in self._cursors:
+                version = self.sim.version()
+                start = min(int(cursor), version) if cursor is not None else max(0, version - int(backfill))
+                self._cursors[session_id] = (start, time.time())
+            self._prune_locked()
+            return self._cursors[session_id][0]
+
+    def read_new(self, session_id: str) -> pd.DataFrame:
+        """Negócios recebidos desde a última leitura desta sessão (avança o cursor)."""
+        cursor = self.register_session(session_id)
+        df_new, version = self.sim.read_since(cursor)
+        with self._lock:
+            self._cursors[session_id] = (version, time.time())
+        return df_new
+
+    def session_cursor(self, session_id: str) -> int:
+        with self._lock:
+            return self._cursors.get(session_id, (0, 0.0))[0]
+
+    def drop_session(self, session_id: str):
+        with self._lock:
+            self._cursors.pop(session_id, None)
+
+    def session_count(self) -> int:
+        with self._lock:
+            return len(self._cursors)
+
+    def _prune_locked(self):
+        # Sessões que não leem há mais de session_ttl_s são descartadas
+        cutoff = time.time() - self.session_ttl_s
+        stale = [sid for sid, (_, ts) in self._cursors.items() if ts < cutoff]
+        for sid in stale:
+            del self._cursors[sid]
+
+def make_market_hub(ingest_mode: str = "thread", store_dir: str = "", checkpoint_dir: str = "",
+                    checkpoint_interval_s: float = 10.0, symbol: str = "SIM", start_price: float = 100000.0,
+                    vol: float = 2.0, tick_size: float = 5.0, max_rows: int = 100) -> MarketDataHub:
+    """
+    Monta o feed padrão do app/serviço: simulador em thread (opcionalmente gravando no tick store)
+    ou, com ingest_mode="process", ingestão em outro processo via memória compartilhada.
+    Com checkpoint_dir (modo thread), o feed retoma do último checkpoint e volta a gravá-lo a cada
+    checkpoint_interval_s enquanto gera dados. `symbol` nomeia o feed no tick store e no checkpoint
+    (um hub por símbolo: tape_gpt.data.multi).
+    """
+    params = dict(start_price=start_price, tick_ms=5000, vol=vol, max_rows=max_rows, tick_size=tick_size)
+    if ingest_mode == "process":
+        from tape_gpt.data.shm_ring import IngestProcess
+        return MarketDataHub(IngestProcess(source="simulator", **params))
+    sim = RealTimeSimulator(**params)
+    if store_dir:
+        # persiste os negócios simulados no tick store (sobrevive a reinícios)
+        sim.add_sink(BufferedAppender(TickStore(store_dir), symbol=symbol))
+    if not checkpoint_dir:
+        return MarketDataHub(sim)
+    store = CheckpointStore(checkpoint_dir)
+    name = f"feed-{symbol.lower()}"   # "SIM" -> SIM_CHECKPOINT
+    restored = restore_simulator(sim, store, name)
+    sim.add_sink(SimCheckpointSink(sim, store, checkpoint_interval_s, name))
+    hub = MarketDataHub(sim)
+    if restored:
+        hub.mark_seeded("checkpoint")
+    return hub
@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from typing import Tuple, Optional
+from tape_gpt.data.schema import compact_trades, compact_offers
 
 # --- Helpers ---
 def _to_numeric(series: pd.Series) -> pd.Series:
@@ -31,7 +32,7 @@ def _find_first_col(df: pd.DataFrame, names) -> Optional[str]:
 # --- Public loaders ---
 def load_csv_ts(file) -> pd.DataFrame:
     """Lê CSV com colunas timestamp,price,volume,side."""
-    return pd.read_csv(file, parse_dates=["timestamp"])
+    return compact_trades(pd.read_csv(file, parse_dates=["timestamp"]))
 
 def parse_profit_excel(file) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
     """
@@ -157,5 +158,6 @@ def parse_profit_excel(file) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
         if sell_price_col:   df_off["sell_price"]   = _to_numeric(df_ofertas[sell_price_col])
         if sell_qty_col:     df_off["sell_qty"]     = _to_numeric(df_ofertas[sell_qty_col])
         if seller_agent_col: df_off["seller_agent"] = df_ofertas[seller_agent_col]
+        df_off = compact_offers(df_off)
 
-    return df_tr, df_off
\ No newline at end of file
+    return compact_trades(df_tr), df_off
\ No newline at end of file
@@ -0,0 +1,140 @@
+# tape_gpt/data/matching.py
+
+import heapq
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+BUY, SELL = 1, -1
+
+class OrderBook:
+    """
+    Livro de ofertas com prioridade preço-tempo, em preços inteiros (ticks do livro).
+    - Cada nível é uma fila FIFO de ordens [order_id, agente, qtd]; a qtd total por nível é mantida
+      à parte para consultas de profundidade sem percorrer as filas.
+    - Melhor preço via heap com remoção preguiçosa de níveis vazios.
+    - Negócios e atualizações de topo são acumulados em listas (drain_* esvazia), para que o
+      chamador os converta em lote.
+    """
+    def __init__(self):
+        self._levels = {BUY: {}, SELL: {}}        # lado -> {preço: deque de ordens}
+        self._qty = {BUY: {}, SELL: {}}           # lado -> {preço: qtd total}
+        self._heap = {BUY: [], SELL: []}          # bids como -preço, asks como preço
+        self._orders: Dict[int, Tuple[int, int]] = {}   # order_id -> (lado, preço)
+        self._next_id = 1
+        self.trades: List[tuple] = []              # (ts, preço, qtd, lado agressor, comprador, vendedor)
+        self.quotes: List[tuple] = []              # (ts, bid, qty_bid, agente_bid, ask, qty_ask, agente_ask)
+        self._last_top = None
+
+    # --- consultas ---
+    def best(self, side: int) -> Optional[int]:
+        heap, qty = self._heap[side], self._qty[side]
+        while heap:
+            p = -heap[0] if side == BUY else heap[0]
+            if qty.get(p, 0) > 0:
+                return p
+            heapq.heappop(heap)
+            qty.pop(p, None)
+            self._levels[side].pop(p, None)
+        return None
+
+    def _top(self, side: int) -> Tuple[int, int, int]:
+        p = self.best(side)
+        if p is None:
+            return 0, 0, -1
+        return p, self._qty[side][p], self._levels[side][p][0][1]
+
+    def depth(self, n: int = 10) -> Tuple[List[tuple], List[tuple]]:
+        """[(preço, qtd, agente da 1ª ordem)] dos n melhores níveis de cada lado."""
+        out = []
+        for side in (BUY, SELL):
+            prices = [p for p, q in self._qty[side].items() if q > 0]
+            prices = heapq.nlargest(n, prices) if side == BUY else heapq.nsmallest(n, prices)
+            out.append([(p, self._qty[side][p], self._levels[side][p][0][1]) for p in prices])
+        return out[0], out[1]
+
+    def _publish_top(self, ts: int):
+        top = self._top(BUY) + self._top(SELL)
+        if top != self._last_top:
+            self._last_top = top
+            self.quotes.append((ts,) + top)
+
+    # --- fluxo de ordens ---
+    def _rest(self, side: int, price: int, qty: int, agent: int) -> int:
+        oid = self._next_id
+        self._next_id += 1
+        level = self._levels[side].get(price)
+        if level is None:
+            level = self._levels[side][price] = deque()
+            heapq.heappush(self._heap[side], -price if side == BUY else price)
+        level.append([oid, agent, qty])
+        self._qty[side][price] = self._qty[side].get(price, 0) + qty
+        self._orders[oid] = (side, price)
+        return oid
+
+    def _match(self, side: int, qty: int, agent: int, limit: Optional[int], ts: int) -> int:
+        """Agride o lado oposto até `limit` (None = mercado). Devolve a qtd não executada."""
+        opp = -side
+        while qty > 0:
+            p = self.best(opp)
+            if p is None or (limit is not None and ((side == BUY and p > limit) or (side == SELL and p < limit))):
+                break
+            level = self._levels[opp][p]
+            while qty > 0 and level:
+                order = level[0]
+                fill = min(qty, order[2])
+                order[2] -= fill
+                qty -= fill
+                self._qty[opp][p] -= fill
+                buyer, seller = (agent, order[1]) if side == BUY else (order[1], agent)
+                self.trades.append((ts, p, fill, side, buyer, seller))
+                if order[2] == 0:
+                    level.popleft()
+                    self._orders.pop(order[0], None)
+        return qty
+
+    def limit(self, agent: int, side: int, price: int, qty: int, ts: int) -> Optional[int]:
+        """Ordem limitada: executa o que cruzar e deixa o resto no livro. Devolve o id (ou None)."""
+        rest = self._match(side, int(qty), agent, price, ts)
+        oid = self._rest(side, price, rest, agent) if rest > 0 else None
+        self._publish_top(ts)
+        return oid
+
+    def market(self, agent: int, side: int, qty: int, ts: int):
+        self._match(side, int(qty), agent, None, ts)
+        self._publish_top(ts)
+
+    def cancel(self, order_id: int, ts: int) -> bool:
+        loc = self._orders.pop(order_id, None)
+        if loc is None:
+            return False
+        side, price = loc
+        level = self._levels[side].get(price)
+        if level:
+            for i, order in enumerate(level):
+                if order[0] == order_id:
+                    self._qty[side][price] -= order[2]
+                    del level[i]
+                    break
+        self._publish_top(ts)
+        return True
+
+    def random_order_id(self, rng: np.random.Generator) -> Optional[int]:
+        """Uma ordem viva qualquer (alvo de cancelamento na simulação)."""
+        if not self._orders:
+            return None
+        # ids crescem monotonicamente; sorteia até achar um vivo (poucas tentativas na prática)
+        lo = self._next_id - 4 * len(self._orders) - 1
+        for _ in range(8):
+            oid = int(rng.integers(max(1, lo), self._next_id))
+            if oid in self._orders:
+                return oid
+        return next(iter(self._orders))
+
+    def drain_trades(self) -> List[tuple]:
+        out, self.trades = self.trades, []
+        return out
+
+    def drain_quotes(self) -> List[tuple]:
+        out, self.quotes = self.quotes, []
+        return out
@@ -0,0 +1,375 @@
+# file: tape_gpt/data/multi.py
+"""
+Vários instrumentos ao mesmo tempo (WIN, WDO, ações...):
+  - um MarketDataHub por símbolo (feed, cursores e checkpoint próprios);
+  - um SymbolPipeline por símbolo, incremental: lê do hub só os negócios novos e mantém janela
+    normalizada, índice por agente, barras/imbalances, sinal principal, top agressores e topo do livro,
+    mais a série do livro (spread/profundidade por barra, BookSeries ligado ao feed como sink);
+  - MultiSymbolHub agenda os passos dos pipelines num pool de workers (no máximo um passo em
+    andamento por símbolo, só para símbolos com dados novos), em background e fora do script do app;
+    a parte incremental (leitura do feed, índices) roda no agendador e a análise da janela
+    (analyze_window: resample/groupby do pandas, que segura o GIL) vai para um pool de processos
+    quando há mais de um núcleo; watchlist() lê apenas os últimos resultados prontos;
+  - cross_asset(): correlação e lead-lag entre os símbolos (analysis.cross_asset), mantida em dia
+    pelo agendador e recalculada só quando algum feed avança.
+"""
+import argparse, os, threading, time
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.analysis.agents import AgentIndex
+from tape_gpt.analysis.cross_asset import analyze_cross_asset
+from tape_gpt.analysis.liquidity import BookSeries
+from tape_gpt.analysis.microstructure import TapeSpeed
+from tape_gpt.analysis.orderflow import top_aggressors
+from tape_gpt.analysis.rule_based import analyze_tape
+from tape_gpt.data.hub import MarketDataHub, make_market_hub
+from tape_gpt.data.preprocess import StreamingPreprocessor, compute_imbalances
+
+# Parâmetros do simulador e descrição do mercado (para o prompt) por símbolo
+SYMBOL_SPECS = {
+    "WIN": {"start_price": 130000.0, "vol": 5.0, "tick_size": 5.0, "market": "índice (mini-índice futuro WIN)"},
+    "WDO": {"start_price": 5400.0, "vol": 0.5, "tick_size": 0.5, "market": "dólar (mini-dólar futuro WDO)"},
+}
+_EQUITY_SPEC = {"start_price": 30.0, "vol": 0.02, "tick_size": 0.01}
+
+WINDOW_S = 120.0          # janela por símbolo em segundos de tape (sobra para cross_asset a 1s e lags)
+DEFAULT_RATE = 1000.0     # taxa padrão do simulador (negócios/s) nos modos poisson/hawkes/book
+
+def symbol_spec(symbol: str) -> dict:
+    """Spec do símbolo; desconhecidos são tratados como ação (preço ~30, tick 0,01)."""
+    spec = SYMBOL_SPECS.get(symbol.upper())
+    return dict(spec) if spec else dict(_EQUITY_SPEC, market=f"ações ({symbol.upper()})")
+
+def parse_watchlist(text: str) -> List[str]:
+    """"WIN, WDO,petr4" -> ["WIN", "WDO", "PETR4"] (sem repetidos, na ordem dada)."""
+    out = []
+    for s in str(text or "").replace(";", ",").split(","):
+        s = s.strip().upper()
+        if s and s not in out:
+            out.append(s)
+    return out
+
+def analyze_window(df: pd.DataFrame, freq: str, lookback: str, micro: dict, book: dict) -> Tuple[pd.DataFrame, dict]:
+    """
+    Análise de uma janela normalizada (imbalances, sinal principal, top agressores). Função de módulo,
+    sem estado: pode rodar num processo do pool (argumentos e retorno vão por pickle).
+    """
+    imbs = compute_imbalances(df, window=freq)
+    insights = analyze_tape(df, imbs, freq=freq, micro=micro, book=book)
+    top_buy, top_sell = top_aggressors(df, lookback=lookback, top_n=5)
+    insights["top_buy_aggressors"] = list(zip(top_buy["agent"].tolist(), top_buy["volume"].tolist()))
+    insights["top_sell_aggressors"] = list(zip(top_sell["agent"].tolist(), top_sell["volume"].tolist()))
+    return imbs, insights
+
+class SymbolPipeline:
+    """
+    Pipeline incremental de um símbolo sobre o hub dele. advance()/step() não são reentrantes: o
+    MultiSymbolHub garante um passo por vez por símbolo. O resultado é um dict somente leitura.
+    """
+    def __init__(self, symbol: str, hub: MarketDataHub, freq: str = "5s", lookback: str = "30min",
+                 book_depth: int = 10):
+        self.symbol = symbol
+        self.hub = hub
+        self.freq = freq
+        self.lookback = lookback
+        self.book_depth = int(book_depth)
+        self._session = f"pipeline:{symbol}"
+        self.stream = StreamingPreprocessor(max_rows=hub.sim.max_rows)
+        self.agents = AgentIndex()
+        self.speed = TapeSpeed()
+        self.book = BookSeries()          # consome todo lote de ofertas do feed (não só a janela)
+        self.book.attach(hub.sim)
+        self.version = -1
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None   # último erro do passo (o resultado anterior continua valendo)
+        hub.register_session(self._session, backfill=hub.sim.max_rows)
+
+    def advance(self) -> Optional[Tuple[int, float, tuple]]:
+        """
+        Parte incremental do passo (no processo do app): lê só os negócios novos e atualiza janela e
+        índices. Devolve (versão, t0, argumentos de analyze_window) ou None se não há o que analisar.
+        """
+        version = self.hub.sim.version()
+        if version == self.version:
+            return None
+        t0 = time.perf_counter()
+        new = self.hub.read_new(self._session)
+        self.stream.update(new)
+        self.agents.update(new)
+        self.speed.update(new)
+        df = self.stream.frame()
+        self.version = version
+        if len(df) == 0:
+            return None
+        return version, t0, (df, self.freq, self.lookback, self.speed.stats(), self.book.stats(self.freq))
+
+    def finish(self, version: int, t0: float, df: pd.DataFrame, imbs: pd.DataFrame, insights: dict) -> dict:
+        """Publica o resultado de analyze_window para a versão lida em advance()."""
+        self.result = {
+            "symbol": self.symbol,
+            "version": version,
+            "df": df,
+            "imbs": imbs,
+            "insights": insights,
+            "book": self._book_top(),
+            "ms": (time.perf_counter() - t0) * 1000,
+            "updated_at": time.time(),
+        }
+        self.error = None
+        return self.result
+
+    def step(self) -> Optional[dict]:
+        """Passo completo no thread atual (advance + analyze_window + finish)."""
+        job = self.advance()
+        if job is None:
+            return self.result
+        version, t0, args = job
+        return self.finish(version, t0, args[0], *analyze_window(*args))
+
+    def _book_top(self) -> dict:
+        # livro do motor (modo "book") ou, sem ele, a última oferta do feed
+        book = self.hub.book_snapshot(depth=self.book_depth)
+        if book is not None and len(book) > 0:
+            bid, ask = book["bid"].dropna(), book["ask"].dropna()
+            return {"bid": float(bid.iloc[0]) if len(bid) else np.nan, "ask": float(ask.iloc[0]) if len(ask) else np.nan}
+        offers = self.hub.snapshot()[1]
+        if offers is None or len(offers) == 0:
+            return {"bid": np.nan, "ask": np.nan}
+        last = offers.iloc[-1]
+        return {"bid": float(last["bid"]), "ask": float(last["ask"])}
+
+class MultiSymbolHub:
+    """
+    Hubs e pipelines por símbolo; start() roda o agendador em background.
+    A análise das janelas (analyze_window) segura o GIL na maior parte do tempo (resample/groupby do
+    pandas), então threads não escalam: com executor="process" ela roda num ProcessPoolExecutor
+    (contexto spawn, como o IngestProcess) e a janela vai por pickle. O padrão ("auto") usa processos
+    quando há mais de um núcleo e threads numa máquina de um núcleo só (sem ganho, sem custo de cópia).
+    """
+    def __init__(self, hubs: Dict[str, MarketDataHub], freq: str = "5s", max_workers: Optional[int] = None,
+                 interval_s: float = 1.0, executor: str = "auto"):
+        if not hubs:
+            raise ValueError("Informe ao menos um símbolo.")
+        if executor not in ("auto", "thread", "process"):
+            raise ValueError(f"Executor inválido: {executor} (use auto, thread ou process)")
+        self.hubs = dict(hubs)
+        self.pipelines = {s: SymbolPipeline(s, h, freq) for s, h in self.hubs.items()}
+        self.max_workers = int(max_workers or min(len(self.hubs), os.cpu_count() or 1))
+        self.interval_s = float(interval_s)
+        if executor == "auto":
+            executor = "process" if (os.cpu_count() or 1) > 1 else "thread"
+        self.executor = executor
+        if executor == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn"))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._running = False
+        self._th: Optional[threading.Thread] = None
+        self.last_cycle_ms = 0.0
+        self._cross = (None, None)   # (chave: parâmetros + versões dos pipelines, insights)
+        self._cross_params = None    # últimos parâmetros pedidos: o agendador mantém o resultado em dia
+
+    def symbols(self) -> List[str]:
+        return list(self.hubs)
+
+    def hub(self, symbol: str) -> MarketDataHub:
+        try:
+            return self.hubs[symbol]
+        except KeyError:
+            raise ValueError(f"Símbolo fora da watchlist: {symbol}") from None
+
+    def market(self, symbol: str) -> str:
+        return symbol_spec(symbol)["market"]
+
+    def result(self, symbol: str) -> Optional[dict]:
+        return self.pipelines[symbol].result
+
+    def book_series(self, symbol: str) -> BookSeries:
+        """Série do livro por barra do símbolo (atualizada pelo feed a cada lote)."""
+        self.hub(symbol)
+        return self.pipelines[symbol].book
+
+    def refresh(self, symbols: Optional[Sequence[str]] = None, block: bool = True) -> Dict[str, Optional[dict]]:
+        """Agenda um passo de cada pipeline com dados novos; block=True espera os passos terminarem."""
+        t0 = time.perf_counter()
+        pending = []
+        with self._lock:
+            for s in symbols or self.symbols():
+                p = self.pipelines[s]
+                fut = self._futures.get(s)
+                if fut is not None and not fut.done():
+                    pending.append(fut)          # passo anterior ainda rodando: não empilha outro
+                elif p.hub.sim.version() != p.version:
+                    self._futures[s] = fut = self._submit(p)
+                    pending.append(fut)
+        if block and pending:
+            wait(pending)
+            self.last_cycle_ms = (time.perf_counter() - t0) * 1000
+        return {s: self.pipelines[s].result for s in symbols or self.symbols()}
+
+    def _submit(self, p: SymbolPipeline) -> Future:
+        """
+        advance() aqui, analyze_window no pool. O Future devolvido só termina depois que o resultado foi
+        publicado no pipeline (refresh(block=True) já encontra p.result atualizado).
+        """
+        out: Future = Future()
+        try:
+            job = p.advance()
+        except Exception as e:
+            p.error = repr(e)
+            out.set_exception(e)
+            return out
+        if job is None:
+            out.set_result(p.result)
+            return out
+        version, t0, args = job
+
+        def _done(f: Future):
+            try:
+                out.set_result(p.finish(version, t0, args[0], *f.result()))
+            except Exception as e:
+                p.error = repr(e)
+                out.set_exception(e)
+        self._pool.submit(analyze_window, *args).add_done_callback(_done)
+        return out
+
+    def cross_asset(self, freq: str = "1s", window: int = 60, max_lag: int = 30) -> dict:
+        """Correlação/lead-lag entre os símbolos nas janelas atuais; recalcula só se algum feed avançou."""
+        key = (freq, int(window), int(max_lag), tuple(p.version for p in self.pipelines.values()))
+        with self._lock:
+            self._cross_params = key[:3]
+            if self._cross[0] == key:
+                return self._cross[1]
+        frames = {s: p.result["df"] for s, p in self.pipelines.items() if p.result is not None}
+        insights = analyze_cross_asset(frames, freq=freq, window=window, max_lag=max_lag)
+        with self._lock:
+            self._cross = (key, insights)
+        return insights
+
+    def _loop(self):
+        while self._running:
+            t0 = time.monotonic()
+            try:
+                self.refresh(block=True)
+                if self._cross_params is not None:
+                    self.cross_asset(*self._cross_params)
+            except Exception:
+                pass   # falha de um ciclo não derruba o agendador; o próximo ciclo tenta de novo
+            time.sleep(max(0.0, self.interval_s - (time.monotonic() - t0)))
+
+    def start(self):
+        """Agendador em background (idempotente)."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._th = threading.Thread(target=self._loop, name="pipeline-scheduler", daemon=True)
+            self._th.start()
+
+    def stop(self):
+        self._running = False
+        if self._th is not None:
+            self._th.join(timeout=2 * self.interval_s + 1)
+            self._th = None
+
+    def close(self):
+        self.stop()
+        for p in self.pipelines.values():
+            p.book.stop()       # seguidoras de ofertas (feeds em outro processo)
+        self._pool.shutdown(wait=True)
+
+    def watchlist(self) -> pd.DataFrame:
+        """Uma linha por símbolo com o sinal principal e o resumo do último passo (não recalcula nada)."""
+        rows = []
+        for s in self.symbols():
+            r = self.pipelines[s].result
+            running = self.hubs[s].sim.is_running()
+            if r is None:
+                rows.append({"símbolo": s, "sinal": self.pipelines[s].error or "—", "rodando": running})
+                continue
+            ins = r["insights"]
+            sig = ins.get("main_signal", {})
+            top_buy, top_sell = ins.get("top_buy_aggressors") or [], ins.get("top_sell_aggressors") or []
+            rows.append({
+                "símbolo": s,
+                "sinal": f"{sig.get('icon', '')} {sig.get('label', '')}".strip(),
+                "último": float(r["df"]["price"].iloc[-1]),
+                "var. %": ins.get("price_change_pct", 0.0),
+                "imbalance": ins.get("imb_last", 0.0),
+                "agressão": ins.get("aggressor_strength", 0.0),
+                "bid": r["book"]["bid"],
+                "ask": r["book"]["ask"],
+                "spread": ins.get("book", {}).get("spread_recent", np.nan),
+                "atualiz./s": ins.get("book", {}).get("update_rate", np.nan),
+                "top comprador": top_buy[0][0] if top_buy else "",
+                "top vendedor": top_sell[0][0] if top_sell else "",
+                "negócios": len(r["df"]),
+                "passo (ms)": r["ms"],
+                "rodando": running,
+            })
+        return pd.DataFrame(rows)
+
+def make_multi_hub(symbols: Sequence[str], ingest_mode: str = "thread", store_dir: str = "", checkpoint_dir: str = "",
+                   checkpoint_interval_s: float = 10.0, freq: str = "5s", max_workers: Optional[int] = None,
+                   max_rows: Optional[int] = None, window_s: float = WINDOW_S, executor: str = "auto") -> MultiSymbolHub:
+    """
+    Um make_market_hub por símbolo (parâmetros de SYMBOL_SPECS) reunidos num MultiSymbolHub.
+    A janela de cada feed é dimensionada por tempo: window_s segundos à taxa padrão do simulador
+    (max_rows explícito tem precedência).
+    """
+    max_rows = int(max_rows or window_s * DEFAULT_RATE)
+    hubs = {}
+    for s in symbols:
+        spec = symbol_spec(s)
+        hubs[s] = make_market_hub(ingest_mode, store_dir, checkpoint_dir, checkpoint_interval_s, symbol=s,
+                                  start_price=spec["start_price"], vol=spec["vol"], tick_size=spec["tick_size"],
+                                  max_rows=max_rows)
+    return MultiSymbolHub(hubs, freq=freq, max_workers=max_workers, executor=executor)
+
+def benchmark(n_symbols: int = 8, rows: int = 20000, workers: Sequence[int] = (1, 2, 4, 8), rounds: int = 5,
+              executors: Sequence[str] = ("thread", "process")) -> pd.DataFrame:
+    """
+    Tempo de um ciclo completo (todos os símbolos com dados novos) por executor e nº de workers.
+    O speedup é relativo a 1 worker em threads; só há ganho real com processos e mais de um núcleo
+    (a coluna "núcleos" registra os da máquina da medição).
+    """
+    out = []
+    for ex in executors:
+        for w in workers:
+            symbols = [f"SYM{i}" for i in range(n_symbols)]
+            multi = make_multi_hub(symbols, max_workers=w, max_rows=rows, executor=ex)
+            chunk, now = rows // 4, time.time_ns()
+            times = []
+            for r in range(rounds + 1):   # a 1ª rodada aquece o pool (spawn + imports nos processos)
+                ts = now + (r * chunk + np.arange(chunk, dtype="int64")) * 1_000_000   # 1 negócio/ms
+                for h in multi.hubs.values():
+                    h.sim._emit(ts, h.sim.vol)
+                t0 = time.perf_counter()
+                multi.refresh(block=True)
+                times.append((time.perf_counter() - t0) * 1000)
+            multi.close()
+            out.append({"executor": ex, "workers": w, "núcleos": os.cpu_count() or 1, "símbolos": n_symbols,
+                        "linhas/símbolo": rows, "ciclo mediano (ms)": float(np.median(times[1:]))})
+    df = pd.DataFrame(out)
+    df["speedup"] = df["ciclo mediano (ms)"].iloc[0] / df["ciclo mediano (ms)"]
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Ciclo dos pipelines por símbolo: threads x processos, por nº de workers.")
+    parser.add_argument("--symbols", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20000, help="janela de negócios por símbolo")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--executors", default="thread,process")
+    args = parser.parse_args()
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    executors = [e.strip() for e in args.executors.split(",") if e.strip()]
+    print(benchmark(args.symbols, args.rows, workers, args.rounds, executors).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,155 @@
 # file: tape_gpt/data/preprocess.py
+import numpy as np
 import pandas as pd
+from typing import Optional
+from tape_gpt.data.schema import TRADE_COLUMNS, SIDE_DTYPE, compact_trades
+from tape_gpt.data.ring import AgentTable, trades_records, trades_frame
+
+NORMALIZED_FLAG = "tape_normalized"   # df.attrs: saída de preprocess_ts (schema + ordenação garantidos)
+
+def is_normalized(df: pd.DataFrame) -> bool:
+    """
+    True se df já está no contrato de saída do preprocess_ts: colunas e dtypes do schema compacto,
+    sem nulos em timestamp/price e ordenado por timestamp.
+    """
+    if list(df.columns[:len(TRADE_COLUMNS)]) != TRADE_COLUMNS:
+        return False
+    ts = df["timestamp"]
+    if str(ts.dtype) != "datetime64[ns, UTC]" or df["price"].dtype != "float64" or df["volume"].dtype != "int32":
+        return False
+    if df["side"].dtype != SIDE_DTYPE:
+        return False
+    # a marca em attrs se propaga para frames derivados (ex.: preprocess_ts(df).sort_values("price")),
+    # então a ordenação é sempre conferida (O(n), sem cópia); a marca só dispensa a checagem de nulos
+    if not ts.is_monotonic_increasing:
+        return False
+    if df.attrs.get(NORMALIZED_FLAG):
+        return True
+    return bool(not ts.isna().any() and not df["price"].isna().any())
+
+def _mark(df: pd.DataFrame) -> pd.DataFrame:
+    df.attrs[NORMALIZED_FLAG] = True
+    return df
 
 def preprocess_ts(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or not isinstance(df, pd.DataFrame) or df.empty:
         return pd.DataFrame(columns=["timestamp", "price", "volume"])
 
-    df = df.copy()
+    # Caminho rápido: entrada já normalizada volta sem cópia
+    if is_normalized(df):
+        return _mark(df if len(df.columns) == len(TRADE_COLUMNS) else df[TRADE_COLUMNS])
 
-    # Padroniza e remove colunas duplicadas (evita DataFrame em df["price"])
-    df.columns = [str(c).strip() for c in df.columns]
-    if getattr(df.columns, "duplicated", None) is not None and df.columns.duplicated().any():
-        df = df.loc[:, ~df.columns.duplicated()]
+    # Padroniza nomes sem mutar/copiar o frame de entrada; em duplicatas, vale a primeira coluna
+    # (evita DataFrame em df["price"])
+    pos = {}
+    for i, c in enumerate(df.columns):
+        pos.setdefault(str(c).strip(), i)
+
+    def _col(name: str) -> pd.Series:
+        return df.iloc[:, pos[name]]
 
     # Mapeia nomes comuns -> internos
     col_price_candidates  = ["price", "Preço", "preco", "Valor", "valor", "Price"]
     col_volume_candidates = ["volume", "Volume", "Quantidade", "qty", "Qty", "QTY"]
 
-    price_col = next((c for c in col_price_candidates  if c in df.columns), None)
-    vol_col   = next((c for c in col_volume_candidates if c in df.columns), None)
-
-    # Falhas: cria colunas vazias para manter contrato de saída
-    if price_col is None:
-        df["price"] = pd.NA
-    if vol_col is None:
-        df["volume"] = pd.NA
-
-    # Se price/volume retornarem DataFrame (colunas duplicadas upstream), reduz para Series
-    def _series_or_first(colname: str):
-        obj = df[colname]
-        if isinstance(obj, pd.DataFrame):  # proteção para pandas com nomes duplicados
-            return obj.iloc[:, 0]
-        return obj
+    price_col = next((c for c in col_price_candidates  if c in pos), None)
+    vol_col   = next((c for c in col_volume_candidates if c in pos), None)
 
-    price_series = _series_or_first(price_col) if price_col else df["price"]
-    vol_series   = _series_or_first(vol_col)   if vol_col   else df["volume"]
-
-    df["price"]  = pd.to_numeric(price_series, errors="coerce")
-    df["volume"] = pd.to_numeric(vol_series,   errors="coerce")
+    # Falhas: colunas vazias para manter contrato de saída
+    na = pd.Series(pd.NA, index=df.index, dtype="object")
+    price = pd.to_numeric(_col(price_col), errors="coerce") if price_col else na
+    volume = pd.to_numeric(_col(vol_col), errors="coerce") if vol_col else na
 
     # timestamp: tenta várias convenções
     ts_candidates = ["timestamp", "Timestamp", "datahora", "DataHora", "time", "Time", "datetime", "DateTime"]
-    ts_col = next((c for c in ts_candidates if c in df.columns), None)
+    ts_col = next((c for c in ts_candidates if c in pos), None)
     if ts_col:
-        ts = pd.to_datetime(df[ts_col], errors="coerce", utc=True)
+        ts = _col(ts_col)
+        if str(ts.dtype) != "datetime64[ns, UTC]":
+            ts = pd.to_datetime(ts, errors="coerce", utc=True)
     else:
         # Se não houver timestamp, cria sequência sintética
-        ts = pd.date_range(end=pd.Timestamp.utcnow(), periods=len(df), freq="S")
-    df["timestamp"] = ts
+        ts = pd.Series(pd.date_range(end=pd.Timestamp.utcnow(), periods=len(df), freq="s"), index=df.index)
 
     # Campos opcionais que o pipeline aproveita
     # (side, buyer_agent, seller_agent podem ou não existir)
-    for opt in ["side", "buyer_agent", "seller_agent"]:
-        if opt not in df.columns:
-            df[opt] = pd.NA
+    out = pd.DataFrame({
+        "timestamp": ts,
+        "price": price,
+        "volume": volume,
+        "side": _col("side") if "side" in pos else na,
+        "buyer_agent": _col("buyer_agent") if "buyer_agent" in pos else na,
+        "seller_agent": _col("seller_agent") if "seller_agent" in pos else na,
+    }, index=df.index)
+
+    # Limpa e ordena (só quando necessário)
+    valid = out[["timestamp", "price", "volume"]].notna().all(axis=1)
+    if not valid.all():
+        out = out.loc[valid].copy()
+    if not out["timestamp"].is_monotonic_increasing:
+        out = out.sort_values("timestamp", kind="stable")
+    # schema compacto: volume int32, side/agentes categóricos, timestamp em ns
+    return _mark(compact_trades(out))
+
+class StreamingPreprocessor:
+    """
+    Normaliza somente as linhas novas de um feed e mantém uma janela já normalizada.
+    Uso: sp.update(hub.read_new(session_id)); df = sp.frame()  — frame() só remonta a janela
+    quando chegou algo novo, então refreshes sem dados novos não copiam nada.
+    """
+    def __init__(self, max_rows: Optional[int] = None):
+        self.max_rows = max_rows
+        self._chunks = []
+        self._rows = 0
+        self._frame: Optional[pd.DataFrame] = None
+
+    def update(self, df_new: pd.DataFrame) -> int:
+        if df_new is None or len(df_new) == 0:
+            return 0
+        chunk = preprocess_ts(df_new)
+        if len(chunk) == 0:
+            return 0
+        self._chunks.append(chunk)
+        self._rows += len(chunk)
+        # descarta blocos inteiros que já saíram da janela
+        while self.max_rows and len(self._chunks) > 1 and self._rows - len(self._chunks[0]) >= self.max_rows:
+            self._rows -= len(self._chunks.pop(0))
+        self._frame = None
+        return len(chunk)
 
-    # Limpa e ordena
-    df = df.dropna(subset=["timestamp", "price", "volume"])
-    df = df.sort_values("timestamp")
-    return df[["timestamp", "price", "volume", "side", "buyer_agent", "seller_agent"]]
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            if not self._chunks:
+                return pd.DataFrame(columns=TRADE_COLUMNS)
+            if len(self._chunks) > 1:
+                merged = pd.concat(self._chunks, ignore_index=True)
+                self._chunks = [merged]
+            df = self._chunks[0]
+            if self.max_rows and len(df) > self.max_rows:
+                df = df.iloc[-self.max_rows:].reset_index(drop=True)
+                self._chunks = [df]
+                self._rows = len(df)
+            if not df["timestamp"].is_monotonic_increasing:
+                # blocos podem se sobrepor no tempo (fontes com relógios diferentes)
+                df = df.sort_values("timestamp", kind="stable")
+                self._chunks = [df]
+            self._frame = _mark(compact_trades(df))
+        return self._frame
+
+    def state(self):
+        """(arrays, meta) da janela em registros TRADE_DTYPE (checkpoint); inverso de from_state."""
+        agents = AgentTable()
+        df = self.frame()
+        return {"trades": trades_records(df, agents)}, {"max_rows": self.max_rows, "agents": agents.names()}
+
+    @classmethod
+    def from_state(cls, arrays, meta) -> "StreamingPreprocessor":
+        sp = cls(max_rows=meta.get("max_rows"))
+        rows = arrays["trades"]
+        if len(rows):
+            df = _mark(trades_frame(rows, AgentTable(meta["agents"])))
+            sp._chunks, sp._rows, sp._frame = [df], len(df), df
+        return sp
 
 def compute_imbalances(df: pd.DataFrame, window: str = "1min") -> pd.DataFrame:
     temp = df.set_index("timestamp")
@@ -77,4 +169,77 @@ def compute_imbalances(df: pd.DataFrame, window: str = "1min") -> pd.DataFrame:
         "total_volume": total_volume
     })
     out.index.name = "timestamp"
-    return out
\ No newline at end of file
+    return out
+
+# ---------------- benchmark (python -m tape_gpt.data.preprocess --rows 200000) ----------------
+
+def _refresh_steps(freq: str):
+    """Etapas de um refresh do Painel sobre a janela de negócios (mesma ordem do app)."""
+    from tape_gpt.analysis.rule_based import analyze_tape
+    from tape_gpt.analysis.orderflow import top_aggressors
+    from tape_gpt.viz.time_sales import time_and_sales_figure
+
+    def _imbalances(st):
+        st["imbs"] = compute_imbalances(st["df"], window=freq)
+    return [
+        ("preprocess_ts", lambda st: st.update(df=preprocess_ts(st["in"]))),
+        ("compute_imbalances", _imbalances),
+        ("analyze_tape", lambda st: analyze_tape(st["df"], st["imbs"], freq=freq)),
+        ("top_aggressors", lambda st: top_aggressors(st["df"], lookback="30min", top_n=5)),
+        ("time_and_sales_figure", lambda st: time_and_sales_figure(st["df"], limit=200)),
+    ]
+
+def benchmark(rows: int = 200_000, freq: str = "1min") -> pd.DataFrame:
+    """
+    Memória de um refresh: pico alocado (tracemalloc) por etapa, em MB e em cópias da janela
+    (pico / bytes do frame normalizado). Compara entrada crua (upload: strings/object, fora de ordem
+    em blocos) com a janela já normalizada que o StreamingPreprocessor entrega ao app.
+    """
+    import tracemalloc
+    rng = np.random.default_rng(0)
+    ts = pd.Timestamp("2024-01-02 13:00", tz="UTC") + pd.to_timedelta(np.cumsum(rng.exponential(0.05, rows)), unit="s")
+    agents = np.array([f"AG{i}" for i in range(40)], dtype=object)
+    raw = pd.DataFrame({
+        "timestamp": ts.astype(str),
+        "price": (100000 + np.cumsum(rng.choice([-5.0, 0.0, 5.0], rows))).astype(object),
+        "volume": rng.integers(1, 50, rows).astype(object),
+        "side": rng.choice(np.array(["buy", "sell"], dtype=object), rows),
+        "buyer_agent": rng.choice(agents, rows),
+        "seller_agent": rng.choice(agents, rows),
+    })
+    sp = StreamingPreprocessor()
+    for chunk in np.array_split(np.arange(rows), 20):   # chega em lotes, como no feed
+        sp.update(raw.iloc[chunk])
+    window = sp.frame()
+    nbytes = int(window.memory_usage(deep=True).sum())
+
+    steps = _refresh_steps(freq)
+    warm = {"in": window}
+    for _, fn in steps:   # aquecimento: imports preguiçosos e compilação dos kernels fora da medição
+        fn(warm)
+
+    out = []
+    for label, df_in in (("entrada crua", raw), ("janela normalizada", window)):
+        total, state = 0, {"in": df_in}
+        tracemalloc.start()
+        for step, fn in steps:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(state)
+            peak = tracemalloc.get_traced_memory()[1] - base
+            total += peak
+            out.append({"entrada": label, "etapa": step, "pico (MB)": peak / 1e6, "cópias": peak / nbytes})
+        tracemalloc.stop()
+        out.append({"entrada": label, "etapa": "refresh (soma)", "pico (MB)": total / 1e6, "cópias": total / nbytes})
+    return pd.DataFrame(out)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Memória por refresh: entrada crua x janela normalizada.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--freq", default="1min")
+    args = parser.parse_args()
+    print(benchmark(args.rows, args.freq).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+if __name__ == "__main__":
+    main()
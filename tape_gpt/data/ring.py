@@ -0,0 +1,178 @@
+# tape_gpt/data/ring.py
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.data.schema import SIDE_DTYPE, price_to_ticks, ticks_to_price
+
+# Registros de tamanho fixo: agentes viram códigos int16 de uma tabela de nomes
+TRADE_DTYPE = np.dtype([
+    ("ts", "i8"),        # epoch em ns (UTC)
+    ("price", "i4"),     # em ticks (schema.PRICE_TICK)
+    ("volume", "i4"),
+    ("side", "i1"),      # 1=buy, -1=sell, 0=unknown
+    ("buyer", "i2"),
+    ("seller", "i2"),
+])
+OFFER_DTYPE = np.dtype([
+    ("ts", "i8"),
+    ("bid", "i4"),       # em ticks
+    ("ask", "i4"),
+    ("qty_bid", "i4"),
+    ("qty_ask", "i4"),
+    ("agent_bid", "i2"),
+    ("agent_ask", "i2"),
+])
+
+class ArrayRing:
+    """
+    Ring buffer de registros estruturados sobre um array NumPy (um escritor, N leitores).
+    `seq` conta tudo que já foi escrito e serve de cursor para leitores incrementais.
+    """
+    def __init__(self, dtype, capacity: int, data: Optional[np.ndarray] = None, header: Optional[np.ndarray] = None):
+        self.dtype = np.dtype(dtype)
+        self._hdr = header if header is not None else np.zeros(2, dtype=np.int64)
+        if header is None:
+            self._hdr[1] = int(capacity)
+        self.capacity = int(self._hdr[1])
+        self._data = data if data is not None else np.zeros(self.capacity, dtype=self.dtype)
+
+    def seq(self) -> int:
+        return int(self._hdr[0])
+
+    def __len__(self) -> int:
+        return min(self.seq(), self.capacity)
+
+    def write(self, rows: np.ndarray):
+        n = len(rows)
+        if n == 0:
+            return
+        seq = int(self._hdr[0])
+        if n > self.capacity:
+            seq += n - self.capacity
+            rows = rows[-self.capacity:]
+            n = self.capacity
+        start = seq % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = rows[:first]
+        if first < n:
+            self._data[:n - first] = rows[first:]
+        self._hdr[0] = seq + n       # publica somente após os dados estarem gravados
+
+    def read_since(self, cursor: int, limit: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """
+        Registros em (cursor, seq]. Sem wrap, devolve uma view (zero cópia), válida até o
+        escritor dar a volta no ring; consuma-a logo (ex.: montando o DataFrame).
+        """
+        seq = self.seq()
+        lo = max(int(cursor), seq - self.capacity)
+        if limit is not None:
+            lo = max(lo, seq - int(limit))
+        if lo >= seq:
+            return self._data[:0], seq
+        a, b = lo % self.capacity, (seq - 1) % self.capacity + 1
+        out = self._data[a:b] if a < b else np.concatenate([self._data[a:], self._data[:b]])
+        if self.seq() - lo > self.capacity:
+            # o escritor sobrescreveu o início enquanto líamos: descarta a parte inválida
+            skip = self.seq() - lo - self.capacity
+            out = out[skip:]
+        return out, seq
+
+    def restore(self, rows: np.ndarray, seq: int):
+        """Recoloca `rows` (os últimos registros gravados) e retoma a contagem em `seq` (checkpoint)."""
+        rows = rows[-self.capacity:]
+        self._hdr[0] = max(0, int(seq) - len(rows))
+        self.write(rows)
+
+class AgentTable:
+    """Tabela nome <-> código int16 dos agentes (códigos estáveis, só cresce)."""
+    def __init__(self, names: Optional[List[str]] = None, capacity: int = 4096):
+        self.capacity = int(capacity)
+        self._codes: Dict[str, int] = {}
+        self._names: List[str] = []
+        for n in names or []:
+            self.code(n)
+
+    def _publish(self, name: str):
+        pass  # ponto de extensão (ex.: tabela em memória compartilhada)
+
+    def code(self, agent) -> int:
+        agent = "" if agent is None or (isinstance(agent, float) and np.isnan(agent)) else str(agent)
+        c = self._codes.get(agent)
+        if c is None:
+            c = len(self._codes)
+            if c >= self.capacity:
+                return -1
+            self._codes[agent] = c
+            self._names.append(agent)
+            self._publish(agent)
+        return c
+
+    def codes(self, s: pd.Series) -> np.ndarray:
+        """Codifica uma coluna inteira (um lookup por valor distinto, não por linha)."""
+        cat = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+        table = np.array([self.code(x) for x in cat.cat.categories] + [-1], dtype="int16")
+        return table[cat.cat.codes.to_numpy()]   # código -1 (ausente) pega o último item
+
+    def names(self) -> List[str]:
+        return self._names
+
+    def categorical(self, codes: np.ndarray) -> pd.Categorical:
+        """Códigos viram categórico direto (sem materializar strings); -1 -> ausente."""
+        return pd.Categorical.from_codes(codes.astype("int16"), categories=self.names())
+
+def trades_records(df: pd.DataFrame, agents: AgentTable) -> np.ndarray:
+    """DataFrame de negócios (schema interno) -> registros TRADE_DTYPE."""
+    rec = np.zeros(len(df), dtype=TRADE_DTYPE)
+    if len(df) == 0:
+        return rec
+    rec["ts"] = pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[ns, UTC]").astype("int64").to_numpy()
+    rec["price"] = price_to_ticks(df["price"].to_numpy())
+    rec["volume"] = df["volume"].to_numpy()
+    side = df["side"].astype(str).str.lower().to_numpy() if "side" in df.columns else np.full(len(df), "")
+    rec["side"] = np.where(side == "buy", 1, np.where(side == "sell", -1, 0))
+    rec["buyer"] = agents.codes(df["buyer_agent"]) if "buyer_agent" in df.columns else -1
+    rec["seller"] = agents.codes(df["seller_agent"]) if "seller_agent" in df.columns else -1
+    return rec
+
+def offers_records(df: pd.DataFrame, agents: AgentTable) -> np.ndarray:
+    """DataFrame de ofertas (bid/ask/qty_bid/qty_ask/agent_bid/agent_ask) -> registros OFFER_DTYPE."""
+    rec = np.zeros(len(df), dtype=OFFER_DTYPE)
+    if len(df) == 0:
+        return rec
+    rec["ts"] = pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[ns, UTC]").astype("int64").to_numpy()
+    rec["bid"] = price_to_ticks(df["bid"].to_numpy())
+    rec["ask"] = price_to_ticks(df["ask"].to_numpy())
+    rec["qty_bid"] = df["qty_bid"].to_numpy()
+    rec["qty_ask"] = df["qty_ask"].to_numpy()
+    rec["agent_bid"] = agents.codes(df["agent_bid"]) if "agent_bid" in df.columns else -1
+    rec["agent_ask"] = agents.codes(df["agent_ask"]) if "agent_ask" in df.columns else -1
+    return rec
+
+def _utc_index(ns: np.ndarray) -> pd.DatetimeIndex:
+    # epoch ns -> datetime64[ns, UTC] sem passar pelo parser do to_datetime (~40x mais rápido)
+    return pd.DatetimeIndex(ns.astype("datetime64[ns]")).tz_localize("UTC")
+
+def trades_frame(rows: np.ndarray, agents: AgentTable) -> pd.DataFrame:
+    """Registros TRADE_DTYPE -> DataFrame no schema compacto."""
+    side_codes = np.where(rows["side"] > 0, 0, np.where(rows["side"] < 0, 1, 2))  # ordem de SIDE_DTYPE
+    return pd.DataFrame({
+        "timestamp": _utc_index(rows["ts"]),
+        "price": ticks_to_price(rows["price"]),
+        "volume": rows["volume"].astype("int32"),
+        "side": pd.Categorical.from_codes(side_codes, dtype=SIDE_DTYPE),
+        "buyer_agent": agents.categorical(rows["buyer"]),
+        "seller_agent": agents.categorical(rows["seller"]),
+    })
+
+def offers_frame(rows: np.ndarray, agents: AgentTable) -> pd.DataFrame:
+    """Registros OFFER_DTYPE -> DataFrame de ofertas no schema compacto."""
+    return pd.DataFrame({
+        "timestamp": _utc_index(rows["ts"]),
+        "agent_bid": agents.categorical(rows["agent_bid"]),
+        "qty_bid": rows["qty_bid"].astype("int32"),
+        "bid": ticks_to_price(rows["bid"]),
+        "ask": ticks_to_price(rows["ask"]),
+        "qty_ask": rows["qty_ask"].astype("int32"),
+        "agent_ask": agents.categorical(rows["agent_ask"]),
+    })
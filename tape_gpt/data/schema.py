@@ -0,0 +1,85 @@
+# tape_gpt/data/schema.py
+
+import numpy as np
+import pandas as pd
+
+# Schema canônico (compacto) dos negócios, aplicado na ingestão e preservado no pipeline:
+# - timestamp: datetime64[ns, UTC] (int64 em ns por baixo)
+# - price: float64 no DataFrame de análise; em transporte/armazenamento vai como int32 em ticks
+# - volume: int32
+# - side/agentes: categóricos (cada nome é guardado uma vez; groupby vira operação sobre códigos)
+SIDE_DTYPE = pd.CategoricalDtype(["buy", "sell", "unknown"])
+PRICE_TICK = 0.01   # resolução de preço para o encode em ticks (cobre índice, dólar e ações)
+
+TRADE_COLUMNS = ["timestamp", "price", "volume", "side", "buyer_agent", "seller_agent"]
+_CATEGORICAL = ("buyer_agent", "seller_agent", "aggressor")
+_OFFER_QTY = ("qty_bid", "qty_ask", "buy_qty", "sell_qty")
+_OFFER_AGENTS = ("agent_bid", "agent_ask", "buyer_agent", "seller_agent")
+
+def price_to_ticks(price, tick: float = PRICE_TICK) -> np.ndarray:
+    """Preço -> inteiro em ticks (int32 cobre até ~21 milhões de pontos com tick 0,01)."""
+    return np.rint(np.asarray(price, dtype="float64") / tick).astype("int32")
+
+def ticks_to_price(ticks, tick: float = PRICE_TICK) -> np.ndarray:
+    # tick = 1/k (0,01): dividir por k devolve o float mais próximo do preço decimal (99945 -> 999.45),
+    # igual ao preço original; multiplicar por 0,01 deixa erro de 1 ulp (999.4500000000001)
+    per = round(1.0 / tick)
+    if abs(per * tick - 1.0) < 1e-12:
+        return np.asarray(ticks, dtype="float64") / per
+    return np.asarray(ticks, dtype="float64") * tick
+
+def _as_category(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    return s.astype("category")
+
+def normalize_side(s: pd.Series) -> pd.Series:
+    """Lado do agressor em {'buy','sell','unknown'} como categórico."""
+    if isinstance(s.dtype, pd.CategoricalDtype) and s.dtype == SIDE_DTYPE:
+        return s
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # categórico com outras categorias (ex.: vindo do parquet/polars): normaliza só as categorias
+        cats = normalize_side(pd.Series(s.cat.categories))
+        lut = np.append(cats.cat.codes.to_numpy(), SIDE_DTYPE.categories.get_loc("unknown"))
+        codes = lut[s.cat.codes.to_numpy()]  # código -1 (nulo) cai no último slot -> unknown
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=SIDE_DTYPE), index=s.index)
+    low = s.astype("string").str.strip().str.lower()
+    return pd.Series(pd.Categorical(low.where(low.isin(["buy", "sell"]), "unknown"), dtype=SIDE_DTYPE), index=s.index)
+
+def compact_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte (in-place nas colunas, sem copiar o frame) para o schema canônico.
+    Colunas ausentes são ignoradas; volume com NaN é mantido como float até ser limpo.
+    """
+    if df is None or len(df.columns) == 0:
+        return df
+    if "timestamp" in df.columns:
+        ts = df["timestamp"]
+        if not (isinstance(ts.dtype, pd.DatetimeTZDtype) and str(ts.dtype) == "datetime64[ns, UTC]"):
+            df["timestamp"] = pd.to_datetime(ts, errors="coerce", utc=True).astype("datetime64[ns, UTC]")
+    if "price" in df.columns and df["price"].dtype != "float64":
+        df["price"] = pd.to_numeric(df["price"], errors="coerce").astype("float64")
+    if "volume" in df.columns and df["volume"].dtype != "int32":
+        vol = pd.to_numeric(df["volume"], errors="coerce")
+        df["volume"] = vol.astype("int32") if not vol.isna().any() else vol
+    if "side" in df.columns:
+        df["side"] = normalize_side(df["side"])
+    for c in _CATEGORICAL:
+        if c in df.columns:
+            df[c] = _as_category(df[c])
+    return df
+
+def compact_offers(df: pd.DataFrame) -> pd.DataFrame:
+    """Ofertas: quantidades int32, preços float64, agentes categóricos."""
+    if df is None or len(df.columns) == 0:
+        return df
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", utc=True).astype("datetime64[ns, UTC]")
+    for c in _OFFER_QTY:
+        if c in df.columns and df[c].dtype != "int32":
+            q = pd.to_numeric(df[c], errors="coerce")
+            df[c] = q.astype("int32") if not q.isna().any() else q
+    for c in _OFFER_AGENTS:
+        if c in df.columns:
+            df[c] = _as_category(df[c])
+    return df
@@ -0,0 +1,245 @@
+# tape_gpt/data/shm_ring.py
+
+import atexit, time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from tape_gpt.data.ring import (ArrayRing, AgentTable, TRADE_DTYPE, OFFER_DTYPE,
+                                 trades_records, offers_records, trades_frame, offers_frame)
+
+AGENT_DTYPE = np.dtype("S64")   # nomes mais longos são cortados e marcados com o código (únicos)
+
+_HEADER_SLOTS = 8          # int64: [0]=seq (total escrito), [1]=capacidade
+_CTRL_SLOTS = 4            # float64: [0]=rodando, [1]=tick (s), [2]=vol, [3]=taxa (negócios/s)
+
+class SharedRing(ArrayRing):
+    """
+    ArrayRing cujo header e dados vivem num segmento de memória compartilhada.
+    Um único escritor; leitores mapeiam o mesmo segmento com arrays somente leitura.
+    """
+    def __init__(self, name: str, dtype, capacity: int = 0, create: bool = False, writable: bool = False):
+        dtype = np.dtype(dtype)
+        if create:
+            size = _HEADER_SLOTS * 8 + int(capacity) * dtype.itemsize
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            hdr = np.ndarray((_HEADER_SLOTS,), np.int64, buffer=self.shm.buf)
+            hdr[:] = 0
+            hdr[1] = int(capacity)
+        else:
+            # o processo de ingestão é filho do dono e compartilha o resource_tracker dele,
+            # então anexar não transfere a posse (quem remove o segmento é o criador)
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = create
+        hdr = np.ndarray((_HEADER_SLOTS,), np.int64, buffer=self.shm.buf)
+        data = np.ndarray((int(hdr[1]),), dtype, buffer=self.shm.buf, offset=_HEADER_SLOTS * 8)
+        if not writable:
+            data.flags.writeable = False
+        super().__init__(dtype, int(hdr[1]), data=data, header=hdr)
+
+    def close(self):
+        self._data = None
+        self._hdr = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class SharedAgentTable(AgentTable):
+    """Tabela de agentes publicada em memória compartilhada (escrita só pelo processo de ingestão)."""
+    def __init__(self, name: str, capacity: int = 4096, create: bool = False, writable: bool = False):
+        self._ring = SharedRing(name, AGENT_DTYPE, capacity, create=create, writable=writable)
+        super().__init__(capacity=self._ring.capacity)
+
+    def _publish(self, name: str):
+        raw = name.encode("utf-8")
+        if len(raw) > AGENT_DTYPE.itemsize:
+            # corta sem partir um caractere e acrescenta ~código: dois nomes com o mesmo prefixo
+            # continuam distintos no leitor (categorias do categórico precisam ser únicas)
+            tag = f"~{len(self._names) - 1}".encode("utf-8")
+            raw = raw[:AGENT_DTYPE.itemsize - len(tag)].decode("utf-8", "ignore").encode("utf-8") + tag
+        self._ring.write(np.array([raw], dtype=AGENT_DTYPE))
+
+    def names(self) -> List[str]:
+        # leitor: sincroniza com o que o escritor já publicou
+        n = self._ring.seq()
+        if n != len(self._names):
+            raw, _ = self._ring.read_since(0)
+            self._names = [x.decode("utf-8", "ignore") for x in raw]
+        return self._names
+
+    def close(self):
+        self._ring.close()
+
+def _ring_names(prefix: str) -> Dict[str, str]:
+    return {k: f"{prefix}_{k}" for k in ("trades", "offers", "agents", "ctrl")}
+
+class _RingWriter:
+    """Sink do simulador: converte cada lote (negócios, ofertas) em registros fixos e publica nos rings."""
+    def __init__(self, prefix: str):
+        names = _ring_names(prefix)
+        self.trades = SharedRing(names["trades"], TRADE_DTYPE, writable=True)
+        self.offers = SharedRing(names["offers"], OFFER_DTYPE, writable=True)
+        self.agents = SharedAgentTable(names["agents"], writable=True)
+
+    def __call__(self, trades: pd.DataFrame, offers: Optional[pd.DataFrame] = None):
+        self.trades.write(trades_records(trades, self.agents))
+        if offers is not None and len(offers) > 0:
+            self.offers.write(offers_records(offers, self.agents))
+
+def _ingest_main(prefix: str, source: str, params: dict):
+    """Processo de ingestão: gera/reproduz dados e escreve nos rings, sem tocar na UI."""
+    names = _ring_names(prefix)
+    ctrl_shm = shared_memory.SharedMemory(name=names["ctrl"])
+    ctrl = np.ndarray((_CTRL_SLOTS,), np.float64, buffer=ctrl_shm.buf)
+    writer = _RingWriter(prefix)
+
+    if source == "replay":
+        # Reproduz um XLSX do Profit (ou uma janela do tick store) respeitando/acelerando os intervalos
+        if params.get("symbol"):
+            from tape_gpt.data.tick_store import TickStore
+            store = TickStore(params.get("store_root", "data/ticks"))
+            df_tr = store.read(params["symbol"], params.get("start"), params.get("end"))
+        else:
+            from tape_gpt.data.loaders import parse_profit_excel
+            df_tr, _ = parse_profit_excel(params["path"])
+        speed = float(params.get("speed", 1.0)) or 1.0
+        ts = pd.to_datetime(df_tr["timestamp"], utc=True)
+        due = ((ts - ts.iloc[0]).dt.total_seconds().to_numpy() / speed) if len(ts) else np.array([])
+        t0, i = time.time(), 0
+        while ctrl[0] and i < len(df_tr):
+            # publica em lote tudo que "já aconteceu" desde o último passo
+            j = int(np.searchsorted(due, time.time() - t0, side="right"))
+            if j > i:
+                batch = df_tr.iloc[i:j].copy()
+                batch["timestamp"] = pd.Timestamp.now(tz="UTC")
+                writer(batch, None)
+                i = j
+            time.sleep(0.01)
+    else:
+        from tape_gpt.data.simulator import RealTimeSimulator
+        sim = RealTimeSimulator(start_price=params.get("start_price", 100000.0),
+                                tick_ms=int(ctrl[1] * 1000), vol=ctrl[2], max_rows=int(params.get("max_rows", 100)),
+                                mode=params.get("mode", "tick"), rate=ctrl[3] or 1000.0,
+                                tick_size=float(params.get("tick_size", 5.0)))
+        if params.get("seed_path"):
+            try:
+                sim.seed_from_profit_xlsx(params["seed_path"])
+                writer(*sim.get_dataframes())
+            except Exception:
+                pass
+        sim.add_sink(writer)
+        while ctrl[0]:
+            sim.tick = max(0.01, float(ctrl[1]))
+            sim.vol = float(ctrl[2])
+            sim.rate = float(ctrl[3]) or sim.rate
+            time.sleep(sim.run_once())
+    ctrl_shm.close()
+
+class IngestProcess:
+    """
+    Ingestão em processo separado (fora do GIL do Streamlit) escrevendo em rings de memória
+    compartilhada. Expõe a mesma interface de leitura do RealTimeSimulator
+    (version/read_since/read_offers_since/get_dataframes/start/stop), então pode ser usado pelo MarketDataHub.
+    """
+    def __init__(self, source: str = "simulator", start_price: float = 100000.0, tick_ms: int = 5000,
+                 vol: float = 2.0, max_rows: int = 100, capacity: int = 1 << 16, prefix: Optional[str] = None,
+                 mode: str = "tick", rate: float = 1000.0, **params):
+        self.source = source
+        self.max_rows = max_rows
+        self.prefix = prefix or f"pilot_{mp.current_process().pid}_{id(self) & 0xffff:x}"
+        self.params = dict(params, start_price=float(start_price), max_rows=int(max_rows), mode=mode)
+        names = _ring_names(self.prefix)
+        self._trades = SharedRing(names["trades"], TRADE_DTYPE, capacity, create=True)
+        self._offers = SharedRing(names["offers"], OFFER_DTYPE, capacity, create=True)
+        self._agents = SharedAgentTable(names["agents"], create=True)
+        self._ctrl_shm = shared_memory.SharedMemory(name=names["ctrl"], create=True, size=_CTRL_SLOTS * 8)
+        self._ctrl = np.ndarray((_CTRL_SLOTS,), np.float64, buffer=self._ctrl_shm.buf)
+        self._ctrl[:] = [0.0, max(10, int(tick_ms)) / 1000.0, float(vol), float(rate)]
+        self._proc = None
+        # os segmentos são do processo do app: sem close() eles sobrevivem ao reinício do servidor
+        atexit.register(self.close)
+
+    # parâmetros ao vivo (lidos pelo processo de ingestão a cada passo)
+    @property
+    def tick(self) -> float:
+        return float(self._ctrl[1])
+
+    @tick.setter
+    def tick(self, value: float):
+        self._ctrl[1] = float(value)
+
+    @property
+    def vol(self) -> float:
+        return float(self._ctrl[2])
+
+    @vol.setter
+    def vol(self, value: float):
+        self._ctrl[2] = float(value)
+
+    @property
+    def rate(self) -> float:
+        return float(self._ctrl[3])
+
+    @rate.setter
+    def rate(self, value: float):
+        self._ctrl[3] = float(value)
+
+    @property
+    def mode(self) -> str:
+        return self.params.get("mode", "tick")
+
+    @mode.setter
+    def mode(self, value: str):
+        self.params["mode"] = value   # vale a partir do próximo start()
+
+    def seed_from_profit_xlsx(self, path: str):
+        # a semente é aplicada pelo processo de ingestão quando ele sobe
+        self.params["seed_path"] = path
+
+    def start(self):
+        if self.is_running():
+            return
+        self._ctrl[0] = 1.0
+        ctx = mp.get_context("spawn")   # não herda threads do servidor Streamlit
+        self._proc = ctx.Process(target=_ingest_main, args=(self.prefix, self.source, self.params), daemon=True)
+        self._proc.start()
+        self.params.pop("seed_path", None)  # semeia só na primeira subida
+
+    def stop(self):
+        self._ctrl[0] = 0.0
+
+    def is_running(self) -> bool:
+        return bool(self._ctrl[0]) and self._proc is not None and self._proc.is_alive()
+
+    def version(self) -> int:
+        return self._trades.seq()
+
+    def read_since(self, cursor: int):
+        rows, seq = self._trades.read_since(cursor)
+        return trades_frame(rows, self._agents), seq
+
+    def read_offers_since(self, cursor: int):
+        rows, seq = self._offers.read_since(cursor)
+        return offers_frame(rows, self._agents), seq
+
+    def get_dataframes(self):
+        rows, _ = self._trades.read_since(0, limit=self.max_rows)
+        offs, _ = self._offers.read_since(0, limit=self.max_rows)
+        return trades_frame(rows, self._agents), offers_frame(offs, self._agents)
+
+    def close(self):
+        if self._ctrl is None:
+            return
+        atexit.unregister(self.close)
+        self.stop()
+        if self._proc is not None:
+            self._proc.join(timeout=2.0)
+        for r in (self._trades, self._offers, self._agents):
+            r.close()
+        self._ctrl = None
+        self._ctrl_shm.close()
+        self._ctrl_shm.unlink()
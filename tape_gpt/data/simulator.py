@@ -1,31 +1,63 @@
 # tape_gpt/data/simulator.py
 
-import threading, time, random
-from datetime import datetime, timezone
-from collections import deque
+import threading, time
 import numpy as np
 import pandas as pd
 from tape_gpt.data.loaders import parse_profit_excel  # usa o mesmo parser do upload  
+from tape_gpt.data.ring import (ArrayRing, AgentTable, TRADE_DTYPE, OFFER_DTYPE,
+                                 trades_records, offers_records, trades_frame, offers_frame)
+from tape_gpt.data.schema import price_to_ticks
+from tape_gpt.data.matching import OrderBook, BUY, SELL
+
+SIM_MODES = ("tick", "poisson", "hawkes", "book")
 
 class RealTimeSimulator:
     """
-    Gera dados 'como se fossem' em tempo real.
-    - Negócios (negocios): Compradora, Valor, Quantidade, Vendedora, Agressor (+ colunas internas)
-    - Ofertas (ofertas): Agente_L, Qtde_L, Compra, Venda, Qtde_V, Agente_V
-      (mapeadas em: agent_bid, qty_bid, bid, ask, qty_ask, agent_ask)
+    Gera dados 'como se fossem' em tempo real, já no schema interno compacto (tape_gpt.data.schema).
+    - Negócios (negocios): timestamp, price, volume, side, buyer_agent, seller_agent
+      (equivalem a Valor, Quantidade, Agressor, Compradora, Vendedora do Profit)
+    - Ofertas (ofertas): timestamp, agent_bid, qty_bid, bid, ask, qty_ask, agent_ask
+      (equivalem a Agente, Qtde, Compra, Venda, Qtde, Agente do Profit)
+    Modos de relógio:
+    - "tick": um negócio + uma oferta a cada `tick` segundos (comportamento original)
+    - "poisson": chegadas Poisson com taxa `rate` (negócios/s), geradas em lotes vetorizados
+    - "hawkes": processo de Hawkes (kernel exponencial) com taxa média `rate` — chegadas em rajadas
+    - "book": fluxo de ordens (limite/mercado/cancelamento) dos `agents` em um OrderBook com
+      prioridade preço-tempo; negócios e ofertas saem do mesmo livro (`rate` = eventos/s)
     """
-    def __init__(self, start_price: float = 100000.0, tick_ms: int = 5000, vol: float = 2.0, max_rows: int = 100):
+    def __init__(self, start_price: float = 100000.0, tick_ms: int = 5000, vol: float = 2.0, max_rows: int = 100,
+                 mode: str = "tick", rate: float = 1000.0, batch_ms: int = 50,
+                 hawkes_alpha: float = 0.7, hawkes_beta: float = 20.0, tick_size: float = 5.0):
         self.price = float(start_price)
         self.tick = max(10, int(tick_ms)) / 1000.0    # agora padrão = 1s
-        self.vol = float(vol)
+        self.vol = float(vol)                         # σ por passo (tick) ou por segundo (poisson/hawkes)
         self.max_rows = max_rows                      # janela fixa de 100 negócios
+        self.mode = mode if mode in SIM_MODES else "tick"
+        self.rate = float(rate)                       # negócios/s alvo nos modos por chegada
+        self.batch = max(5, int(batch_ms)) / 1000.0   # granularidade do relógio por eventos
+        self.hawkes_alpha = float(hawkes_alpha)       # razão de ramificação (< 1)
+        self.hawkes_beta = float(hawkes_beta)         # decaimento do kernel (1/s)
         self._running = False
         self._th = None
         self._lock = threading.Lock()
 
-        self._negocios = deque(maxlen=self.max_rows)  # mantém sempre 100
-        self._ofertas  = deque(maxlen=self.max_rows)
+        # buffers colunares de tamanho fixo (mantém sempre os últimos max_rows)
+        self._negocios = ArrayRing(TRADE_DTYPE, self.max_rows)
+        self._ofertas  = ArrayRing(OFFER_DTYPE, self.max_rows)
+        self._sinks = []                              # callbacks (negocios_df, ofertas_df) -> None
+        self.sink_errors = 0                          # falhas de sinks (não derrubam a thread do feed)
+        self.last_sink_error = ""
         self.agents = [f"AG{str(i).zfill(3)}" for i in range(1, 51)]
+        self._agents = AgentTable(self.agents)
+        self._rng = np.random.default_rng()
+        self._pending = np.empty(0)                   # filhos Hawkes agendados para lotes futuros (s)
+        self._clock = None                            # fim do último lote gerado (epoch s)
+        self.tick_size = float(tick_size)             # tick do livro no modo "book" (pontos)
+        self._book: OrderBook = None
+        self._book_lock = threading.Lock()
+        # população heterogênea: poucos agentes concentram a maior parte do fluxo (pesos ~ Zipf)
+        w = 1.0 / np.arange(1, len(self.agents) + 1)
+        self._agent_p = self._rng.permutation(w / w.sum())
 
     def seed_from_profit_xlsx(self, path: str):
         """
@@ -33,108 +65,303 @@ class RealTimeSimulator:
         semeia o simulador com o mesmo formato usado no upload.  
         """
         df_trades, df_offers = parse_profit_excel(path)  # df_trades: price, volume, side, buyer_agent, seller_agent...
-        # Mapeia para o schema interno do simulador (igual ao que ele já expõe hoje)  
-        df_trades = df_trades.sort_values("timestamp").tail(self.max_rows).copy()
-        for _, r in df_trades.iterrows():
-            negocio = {
-                "timestamp": pd.to_datetime(r["timestamp"], utc=True),
-                "Valor": float(r["price"]),
-                "Quantidade": int(r["volume"]),
-                "Compradora": str(r.get("buyer_agent", "")) if pd.notna(r.get("buyer_agent", pd.NA)) else "",
-                "Vendedora": str(r.get("seller_agent", "")) if pd.notna(r.get("seller_agent", pd.NA)) else "",
-                "Agressor": ("Compradora" if str(r.get("side","")).lower().startswith("buy") else "Vendedora"),
-                # colunas internas (já usadas no pipeline/indicadores)
-                "price": float(r["price"]),
-                "volume": int(r["volume"]),
-                "side": "buy" if str(r.get("side","")).lower().startswith("buy") else "sell",
-                "buyer_agent": str(r.get("buyer_agent", "")) if pd.notna(r.get("buyer_agent", pd.NA)) else "",
-                "seller_agent": str(r.get("seller_agent", "")) if pd.notna(r.get("seller_agent", pd.NA)) else "",
-            }
-            self._negocios.append(negocio)
-            self.price = negocio["price"]  # atualiza preço corrente com o último da semente
+        df_trades = df_trades.sort_values("timestamp").tail(self.max_rows)
+        with self._lock:
+            self._negocios.write(trades_records(df_trades, self._agents))
+        if len(df_trades):
+            self.price = float(df_trades["price"].iloc[-1])  # preço corrente = último da semente
 
         if df_offers is not None and len(df_offers) > 0:
-            df_offers = df_offers.tail(self.max_rows).copy()
-            for _, r in df_offers.iterrows():
-                oferta = {
-                    "timestamp": pd.Timestamp.utcnow(),
-                    "Agente_L": str(r.get("buyer_agent","")),
-                    "Qtde_L": int(r.get("buy_qty", 0)),
-                    "Compra": float(r.get("buy_price", self.price - 1)),
-                    "Venda": float(r.get("sell_price", self.price + 1)),
-                    "Qtde_V": int(r.get("sell_qty", 0)),
-                    "Agente_V": str(r.get("seller_agent","")),
-                    # mapeamento interno
-                    "agent_bid": str(r.get("buyer_agent","")),
-                    "qty_bid": int(r.get("buy_qty", 0)),
-                    "bid": float(r.get("buy_price", self.price - 1)),
-                    "ask": float(r.get("sell_price", self.price + 1)),
-                    "qty_ask": int(r.get("sell_qty", 0)),
-                    "agent_ask": str(r.get("seller_agent","")),
-                }
-                self._ofertas.append(oferta)
+            df_offers = df_offers.tail(self.max_rows)
+            n = len(df_offers)
+            def _get(col, default):
+                return df_offers[col].to_numpy() if col in df_offers.columns else np.full(n, default)
+            offers = pd.DataFrame({
+                "timestamp": pd.Timestamp.now(tz="UTC"),
+                "agent_bid": _get("buyer_agent", ""),
+                "qty_bid": _get("buy_qty", 0),
+                "bid": _get("buy_price", self.price - 1),
+                "ask": _get("sell_price", self.price + 1),
+                "qty_ask": _get("sell_qty", 0),
+                "agent_ask": _get("seller_agent", ""),
+            })
+            with self._lock:
+                self._ofertas.write(offers_records(offers, self._agents))
+
+    # --- checkpoint ---
+    def state(self):
+        """(arrays, meta) dos buffers e do preço corrente; o livro do modo "book" é remontado ao retomar."""
+        with self._lock:
+            tr, seq_tr = self._negocios.read_since(0)
+            of, seq_of = self._ofertas.read_since(0)
+            arrays = {"negocios": tr.copy(), "ofertas": of.copy()}
+        meta = {"seq_negocios": seq_tr, "seq_ofertas": seq_of, "price": self.price,
+                "agents": list(self._agents.names()), "saved_at": time.time()}
+        return arrays, meta
+
+    def restore_state(self, arrays, meta):
+        """Retoma de state(): mesma janela, mesmas versões (cursores continuam válidos) e mesmo preço."""
+        # códigos do checkpoint -> códigos desta tabela (iguais quando a ordem dos nomes coincide)
+        lut = np.array([self._agents.code(n) for n in meta["agents"]] + [-1], dtype="int16")
+        tr, of = arrays["negocios"].copy(), arrays["ofertas"].copy()
+        for rows, cols in ((tr, ("buyer", "seller")), (of, ("agent_bid", "agent_ask"))):
+            for c in cols:
+                rows[c] = lut[rows[c]]
+        with self._lock:
+            self._negocios.restore(tr, meta["seq_negocios"])
+            self._ofertas.restore(of, meta["seq_ofertas"])
+        self.price = float(meta["price"])
+
+    # --- geração ---
+    def _emit(self, ts_ns: np.ndarray, sigma: float):
+        """Gera len(ts_ns) negócios (e uma atualização de oferta por negócio) de forma vetorizada."""
+        n = len(ts_ns)
+        if n == 0:
+            return
+        rng = self._rng
+        n_agents = len(self.agents)
+        prices = np.maximum(1.0, np.round(self.price + np.cumsum(rng.normal(0, sigma, n)), 2))
+        self.price = float(prices[-1])
+
+        tr = np.zeros(n, dtype=TRADE_DTYPE)
+        tr["ts"] = ts_ns
+        tr["price"] = price_to_ticks(prices)
+        tr["volume"] = np.maximum(1, rng.exponential(scale=50, size=n)).astype("int32")
+        tr["side"] = rng.choice(np.array([1, -1], dtype="int8"), size=n)
+        tr["buyer"] = rng.integers(0, n_agents, n)
+        tr["seller"] = rng.integers(0, n_agents, n)
+
+        spread = np.maximum(1.0, np.abs(rng.normal(2.0, 1.0, n)))
+        of = np.zeros(n, dtype=OFFER_DTYPE)
+        of["ts"] = ts_ns
+        of["bid"] = price_to_ticks(np.round(prices - spread / 2, 2))
+        of["ask"] = price_to_ticks(np.round(prices + spread / 2, 2))
+        of["qty_bid"] = np.maximum(1, rng.exponential(scale=100, size=n)).astype("int32")
+        of["qty_ask"] = np.maximum(1, rng.exponential(scale=100, size=n)).astype("int32")
+        of["agent_bid"] = rng.integers(0, n_agents, n)
+        of["agent_ask"] = rng.integers(0, n_agents, n)
+
+        self._publish(tr, of)
+
+    def _publish(self, tr: np.ndarray, of: np.ndarray):
+        with self._lock:
+            self._negocios.write(tr)   # ring de max_rows já descarta os mais antigos
+            self._ofertas.write(of)
+        if self._sinks and (len(tr) or len(of)):
+            df_tr, df_of = trades_frame(tr, self._agents), offers_frame(of, self._agents)
+            for sink in self._sinks:
+                self._call_sink(sink, df_tr, df_of)
+
+    def _call_sink(self, fn, *args):
+        # um sink com erro (regra de alerta, disco cheio no tick store...) não pode parar
+        # o feed nem impedir os demais sinks de receberem o lote
+        try:
+            fn(*args)
+        except Exception as e:
+            self.sink_errors += 1
+            self.last_sink_error = f"{type(e).__name__}: {e}"
 
     def _step(self):
         # Gera próximo ponto (random walk) com base no último preço  
-        dp = np.random.normal(0, self.vol)
-        self.price = max(1.0, float(round(self.price + dp, 2)))
-        ts = datetime.now(timezone.utc)  # agora tz-aware (UTC)  【】
-
-        aggressor_side = random.choice(["Compradora", "Vendedora"])
-        buyer  = random.choice(self.agents)
-        seller = random.choice(self.agents)
-        qty = int(max(1, np.random.exponential(scale=50)))
-
-        spread = max(1.0, abs(np.random.normal(2.0, 1.0)))
-        bid = round(self.price - spread/2, 2)
-        ask = round(self.price + spread/2, 2)
-        qty_bid = int(max(1, np.random.exponential(scale=100)))
-        qty_ask = int(max(1, np.random.exponential(scale=100)))
-        agent_bid = random.choice(self.agents)
-        agent_ask = random.choice(self.agents)
-
-        negocio = {
-            "timestamp": ts,
-            "Valor": float(self.price),
-            "Quantidade": qty,
-            "Compradora": buyer,
-            "Vendedora": seller,
-            "Agressor": aggressor_side,
-            "price": float(self.price),
-            "volume": qty,
-            "side": "buy" if aggressor_side == "Compradora" else "sell",
-            "buyer_agent": buyer,
-            "seller_agent": seller,
-        }
-        oferta = {
-            "timestamp": ts,
-            "Agente_L": agent_bid, "Qtde_L": qty_bid, "Compra": float(bid),
-            "Venda": float(ask),    "Qtde_V": qty_ask, "Agente_V": agent_ask,
-            "agent_bid": agent_bid, "qty_bid": qty_bid, "bid": float(bid),
-            "ask": float(ask), "qty_ask": qty_ask, "agent_ask": agent_ask,
-        }
-        with self._lock:
-            self._negocios.append(negocio)  # deque maxlen=100 já exclui o mais antigo
-            self._ofertas.append(oferta)
+        self._emit(np.array([time.time_ns()], dtype="int64"), self.vol)
+
+    def _arrivals(self, t0: float, t1: float) -> np.ndarray:
+        """Instantes de chegada (s) em [t0, t1) conforme o modo."""
+        dt = max(0.0, t1 - t0)
+        rng = self._rng
+        if self.mode == "poisson":
+            return np.sort(t0 + rng.uniform(0.0, dt, rng.poisson(self.rate * dt)))
+        # Hawkes por ramificação: imigrantes Poisson(mu) e cada evento gera Poisson(alpha) filhos
+        # a Exp(beta) depois; mu = rate*(1-alpha) mantém a taxa média igual a `rate`.
+        # Cada evento ramifica uma única vez, no lote em que acontece; filhos que caem depois de t1
+        # ficam pendentes para os próximos lotes.
+        alpha = min(max(self.hawkes_alpha, 0.0), 0.95)
+        mu = self.rate * (1.0 - alpha)
+        due = self._pending[self._pending < t1]
+        future = [self._pending[self._pending >= t1]]
+        gen = np.concatenate([t0 + rng.uniform(0.0, dt, rng.poisson(mu * dt)), due])
+        events = [gen]
+        while len(gen):
+            kids = rng.poisson(alpha, len(gen))
+            children = np.repeat(gen, kids) + rng.exponential(1.0 / self.hawkes_beta, int(kids.sum()))
+            future.append(children[children >= t1])
+            gen = children[children < t1]
+            events.append(gen)
+        self._pending = np.concatenate(future)
+        return np.sort(np.concatenate(events))
+
+    def _step_batch(self, t0: float, t1: float):
+        times = self._arrivals(t0, t1)
+        # σ por negócio escalado para que a variância por segundo seja vol²
+        sigma = self.vol / np.sqrt(max(self.rate, 1.0))
+        self._emit((times * 1e9).astype("int64"), sigma)
+
+    # --- modo "book": motor de casamento ---
+    def _ensure_book(self, ts: int):
+        if self._book is not None:
+            return
+        book = OrderBook()
+        mid = int(round(self.price / self.tick_size))
+        n_agents = len(self.agents)
+        for k in range(1, 11):   # 10 níveis de cada lado com algumas ordens por nível
+            for side in (BUY, SELL):
+                for _ in range(3):
+                    agent = int(self._rng.choice(n_agents, p=self._agent_p))
+                    qty = int(max(1, self._rng.exponential(100)))
+                    book.limit(agent, side, mid - side * k, qty, ts)
+        # a montagem do livro gera negócios e cotações de um lado só (ask/bid 0 até o outro lado existir):
+        # nada disso é mercado, então sai antes do primeiro lote publicado
+        book.drain_trades()
+        book.drain_quotes()
+        self._book = book
+
+    def _step_book(self, t0: float, t1: float):
+        rng = self._rng
+        dt = max(0.0, t1 - t0)
+        n = rng.poisson(self.rate * dt)
+        ts = (np.sort(t0 + rng.uniform(0.0, dt, n)) * 1e9).astype("int64")
+        kinds = rng.choice(3, size=n, p=[0.55, 0.15, 0.30])           # 0=limite, 1=mercado, 2=cancela
+        sides = rng.choice(np.array([BUY, SELL]), size=n)
+        agents = rng.choice(len(self.agents), size=n, p=self._agent_p)
+        qtys = np.maximum(1, rng.exponential(np.where(kinds == 1, 50, 100))).astype("int64")
+        offsets = rng.geometric(1.0 / (1.0 + self.vol), size=n) - 1    # ticks atrás do melhor preço
+
+        with self._book_lock:
+            self._ensure_book(int(t0 * 1e9))
+            book = self._book
+            last = int(round(self.price / self.tick_size))
+            for i in range(n):
+                k, side, agent, t = kinds[i], int(sides[i]), int(agents[i]), int(ts[i])
+                if k == 0:
+                    own = book.best(side)
+                    ref = own + side if own is not None else last - side   # melhora 1 tick o próprio lado
+                    book.limit(agent, side, ref - side * int(offsets[i]), int(qtys[i]), t)
+                elif k == 1:
+                    book.market(agent, side, int(qtys[i]), t)
+                else:
+                    oid = book.random_order_id(rng)
+                    if oid is not None:
+                        book.cancel(oid, t)
+                for s in (BUY, SELL):
+                    if book.best(s) is None:
+                        # lado zerado (varrida/cancelamentos): um formador de mercado repõe o topo a 1 tick
+                        # do outro lado, para o livro publicado ter sempre bid e ask
+                        other = book.best(-s)
+                        ref = other if other is not None else last + s
+                        book.limit(agent, s, ref - s, int(qtys[i]), t)
+            trades = book.drain_trades()
+            # estados intermediários de um lado só (antes da reposição acima) não viram cotação
+            quotes = [q for q in book.drain_quotes() if q[1] > 0 and q[4] > 0]
+
+        tr = np.zeros(len(trades), dtype=TRADE_DTYPE)
+        if trades:
+            t = np.array(trades, dtype="int64")
+            tr["ts"], tr["volume"], tr["side"] = t[:, 0], t[:, 2], t[:, 3]
+            tr["price"] = price_to_ticks(t[:, 1] * self.tick_size)
+            tr["buyer"], tr["seller"] = t[:, 4], t[:, 5]
+            self.price = float(t[-1, 1] * self.tick_size)
+        of = np.zeros(len(quotes), dtype=OFFER_DTYPE)
+        if quotes:
+            q = np.array(quotes, dtype="int64")
+            of["ts"] = q[:, 0]
+            of["bid"], of["qty_bid"], of["agent_bid"] = price_to_ticks(q[:, 1] * self.tick_size), q[:, 2], q[:, 3]
+            of["ask"], of["qty_ask"], of["agent_ask"] = price_to_ticks(q[:, 4] * self.tick_size), q[:, 5], q[:, 6]
+        self._publish(tr, of)
+
+    def book_snapshot(self, depth: int = 10):
+        """Livro atual (modo "book") no formato de ofertas, um nível por linha; None nos outros modos."""
+        if self._book is None:
+            return None
+        with self._book_lock:
+            bids, asks = self._book.depth(depth)
+        names = self._agents.names()
+        m = max(len(bids), len(asks))
+        bids = bids + [(np.nan, 0, -1)] * (m - len(bids))
+        asks = asks + [(np.nan, 0, -1)] * (m - len(asks))
+        return pd.DataFrame({
+            "agent_bid": [names[a] if a >= 0 else "" for _, _, a in bids],
+            "qty_bid": [q for _, q, _ in bids],
+            "bid": [p * self.tick_size for p, _, _ in bids],
+            "ask": [p * self.tick_size for p, _, _ in asks],
+            "qty_ask": [q for _, q, _ in asks],
+            "agent_ask": [names[a] if a >= 0 else "" for _, _, a in asks],
+        })
+
+    def book_depth(self, levels: int = 10):
+        """(qtd compra, qtd venda) somadas nos `levels` melhores níveis (modo "book"); None nos outros modos."""
+        if self._book is None:
+            return None
+        with self._book_lock:
+            bids, asks = self._book.depth(levels)
+        return sum(q for _, q, _ in bids), sum(q for _, q, _ in asks)
+
+    def run_once(self) -> float:
+        """Executa um passo do relógio e devolve quantos segundos dormir até o próximo."""
+        if self.mode == "tick":
+            self._step()
+            return self.tick
+        now = time.time()
+        t0 = self._clock if self._clock is not None and now - self._clock < 5.0 else now - self.batch
+        if self.mode == "book":
+            self._step_book(t0, now)
+        else:
+            self._step_batch(t0, now)
+        self._clock = now
+        return self.batch
+
+    def add_sink(self, fn):
+        """Registra um destino extra para cada lote gerado (ex.: ring em memória compartilhada, tick store)."""
+        self._sinks.append(fn)
 
     def start(self):
         if self._running: return
         self._running = True
+        self._clock = None
         def _loop():
             while self._running:
-                self._step()
-                time.sleep(self.tick)  # 1s por padrão
+                time.sleep(self.run_once())  # 1s por padrão no modo tick; ~50ms nos modos por chegada
+            self.flush_sinks()               # parou: nada fica só no buffer dos sinks
         self._th = threading.Thread(target=_loop, daemon=True)
         self._th.start()
 
     def stop(self):
         self._running = False
 
+    def flush_sinks(self):
+        """Esvazia os sinks com buffer (os que expõem flush(), ex.: BufferedAppender do tick store)."""
+        for sink in self._sinks:
+            fn = getattr(sink, "flush", None)
+            if callable(fn):
+                self._call_sink(fn)
+
     def is_running(self) -> bool:
         return self._running
 
     def get_dataframes(self):
         with self._lock:
-            df_tr = pd.DataFrame(list(self._negocios))
-            df_of = pd.DataFrame(list(self._ofertas))
-        return df_tr, df_of
\ No newline at end of file
+            tr, _ = self._negocios.read_since(0)
+            of, _ = self._ofertas.read_since(0)
+            tr, of = tr.copy(), of.copy()
+        return trades_frame(tr, self._agents), offers_frame(of, self._agents)
+
+    def version(self) -> int:
+        """Número de negócios emitidos até agora; muda sempre que há dado novo."""
+        with self._lock:
+            return self._negocios.seq()
+
+    def read_since(self, cursor: int):
+        """
+        Retorna (negócios novos desde `cursor`, nova versão).
+        Se o leitor ficou para trás além da janela, recebe apenas o que ainda está no buffer.
+        """
+        with self._lock:
+            rows, seq = self._negocios.read_since(cursor)
+            rows = rows.copy()
+        return trades_frame(rows, self._agents), seq
+
+    def read_offers_since(self, cursor: int):
+        """(ofertas novas desde `cursor`, nova contagem), como read_since para os negócios."""
+        with self._lock:
+            rows, seq = self._ofertas.read_since(cursor)
+            rows = rows.copy()
+        return offers_frame(rows, self._agents), seq
@@ -0,0 +1,107 @@
+# file: tape_gpt/data/snapshots.py
+import threading, time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Tuple
+import pandas as pd
+
+@dataclass(frozen=True)
+class SnapshotRef:
+    """Referência leve a uma versão congelada: (fonte, versão). É o que fica no session_state."""
+    source: Hashable
+    version: Hashable
+    frozen_at: str
+
+class _Entry:
+    __slots__ = ("trades", "offers", "refs", "touched", "nbytes")
+
+    def __init__(self, trades, offers):
+        self.trades = trades
+        self.offers = offers
+        self.refs = 0
+        self.touched = time.time()
+        self.nbytes = sum(int(df.memory_usage(index=True, deep=False).sum()) for df in (trades, offers) if df is not None)
+
+def _frozen(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    # cópia rasa: O(colunas), compartilha os arrays; reatribuir colunas no original não altera a versão
+    return df.copy(deep=False) if df is not None else None
+
+def content_hash(*frames: Optional[pd.DataFrame]) -> str:
+    """Identidade do conteúdo (valores de todas as linhas e colunas) para chavear versões de dados estáticos."""
+    h = 0
+    for df in frames:
+        if df is not None and len(df):
+            h = (h * 1_000_003 + int(pd.util.hash_pandas_object(df, index=False).sum())) % (1 << 64)
+    return f"{h:016x}"
+
+class SnapshotStore:
+    """
+    Versões imutáveis de (negócios, ofertas) indexadas por (fonte, versão) e compartilhadas entre sessões.
+    - freeze(): O(1) em linhas — a mesma (fonte, versão) congelada por N sessões é guardada uma vez;
+    - contagem de referências: release() devolve a versão; sem referências ela fica num LRU curto
+      (max_unreferenced) para ser reaproveitada e depois é descartada;
+    - referências não tocadas há mais de ttl_s (sessões abandonadas) são soltas no prune.
+    Os DataFrames devolvidos por get() são compartilhados: trate-os como somente leitura.
+    """
+    def __init__(self, max_unreferenced: int = 4, ttl_s: float = 3600.0):
+        self.max_unreferenced = int(max_unreferenced)
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[Hashable, Hashable], _Entry] = {}
+        self._idle: "OrderedDict[Tuple[Hashable, Hashable], None]" = OrderedDict()
+
+    def freeze(self, source: Hashable, version: Hashable, trades: Optional[pd.DataFrame],
+               offers: Optional[pd.DataFrame] = None) -> SnapshotRef:
+        key = (source, version)
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = _Entry(_frozen(trades), _frozen(offers))
+            self._idle.pop(key, None)
+            e.refs += 1
+            e.touched = time.time()
+            self._prune_locked()
+        return SnapshotRef(source, version, pd.Timestamp.now(tz="UTC").isoformat())
+
+    def get(self, ref: Optional[SnapshotRef]) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """(negócios, ofertas) da versão; (None, None) se ela já foi descartada."""
+        if ref is None:
+            return None, None
+        with self._lock:
+            e = self._entries.get((ref.source, ref.version))
+            if e is None:
+                return None, None
+            e.touched = time.time()
+            return e.trades, e.offers
+
+    def release(self, ref: Optional[SnapshotRef]):
+        if ref is None:
+            return
+        key = (ref.source, ref.version)
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                return
+            e.refs = max(0, e.refs - 1)
+            if e.refs == 0:
+                self._idle[key] = None
+            self._prune_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "versions": len(self._entries),
+                "refs": sum(e.refs for e in self._entries.values()),
+                "idle": len(self._idle),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+            }
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.ttl_s
+        for key, e in self._entries.items():
+            if e.refs and e.touched < cutoff:
+                e.refs = 0                  # sessão abandonada: solta as referências
+                self._idle[key] = None
+        while len(self._idle) > self.max_unreferenced:
+            key, _ = self._idle.popitem(last=False)
+            self._entries.pop(key, None)
@@ -0,0 +1,172 @@
+# tape_gpt/data/tick_store.py
+
+import atexit, os, time, threading
+from typing import List, Optional, Sequence
+import pandas as pd
+from tape_gpt.data.schema import TRADE_COLUMNS, compact_trades
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        return pa, pq
+    except ImportError as e:
+        raise RuntimeError("O tick store requer 'pyarrow' (pip install pyarrow).") from e
+
+def _to_utc(ts) -> Optional[pd.Timestamp]:
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+class TickStore:
+    """
+    Armazém de negócios append-only em Parquet, particionado por símbolo/dia:
+        <root>/symbol=WIN/date=2025-08-12/part-<ns>.parquet
+    Cada arquivo é gravado ordenado por timestamp, em row groups de tamanho fixo, com
+    estatísticas min/max — read() descarta dias e row groups fora da janela pedida.
+    """
+    def __init__(self, root: str = "data/ticks", row_group_size: int = 65536):
+        self.root = root
+        self.row_group_size = int(row_group_size)
+
+    def _day_dir(self, symbol: str, day: str) -> str:
+        return os.path.join(self.root, f"symbol={symbol}", f"date={day}")
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(self.root) if d.startswith("symbol="))
+
+    def days(self, symbol: str) -> List[str]:
+        base = os.path.join(self.root, f"symbol={symbol}")
+        if not os.path.isdir(base):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(base) if d.startswith("date="))
+
+    def append(self, symbol: str, df: pd.DataFrame) -> int:
+        """Grava os negócios como novas partes (nunca reescreve arquivos existentes). Retorna nº de linhas."""
+        pa, pq = _require_pyarrow()
+        if df is None or len(df) == 0:
+            return 0
+        cols = [c for c in TRADE_COLUMNS if c in df.columns]
+        data = df[cols].copy()
+        data = compact_trades(data).dropna(subset=["timestamp"]).sort_values("timestamp", kind="stable")
+        written = 0
+        for day, part in data.groupby(data["timestamp"].dt.strftime("%Y-%m-%d"), sort=True):
+            d = self._day_dir(symbol, day)
+            os.makedirs(d, exist_ok=True)
+            path = os.path.join(d, f"part-{time.time_ns()}.parquet")
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            pq.write_table(table, path + ".tmp", row_group_size=self.row_group_size,
+                           write_statistics=True, use_dictionary=["side", "buyer_agent", "seller_agent"])
+            os.replace(path + ".tmp", path)  # a parte só fica visível depois de completa
+            written += len(part)
+        return written
+
+    def files(self, symbol: str, start=None, end=None) -> List[str]:
+        """Caminhos das partes Parquet dos dias que intersectam [start, end] (para leitores externos, ex.: polars)."""
+        start, end = _to_utc(start), _to_utc(end)
+        out = []
+        for day in self.days(symbol):
+            if start is not None and day < start.strftime("%Y-%m-%d"):
+                continue
+            if end is not None and day > end.strftime("%Y-%m-%d"):
+                continue
+            d = self._day_dir(symbol, day)
+            out.extend(os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith(".parquet"))
+        return out
+
+    def read(self, symbol: str, start=None, end=None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Negócios de `symbol` com start <= timestamp <= end (limites opcionais, UTC)."""
+        pa, pq = _require_pyarrow()
+        start, end = _to_utc(start), _to_utc(end)
+        cols = list(columns) if columns else list(TRADE_COLUMNS)
+        if "timestamp" not in cols:
+            cols = ["timestamp"] + cols
+
+        tables = []
+        for day in self.days(symbol):
+            # poda por partição (dia)
+            if start is not None and day < start.strftime("%Y-%m-%d"):
+                continue
+            if end is not None and day > end.strftime("%Y-%m-%d"):
+                continue
+            d = self._day_dir(symbol, day)
+            for fname in sorted(os.listdir(d)):
+                if not fname.endswith(".parquet"):
+                    continue
+                pf = pq.ParquetFile(os.path.join(d, fname))
+                ts_idx = pf.schema_arrow.get_field_index("timestamp")
+                keep = []
+                for i in range(pf.metadata.num_row_groups):
+                    st = pf.metadata.row_group(i).column(ts_idx).statistics
+                    if st is not None and st.has_min_max:
+                        gmin, gmax = _to_utc(st.min), _to_utc(st.max)
+                        # poda por row group (estatísticas min/max)
+                        if (start is not None and gmax < start) or (end is not None and gmin > end):
+                            continue
+                    keep.append(i)
+                if keep:
+                    file_cols = [c for c in cols if pf.schema_arrow.get_field_index(c) >= 0]
+                    tables.append(pf.read_row_groups(keep, columns=file_cols))
+
+        if not tables:
+            return pd.DataFrame(columns=cols)
+        df = pa.concat_tables(tables, promote_options="default").to_pandas()
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df["timestamp"] >= start
+        if end is not None:
+            mask &= df["timestamp"] <= end
+        df = df[mask]
+        if not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="stable")
+        return compact_trades(df.reset_index(drop=True))
+
+    def last(self, symbol: str, n: int = 100, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Últimos `n` negócios (lê apenas o dia mais recente, e o anterior se precisar)."""
+        out = []
+        total = 0
+        for day in reversed(self.days(symbol)):
+            df_day = self.read(symbol, start=f"{day} 00:00:00", end=f"{day} 23:59:59.999999999", columns=columns)
+            out.insert(0, df_day)
+            total += len(df_day)
+            if total >= n:
+                break
+        if not out:
+            return pd.DataFrame(columns=list(columns) if columns else TRADE_COLUMNS)
+        return pd.concat(out, ignore_index=True).tail(n).reset_index(drop=True)
+
+class BufferedAppender:
+    """
+    Sink para o simulador (assinatura (negocios_df, ofertas_df)) que acumula lotes de negócios e
+    grava no TickStore — uma parte Parquet a cada `flush_rows` linhas ou `flush_s` segundos.
+    O resto do buffer é gravado quando o simulador para (flush_sinks) e na saída do processo.
+    """
+    def __init__(self, store: TickStore, symbol: str, flush_rows: int = 50000, flush_s: float = 30.0):
+        self.store = store
+        self.symbol = symbol
+        self.flush_rows = int(flush_rows)
+        self.flush_s = float(flush_s)
+        self._buf: List[pd.DataFrame] = []
+        self._rows = 0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def __call__(self, trades: pd.DataFrame, offers: Optional[pd.DataFrame] = None):
+        if trades is None or len(trades) == 0:
+            return
+        with self._lock:
+            self._buf.append(trades)
+            self._rows += len(trades)
+            due = self._rows >= self.flush_rows or (time.time() - self._last_flush) >= self.flush_s
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            chunks, self._buf, self._rows = self._buf, [], 0
+            self._last_flush = time.time()
+        return self.store.append(self.symbol, pd.concat(chunks, ignore_index=True)) if chunks else 0
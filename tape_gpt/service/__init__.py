@@ -0,0 +1,2 @@
+# file: tape_gpt/service/__init__.py
+# package marker
@@ -0,0 +1,247 @@
+# file: tape_gpt/service/api.py
+"""
+Serviço de análise sem Streamlit (HTTP + WebSocket, Starlette/uvicorn opcionais).
+Usa o mesmo feed (MarketDataHub) e as mesmas funções do painel; a análise é calculada
+uma vez por versão do feed e compartilhada por todos os clientes.
+
+    python -m tape_gpt.service.api --port 8000
+
+Rotas:
+  GET  /health                      -> status e versão do feed
+  GET  /insights?freq=&lookback=    -> analyze_tape + top agressores + eventos de liquidez
+  GET  /imbalances?freq=&last=      -> barras de compute_imbalances
+  GET  /trades?since=               -> negócios novos desde o cursor (+ novo cursor)
+  GET  /book?depth=                 -> livro (modo "book" do simulador) ou topo das ofertas
+  POST /analyze                     -> análise avulsa de um XLSX do Profit (corpo binário) ou JSON {"trades": [...]}
+  WS   /ws?freq=&lookback=          -> snapshot inicial e depois {"type": "trades"|"insights"} a cada versão nova
+"""
+import argparse, asyncio, io, json, threading
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from tape_gpt.config import get_settings
+from tape_gpt.data.hub import MarketDataHub, make_market_hub
+from tape_gpt.data.loaders import parse_profit_excel
+from tape_gpt.data.preprocess import preprocess_ts, compute_imbalances
+from tape_gpt.analysis.orderflow import top_aggressors
+from tape_gpt.analysis.rule_based import analyze_tape
+from tape_gpt.analysis.liquidity import book_liquidity, book_series, detect_liquidity_events, summarize_liquidity_events
+
+def _require_starlette():
+    try:
+        import starlette
+        return starlette
+    except ImportError as e:
+        raise RuntimeError("O serviço requer starlette e uvicorn (pip install starlette uvicorn).") from e
+
+def _require_uvicorn():
+    try:
+        import uvicorn
+        return uvicorn
+    except ImportError as e:
+        raise RuntimeError("O serviço requer starlette e uvicorn (pip install starlette uvicorn).") from e
+
+def to_jsonable(obj):
+    """Converte insights/DataFrames (numpy, Timestamp, NaN) para tipos JSON."""
+    if isinstance(obj, pd.DataFrame):
+        return json.loads(obj.to_json(orient="records", date_format="iso"))
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    return obj
+
+def analyze_frames(trades: pd.DataFrame, offers: Optional[pd.DataFrame] = None, freq: str = "5s",
+                   lookback: str = "30min", top_n: int = 5) -> dict:
+    """Mesma sequência do painel: preprocess -> imbalances -> analyze_tape -> top agressores -> liquidez."""
+    df = preprocess_ts(trades)
+    imbs = compute_imbalances(df, window=freq)
+    book = None
+    if offers is not None and "timestamp" in offers.columns and offers["timestamp"].notna().any():
+        book = book_liquidity(book_series(offers, freq))
+    insights = analyze_tape(df, imbs, freq=freq, book=book)
+    top_buy, top_sell = top_aggressors(df, lookback=lookback, top_n=top_n)
+    insights["top_buy_aggressors"] = list(zip(top_buy["agent"].tolist(), top_buy["volume"].tolist()))
+    insights["top_sell_aggressors"] = list(zip(top_sell["agent"].tolist(), top_sell["volume"].tolist()))
+    if offers is not None and "timestamp" in offers.columns and offers["timestamp"].notna().any():
+        insights["liquidity_events"] = summarize_liquidity_events(detect_liquidity_events(df, offers))
+    return {"insights": insights, "imbs": imbs, "rows": len(df)}
+
+class AnalysisService:
+    """
+    Análise do feed compartilhada entre clientes: o resultado de cada (versão, freq, lookback, top_n)
+    é calculado uma vez e reaproveitado; quando o feed avança, o cache antigo é descartado.
+    """
+    def __init__(self, hub: MarketDataHub, freq: str = "5s", lookback: str = "30min", top_n: int = 5):
+        self.hub = hub
+        self.freq = freq
+        self.lookback = lookback
+        self.top_n = int(top_n)
+        self._lock = threading.Lock()
+        self._cache_version = -1
+        self._cache = {}
+
+    def version(self) -> int:
+        return self.hub.sim.version()
+
+    def analysis(self, freq: Optional[str] = None, lookback: Optional[str] = None, top_n: Optional[int] = None) -> dict:
+        """Resultado de analyze_frames sobre a janela corrente do feed (cacheado por versão)."""
+        key = (freq or self.freq, lookback or self.lookback, int(top_n or self.top_n))
+        pd.to_timedelta(key[0]), pd.to_timedelta(key[1])   # ValueError cedo para parâmetros inválidos
+        with self._lock:
+            version = self.version()
+            if version != self._cache_version:
+                self._cache_version, self._cache = version, {}
+            out = self._cache.get(key)
+            if out is None:
+                trades, offers = self.hub.snapshot()
+                if len(trades) == 0:
+                    out = {"insights": {"summary": "Dados insuficientes."}, "imbs": pd.DataFrame(), "rows": 0}
+                else:
+                    out = analyze_frames(trades, offers, *key)
+                out["version"] = version
+                self._cache[key] = out
+            return out
+
+    def insights(self, **params) -> dict:
+        a = self.analysis(**params)
+        return {"version": a["version"], "rows": a["rows"], "insights": to_jsonable(a["insights"])}
+
+    def imbalances(self, freq: Optional[str] = None, last: int = 100) -> dict:
+        a = self.analysis(freq=freq)
+        imbs = a["imbs"].tail(int(last)).reset_index()
+        return {"version": a["version"], "bars": to_jsonable(imbs)}
+
+    def trades_since(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        return self.hub.sim.read_since(int(cursor))
+
+    def book(self, depth: int = 10) -> dict:
+        book = self.hub.book_snapshot(depth=int(depth))
+        if book is None:
+            # sem livro do motor: último topo das ofertas do feed
+            offers = self.hub.snapshot()[1]
+            book = offers.tail(1)
+        return {"version": self.version(), "book": to_jsonable(book)}
+
+# ---------------- app HTTP/WebSocket ----------------
+
+def create_app(service: AnalysisService, push_interval_s: float = 0.5):
+    """App Starlette sobre o serviço (cálculos em threadpool para não travar o event loop)."""
+    _require_starlette()
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+
+    def _params(request) -> dict:
+        q = request.query_params
+        out = {"freq": q.get("freq"), "lookback": q.get("lookback")}
+        if q.get("top_n"):
+            out["top_n"] = int(q["top_n"])
+        return out
+
+    async def _run(fn, *args, **kwargs):
+        try:
+            return JSONResponse(await run_in_threadpool(fn, *args, **kwargs))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def health(request):
+        return JSONResponse({"status": "ok", "version": service.version(), "running": service.hub.sim.is_running()})
+
+    async def insights(request):
+        try:
+            params = _params(request)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return await _run(service.insights, **params)
+
+    async def imbalances(request):
+        q = request.query_params
+        return await _run(service.imbalances, freq=q.get("freq"), last=q.get("last", 100))
+
+    async def trades(request):
+        def _read(cursor):
+            df, version = service.trades_since(int(cursor))
+            return {"version": version, "trades": to_jsonable(df)}
+        return await _run(_read, request.query_params.get("since", 0))
+
+    async def book(request):
+        return await _run(service.book, depth=request.query_params.get("depth", 10))
+
+    async def analyze(request):
+        body = await request.body()
+        q = request.query_params
+        def _analyze():
+            if request.headers.get("content-type", "").startswith("application/json"):
+                payload = json.loads(body or b"{}")
+                trades = pd.DataFrame(payload.get("trades") or [])
+                offers = pd.DataFrame(payload["offers"]) if payload.get("offers") else None
+            else:
+                trades, offers = parse_profit_excel(io.BytesIO(body))
+            if trades is None or len(trades) == 0:
+                raise ValueError("Nenhum negócio no corpo da requisição.")
+            out = analyze_frames(trades, offers, freq=q.get("freq", service.freq),
+                                 lookback=q.get("lookback", service.lookback), top_n=int(q.get("top_n", service.top_n)))
+            return {"rows": out["rows"], "insights": to_jsonable(out["insights"])}
+        return await _run(_analyze)
+
+    async def ws(websocket):
+        await websocket.accept()
+        q = websocket.query_params
+        params = {"freq": q.get("freq"), "lookback": q.get("lookback")}
+        try:
+            cursor = service.version()
+            await websocket.send_json({"type": "snapshot", **await run_in_threadpool(service.insights, **params)})
+            while True:
+                await asyncio.sleep(push_interval_s)
+                if service.version() == cursor:
+                    continue
+                # só o incremento de negócios; insights vêm do cache compartilhado da versão
+                df_new, cursor = await run_in_threadpool(service.trades_since, cursor)
+                if len(df_new):
+                    await websocket.send_json({"type": "trades", "version": cursor, "trades": to_jsonable(df_new)})
+                await websocket.send_json({"type": "insights", **await run_in_threadpool(service.insights, **params)})
+        except WebSocketDisconnect:
+            pass
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close()
+
+    return Starlette(routes=[
+        Route("/health", health),
+        Route("/insights", insights),
+        Route("/imbalances", imbalances),
+        Route("/trades", trades),
+        Route("/book", book),
+        Route("/analyze", analyze, methods=["POST"]),
+        WebSocketRoute("/ws", ws),
+    ])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço de análise do TapeGPT (HTTP/WebSocket).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--freq", default="5s")
+    parser.add_argument("--seed", default="testes/exemplo_times_in_trade.xlsx", help="XLSX para semear o simulador")
+    parser.add_argument("--no-run", action="store_true", help="não inicia o simulador (só a semente)")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    hub = make_market_hub(settings.INGEST_MODE, settings.TICK_STORE_DIR)
+    if args.seed:
+        hub.ensure_seeded(args.seed)
+    if not args.no_run:
+        hub.sim.start()
+    app = create_app(AnalysisService(hub, freq=args.freq))
+    _require_uvicorn().run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# file: tape_gpt/startup.py
+"""
+Medição do carregamento do app: tempo dos imports adiados (lazy_import) e das fases de
+inicialização (timed/record), acumulado por processo. report() devolve a tabela do diagnóstico.
+Para o detalhe dos imports de topo use `python -X importtime -m streamlit run app.py`.
+"""
+import importlib, sys, threading, time
+from contextlib import contextmanager
+import pandas as pd
+
+_lock = threading.Lock()
+_events = {}   # rótulo -> {"tipo", "primeira_ms", "ultima_ms", "vezes"}
+
+def record(label: str, ms: float, kind: str = "fase"):
+    with _lock:
+        e = _events.get(label)
+        if e is None:
+            _events[label] = {"tipo": kind, "primeira_ms": ms, "ultima_ms": ms, "vezes": 1}
+        else:
+            e["ultima_ms"] = ms
+            e["vezes"] += 1
+
+@contextmanager
+def timed(label: str, kind: str = "fase"):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(label, (time.perf_counter() - t0) * 1000, kind)
+
+def lazy_import(name: str):
+    """Importa `name` no primeiro uso e registra quanto custou (chamadas seguintes são só um lookup)."""
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return mod
+    with timed(name, kind="import"):
+        return importlib.import_module(name)
+
+def report() -> pd.DataFrame:
+    with _lock:
+        rows = [{"etapa": k, **v} for k, v in _events.items()]
+    if not rows:
+        return pd.DataFrame(columns=["etapa", "tipo", "primeira_ms", "ultima_ms", "vezes"])
+    return pd.DataFrame(rows).round({"primeira_ms": 1, "ultima_ms": 1})
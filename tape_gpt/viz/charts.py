@@ -1,5 +1,6 @@
 # file: tape_gpt/viz/charts.py
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import pandas as pd
 
 def candle_volume_figure(df: pd.DataFrame, freq: str = "1min") -> go.Figure:
@@ -104,4 +105,96 @@ def top_aggressors_figure(top_buy: pd.DataFrame, top_sell: pd.DataFrame) -> go.F
         margin=dict(l=10, r=10, t=30, b=10),
         xaxis=dict(zeroline=True)
     )
-    return fig
\ No newline at end of file
+    return fig
+def signal_timeline_figure(timeline: pd.DataFrame) -> go.Figure:
+    """Preço de fechamento por barra, com o main_signal de cada barra como marcador colorido."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=timeline.index, y=timeline["close"], mode="lines", name="Fechamento",
+        line=dict(color="lightgray")
+    ))
+    for label, grp in timeline.groupby("label", sort=False):
+        fig.add_trace(go.Scatter(
+            x=grp.index, y=grp["close"], mode="markers", name=label,
+            marker=dict(color=grp["color"].iloc[0], size=8),
+            customdata=grp[["trend", "imb_last", "aggressor_strength"]].to_numpy(),
+            hovertemplate="%{x}<br>Preço: %{y}<br>Tendência: %{customdata[0]}"
+                          "<br>Imbalance: %{customdata[1]:.2f}<br>Pressão: %{customdata[2]:.2f}<extra></extra>"
+        ))
+    fig.update_layout(
+        xaxis_title="Tempo",
+        yaxis_title="Preço",
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+def rolling_correlation_figure(rolling: pd.DataFrame) -> go.Figure:
+    """Correlação móvel dos retornos por par de símbolos (saída "rolling" do analyze_cross_asset)."""
+    fig = go.Figure()
+    for pair in rolling.columns:
+        fig.add_trace(go.Scatter(x=rolling.index, y=rolling[pair], mode="lines", name=pair))
+    fig.update_layout(
+        xaxis_title="Tempo",
+        yaxis_title="Correlação",
+        yaxis=dict(range=[-1, 1]),
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+def cross_correlation_figure(xcorr: pd.DataFrame, step_s: float = 1.0) -> go.Figure:
+    """Correlação cruzada por lag (s) de cada par; o pico fora do zero indica quem lidera."""
+    fig = go.Figure()
+    lag_s = xcorr.index.to_numpy() * step_s
+    for pair in xcorr.columns:
+        fig.add_trace(go.Scatter(x=lag_s, y=xcorr[pair], mode="lines+markers", name=pair, marker=dict(size=4)))
+    fig.add_vline(x=0, line=dict(color="lightgray", dash="dot"))
+    fig.update_layout(
+        xaxis_title="Lag (s) — positivo: o 1º símbolo do par lidera",
+        yaxis_title="Correlação",
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+def candle_liquidity_figure(df: pd.DataFrame, book: pd.DataFrame, freq: str = "1min") -> go.Figure:
+    """
+    Candles com a liquidez do livro no mesmo eixo de tempo (saída de BookSeries.frame/book_series):
+    spread e atualizações/s, profundidade no topo e em N níveis, imbalance do livro.
+    """
+    temp = df.set_index("timestamp")
+    ohlc = temp["price"].resample(freq).ohlc()
+    book = book[(book.index >= ohlc.index.min()) & (book.index <= ohlc.index.max())] if len(ohlc) else book
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.46, 0.18, 0.18, 0.18],
+                        specs=[[{}], [{"secondary_y": True}], [{}], [{}]])
+    fig.add_trace(go.Candlestick(x=ohlc.index, open=ohlc["open"], high=ohlc["high"], low=ohlc["low"],
+                                 close=ohlc["close"], name="Candles"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=book.index, y=book["spread"], mode="lines", name="Spread",
+                             line=dict(color="purple")), row=2, col=1)
+    fig.add_trace(go.Bar(x=book.index, y=book["update_rate"], name="Atualizações/s",
+                         marker_color="rgba(128,128,128,0.3)"), row=2, col=1, secondary_y=True)
+    fig.add_trace(go.Scatter(x=book.index, y=book["depth_top"], mode="lines", name="Qtd no topo",
+                             line=dict(color="teal")), row=3, col=1)
+    if book["depth_n"].notna().any():
+        fig.add_trace(go.Scatter(x=book.index, y=book["depth_n"], mode="lines", name="Qtd em N níveis",
+                                 line=dict(color="teal", dash="dot")), row=3, col=1)
+        fig.add_trace(go.Scatter(x=book.index, y=book["imbalance_n"], mode="lines", name="Imbalance (N níveis)",
+                                 line=dict(color="orange", dash="dot")), row=4, col=1)
+    fig.add_trace(go.Bar(x=book.index, y=book["imbalance"], name="Imbalance do topo",
+                         marker_color=["green" if v >= 0 else "red" for v in book["imbalance"].fillna(0)]), row=4, col=1)
+    fig.update_yaxes(title_text="Preço", row=1, col=1)
+    fig.update_yaxes(title_text="Spread", row=2, col=1)
+    fig.update_yaxes(title_text="Atual./s", row=2, col=1, secondary_y=True, showgrid=False)
+    fig.update_yaxes(title_text="Profund.", row=3, col=1)
+    fig.update_yaxes(title_text="Imbal.", range=[-1, 1], row=4, col=1)
+    fig.update_layout(
+        xaxis_rangeslider_visible=False,
+        legend=dict(orientation="h"),
+        height=600,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
@@ -11,9 +11,14 @@ def time_and_sales_figure(trades_df: pd.DataFrame, limit: int = 150) -> go.Figur
     if not cols_needed.issubset(set(trades_df.columns)):
         return go.Figure()
 
-    df = trades_df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df = df.dropna(subset=["timestamp"]).sort_values("timestamp", ascending=False).head(limit).iloc[::-1].reset_index(drop=True)
+    ts = trades_df["timestamp"]
+    if pd.api.types.is_datetime64_any_dtype(ts) and ts.is_monotonic_increasing and not ts.isna().any():
+        # já ordenado (preprocess_ts/simulador): copia só as últimas `limit` linhas
+        df = trades_df.tail(limit).reset_index(drop=True)
+    else:
+        df = trades_df.copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        df = df.dropna(subset=["timestamp"]).sort_values("timestamp", ascending=False).head(limit).iloc[::-1].reset_index(drop=True)
 
     # Colunas opcionais (agentes)
     buyer = df["buyer_agent"] if "buyer_agent" in df.columns else ""
@@ -0,0 +1,5 @@
+# file: testes/conftest.py
+import os, sys
+
+# permite rodar `pytest testes` da raiz sem instalar o pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+# file: testes/test_alerts.py
+"""AlertEngine: sinks isolados e thread seguidora resistente a falhas e parável."""
+import time
+import pandas as pd
+from tape_gpt.analysis.alerts import AlertEngine
+
+RULE = "imbalance < -0.4 for 1 bars"
+
+def _sells(n: int = 20) -> pd.DataFrame:
+    return pd.DataFrame({"timestamp": [pd.Timestamp.now(tz="UTC")] * n, "price": 100.0, "volume": 10, "side": "sell"})
+
+class _FlakyFeed:
+    """Feed sem add_sink (como o IngestProcess): uma leitura sim, outra não, levanta erro."""
+    def __init__(self):
+        self.reads = 0
+
+    def version(self) -> int:
+        return 0
+
+    def read_since(self, cursor: int):
+        self.reads += 1
+        if self.reads % 2:
+            raise RuntimeError("feed reiniciando")
+        return _sells(), cursor + 1
+
+def _until(cond, timeout: float = 10.0):
+    t0 = time.monotonic()
+    while not cond() and time.monotonic() - t0 < timeout:
+        time.sleep(0.01)
+    return cond()
+
+def test_sink_com_erro_nao_impede_os_outros():
+    engine = AlertEngine(rules=[RULE], symbol="WIN")
+    got = []
+    engine.add_sink(lambda alert: 1 / 0)
+    engine.add_sink(got.append)
+    fired = engine.on_batch(_sells())
+    assert len(fired) == 1 and got == fired
+    assert got[0]["symbol"] == "WIN"
+    assert engine.sink_errors == 1 and "ZeroDivisionError" in engine.last_sink_error
+    assert engine.log.seq() == 1
+
+def test_seguidora_sobrevive_a_erros_e_para():
+    engine = AlertEngine(rules=[RULE], cooldown_s=0.0)
+    feed = _FlakyFeed()
+    engine.attach(feed, interval_s=0.01)
+    try:
+        assert _until(lambda: engine.log.seq() >= 2 and engine.follow_errors >= 2)
+        assert "feed reiniciando" in engine.last_follow_error
+    finally:
+        engine.stop()
+    reads = feed.reads
+    time.sleep(0.1)
+    assert feed.reads == reads
+    assert engine._follower is None
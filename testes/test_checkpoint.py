@@ -0,0 +1,15 @@
+# file: testes/test_checkpoint.py
+"""Nomes dos checkpoints de sessão: chaves "sid:símbolo" distintas nunca caem no mesmo arquivo."""
+from tape_gpt.data.checkpoint import _NAME_RE, session_name
+
+SID = "0123456789abcdef0123456789abcdef"
+
+def test_separador_evita_colisao_entre_sid_e_simbolo():
+    assert session_name(f"{SID}:WIN") == f"session-{SID}-WIN"
+    assert session_name(f"{SID[:-1]}:{SID[-1]}WIN") != session_name(f"{SID}:WIN")
+
+def test_chaves_limpas_ou_cortadas_nao_colidem():
+    keys = [f"{SID}:WIN$N", f"{SID}:WIN-N", f"{SID}:WIN:N", f"{SID}:WIN N", f"{SID}:" + "A" * 60, f"{SID}:" + "A" * 61]
+    names = [session_name(k) for k in keys]
+    assert len(set(names)) == len(keys)
+    assert all(_NAME_RE.match(n) for n in names)
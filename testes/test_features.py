@@ -0,0 +1,42 @@
+# file: testes/test_features.py
+"""Paridade do signal_timeline com analyze_tape rodado no prefixo até cada barra."""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from tape_gpt.analysis.features import signal_timeline
+from tape_gpt.analysis.rule_based import analyze_tape
+from tape_gpt.data.loaders import parse_profit_excel
+from tape_gpt.data.preprocess import compute_imbalances, preprocess_ts
+
+XLSX = os.path.join(os.path.dirname(__file__), "exemplo_times_in_trade.xlsx")
+FIELDS = ["price_change_pct", "imb_last", "aggressor_strength", "volatility", "volatility_rel"]
+
+def _one_sided_tape(n: int = 800, seed: int = 3) -> pd.DataFrame:
+    # lados em rajadas longas: várias barras só com compras ou só com vendas
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2024-01-02 13:00", tz="UTC") + pd.to_timedelta(np.cumsum(rng.exponential(0.25, n)), unit="s")
+    side = np.repeat(rng.choice(["buy", "sell"], n // 40 + 1), 40)[:n]
+    price = 100000.0 + 5.0 * np.cumsum(np.where(side == "buy", 1, -1) * rng.integers(0, 2, n))
+    agents = rng.choice(["AG1", "AG2", "AG3"], n)
+    return preprocess_ts(pd.DataFrame({"timestamp": ts, "price": price, "volume": rng.integers(1, 50, n),
+                                       "side": side, "buyer_agent": agents, "seller_agent": agents[::-1]}))
+
+def _xlsx_tape() -> pd.DataFrame:
+    return preprocess_ts(parse_profit_excel(XLSX)[0])
+
+@pytest.mark.parametrize("make, freq", [(_xlsx_tape, "5s"), (_xlsx_tape, "1min"), (_one_sided_tape, "5s"),
+                                        (_one_sided_tape, "30s")])
+def test_signal_timeline_igual_ao_analyze_tape_no_prefixo(make, freq):
+    df = make()
+    timeline = signal_timeline(df, compute_imbalances(df, window=freq), freq=freq)
+    bins = df["timestamp"].dt.floor(freq)
+    assert len(timeline) == bins.nunique()
+    for label, row in timeline.iterrows():
+        prefix = df[bins <= label]
+        ins = analyze_tape(prefix, compute_imbalances(prefix, window=freq), freq=freq)
+        assert row["label"] == ins["main_signal"]["label"], label
+        assert row["trend"] == ins["trend"], label
+        assert bool(row["reversal_detected"]) == bool(ins["reversal_detected"]), label
+        for f in FIELDS:
+            assert row[f] == pytest.approx(ins[f], rel=1e-6, abs=1e-9), (label, f)
@@ -0,0 +1,174 @@
+# file: testes/test_kernels.py
+"""Paridade dos kernels (NumPy e backend ativo) com os resultados do pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+from tape_gpt.analysis import kernels
+from tape_gpt.analysis.microstructure import TapeSpeed
+from tape_gpt.analysis.orderflow import Footprint, cumulative_volume_delta, rolling_aggressor_volume
+from tape_gpt.chat.tools import TapeTools
+
+N = 20_000
+WINDOW_NS = 120 * 10**9
+
+@pytest.fixture(scope="module")
+def tape():
+    ts, volume, sign = kernels._synthetic_tape(N, seed=7)
+    side = np.where(sign > 0, "buy", np.where(sign < 0, "sell", "unknown"))
+    df = pd.DataFrame({"timestamp": pd.to_datetime(ts, utc=True), "price": 100.0, "volume": volume, "side": side})
+    return ts, volume, sign, df
+
+# cada kernel em duas versões: fallback NumPy e a API pública (numba quando instalado)
+CVD = {"numpy": kernels._cvd_np, "ativo": kernels.cvd}
+ROLLING = {"numpy": kernels._rolling_side_volume_np, "ativo": kernels.rolling_side_volume}
+CLUSTER = {"numpy": kernels._first_cluster_np, "ativo": kernels.first_cluster}
+FOOTPRINT = {"numpy": kernels._footprint_add_np, "ativo": kernels.footprint_add}
+
+@pytest.mark.parametrize("impl", CVD)
+def test_cvd_igual_ao_cumsum_do_pandas(tape, impl):
+    ts, volume, sign, _ = tape
+    expected = (pd.Series(volume) * pd.Series(sign)).cumsum().to_numpy()
+    np.testing.assert_allclose(CVD[impl](volume, sign), expected)
+
+@pytest.mark.parametrize("impl", ROLLING)
+def test_rolling_side_volume_igual_ao_rolling_do_pandas(tape, impl):
+    ts, volume, sign, _ = tape
+    vol = pd.Series(volume, index=pd.DatetimeIndex(ts.view("datetime64[ns]")))
+    s = pd.Series(sign, index=vol.index)
+    exp_buy = vol.where(s > 0, 0.0).rolling("2min").sum().to_numpy()
+    exp_sell = vol.where(s < 0, 0.0).rolling("2min").sum().to_numpy()
+    vb, vs = ROLLING[impl](ts, volume, sign, WINDOW_NS)
+    np.testing.assert_allclose(vb, exp_buy, atol=1e-6)
+    np.testing.assert_allclose(vs, exp_sell, atol=1e-6)
+
+def _first_cluster_loop_pandas(times: pd.Series, window: pd.Timedelta, k: int = 3) -> int:
+    # varredura anterior do analyze_tape (iloc por negócio)
+    for i in range(len(times) - k + 1):
+        if times.iloc[i + k - 1] - times.iloc[i] <= window:
+            return i
+    return -1
+
+@pytest.mark.parametrize("impl", CLUSTER)
+@pytest.mark.parametrize("window_s", [0.001, 0.5, 5, 120])
+def test_first_cluster_igual_a_varredura_do_pandas(tape, impl, window_s):
+    ts, volume, _, _ = tape
+    big = ts[volume >= 190]
+    expected = _first_cluster_loop_pandas(pd.Series(pd.to_datetime(big, utc=True)), pd.Timedelta(seconds=window_s))
+    assert CLUSTER[impl](big, int(window_s * 1e9), 3) == expected
+
+def test_first_cluster_sem_eventos_suficientes():
+    assert kernels.first_cluster(np.array([1, 2], np.int64), 10, 3) == -1
+
+def test_wrappers_do_orderflow(tape):
+    ts, volume, sign, df = tape
+    cvd = cumulative_volume_delta(df)
+    assert isinstance(cvd.index, pd.DatetimeIndex)
+    np.testing.assert_allclose(cvd.to_numpy(), np.cumsum(volume * sign))
+    flow = rolling_aggressor_volume(df, "2min")
+    vb, vs = kernels._rolling_side_volume_np(ts, volume, sign, WINDOW_NS)
+    np.testing.assert_allclose(flow["vbuy"].to_numpy(), vb)
+    np.testing.assert_allclose(flow["vsell"].to_numpy(), vs)
+
+def test_tape_speed_numpy_igual_ao_backend_ativo_e_em_lotes(tape):
+    ts, _, sign, _ = tape
+    args = (1.0, 30.0, 0.01, 50)
+    ref = kernels._tape_speed_np(ts, sign, *args, np.zeros(1, np.int64), np.zeros(kernels.SPEED_STATE))
+    whole = kernels.tape_speed(ts, sign, *args, np.zeros(1, np.int64), np.zeros(kernels.SPEED_STATE))
+    clock, state = np.zeros(1, np.int64), np.zeros(kernels.SPEED_STATE)
+    parts = [kernels.tape_speed(ts[a:b], sign[a:b], *args, clock, state)
+             for a, b in zip(range(0, N, 3_000), range(3_000, N + 3_000, 3_000))]
+    batched = [np.concatenate(col) for col in zip(*parts)]
+    for r, w, b in zip(ref, whole, batched):
+        np.testing.assert_allclose(w, r, rtol=1e-7, atol=1e-9)
+        np.testing.assert_allclose(b, r, rtol=1e-7, atol=1e-9)
+
+def test_tape_speed_sequencias_iguais_ao_groupby_do_pandas(tape):
+    ts, _, sign, _ = tape
+    _, _, _, side, run = kernels.tape_speed(ts, sign, 1.0, 30.0, 0.01, 50,
+                                            np.zeros(1, np.int64), np.zeros(kernels.SPEED_STATE))
+    # lado vigente: último sinal não nulo; negócio sem lado não quebra nem alonga a sequência
+    s = pd.Series(sign).replace(0, np.nan).ffill().fillna(0)
+    seq = (s != s.shift()).cumsum()
+    exp_run = (pd.Series(sign != 0).astype(int).groupby(seq).cumsum()).to_numpy()
+    np.testing.assert_array_equal(side, s.to_numpy().astype(np.int8))
+    np.testing.assert_array_equal(run[s.to_numpy() != 0], exp_run[s.to_numpy() != 0])
+
+def test_tape_speed_intensidade_de_fluxo_constante():
+    # 10 negócios/s por 5 min: a intensidade rápida converge para 10/s
+    ts = (np.arange(3000, dtype=np.int64) * 100_000_000) + 10**18
+    sp = TapeSpeed()
+    df = pd.DataFrame({"timestamp": pd.to_datetime(ts, utc=True), "price": 1.0, "volume": 1, "side": "buy"})
+    sp.update(df)
+    assert sp.stats()["intensity"] == pytest.approx(10.0, rel=0.05)
+
+@pytest.mark.parametrize("ia_ms", [3, 150, 1000, 45_000, 90_000])
+def test_tape_speed_quantis_de_intervalos_constantes(ia_ms):
+    # intervalo constante: p50 = p90 = o intervalo (antes, 1000 ms virava p50 1500 / p90 1900)
+    ts = (np.arange(500, dtype=np.int64) * ia_ms * 1_000_000) + 10**18
+    sp = TapeSpeed()
+    for chunk in np.array_split(ts, 5):
+        sp.update(pd.DataFrame({"timestamp": pd.to_datetime(chunk, utc=True), "side": "buy"}))
+    ia = sp.stats()["interarrival_ms"]
+    assert ia["p50"] == pytest.approx(ia_ms) and ia["p90"] == pytest.approx(ia_ms)
+    restored = TapeSpeed.from_state(*sp.state())
+    assert restored.stats()["interarrival_ms"]["p90"] == pytest.approx(ia_ms)
+
+def test_tape_speed_quantis_proximos_dos_exatos():
+    rng = np.random.default_rng(0)
+    ia = rng.exponential(300.0, 20_000)
+    ts = (np.cumsum(ia) * 1e6).astype(np.int64) + 10**18
+    sp = TapeSpeed()
+    sp.update(pd.DataFrame({"timestamp": pd.to_datetime(ts, utc=True), "side": "buy"}))
+    exact = np.percentile(np.diff(ts) / 1e6, [50, 90])
+    got = sp.stats()["interarrival_ms"]
+    assert got["p50"] == pytest.approx(exact[0], rel=0.1)
+    assert got["p90"] == pytest.approx(exact[1], rel=0.1)
+
+def _priced(df: pd.DataFrame, step: float, seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    walk = np.cumsum(rng.choice([-1, 0, 1], len(df)))
+    return df.assign(price=np.round(1000.0 + step * walk, 2))
+
+def _groupby_footprint(df: pd.DataFrame) -> pd.DataFrame:
+    g = df.assign(vbuy=df["volume"].where(df["side"] == "buy", 0.0), vsell=df["volume"].where(df["side"] == "sell", 0.0))
+    return g.groupby("price")[["vbuy", "vsell", "volume"]].sum().sort_index(ascending=False)
+
+@pytest.mark.parametrize("impl", FOOTPRINT)
+def test_footprint_add_igual_ao_groupby_do_pandas(tape, impl):
+    _, volume, sign, _ = tape
+    level = np.arange(len(volume)) % 37
+    acc = [np.zeros(37) for _ in range(3)]
+    FOOTPRINT[impl](level, volume, sign, *acc)
+    ref = pd.DataFrame({"level": level, "v": volume, "s": sign})
+    np.testing.assert_allclose(acc[0], ref.v.where(ref.s > 0, 0.0).groupby(ref.level).sum())
+    np.testing.assert_allclose(acc[1], ref.v.where(ref.s < 0, 0.0).groupby(ref.level).sum())
+    np.testing.assert_allclose(acc[2], ref.v.groupby(ref.level).sum())
+
+@pytest.mark.parametrize("step", [5.0, 0.01])
+def test_footprint_incremental_igual_ao_groupby(tape, step):
+    df = _priced(tape[3], step)
+    fp = Footprint()
+    for chunk in np.array_split(np.arange(len(df)), 7):   # faixa de preço cresce para os dois lados
+        fp.update(df.iloc[chunk])
+    got = fp.frame().set_index("price")
+    ref = _groupby_footprint(df)
+    np.testing.assert_allclose(got.index.to_numpy(), ref.index.to_numpy())
+    np.testing.assert_allclose(got[["vbuy", "vsell", "volume"]].to_numpy(), ref.to_numpy())
+    np.testing.assert_allclose(got["delta"].to_numpy(), (ref["vbuy"] - ref["vsell"]).to_numpy())
+
+@pytest.mark.parametrize("step, bins", [(5.0, 20), (5.0, 10_000), (0.01, 7), (0.01, 100)])
+def test_volume_profile_da_ferramenta_sobre_o_footprint(tape, step, bins):
+    df = _priced(tape[3], step)
+    prof = TapeTools(df).get_volume_profile("all", bins)
+    ref = _groupby_footprint(df).sort_index()
+    levels = ref.index.to_numpy()
+    nb = max(1, min(bins, 100))
+    if len(levels) > nb:   # faixas de mesma largura, preço da faixa = limite inferior
+        edges = np.linspace(levels[0], levels[-1], nb + 1)
+        ref = ref.groupby(np.clip(np.searchsorted(edges, levels, "right") - 1, 0, nb - 1)).sum()
+        ref.index = edges[ref.index]
+    assert prof["trades"] == len(df)
+    assert [lv["price"] for lv in prof["levels"]] == pytest.approx(list(ref.index))
+    assert [lv["volume"] for lv in prof["levels"]] == pytest.approx(list(ref["volume"]))
+    assert [lv["buy"] for lv in prof["levels"]] == pytest.approx(list(ref["vbuy"]))
+    assert prof["poc"] == pytest.approx(ref["volume"].idxmax())
@@ -0,0 +1,61 @@
+# file: testes/test_local_backend.py
+"""LocalLLM: template de chat por modelo, rota /v1/chat/completions e descarte dos pedidos que estouraram o prazo."""
+import threading
+import pytest
+from tape_gpt.chat.local_backend import LocalLLM, make_engine, render_llama3, render_mistral
+from tape_gpt.chat.resilience import LLMTimeoutError
+
+MSGS = [{"role": "system", "content": "Seja breve."}, {"role": "user", "content": "Como está o fluxo?"}]
+
+def test_templates_llama3_e_mistral():
+    p = render_llama3(MSGS)
+    assert p.startswith("<|begin_of_text|><|start_header_id|>system<|end_header_id|>")
+    assert p.endswith("<|start_header_id|>assistant<|end_header_id|>\n\n")
+    assert "<|im_start|>" not in p
+    # Mistral não tem papel de sistema: vai no primeiro [INST]
+    assert render_mistral(MSGS) == "<s>[INST] Seja breve.\n\nComo está o fluxo? [/INST]"
+
+def test_template_desconhecido_falha():
+    with pytest.raises(ValueError):
+        make_engine("local", "http://127.0.0.1:1/v1", template="alpaca")
+
+class _SlowEngine:
+    """Motor de teste: o primeiro lote fica preso até `release`; guarda os prompts que chegaram a ser gerados."""
+    model = "fake"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.seen = []
+
+    @staticmethod
+    def render(messages):
+        return messages[-1]["content"]
+
+    def generate(self, prompts, max_tokens, temperature):
+        self.seen += prompts
+        self.release.wait(5)
+        return [f"ok {p}" for p in prompts]
+
+def test_pedido_com_prazo_vencido_nao_e_gerado():
+    eng = _SlowEngine()
+    llm = LocalLLM(eng, max_batch=1, batch_window_s=0.0, timeout_s=0.2)
+    first = llm.submit([{"role": "user", "content": "a"}])
+    with pytest.raises(LLMTimeoutError):
+        llm.complete([{"role": "user", "content": "b"}])   # fica na fila atrás de "a" e estoura o prazo
+    eng.release.set()
+    assert first.result(timeout=5) == "ok a"
+    llm.timeout_s = 5
+    assert llm.complete([{"role": "user", "content": "c"}]) == "ok c"
+    assert eng.seen == ["a", "c"]
+
+def test_template_server_usa_chat_completions():
+    pytest.importorskip("openai")
+    from tape_gpt.chat.mock_llm import MockLLMServer
+    srv = MockLLMServer().start()
+    try:
+        llm = LocalLLM(make_engine("local", srv.url, "mock", template="server"), max_batch=4, timeout_s=10)
+        assert llm.complete(MSGS)
+        assert [r["path"].rstrip("/").endswith("/chat/completions") for r in srv.requests] == [True]
+        assert srv.requests[0]["body"]["messages"] == MSGS
+    finally:
+        srv.stop()
@@ -0,0 +1,200 @@
+# file: testes/test_resilience.py
+"""LLMGuard contra falhas injetadas no MockLLMServer (fault_sequence / random_faults)."""
+import asyncio, random, threading, time
+import pytest
+from tape_gpt.chat.client import _make_client, _require_openai, acall_openai, call_openai
+from tape_gpt.chat.mock_llm import MockLLMServer, fault_sequence, random_faults
+from tape_gpt.chat.resilience import CircuitOpenError, LLMGuard, LLMTimeoutError
+
+openai = pytest.importorskip("openai")
+
+MODEL = "gpt-5-mini"   # só Responses API: uma requisição por tentativa (sem fallback para Chat)
+MSGS = [{"role": "user", "content": "resumo do tape"}]
+
+class _MaxJitter(random.Random):
+    """Full jitter sempre no teto: esperas determinísticas (base * 2^tentativa)."""
+    def uniform(self, a, b):
+        return b
+
+@pytest.fixture
+def server():
+    servers = []
+    def _make(**kw):
+        kw.setdefault("hang_s", 3.0)
+        srv = MockLLMServer(**kw).start()
+        servers.append(srv)
+        return srv
+    yield _make
+    for srv in servers:
+        srv.stop()
+
+def _ask(srv, guard):
+    return call_openai("mock", MODEL, MSGS, base_url=srv.url, guard=guard)
+
+# ---------- retry ----------
+
+def test_retry_em_503_com_backoff(server):
+    srv = server(fault=fault_sequence([503, 503]))
+    guard = LLMGuard(deadline_s=10, max_retries=3, base_delay_s=0.1, rng=_MaxJitter())
+    t0 = time.perf_counter()
+    assert _ask(srv, guard).startswith("Resposta do mock")
+    assert time.perf_counter() - t0 >= 0.1 + 0.2        # backoff exponencial entre as tentativas
+    assert len(srv.requests) == 3
+    assert guard.stats["attempts"] == 3 and guard.stats["retries"] == 2 and guard.stats["failures"] == 0
+
+def test_retry_em_429_respeita_retry_after(server):
+    # o mock responde 429 com Retry-After: 0 -> nova tentativa imediata, apesar do backoff de 5 s
+    srv = server(fault=fault_sequence([429, 429]))
+    guard = LLMGuard(deadline_s=30, max_retries=3, base_delay_s=5.0, rng=_MaxJitter())
+    t0 = time.perf_counter()
+    assert _ask(srv, guard).startswith("Resposta do mock")
+    assert time.perf_counter() - t0 < 2.0
+    assert guard.stats["retries"] == 2
+
+def test_backoff_usa_retry_after_do_servidor_limitado_ao_teto():
+    class _Resp:
+        headers = {"retry-after": "1.5"}
+    class _Err(Exception):
+        response = _Resp()
+    guard = LLMGuard(base_delay_s=0.1, max_delay_s=8.0, rng=_MaxJitter())
+    assert guard.backoff(0, _Err()) == 1.5
+    assert guard.backoff(3) == pytest.approx(0.8)
+    _Resp.headers = {"retry-after": "120"}
+    assert guard.backoff(0, _Err()) == 8.0
+
+def test_sem_retry_em_400(server):
+    srv = server(fault=fault_sequence([400]))
+    guard = LLMGuard(deadline_s=10, max_retries=3, base_delay_s=0.01, failure_threshold=1)
+    with pytest.raises(openai.BadRequestError):
+        _ask(srv, guard)
+    assert len(srv.requests) == 1 and guard.stats["retries"] == 0
+    assert guard.breaker.state == "closed"              # erro do pedido não abre o circuito
+
+def test_desiste_apos_max_retries(server):
+    srv = server(fault=fault_sequence([503] * 10))
+    guard = LLMGuard(deadline_s=10, max_retries=2, base_delay_s=0.01)
+    with pytest.raises(openai.InternalServerError):
+        _ask(srv, guard)
+    assert len(srv.requests) == 3 and guard.stats["failures"] == 1
+
+def test_falhas_aleatorias_sao_absorvidas_pelo_retry(server):
+    srv = server(fault=random_faults(fail_rate=0.4, seed=3))
+    guard = LLMGuard(deadline_s=30, max_retries=8, base_delay_s=0.01, failure_threshold=100)
+    for _ in range(10):
+        assert _ask(srv, guard).startswith("Resposta do mock")
+    assert guard.stats["attempts"] == len(srv.requests)
+    assert guard.stats["retries"] == len(srv.requests) - 10 > 0
+
+# ---------- prazo ----------
+
+def test_prazo_com_servidor_pendurado(server):
+    srv = server(fault=fault_sequence(["hang"] * 10))
+    guard = LLMGuard(deadline_s=0.8, max_retries=5, base_delay_s=0.05)
+    t0 = time.perf_counter()
+    with pytest.raises((LLMTimeoutError, openai.APITimeoutError)):
+        _ask(srv, guard)
+    assert time.perf_counter() - t0 < 1.5               # o prazo vale para todas as tentativas somadas
+
+def test_prazo_com_servidor_pendurado_async(server):
+    srv = server(fault=fault_sequence(["hang"] * 10))
+    guard = LLMGuard(deadline_s=0.8, max_retries=5, base_delay_s=0.05)
+
+    async def _go():
+        async with _require_openai().AsyncOpenAI(api_key="mock", base_url=srv.url, max_retries=0) as client:
+            return await guard.arun(lambda t: acall_openai(client, MODEL, MSGS))
+    t0 = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(_go())
+    assert time.perf_counter() - t0 < 1.5
+
+def test_prazo_nao_espera_backoff_que_passaria_do_limite(server):
+    srv = server(fault=fault_sequence([503] * 10))
+    guard = LLMGuard(deadline_s=1.0, max_retries=10, base_delay_s=5.0, rng=_MaxJitter())
+    t0 = time.perf_counter()
+    with pytest.raises(openai.InternalServerError):
+        _ask(srv, guard)
+    assert time.perf_counter() - t0 < 0.5 and len(srv.requests) == 1
+
+# ---------- circuit breaker ----------
+
+def test_circuito_abre_sonda_meio_aberto_e_fecha(server):
+    srv = server(fault=fault_sequence([503, 503, 503]))
+    guard = LLMGuard(deadline_s=5, max_retries=0, failure_threshold=2, reset_after_s=0.4)
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            _ask(srv, guard)
+    assert guard.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):              # aberto: falha na hora, sem requisição
+        _ask(srv, guard)
+    assert len(srv.requests) == 2 and guard.stats["rejected"] == 1
+
+    time.sleep(0.45)
+    assert guard.breaker.state == "half_open"
+    with pytest.raises(openai.InternalServerError):     # sonda falhou: volta a abrir
+        _ask(srv, guard)
+    assert guard.breaker.state == "open"
+
+    time.sleep(0.45)
+    assert _ask(srv, guard).startswith("Resposta do mock")   # sonda ok: fecha
+    assert guard.breaker.state == "closed"
+    assert len(srv.requests) == 4
+
+def test_meio_aberto_deixa_passar_uma_sonda_por_vez(server):
+    srv = server(fault=fault_sequence([503]), delay_s=0.3)
+    guard = LLMGuard(deadline_s=5, max_retries=0, failure_threshold=1, reset_after_s=0.2)
+    with pytest.raises(openai.InternalServerError):
+        _ask(srv, guard)
+    time.sleep(0.25)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_safe(srv, guard))) for _ in range(3)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert sorted(results) == ["circuito", "circuito", "ok"]
+
+def _safe(srv, guard) -> str:
+    try:
+        _ask(srv, guard)
+        return "ok"
+    except CircuitOpenError:
+        return "circuito"
+
+# ---------- concorrência ----------
+
+def test_limite_de_chamadas_simultaneas(server):
+    srv = server(delay_s=0.3)
+    guard = LLMGuard(deadline_s=10, max_concurrency=2)
+    client = _make_client("mock", srv.url, timeout_s=5)
+    lock, live, peak = threading.Lock(), [0], [0]
+
+    def _call(t):
+        with lock:
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+        try:
+            return client.with_options(timeout=t).responses.create(model=MODEL, input="oi")
+        finally:
+            with lock:
+                live[0] -= 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=guard.run, args=(_call,)) for _ in range(6)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert peak[0] == 2 and len(srv.requests) == 6
+    assert time.perf_counter() - t0 >= 3 * 0.3          # 6 chamadas em 3 levas de 2
+
+def test_sem_vaga_dentro_do_prazo(server):
+    srv = server()
+    guard = LLMGuard(deadline_s=0.3, max_concurrency=1, max_retries=0)
+    holder = threading.Thread(target=guard.run, args=(lambda t: time.sleep(1.0),))   # ocupa a única vaga
+    holder.start()
+    time.sleep(0.05)
+    with pytest.raises(LLMTimeoutError, match="vaga"):
+        _ask(srv, guard)
+    holder.join()
+    assert len(srv.requests) == 0
+    assert guard.breaker.state == "closed"              # fila cheia não diz nada sobre o provedor
@@ -0,0 +1,100 @@
+# file: testes/test_scheduler.py
+"""LLMScheduler contra o MockLLMServer: roteamento para o modelo barato, hedge e cancelamento da perdedora."""
+import threading, time
+import pytest
+from tape_gpt.chat.mock_llm import MockLLMServer
+from tape_gpt.chat.resilience import LLMGuard
+from tape_gpt.chat.scheduler import LLMScheduler
+
+pytest.importorskip("openai")
+
+MSGS = [{"role": "user", "content": "Como está o fluxo?"}]
+
+class _Latency:
+    """latency(req) do mock: a 1ª requisição demora `slow` s, as seguintes `fast` s; guarda o instante de chegada."""
+    def __init__(self, slow: float, fast: float = 0.0):
+        self.slow, self.fast = slow, fast
+        self.arrivals = []
+        self._lock = threading.Lock()
+
+    def __call__(self, req: dict) -> float:
+        with self._lock:
+            self.arrivals.append((time.perf_counter(), req.get("model")))
+            return self.slow if len(self.arrivals) == 1 else self.fast
+
+def _scheduler(srv, **kw) -> LLMScheduler:
+    kw.setdefault("guard", LLMGuard(deadline_s=10, max_retries=0))   # guard próprio: sem estado de outros testes
+    return LLMScheduler("mock", "gpt-4o", cheap_model="gpt-4o-mini", base_url=srv.url, **kw)
+
+@pytest.fixture
+def server():
+    servers = []
+    def _make(**kw):
+        srv = MockLLMServer(hang_s=2.0, **kw).start()
+        servers.append(srv)
+        return srv
+    yield _make
+    for srv in servers:
+        srv.stop()
+
+def test_tarefas_baratas_vao_para_o_modelo_barato_sem_hedge(server):
+    lat = _Latency(slow=0.4)
+    srv = server(latency=lat)
+    sched = _scheduler(srv, initial_hedge_s=0.05)
+    for kind in ("summary", "classify"):
+        assert sched.complete(MSGS, kind=kind).startswith("Resposta do mock")
+    assert [r["body"]["model"] for r in srv.requests] == ["gpt-4o-mini", "gpt-4o-mini"]
+    assert sched.stats["hedged"] == 0 and sched.stats["calls"] == 2
+    sched.complete(MSGS, kind="answer", hedge=False)
+    assert srv.requests[-1]["body"]["model"] == "gpt-4o"
+
+def test_hedge_dispara_apos_o_atraso_e_fica_com_a_primeira_resposta(server):
+    lat = _Latency(slow=1.5)
+    srv = server(latency=lat)
+    sched = _scheduler(srv, initial_hedge_s=0.2, hedge_models=["gpt-4o-mini"])
+    t0 = time.perf_counter()
+    text = sched.complete(MSGS, kind="answer")
+    elapsed = time.perf_counter() - t0
+    assert text.startswith("Resposta do mock")
+    assert elapsed < 1.0                                # não esperou a original lenta
+    (t_first, m_first), (t_hedge, m_hedge) = lat.arrivals
+    assert (m_first, m_hedge) == ("gpt-4o", "gpt-4o-mini")
+    assert t_hedge - t_first >= 0.15                    # réplica só depois do atraso de hedge
+    assert sched.stats["hedged"] == 1 and sched.stats["hedge_wins"] == 1
+
+def test_sem_hedge_quando_a_resposta_chega_antes_do_atraso(server):
+    srv = server(delay_s=0.05)
+    sched = _scheduler(srv, initial_hedge_s=1.0)
+    sched.complete(MSGS, kind="answer")
+    assert len(srv.requests) == 1 and sched.stats["hedged"] == 0 and sched.stats["cancelled"] == 0
+
+def test_perdedora_e_cancelada(server):
+    lat = _Latency(slow=1.0)
+    srv = server(latency=lat)
+    sched = _scheduler(srv, initial_hedge_s=0.2)
+    sched.chat_completion({"model": "gpt-4o", "messages": MSGS, "max_tokens": 16})
+    assert sched.stats["cancelled"] == 1
+    # a conexão da perdedora foi fechada pelo cliente: o mock não consegue entregar a resposta
+    deadline = time.time() + 3
+    while srv.cancelled == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    assert srv.cancelled == 1
+
+def test_hedge_quando_a_primeira_falha_antes_do_atraso(server):
+    from tape_gpt.chat.mock_llm import fault_sequence
+    srv = server(fault=fault_sequence([400]))
+    sched = _scheduler(srv, initial_hedge_s=5.0)
+    t0 = time.perf_counter()
+    assert sched.complete(MSGS, kind="answer").startswith("Resposta do mock")
+    assert time.perf_counter() - t0 < 2.0               # réplica saiu já, sem esperar o atraso
+    assert sched.stats["hedged"] == 1 and sched.stats["hedge_wins"] == 1
+
+def test_atraso_de_hedge_acompanha_o_quantil_das_latencias():
+    sched = LLMScheduler("mock", "m", initial_hedge_s=4.0, min_hedge_s=0.25, guard=LLMGuard())
+    assert sched.hedge_delay() == 4.0                   # poucas amostras: valor inicial
+    for s in [0.5] * 18 + [1.0, 3.0]:
+        sched._observe("answer", s)
+    assert sched.hedge_delay() == pytest.approx(1.1)    # p95 das últimas latências
+    for s in [0.01] * 100:
+        sched._observe("answer", s)
+    assert sched.hedge_delay() == 0.25                  # piso
@@ -0,0 +1,36 @@
+import uuid
+import numpy as np
+import pandas as pd
+from tape_gpt.data.shm_ring import AGENT_DTYPE, SharedAgentTable
+
+def _tables():
+    name = f"t_agents_{uuid.uuid4().hex[:8]}"
+    writer = SharedAgentTable(name, capacity=64, create=True, writable=True)
+    return writer, SharedAgentTable(name)
+
+def test_nomes_curtos_passam_inteiros():
+    writer, reader = _tables()
+    try:
+        names = ["Banco Exemplo Corretora A", "Banco Exemplo Corretora B", "XP", "Ágora Investimentos"]
+        codes = writer.codes(pd.Series(names))
+        assert reader.names() == names
+        cat = reader.categorical(codes)
+        assert list(cat) == names
+    finally:
+        reader.close()
+        writer.close()
+
+def test_nomes_longos_com_mesmo_prefixo_continuam_unicos():
+    writer, reader = _tables()
+    try:
+        prefix = "Corretora de Títulos e Valores Mobiliários Exemplo Muito Longa S.A. "
+        names = [prefix + "A", prefix + "B", prefix + "A"]
+        codes = writer.codes(pd.Series(names))
+        got = reader.names()
+        assert len(got) == 2 and len(set(got)) == 2
+        assert all(len(n.encode("utf-8")) <= AGENT_DTYPE.itemsize for n in got)
+        cat = reader.categorical(np.asarray(codes))   # levantava "categories must be unique"
+        assert cat[0] == cat[2] != cat[1]
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,18 @@
+import time
+import pytest
+from tape_gpt.data.simulator import RealTimeSimulator
+
+@pytest.mark.parametrize("vol", [0.5, 2.0, 8.0])
+def test_modo_book_so_publica_cotacoes_com_os_dois_lados(vol):
+    # vol baixo = ordens coladas no topo: varridas zeram um lado com frequência
+    sim = RealTimeSimulator(mode="book", rate=2000, vol=vol, max_rows=100_000)
+    batches = []
+    sim.add_sink(lambda trades, offers: batches.append(offers))
+    t = time.time()
+    for i in range(100):
+        sim._step_book(t + i * 0.05, t + (i + 1) * 0.05)
+    assert len(batches[0]) > 0                     # o 1º lote vem logo após a montagem do livro
+    offers, _ = sim.read_offers_since(0)
+    assert len(offers) > 0
+    assert (offers["bid"] > 0).all() and (offers["ask"] > 0).all()
+    assert (offers["ask"] > offers["bid"]).all()
@@ -0,0 +1,128 @@
+# file: testes/test_tools.py
+"""Function calling ponta a ponta: call_openai_tools + TapeTools contra o MockLLMServer local."""
+import json
+import pytest
+from tape_gpt.chat.client import call_openai_tools
+from tape_gpt.chat.mock_llm import MockLLMServer
+from tape_gpt.chat.tools import TOOL_SPECS, TapeTools
+from tape_gpt.data.loaders import parse_profit_excel
+
+pytest.importorskip("openai")
+
+XLSX = "testes/exemplo_times_in_trade.xlsx"
+
+class _ScriptedServer(MockLLMServer):
+    """Mock que pede as ferramentas do roteiro (uma lista de chamadas por rodada) enquanto houver tools."""
+    def __init__(self, script, **kw):
+        super().__init__(**kw)
+        self.script = list(script)
+
+    def chat_completion(self, req: dict) -> dict:
+        out = super().chat_completion(req)
+        if req.get("tools") and self.script:
+            calls = self.script.pop(0)
+            out["choices"][0]["message"] = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": self._id("call"), "type": "function",
+                 "function": {"name": n, "arguments": a if isinstance(a, str) else json.dumps(a)}}
+                for n, a in calls]}
+            out["choices"][0]["finish_reason"] = "tool_calls"
+        return out
+
+@pytest.fixture(scope="module")
+def tools():
+    trades, _ = parse_profit_excel(XLSX)
+    return TapeTools(trades)
+
+@pytest.fixture
+def server():
+    srv = MockLLMServer().start()
+    yield srv
+    srv.stop()
+
+def _ask(srv, tools, question, **kw):
+    msgs = [{"role": "system", "content": "Tape reading."}, {"role": "user", "content": question}]
+    return call_openai_tools("mock", "gpt-4o-mini", msgs, tools, base_url=srv.url, **kw)
+
+@pytest.mark.parametrize("question, expected", [
+    ("Qual o POC do perfil de volume?", "get_volume_profile"),
+    ("O que o agente XP está fazendo?", "get_agent_stats"),
+    ("Como estão as últimas barras?", "get_bars"),
+    ("Teve print grande hoje?", "get_big_prints"),
+])
+def test_modelo_escolhe_a_ferramenta_e_recebe_o_resultado(server, tools, question, expected):
+    text, trace = _ask(server, tools, question)
+    assert [c["name"] for c in trace] == [expected]
+    assert "error" not in trace[0]["result"]
+    assert text.startswith("Consultei o tape")
+    # 1ª rodada com as ferramentas; 2ª com o resultado no histórico
+    bodies = [r["body"] for r in server.requests]
+    assert len(bodies) == 2 and bodies[0]["tools"]
+    tool_msgs = [m for m in bodies[1]["messages"] if m["role"] == "tool"]
+    assert json.loads(tool_msgs[0]["content"]) == json.loads(json.dumps(trace[0]["result"], default=str))
+
+def test_resultados_das_ferramentas(server, tools):
+    _, trace = _ask(server, tools, "Qual o POC do perfil e os prints grandes?")
+    res = {c["name"]: c["result"] for c in trace}
+    prof = res["get_volume_profile"]
+    assert prof["trades"] == len(tools.df) and prof["poc"] in [lv["price"] for lv in prof["levels"]]
+    prints = res["get_big_prints"]["prints"]
+    assert prints and all({"vbuy_2min", "vsell_2min"} <= set(p) for p in prints)
+
+def test_sem_ferramentas_responde_direto(server, tools):
+    text, trace = _ask(server, tools, "Bom dia")
+    assert trace == [] and text.startswith("Resposta do mock")
+    assert len(server.requests) == 1
+
+def test_limite_de_rodadas():
+    trades, _ = parse_profit_excel(XLSX)
+    tools = TapeTools(trades)
+    srv = _ScriptedServer([[("get_bars", {"freq": "1min", "n": 3})]] * 10).start()
+    try:
+        text, trace = _ask(srv, tools, "barras?", max_rounds=2)
+    finally:
+        srv.stop()
+    # duas rodadas com ferramentas; a última vai sem tools e o modelo tem de responder em texto
+    assert len(trace) == 2
+    with_tools = [bool(r["body"].get("tools")) for r in srv.requests]
+    assert with_tools == [True, True, False]
+    assert text.startswith("Consultei o tape")
+
+def test_modelo_que_insiste_em_ferramentas_estoura_o_limite(tools):
+    class _Stubborn(_ScriptedServer):
+        def chat_completion(self, req):
+            return super().chat_completion(dict(req, tools=TOOL_SPECS))   # ignora a retirada das tools
+    srv = _Stubborn([[("get_bars", {"freq": "1min", "n": 3})]] * 10).start()
+    try:
+        with pytest.raises(RuntimeError, match="limite de chamadas"):
+            _ask(srv, tools, "barras?", max_rounds=1)
+    finally:
+        srv.stop()
+
+def test_argumentos_invalidos_voltam_como_erro_para_o_modelo(tools):
+    script = [[("get_bars", {"freq": "nada", "n": 3}),
+               ("get_volume_profile", {"range": "all", "cores": 3}),
+               ("get_big_prints", "{nao e json"),
+               ("apaga_tudo", {})]]
+    srv = _ScriptedServer(script).start()
+    try:
+        text, trace = _ask(srv, tools, "qualquer coisa")
+    finally:
+        srv.stop()
+    errors = [c["result"].get("error", "") for c in trace]
+    assert errors[0].startswith("argumentos inválidos para get_bars")
+    assert errors[1].startswith("argumentos inválidos para get_volume_profile")
+    assert errors[2].startswith("argumentos inválidos para get_big_prints")
+    assert errors[3] == "ferramenta desconhecida: apaga_tudo"
+    # o loop segue: os erros vão para o modelo, que responde em texto
+    assert text.count("erro:") == 4
+
+def test_get_bars_limita_freq_e_rejeita_nao_positiva(tools):
+    assert tools.call("get_bars", {"freq": "1ms", "n": 3})["freq"] == "1s"
+    for freq in ("0s", "-1min"):
+        assert tools.call("get_bars", {"freq": freq, "n": 3})["error"].startswith("argumentos inválidos para get_bars")
+
+def test_falha_interna_volta_como_erro(tools, monkeypatch):
+    def boom(freq):
+        raise KeyError("price")
+    monkeypatch.setattr(tools, "_bars_for", boom)
+    assert tools.call("get_bars", {"freq": "1min", "n": 3}) == {"error": "falha em get_bars: KeyError: 'price'"}